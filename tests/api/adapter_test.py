@@ -4,7 +4,7 @@ import mock
 from testify import TestCase, assert_equal, run, setup, teardown
 from tests import mocks
 from tests.assertions import assert_length
-from tron import node, scheduler
+from tron import actioncommand, node, scheduler
 from tron.api import adapter
 from tron.api.adapter import ReprAdapter, RunAdapter, ActionRunAdapter
 from tron.api.adapter import JobRunAdapter, ServiceAdapter
@@ -45,6 +45,19 @@ class ReprAdapterTestCase(TestCase):
         expected = dict(one=1, two=2, three=3, four=4)
         assert_equal(self.adapter.get_repr(), expected)
 
+    def test_select_fields(self):
+        self.adapter.select_fields(['two', 'three'])
+        assert_equal(self.adapter.get_repr(), dict(two=2, three=3))
+
+    def test_select_fields_empty(self):
+        assert_equal(self.adapter.select_fields(None), self.adapter)
+        assert_equal(len(self.adapter.get_repr()), 4)
+
+    def test_adapt_many_fields(self):
+        reprs = adapter.adapt_many(
+            MockAdapter, [self.original], fields=['one'])
+        assert_equal(reprs, [dict(one=1)])
+
 
 class SampleClassStub(object):
 
@@ -117,6 +130,27 @@ class ActionRunAdapterTestCase(TestCase):
         result = self.adapter.get_repr()
         assert_equal(result['command'], self.action_run.rendered_command)
 
+    @mock.patch('tron.api.adapter.filehandler', autospec=True)
+    def test_get_stdout(self, mock_filehandler):
+        self.adapter.include_stdout = True
+        serializer = mock_filehandler.OutputStreamSerializer.return_value
+        assert_equal(self.adapter.get_stdout(), serializer.tail.return_value)
+        assert_equal(self.adapter.get_stdout_offset(),
+            serializer.size.return_value)
+        serializer.tail.assert_called_once_with(
+            actioncommand.ActionCommand.STDOUT, 4)
+
+    @mock.patch('tron.api.adapter.filehandler', autospec=True)
+    def test_get_stderr_since_offset(self, mock_filehandler):
+        self.adapter = ActionRunAdapter(self.action_run,
+            include_stderr=True, stderr_offset=20)
+        serializer = mock_filehandler.OutputStreamSerializer.return_value
+        serializer.read_since.return_value = ['line'], 25
+        assert_equal(self.adapter.get_stderr(), ['line'])
+        assert_equal(self.adapter.get_stderr_offset(), 25)
+        serializer.read_since.assert_called_once_with(
+            actioncommand.ActionCommand.STDERR, 20)
+
 
 class ActionRunGraphAdapterTestCase(TestCase):
 
@@ -183,6 +217,13 @@ class NodeAdapterTestCase(TestCase):
         result = self.adapter.get_repr()
         assert_equal(result['hostname'], self.node.hostname)
         assert_equal(result['username'], self.node.username)
+        assert_equal(result['run_queue'], None)
+
+    def test_repr_include_run_queue(self):
+        self.adapter = adapter.NodeAdapter(self.node, include_run_queue=True)
+        result = self.adapter.get_repr()
+        assert_equal(result['run_queue'],
+            self.node.get_run_queue_stats.return_value)
 
 
 class NodePoolAdapterTestCase(TestCase):
@@ -196,6 +237,10 @@ class NodePoolAdapterTestCase(TestCase):
     def test_repr(self, mock_many):
         result = self.adapter.get_repr()
         assert_equal(result['name'], self.pool.get_name.return_value)
+        assert_equal(result['strategy'],
+            self.pool.get_strategy_name.return_value)
+        assert_equal(result['placements'],
+            self.pool.get_placements.return_value)
         mock_many.assert_called_with(adapter.NodeAdapter,
             self.pool.get_nodes.return_value)
 
@@ -0,0 +1,74 @@
+import mock
+from testify import TestCase, run, setup, assert_equal
+
+from tron.api import cache
+from tron.core import job, jobrun
+
+
+def build_job(name, version, active_runs=()):
+    mock_job = mock.create_autospec(job.Job, version=version)
+    mock_job.get_name.return_value = name
+    mock_job.runs = mock.create_autospec(jobrun.JobRunCollection)
+    mock_job.runs.get_active.return_value = iter(active_runs)
+    return mock_job
+
+
+class BuildETagTestCase(TestCase):
+
+    def test_build_etag(self):
+        jobs = [build_job('a', 3), build_job('b', 7)]
+        assert_equal(cache.build_etag(jobs), '"7-2-0-0"')
+        assert_equal(cache.build_etag(jobs, True, True), '"7-2-1-1"')
+
+    def test_build_etag_empty(self):
+        assert_equal(cache.build_etag([]), '"0-0-0-0"')
+
+    @mock.patch('tron.api.cache.time', autospec=True)
+    def test_build_etag_active_runs(self, mock_time):
+        mock_time.time.return_value = 1234.5
+        jobs = [build_job('a', 3, [mock.Mock()])]
+        assert_equal(cache.build_etag(jobs, True), '"3-1-1-0-1234"')
+
+
+class JobReprCacheTestCase(TestCase):
+
+    @setup
+    def setup_cache(self):
+        self.cache = cache.JobReprCache()
+        self.job = build_job('a', 1)
+
+    @mock.patch('tron.api.cache.adapter', autospec=True)
+    def test_get_repr(self, mock_adapter):
+        job_repr = self.cache.get_repr(self.job, True)
+        job_adapter = mock_adapter.JobAdapter.return_value
+        assert_equal(job_repr, job_adapter.select_fields.return_value.get_repr())
+        self.job.runs.get_active.return_value = iter([])
+        assert_equal(self.cache.get_repr(self.job, True), job_repr)
+        mock_adapter.JobAdapter.assert_called_once_with(
+            self.job, True, False, num_runs=None)
+
+    @mock.patch('tron.api.cache.adapter', autospec=True)
+    def test_get_repr_new_version(self, mock_adapter):
+        self.cache.get_repr(self.job)
+        self.job.version = 2
+        self.cache.get_repr(self.job)
+        self.cache.get_repr(self.job, include_action_runs=True)
+        assert_equal(mock_adapter.JobAdapter.call_count, 3)
+
+    @mock.patch('tron.api.cache.adapter', autospec=True)
+    def test_get_repr_active_runs(self, mock_adapter):
+        self.job.runs.get_active.side_effect = lambda: iter([mock.Mock()])
+        self.cache.get_repr(self.job, True)
+        self.cache.get_repr(self.job, True)
+        assert_equal(mock_adapter.JobAdapter.call_count, 2)
+
+    @mock.patch('tron.api.cache.adapter', autospec=True)
+    def test_get_reprs_prunes(self, _mock_adapter):
+        other = build_job('b', 1)
+        self.cache.get_reprs([self.job, other])
+        self.cache.get_reprs([other])
+        assert_equal(self.cache.entries.keys(), ['b'])
+
+
+if __name__ == "__main__":
+    run()
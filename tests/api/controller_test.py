@@ -1,6 +1,6 @@
 import mock
 
-from testify import setup, TestCase, run, assert_equal
+from testify import setup, TestCase, run, assert_equal, assert_raises
 from testify.assertions import assert_in
 from tests.testingutils import autospec_method
 from tron import mcp
@@ -8,7 +8,7 @@ from tron.api import controller
 
 from tron.api.controller import JobCollectionController, ConfigController
 from tron.config import ConfigError, manager, config_parse
-from tron.core import job, service, jobrun, actionrun
+from tron.core import backfill, job, service, jobrun, actionrun
 
 
 class JobCollectionControllerTestCase(TestCase):
@@ -114,6 +114,22 @@ class JobControllerTestCase(TestCase):
         self.job_scheduler.manual_start.assert_called_with(run_time=run_time)
 
 
+class BackfillControllerTestCase(TestCase):
+
+    @setup
+    def setup_controller(self):
+        self.backfill = mock.create_autospec(backfill.Backfill)
+        self.controller = controller.BackfillController(self.backfill)
+
+    def test_handle_command_cancel(self):
+        self.controller.handle_command('cancel')
+        self.backfill.cancel.assert_called_with()
+
+    def test_handle_command_unknown(self):
+        assert_raises(controller.UnknownCommandError,
+            self.controller.handle_command, 'start')
+
+
 class ServiceInstanceControllerTestCase(TestCase):
 
     @setup
@@ -3,6 +3,7 @@ from testify import TestCase, run, assert_equal, setup
 from tests.testingutils import Turtle
 
 from tron.api.requestargs import get_integer, get_string, get_bool, get_datetime
+from tron.api.requestargs import get_list
 
 
 class RequestArgsTestCase(TestCase):
@@ -61,6 +62,13 @@ class RequestArgsTestCase(TestCase):
     def test_get_datetime_missing(self):
         assert not get_datetime(self.request, 'missing')
 
+    def test_get_list(self):
+        self._add_arg('list', 'one,two,')
+        assert_equal(get_list(self.request, 'list'), ['one', 'two'])
+
+    def test_get_list_missing(self):
+        assert_equal(get_list(self.request, 'missing'), None)
+
 
 if __name__ == "__main__":
     run()
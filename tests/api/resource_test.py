@@ -1,22 +1,24 @@
 """
 Test cases for the web services interface to tron
 """
+import datetime
 import mock
 import twisted.web.resource
 import twisted.web.http
 import twisted.web.server
 
 from testify import TestCase, class_setup, assert_equal, run, setup
-from testify import teardown
+from testify import teardown, assert_in
 from testify import setup_teardown
 from tests import mocks
 from twisted.web import http
 from tests.assertions import assert_call
-from tron import event, node
+from tron import changefeed, event, node
 from tron import mcp
 from tron.api import resource as www, controller
 from tests.testingutils import Turtle, autospec_method
-from tron.core import service, serviceinstance, job, jobrun
+from tron.core import service, serviceinstance, job, jobrun, actionrun
+from tron.core import backfill, runtimer
 
 
 REQUEST = twisted.web.server.Request(mock.Mock(), None)
@@ -34,7 +36,8 @@ class WWWTestCase(TestCase):
     @setup_teardown
     def mock_respond(self):
         with mock.patch('tron.api.resource.respond', autospec=True) as self.respond:
-            self.respond.side_effect = lambda _req, output, code=None: output
+            self.respond.side_effect = (
+                lambda _req, output, code=None, headers=None: output)
             yield
 
     @setup
@@ -85,6 +88,37 @@ class ActionRunResourceTestCase(WWWTestCase):
         response = self.resource.render_GET(request)
         assert_equal(response['id'], self.action_run.id)
 
+    def test_getChild(self):
+        assert_equal(self.resource.getChild('', None), self.resource)
+        child = self.resource.getChild('stream', None)
+        assert isinstance(child, www.ActionRunStreamResource)
+        assert_equal(child.action_run, self.action_run)
+
+    def test_getChild_missing(self):
+        child = self.resource.getChild('bogus', None)
+        assert isinstance(child, twisted.web.resource.NoResource)
+
+
+class ActionRunStreamResourceTestCase(TestCase):
+
+    @setup
+    def setup_resource(self):
+        self.action_run = mock.MagicMock(output_path=['one'])
+        self.resource = www.ActionRunStreamResource(self.action_run)
+
+    @mock.patch('tron.api.resource.filehandler', autospec=True)
+    @mock.patch('tron.api.resource.stream', autospec=True)
+    def test_render_GET(self, mock_stream, mock_filehandler):
+        request = build_request(stdout_offset="12")
+        serializer = mock_filehandler.OutputStreamSerializer.return_value
+        response = self.resource.render_GET(request)
+        assert_equal(response, twisted.web.server.NOT_DONE_YET)
+        expected_offsets = {
+            '.stdout': 12, '.stderr': serializer.size.return_value}
+        mock_stream.OutputStream.assert_called_with(
+            request, self.action_run, serializer, expected_offsets)
+        mock_stream.OutputStream.return_value.start.assert_called_with()
+
 
 class JobrunResourceTestCase(WWWTestCase):
 
@@ -107,7 +141,9 @@ class ApiRootResourceTestCase(WWWTestCase):
         self.resource = www.ApiRootResource(self.mcp)
 
     def test__init__(self):
-        expected_children = ['jobs', 'services', 'config', 'status', 'events', '']
+        expected_children = [
+            'jobs', 'services', 'config', 'status', 'events', 'nodes',
+            'changes', 'upcoming', 'backfills', '']
         assert_equal(set(expected_children), set(self.resource.children))
 
     def test_render_GET(self):
@@ -149,6 +185,90 @@ class ActionRunHistoryResourceTestCase(WWWTestCase):
         assert_equal(len(response), len(self.action_runs))
 
 
+class ActionRunHistoryPaginationTestCase(WWWTestCase):
+
+    @setup
+    def setup_resource(self):
+        self.action_runs = []
+        for num in reversed(xrange(5)):
+            action_run = mock.create_autospec(actionrun.ActionRun,
+                job_run_id='MASTER.job.%s' % num,
+                start_time=datetime.datetime(2013, 1, 1, num),
+                node=mock.create_autospec(node.Node))
+            action_run.state.name = 'succeeded' if num % 2 else 'failed'
+            action_run.node.get_name.return_value = 'node%s' % (num % 2)
+            self.action_runs.append(action_run)
+        self.resource = www.ActionRunHistoryResource(self.action_runs)
+        self.adapter_patcher = mock.patch(
+            'tron.api.resource.adapter', autospec=True)
+        self.adapter = self.adapter_patcher.start()
+
+    @teardown
+    def teardown_resource(self):
+        self.adapter_patcher.stop()
+
+    def get_adapted(self):
+        return self.adapter.adapt_many.call_args[0][1]
+
+    def test_render_GET_paginated(self):
+        self.resource.render_GET(build_request(limit='2', fields='id'))
+        assert_equal(self.get_adapted(), self.action_runs[:2])
+        self.adapter.adapt_many.assert_called_with(
+            self.adapter.ActionRunAdapter, mock.ANY, fields=['id'])
+        self.respond.assert_called_with(mock.ANY,
+            self.adapter.adapt_many.return_value,
+            headers={'X-Next-Cursor': '3'})
+
+    def test_render_GET_cursor(self):
+        self.resource.render_GET(build_request(cursor='3', limit='2'))
+        assert_equal(self.get_adapted(), self.action_runs[2:4])
+        self.resource.render_GET(build_request(cursor='1', limit='2'))
+        assert_equal(self.get_adapted(), self.action_runs[4:])
+        self.respond.assert_called_with(mock.ANY, mock.ANY, headers={})
+
+    def test_render_GET_filtered(self):
+        request = build_request(state='succeeded', node='node1',
+            since='2013-01-01 02:00:00')
+        self.resource.render_GET(request)
+        assert_equal(self.get_adapted(), [self.action_runs[1]])
+
+
+class BuildJobFilterTestCase(TestCase):
+
+    @setup
+    def setup_job(self):
+        self.job = mock.create_autospec(job.Job, status='enabled',
+            node_pool=mock.create_autospec(node.NodePool),
+            runs=[mock.Mock(run_time=datetime.datetime(2013, 1, 1, 5))])
+        self.job.get_name.return_value = 'MASTER.some_job'
+        self.job.node_pool.get_name.return_value = 'pool'
+        node_one = mock.create_autospec(node.Node)
+        node_one.get_name.return_value = 'node_one'
+        self.job.node_pool.get_nodes.return_value = [node_one]
+
+    def assert_matches(self, expected, **kwargs):
+        matches = www.build_job_filter(build_request(**kwargs))
+        assert_equal(matches(self.job), expected)
+
+    def test_no_filters(self):
+        self.assert_matches(True)
+
+    def test_namespace(self):
+        self.assert_matches(True, namespace='MASTER', name_prefix='MASTER.so')
+        self.assert_matches(False, namespace='OTHER')
+        self.assert_matches(False, name_prefix='MASTER.other')
+
+    def test_node(self):
+        self.assert_matches(True, node='pool')
+        self.assert_matches(True, node='node_one')
+        self.assert_matches(False, node='node_two')
+
+    def test_time_range(self):
+        self.assert_matches(True, since='2013-01-01 04:00:00')
+        self.assert_matches(False, since='2013-01-01 06:00:00')
+        self.assert_matches(False, until='2013-01-01 04:00:00')
+
+
 class JobCollectionResourceTestCase(WWWTestCase):
 
     @class_setup
@@ -167,9 +287,67 @@ class JobCollectionResourceTestCase(WWWTestCase):
     def test_render_GET(self):
         self.resource.get_data = Turtle()
         result = self.resource.render_GET(REQUEST)
-        assert_call(self.resource.get_data, 0, False, False)
+        assert_call(self.resource.get_data, 0, False, False, [], 5, None)
         assert 'jobs' in result
 
+
+class JobCollectionResourceCacheTestCase(WWWTestCase):
+
+    @setup
+    def setup_resource(self):
+        self.jobs = [mock.create_autospec(job.Job, version=i, status='enabled')
+                     for i in xrange(3)]
+        for i, mock_job in enumerate(self.jobs):
+            mock_job.get_name.return_value = 'job%s' % i
+        self.job_collection = mock.create_autospec(job.JobCollection)
+        self.job_collection.get_jobs.return_value = self.jobs
+        self.resource = www.JobCollectionResource(self.job_collection)
+        autospec_method(self.resource.get_data)
+        self.request = build_request()
+        self.request.setETag.return_value = None
+
+    def test_render_GET_not_modified(self):
+        self.request.setETag.return_value = twisted.web.http.CACHED
+        assert_equal(self.resource.render_GET(self.request), "")
+        self.request.setETag.assert_called_with('"2-3-0-0"')
+        assert not self.resource.get_data.call_count
+
+    def test_render_GET_rendered(self):
+        first = self.resource.render_GET(self.request)
+        assert_equal(self.resource.render_GET(self.request), first)
+        assert_equal(self.resource.get_data.call_count, 1)
+
+        self.jobs[0].version = 5
+        self.resource.render_GET(self.request)
+        assert_equal(self.resource.get_data.call_count, 2)
+
+    def test_render_GET_paginated(self):
+        request = build_request(limit='2', fields='name,status')
+        response = self.resource.render_GET(request)
+        assert_equal(response['next_cursor'], 'job1')
+        self.resource.get_data.assert_called_with(
+            False, False, self.jobs[:2], 5, ['name', 'status'])
+
+        request = build_request(limit='2', cursor='job1')
+        response = self.resource.render_GET(request)
+        assert_equal(response['next_cursor'], None)
+        self.resource.get_data.assert_called_with(
+            False, False, self.jobs[2:], 5, None)
+
+    def test_render_GET_filtered(self):
+        self.jobs[1].status = 'disabled'
+        request = build_request(state='disabled,running', num_runs='2')
+        self.resource.render_GET(request)
+        self.resource.get_data.assert_called_with(
+            False, False, [self.jobs[1]], 2, None)
+
+    def test_get_job_index(self):
+        with mock.patch('tron.api.resource.adapter', autospec=True) as adapt:
+            adapt.adapt_many.return_value = [dict(name='a', actions=['b'])]
+            assert_equal(self.resource.get_job_index(), {'a': ['b']})
+            self.resource.get_job_index()
+            assert_equal(adapt.adapt_many.call_count, 1)
+
     def test_getChild(self):
         child = self.resource.getChild("testname", mock.Mock())
         assert isinstance(child, www.JobResource)
@@ -303,6 +481,20 @@ class ServiceCollectionResourceTestCase(TestCase):
             assert_equal(len(respond.call_args[0][1]['services']), service_count)
 
 
+class StatusResourceTestCase(WWWTestCase):
+
+    @setup
+    def setup_resource(self):
+        self.mcp = mock.create_autospec(mcp.MasterControlProgram)
+        self.resource = www.StatusResource(self.mcp)
+
+    def test_render_GET(self):
+        response = self.resource.render_GET(build_request())
+        state_watcher = self.mcp.get_state_watcher.return_value
+        assert_equal(response['state_flushes'],
+            state_watcher.get_flush_stats.return_value)
+
+
 class EventResourceTestCase(WWWTestCase):
 
     @setup
@@ -323,6 +515,270 @@ class EventResourceTestCase(WWWTestCase):
         names = [e['name'] for e in response['data']]
         assert_equal(names, [critical_message, ok_message])
 
+    def test_render_GET_with_filters(self):
+        recorder = event.get_recorder(self.name)
+        recorder.get_child('child').ok('child ok')
+        recorder.get_child('child').critical('child critical')
+        recorder.get_child('other').critical('other critical')
+        request = build_request(entity='child', min_level='critical', limit='5')
+        response = self.resource.render_GET(request)
+        assert_equal([e['name'] for e in response['data']], ['child critical'])
+
+    def test_render_GET_limit(self):
+        recorder = event.get_recorder(self.name)
+        for name in ['one', 'two', 'three']:
+            recorder.info(name)
+        response = self.resource.render_GET(build_request(limit='2'))
+        assert_equal([e['name'] for e in response['data']], ['three', 'two'])
+
+    def test_render_GET_invalid_min_level(self):
+        response = self.resource.render_GET(build_request(min_level='bogus'))
+        assert_in('min_level', response['error'])
+
+    def test_render_GET_invalid_since(self):
+        response = self.resource.render_GET(build_request(since='yesterday'))
+        assert_in('since', response['error'])
+
+
+class NodeCollectionResourceTestCase(WWWTestCase):
+
+    @setup
+    def setup_resource(self):
+        self.nodes = [mock.create_autospec(node.Node) for _ in xrange(2)]
+        for i, mock_node in enumerate(self.nodes):
+            mock_node.get_name.return_value = 'node%s' % i
+        self.repo = mock.Mock(nodes=dict(
+            (n.get_name.return_value, n) for n in reversed(self.nodes)))
+        self.resource = www.NodeCollectionResource(self.repo)
+
+    def test_render_GET(self):
+        response = self.resource.render_GET(build_request())
+        queues = [n['run_queue'] for n in response['nodes']]
+        assert_equal(queues,
+            [n.get_run_queue_stats.return_value for n in self.nodes])
+
+
+class JobScheduleResourceTestCase(WWWTestCase):
+
+    @setup
+    def setup_resource(self):
+        self.job_scheduler = mock.create_autospec(job.JobScheduler)
+        self.job = self.job_scheduler.get_job.return_value
+        self.resource = www.JobScheduleResource(self.job_scheduler)
+        self.start_time = datetime.datetime(2012, 3, 14)
+        self.run_times = [datetime.datetime(2012, 3, 14, hour)
+                          for hour in xrange(3)]
+
+    @mock.patch('tron.api.resource.backfill.get_run_times', autospec=True)
+    def test_render_GET(self, mock_get_run_times):
+        mock_get_run_times.return_value = self.run_times
+        request = build_request(start_time='2012-03-14 00:00:00', limit='2')
+        response = self.resource.render_GET(request)
+        mock_get_run_times.assert_called_with(self.job, self.start_time,
+            self.start_time + self.resource.DEFAULT_WINDOW, 3)
+        assert_equal(response['job_name'], self.job.get_name.return_value)
+        assert_equal(response['run_times'], self.run_times[:2])
+        assert response['truncated']
+
+    @mock.patch('tron.api.resource.backfill.get_run_times', autospec=True)
+    def test_render_GET_invalid_window(self, mock_get_run_times):
+        mock_get_run_times.side_effect = backfill.BackfillError("bad window")
+        response = self.resource.render_GET(build_request())
+        assert_equal(response, {'error': "bad window"})
+        self.respond.assert_called_with(
+            mock.ANY, response, code=http.BAD_REQUEST)
+
+    @mock.patch('tron.api.resource.backfill.get_run_times', autospec=True)
+    def test_render_GET_malformed_time(self, mock_get_run_times):
+        for key in ('start_time', 'end_time'):
+            request = build_request(**{key: '2012-03-14'})
+            response = self.resource.render_GET(request)
+            assert 'error' in response
+            self.respond.assert_called_with(
+                mock.ANY, response, code=http.BAD_REQUEST)
+        assert not mock_get_run_times.called
+
+
+class JobBackfillResourceTestCase(WWWTestCase):
+
+    @setup_teardown
+    def setup_resource(self):
+        self.job_scheduler = mock.create_autospec(job.JobScheduler)
+        self.resource = www.JobBackfillResource(self.job_scheduler)
+        patcher = mock.patch('tron.api.resource.backfill.BackfillManager',
+            autospec=True)
+        with patcher as mock_manager_class:
+            self.manager = mock_manager_class.get_instance.return_value
+            yield
+
+    def test_render_POST(self):
+        request = build_request(start_time='2012-03-14 00:00:00',
+            end_time='2012-03-15 00:00:00', max_concurrency='4')
+        response = self.resource.render_POST(request)
+        self.manager.create.assert_called_with(self.job_scheduler,
+            datetime.datetime(2012, 3, 14), datetime.datetime(2012, 3, 15), 4)
+        job_backfill = self.manager.create.return_value
+        assert_equal(response, job_backfill.get_status.return_value)
+
+    def test_render_POST_missing_window(self):
+        request = build_request(start_time='2012-03-14 00:00:00')
+        response = self.resource.render_POST(request)
+        assert 'error' in response
+        assert not self.manager.create.called
+
+    def test_render_POST_backfill_error(self):
+        self.manager.create.side_effect = backfill.BackfillError("no runs")
+        request = build_request(start_time='2012-03-14 00:00:00',
+            end_time='2012-03-15 00:00:00')
+        response = self.resource.render_POST(request)
+        assert_equal(response, {'error': "no runs"})
+
+
+class BackfillCollectionResourceTestCase(WWWTestCase):
+
+    @setup
+    def setup_resource(self):
+        self.manager = mock.create_autospec(backfill.BackfillManager)
+        self.resource = www.BackfillCollectionResource(self.manager)
+
+    def test_getChild(self):
+        child = self.resource.getChild('3', None)
+        self.manager.get.assert_called_with(3)
+        assert_equal(child.backfill, self.manager.get.return_value)
+
+    def test_getChild_missing(self):
+        self.manager.get.return_value = None
+        child = self.resource.getChild('3', None)
+        assert isinstance(child, twisted.web.resource.NoResource)
+
+    def test_getChild_not_a_number(self):
+        child = self.resource.getChild('abc', None)
+        assert isinstance(child, twisted.web.resource.NoResource)
+
+    def test_render_GET(self):
+        job_backfill = mock.create_autospec(backfill.Backfill)
+        self.manager.get_all.return_value = [job_backfill]
+        response = self.resource.render_GET(build_request())
+        assert_equal(response['backfills'],
+            [job_backfill.get_status.return_value])
+
+
+class UpcomingRunsResourceTestCase(WWWTestCase):
+
+    @setup
+    def setup_resource(self):
+        self.run_timer = mock.create_autospec(runtimer.RunTimer)
+        self.resource = www.UpcomingRunsResource(self.run_timer)
+
+    @mock.patch('tron.api.resource.adapter', autospec=True)
+    def test_render_GET(self, mock_adapter):
+        response = self.resource.render_GET(build_request(num_runs='3'))
+        self.run_timer.get_upcoming.assert_called_with(3)
+        mock_adapter.adapt_many.assert_called_with(
+            mock_adapter.JobRunAdapter,
+            self.run_timer.get_upcoming.return_value)
+        assert_equal(response['runs'], mock_adapter.adapt_many.return_value)
+
+    def test_render_GET_default(self):
+        self.run_timer.get_upcoming.return_value = []
+        self.resource.render_GET(build_request())
+        self.run_timer.get_upcoming.assert_called_with(
+            self.resource.DEFAULT_NUM_RUNS)
+
+
+class ChangeFeedResourceTestCase(WWWTestCase):
+
+    @setup
+    def setup_resource(self):
+        self.feed = changefeed.ChangeFeed()
+        self.feed.append('job', 'MASTER.one', 'MASTER.one', 'enabled')
+        self.feed.append('job', 'OTHER.two', 'OTHER.two', 'enabled')
+        self.resource = www.ChangeFeedResource(self.feed)
+
+    def test_getChild(self):
+        child = self.resource.getChild('stream', None)
+        assert isinstance(child, www.ChangeStreamResource)
+        assert_equal(child.change_feed, self.feed)
+
+    def test_render_GET(self):
+        request = build_request(since='0', namespace='OTHER')
+        response = self.resource.render_GET(request)
+        assert_equal(response['seq'], 2)
+        assert_equal([c['name'] for c in response['changes']], ['OTHER.two'])
+        assert not response['reset']
+
+    def test_render_GET_no_wait(self):
+        response = self.resource.render_GET(build_request(timeout='0'))
+        assert_equal(response['changes'], [])
+
+    @mock.patch('tron.api.resource.ChangeWaiter', autospec=True)
+    def test_render_GET_waits(self, mock_waiter):
+        request = build_request()
+        response = self.resource.render_GET(request)
+        assert_equal(response, twisted.web.server.NOT_DONE_YET)
+        mock_waiter.assert_called_with(
+            request, self.feed, 2, mock.ANY, self.resource.DEFAULT_TIMEOUT)
+        mock_waiter.return_value.start.assert_called_with()
+
+
+class ChangeWaiterTestCase(WWWTestCase):
+
+    @setup
+    def setup_waiter(self):
+        self.feed = changefeed.ChangeFeed()
+        self.request = build_request()
+        matches = changefeed.build_filter(namespace='MASTER')
+        self.waiter = www.ChangeWaiter(self.request, self.feed, 0, matches, 30)
+
+    @mock.patch('tron.api.resource.eventloop', autospec=True)
+    def test_handle_change(self, mock_eventloop):
+        self.waiter.start()
+        self.feed.append('job', 'OTHER.two', 'OTHER.two', 'enabled')
+        assert not self.request.finish.call_count
+        self.feed.append('job', 'MASTER.one', 'MASTER.one', 'enabled')
+        response = self.request.write.call_args[0][0]
+        assert_equal([c['name'] for c in response['changes']], ['MASTER.one'])
+        self.request.finish.assert_called_with()
+        assert_equal(self.feed.subscribers, [])
+        mock_eventloop.call_later.return_value.cancel.assert_called_with()
+
+    @mock.patch('tron.api.resource.eventloop', autospec=True)
+    def test_finish_timeout(self, mock_eventloop):
+        self.waiter.start()
+        mock_eventloop.call_later.assert_called_with(30, self.waiter.finish)
+        self.waiter.finish()
+        response = self.request.write.call_args[0][0]
+        assert_equal(response['changes'], [])
+        self.request.finish.assert_called_with()
+
+
+class ChangeStreamResourceTestCase(TestCase):
+
+    @setup
+    def setup_resource(self):
+        self.feed = changefeed.ChangeFeed()
+        self.feed.append('job', 'MASTER.one', 'MASTER.one', 'enabled')
+        self.resource = www.ChangeStreamResource(self.feed)
+
+    @mock.patch('tron.api.resource.stream', autospec=True)
+    def test_render_GET(self, mock_stream):
+        request = build_request()
+        request.getHeader.return_value = None
+        response = self.resource.render_GET(request)
+        assert_equal(response, twisted.web.server.NOT_DONE_YET)
+        mock_stream.ChangeStream.assert_called_with(
+            request, self.feed, 1, mock.ANY)
+        mock_stream.ChangeStream.return_value.start.assert_called_with()
+
+    @mock.patch('tron.api.resource.stream', autospec=True)
+    def test_render_GET_last_event_id(self, mock_stream):
+        request = build_request()
+        request.getHeader.return_value = '0'
+        self.resource.render_GET(request)
+        request.getHeader.assert_called_with('last-event-id')
+        mock_stream.ChangeStream.assert_called_with(
+            request, self.feed, 0, mock.ANY)
+
 
 class ConfigResourceTestCase(TestCase):
 
@@ -353,6 +809,16 @@ class ConfigResourceTestCase(TestCase):
             'error': self.controller.update_config.return_value}
         self.respond.assert_called_with(request, response_content)
 
+    def test_render_POST_with_diff(self):
+        name, config, hash = 'the_name', mock.Mock(), mock.Mock()
+        request = build_request(name=name, config=config, hash=hash)
+        self.controller.update_config.return_value = None
+        self.resource.render_POST(request)
+        response_content = {
+            'status': 'Active',
+            'diff': self.controller.get_config_diff.return_value}
+        self.respond.assert_called_with(request, response_content)
+
 
 if __name__ == '__main__':
     run()
@@ -0,0 +1,195 @@
+import json
+import mock
+from testify import TestCase, run, setup, assert_equal, teardown
+
+from twisted.web import server
+from tron import changefeed
+from tron.api import stream
+from tron.core import actionrun
+from tron.serialize import filehandler
+
+
+def parse_events(request):
+    events = []
+    for call in request.write.mock_calls:
+        lines = call[1][0].strip().split('\n')
+        fields = dict(line.split(': ', 1) for line in lines)
+        events.append((fields['event'], json.loads(fields['data'])))
+    return events
+
+
+class OutputStreamTestCase(TestCase):
+
+    @setup
+    def setup_stream(self):
+        self.request = mock.create_autospec(server.Request)
+        self.action_run = mock.create_autospec(actionrun.ActionRun,
+            is_done=False)
+        self.serializer = mock.create_autospec(
+            filehandler.OutputStreamSerializer)
+        self.serializer.full_path.side_effect = lambda name: 'path%s' % name
+        self.serializer.read_from.side_effect = lambda _, offset: (offset, '')
+        self.offsets = {'.stdout': 10, '.stderr': 0}
+        self.stream = stream.OutputStream(
+            self.request, self.action_run, self.serializer, self.offsets)
+        self.manager = filehandler.FileHandleManager.get_instance()
+
+    @teardown
+    def teardown_stream(self):
+        self.manager.listeners.clear()
+
+    def test_start(self):
+        self.stream.start()
+        self.request.registerProducer.assert_called_with(self.stream, True)
+        assert_equal(set(self.manager.listeners),
+            set(['path.stdout', 'path.stderr']))
+        self.action_run.attach.assert_called_with(True, self.stream)
+        assert_equal(self.stream.behind, set())
+
+    def test_handle_write(self):
+        self.stream.start()
+        self.stream.handle_write('path.stdout', 'some output')
+        assert_equal(parse_events(self.request),
+            [('stdout', {'offset': 10, 'data': 'some output'})])
+        assert_equal(self.offsets['.stdout'], 21)
+
+    def test_handle_write_split_character(self):
+        self.stream.start()
+        self.stream.handle_write('path.stdout', 'caf\xc3')
+        self.stream.handle_write('path.stdout', '\xa9 ok')
+        assert_equal(parse_events(self.request), [
+            ('stdout', {'offset': 10, 'data': 'caf'}),
+            ('stdout', {'offset': 13, 'data': u'\xe9 ok'})])
+        assert_equal(self.offsets['.stdout'], 18)
+
+    def test_handle_write_invalid_utf8(self):
+        self.stream.start()
+        self.stream.handle_write('path.stdout', 'a\xff\xfeb')
+        assert_equal(parse_events(self.request),
+            [('stdout', {'offset': 10, 'data': u'a\ufffd\ufffdb'})])
+
+    def test_finish_sends_partial_character(self):
+        self.stream.start()
+        self.stream.handle_write('path.stdout', 'caf\xc3')
+        self.action_run.is_done = True
+        self.stream.handler(self.action_run, None)
+        events = parse_events(self.request)
+        assert_equal(events[1], ('stdout', {'offset': 13, 'data': u'\ufffd'}))
+        assert_equal(events[-1][0], 'done')
+
+    def test_handle_write_paused(self):
+        self.stream.start()
+        self.stream.pauseProducing()
+        self.stream.handle_write('path.stderr', 'some output')
+        assert not self.request.write.call_count
+
+        self.serializer.read_from.side_effect = [(0, 'some output'), (11, '')]
+        self.stream.resumeProducing()
+        assert_equal(parse_events(self.request),
+            [('stderr', {'offset': 0, 'data': 'some output'})])
+        assert_equal(self.stream.behind, set())
+
+    def test_finish_when_done(self):
+        self.stream.start()
+        self.action_run.is_done = True
+        self.stream.handler(self.action_run, None)
+        assert_equal(parse_events(self.request)[-1][0], 'done')
+        self.request.finish.assert_called_with()
+        self.action_run.remove_observer.assert_called_with(self.stream)
+        assert_equal(self.manager.listeners, {})
+
+    def test_finish_paused(self):
+        self.stream.start()
+        self.stream.pauseProducing()
+        self.stream.finish()
+        assert not self.request.finish.call_count
+        self.stream.resumeProducing()
+        self.request.finish.assert_called_with()
+
+    def test_client_closed(self):
+        self.stream.start()
+        self.stream.stopProducing()
+        self.stream.finish()
+        assert not self.request.finish.call_count
+        assert_equal(self.manager.listeners, {})
+
+
+class SplitPartialCharTestCase(TestCase):
+
+    def test_split_partial_char(self):
+        assert_equal(stream.split_partial_char('abc'), ('abc', ''))
+        assert_equal(stream.split_partial_char(''), ('', ''))
+        assert_equal(stream.split_partial_char('caf\xc3'), ('caf', '\xc3'))
+        assert_equal(stream.split_partial_char('caf\xc3\xa9'),
+            ('caf\xc3\xa9', ''))
+        assert_equal(stream.split_partial_char('a\xe2\x82'),
+            ('a', '\xe2\x82'))
+        assert_equal(stream.split_partial_char('a\xff'), ('a\xff', ''))
+
+
+class FormatEventTestCase(TestCase):
+
+    def test_format_event(self):
+        assert_equal(stream.format_event('done', {'a': 1}),
+            'event: done\ndata: {"a": 1}\n\n')
+
+    def test_format_event_with_id(self):
+        assert_equal(stream.format_event('change', [], 3),
+            'id: 3\nevent: change\ndata: []\n\n')
+
+
+class ChangeStreamTestCase(TestCase):
+
+    @setup
+    def setup_stream(self):
+        self.request = mock.create_autospec(server.Request)
+        self.feed = changefeed.ChangeFeed(history=3)
+        self.feed.append('job', 'MASTER.one', 'MASTER.one', 'enabled')
+        matches = changefeed.build_filter(namespace='MASTER')
+        self.stream = stream.ChangeStream(self.request, self.feed, 0, matches)
+
+    def append(self, name):
+        self.feed.append('job', name, name, 'enabled')
+
+    def test_start(self):
+        self.stream.start()
+        self.request.registerProducer.assert_called_with(self.stream, True)
+        assert_equal(parse_events(self.request),
+            [('change', self.feed.changes[0])])
+        assert_equal(self.stream.since, 1)
+
+    def test_handle_change(self):
+        self.stream.start()
+        self.append('OTHER.two')
+        self.append('MASTER.three')
+        assert_equal([e[1]['name'] for e in parse_events(self.request)],
+            ['MASTER.one', 'MASTER.three'])
+        assert_equal(self.stream.since, 3)
+
+    def test_paused(self):
+        self.stream.start()
+        self.stream.pauseProducing()
+        self.append('MASTER.two')
+        assert_equal(len(parse_events(self.request)), 1)
+        self.stream.resumeProducing()
+        assert_equal([e[1]['name'] for e in parse_events(self.request)],
+            ['MASTER.one', 'MASTER.two'])
+
+    def test_paused_reset(self):
+        self.stream.start()
+        self.stream.pauseProducing()
+        for i in xrange(4):
+            self.append('MASTER.%s' % i)
+        self.stream.resumeProducing()
+        assert_equal(parse_events(self.request)[-1], ('reset', {'seq': 5}))
+        self.append('MASTER.last')
+        assert_equal(parse_events(self.request)[-1][1]['seq'], 6)
+
+    def test_stop(self):
+        self.stream.start()
+        self.stream.stopProducing()
+        assert_equal(self.feed.subscribers, [])
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,123 @@
+import mock
+from testify import TestCase, run, setup, assert_equal
+
+from tron import changefeed
+from tron.core import job, service, jobrun, actionrun
+
+
+class ChangeFeedTestCase(TestCase):
+
+    @setup
+    def setup_feed(self):
+        self.feed = changefeed.ChangeFeed(history=5)
+        self.action_run = mock.create_autospec(actionrun.ActionRun,
+            id='MASTER.job.1.action', state=actionrun.ActionRun.STATE_SCHEDULED)
+        self.job_run = mock.create_autospec(jobrun.JobRun,
+            id='MASTER.job.1', state=actionrun.ActionRun.STATE_SCHEDULED)
+        self.job_run.get_action_states.side_effect = lambda: [
+            (self.action_run.id, self.action_run.state)]
+        self.job = mock.create_autospec(job.Job, status='enabled')
+        self.job.runs = [self.job_run]
+        self.job.get_name.return_value = 'MASTER.job'
+        self.job.__str__.return_value = 'Job:MASTER.job'
+        self.feed.watch(self.job)
+        self.feed.snapshot_all()
+
+    def test_watch(self):
+        self.job.attach.assert_called_with(True, self.feed)
+        assert_equal(self.feed.watched, {'Job:MASTER.job': self.job})
+        assert_equal(self.feed.seq, 0)
+
+    def test_watch_does_not_snapshot(self):
+        feed = changefeed.ChangeFeed()
+        feed.watch(self.job)
+        assert_equal(feed.snapshots, {})
+
+    def test_snapshot(self):
+        snapshot = self.feed.snapshots['Job:MASTER.job']
+        assert_equal(snapshot.keys(), [None, 'MASTER.job.1'])
+        assert_equal(len(snapshot['MASTER.job.1']), 2)
+        assert_equal(self.feed.seq, 0)
+
+    def test_handler(self):
+        self.action_run.state = actionrun.ActionRun.STATE_RUNNING
+        self.job_run.state = actionrun.ActionRun.STATE_RUNNING
+        self.feed.handler(self.job, job.Job.NOTIFY_STATE_CHANGE)
+        expected = [
+            ('job_run', 'MASTER.job.1', 'running'),
+            ('action_run', 'MASTER.job.1.action', 'running'),
+        ]
+        changes = [(c['type'], c['name'], c['state']) for c in self.feed.changes]
+        assert_equal(changes, expected)
+        assert_equal(self.feed.seq, 2)
+        assert_equal(self.feed.changes[0]['parent'], 'MASTER.job')
+        assert_equal(self.feed.changes[0]['namespace'], 'MASTER')
+
+    def test_handler_no_changes(self):
+        self.feed.handler(self.job, job.Job.NOTIFY_STATE_CHANGE)
+        assert_equal(self.feed.seq, 0)
+
+    def test_handler_stub_not_read_again(self):
+        stub = mock.create_autospec(jobrun.JobRunStub, id='MASTER.job.0',
+            state=actionrun.ActionRun.STATE_SUCCEEDED)
+        stub.get_action_states.return_value = [
+            ('MASTER.job.0.action', 'succeeded')]
+        self.job.runs = [self.job_run, stub]
+        self.feed.handler(self.job, job.Job.NOTIFY_STATE_CHANGE)
+        assert_equal(self.feed.seq, 2)
+        self.feed.handler(self.job, job.Job.NOTIFY_STATE_CHANGE)
+        assert_equal(self.feed.seq, 2)
+        assert_equal(stub.get_action_states.call_count, 1)
+
+    def test_handler_service(self):
+        a_service = mock.create_autospec(service.Service)
+        a_service.get_name.return_value = 'OTHER.service'
+        a_service.get_state.return_value = 'up'
+        self.feed.handler(a_service, service.Service.NOTIFY_STATE_CHANGE)
+        assert_equal(self.feed.changes[0]['type'], 'service')
+        assert_equal(self.feed.changes[0]['namespace'], 'OTHER')
+
+    def test_snapshot_all(self):
+        self.job.status = 'disabled'
+        self.feed.snapshot_all()
+        self.feed.handler(self.job, job.Job.NOTIFY_STATE_CHANGE)
+        assert_equal(self.feed.seq, 0)
+
+    def test_subscribe(self):
+        callback = mock.Mock()
+        self.feed.subscribe(callback)
+        self.feed.append('job', 'MASTER.job', 'MASTER.job', 'disabled')
+        callback.assert_called_with(self.feed.changes[0])
+        self.feed.unsubscribe(callback)
+        self.feed.append('job', 'MASTER.job', 'MASTER.job', 'enabled')
+        assert_equal(callback.call_count, 1)
+
+    def test_get_changes(self):
+        for i in xrange(4):
+            self.feed.append('job', 'MASTER.job%s' % i, 'MASTER.job%s' % i, 'a')
+        changes, is_complete = self.feed.get_changes(2)
+        assert is_complete
+        assert_equal([change['seq'] for change in changes], [3, 4])
+        assert_equal(self.feed.get_changes(4), ([], True))
+        assert_equal(len(self.feed.get_changes(0)[0]), 4)
+
+    def test_get_changes_filtered(self):
+        self.feed.append('job', 'MASTER.job', 'MASTER.job', 'a')
+        self.feed.append('job', 'OTHER.job', 'OTHER.job', 'a')
+        matches = changefeed.build_filter(namespace='OTHER')
+        changes, _ = self.feed.get_changes(0, matches)
+        assert_equal([change['name'] for change in changes], ['OTHER.job'])
+        matches = changefeed.build_filter(name='MASTER.job')
+        changes, _ = self.feed.get_changes(0, matches)
+        assert_equal([change['name'] for change in changes], ['MASTER.job'])
+
+    def test_get_changes_missing_history(self):
+        for i in xrange(7):
+            self.feed.append('job', 'MASTER.job', 'MASTER.job', str(i))
+        assert_equal(self.feed.get_changes(1), ([], False))
+        assert_equal(len(self.feed.get_changes(2)[0]), 5)
+        assert_equal(self.feed.get_changes(10), ([], False))
+
+
+if __name__ == "__main__":
+    run()
@@ -137,6 +137,25 @@ class ClientTestCase(TestCase):
         self.client.request.assert_called_with(
             '/api/jobs?include_job_runs=0&include_action_runs=0')
 
+    def test_backfill(self):
+        self.client.backfill('/api/jobs/name', 'start', 'end', 3)
+        expected_data = {
+            'start_time': 'start', 'end_time': 'end', 'max_concurrency': 3}
+        self.client.request.assert_called_with(
+            '/api/jobs/name/_backfill', expected_data)
+
+    def test_backfill_status(self):
+        self.client.backfill_status(4)
+        self.client.request.assert_called_with('/api/backfills/4')
+
+    def test_events(self):
+        self.client.events()
+        self.client.request.assert_called_with('/api/events')
+
+    def test_object_events_before(self):
+        self.client.object_events('/api/jobs/name', before=0)
+        self.client.request.assert_called_with('/api/jobs/name/_events?before=0')
+
 
 class GetUrlTestCase(TestCase):
 
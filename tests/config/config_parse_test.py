@@ -168,19 +168,29 @@ services:
                 jitter_min_load=4,
                 jitter_max_delay=20,
                 jitter_load_factor=1,
+                min_connections=0,
+                max_connections=1,
+                max_channels_per_connection=0,
+                keepalive_interval=0,
+                max_concurrent_runs=0,
+                run_queue_order='fifo',
             ),
             notification_options=None,
             time_zone=pytz.timezone("EST"),
             state_persistence=config_parse.DEFAULT_STATE_PERSISTENCE,
+            events=config_parse.DEFAULT_EVENTS,
             nodes=FrozenDict({
                 'node0': schema.ConfigNode(name='node0',
-                    username=os.environ['USER'], hostname='node0', port=22),
+                    username=os.environ['USER'], hostname='node0', port=22,
+                    capacity=1),
                 'node1': schema.ConfigNode(name='node1',
-                    username=os.environ['USER'], hostname='node1', port=22)
+                    username=os.environ['USER'], hostname='node1', port=22,
+                    capacity=1)
             }),
             node_pools=FrozenDict({
                 'nodePool': schema.ConfigNodePool(nodes=('node0', 'node1'),
-                                                name='nodePool')
+                                                name='nodePool',
+                                                strategy='random')
             }),
             jobs=FrozenDict({
                 'MASTER.test_job0': schema.ConfigJob(
@@ -1074,6 +1084,29 @@ class ConfigContainerTestCase(TestCase):
         assert_raises(ConfigError,
             config_parse.ConfigContainer.create, config_mapping)
 
+    def test_get_diff(self):
+        other_config = yaml.load(NamedConfigTestCase.config)
+        other_config['jobs'][0]['node'] = 'node1'
+        del other_config['services']
+        previous = config_parse.ConfigContainer(self.config_mapping)
+        self.config_mapping = dict(self.config_mapping)
+        self.config_mapping['other'] = validate_fragment('other', other_config)
+        self.config_mapping['new'] = validate_fragment('new', {})
+        container = config_parse.ConfigContainer(self.config_mapping)
+
+        diff = container.get_diff(previous)
+        assert_equal(diff['namespaces'],
+            {'added': ['new'], 'removed': [], 'updated': ['other']})
+        assert_equal(diff['jobs'],
+            {'added': [], 'removed': [], 'updated': ['test_job0']})
+        assert_equal(diff['services'],
+            {'added': [], 'removed': ['service0'], 'updated': []})
+
+    def test_get_diff_no_previous(self):
+        diff = self.container.get_diff()
+        assert_equal(diff['namespaces']['added'], ['MASTER', 'other'])
+        assert_equal(len(diff['jobs']['added']), 5)
+
     def test_get_job_and_service_names(self):
         job_names, service_names = self.container.get_job_and_service_names()
         expected = ['test_job1', 'test_job0', 'test_job3', 'test_job2', 'test_job4']
@@ -1123,6 +1156,64 @@ class ValidateSSHOptionsTestCase(TestCase):
         config = config_parse.valid_ssh_options.validate(self.config, self.context)
         assert_equal(config.agent, True)
 
+    @mock.patch.dict('tron.config.config_parse.os.environ')
+    def test_post_validation_connection_limits(self):
+        os.environ['SSH_AUTH_SOCK'] = 'something'
+        for invalid in [
+                {'max_connections': 0},
+                {'min_connections': 3, 'max_connections': 2},
+                {'max_channels_per_connection': -1}]:
+            self.config.update(invalid)
+            assert_raises(ConfigError, config_parse.valid_ssh_options.validate,
+                self.config, self.context)
+            self.config = {'agent': True, 'identities': []}
+
+
+class ValidateNotificationOptionsTestCase(TestCase):
+
+    def test_digest_interval_default(self):
+        config = {'smtp_host': 'localhost', 'notification_addr': 'a@b.com'}
+        options = config_parse.valid_notification_options.validate(
+            config, config_utils.NullConfigContext)
+        assert_equal(options.digest_interval, 60)
+
+
+class ValidateStatePersistenceTestCase(TestCase):
+
+    def validate(self, **config):
+        config.setdefault('name', 'state')
+        return config_parse.valid_state_persistence.validate(
+            config, config_utils.NullConfigContext)
+
+    def test_codec_supported(self):
+        for store_type in ('sql', 'yaml'):
+            config = self.validate(store_type=store_type, codec='pickle')
+            assert_equal(config.codec, 'pickle')
+
+    def test_codec_default_for_any_store(self):
+        for store_type in ('shelve', 'log', 'mongo'):
+            assert_equal(self.validate(store_type=store_type).codec, 'yaml')
+
+    def test_codec_not_supported(self):
+        for store_type in ('shelve', 'log', 'mongo'):
+            exception = assert_raises(ConfigError, self.validate,
+                store_type=store_type, codec='pickle')
+            assert_in("not supported by %s" % store_type, str(exception))
+
+
+class ValidateEventsTestCase(TestCase):
+
+    def test_validate(self):
+        config = config_parse.valid_events.validate(
+            {'max_events': 50}, config_utils.NullConfigContext)
+        expected = schema.ConfigEvents(max_events=50, store_dir=None,
+            segment_size=10000, retention_days=7)
+        assert_equal(config, expected)
+
+    def test_validate_invalid_max_events(self):
+        assert_raises(ConfigError, config_parse.valid_events.validate,
+            {'max_events': 0}, config_utils.NullConfigContext)
+
 
 class ValidateIdentityFileTestCase(TestCase):
 
@@ -3,6 +3,7 @@ import shutil
 import tempfile
 import mock
 from testify import TestCase, assert_equal, run, setup, teardown
+from testify import setup_teardown
 import yaml
 from tests.assertions import assert_raises
 from tests.testingutils import autospec_method
@@ -122,7 +123,8 @@ class ConfigManagerTestCase(TestCase):
         assert_equal(manager.read(path), self.content)
         self.manifest.get_file_name.assert_called_with(name)
         assert not self.manifest.add.call_count
-        self.manager.validate_with_fragment.assert_called_with(name, self.content)
+        self.manager.validate_with_fragment.assert_called_with(
+            name, self.raw_content)
 
     def test_write_config_new_name(self):
         name = 'filename2'
@@ -134,29 +136,32 @@ class ConfigManagerTestCase(TestCase):
         self.manifest.get_file_name.assert_called_with(name)
         self.manifest.add.assert_called_with(name, path)
 
-    @mock.patch('tron.config.manager.config_parse.ConfigContainer', autospec=True)
-    def test_validate_with_fragment(self, mock_config_container):
+    def test_validate_with_fragment(self):
         name = 'the_name'
-        name_mapping = {'something': 'content', name: 'old_content'}
-        autospec_method(self.manager.get_config_name_mapping)
-        self.manager.get_config_name_mapping.return_value = name_mapping
-        self.manager.validate_with_fragment(name, self.content)
-        expected_mapping = dict(name_mapping)
-        expected_mapping[name] = self.content
-        mock_config_container.create.assert_called_with(expected_mapping)
-
-    @mock.patch('tron.config.manager.read')
-    @mock.patch('tron.config.manager.config_parse.ConfigContainer', autospec=True)
-    def test_load(self, mock_config_container, mock_read):
-        content_items = self.content.items()
-        self.manifest.get_file_mapping().iteritems.return_value = content_items
+        contents = {'something': 'content', name: 'old_content'}
+        autospec_method(self.manager.get_config_contents, return_value=contents)
+        autospec_method(self.manager.build_container)
+        self.manager.validate_with_fragment(name, self.raw_content)
+        expected_contents = {'something': 'content', name: self.raw_content}
+        self.manager.build_container.assert_called_with(expected_contents)
+
+    @mock.patch('tron.config.manager.read_raw', autospec=True)
+    def test_get_config_contents(self, mock_read_raw):
+        file_mapping = {'one': 'a.yaml', 'two': 'b.yaml'}
+        self.manifest.get_file_mapping.return_value = file_mapping
+        contents = self.manager.get_config_contents()
+        assert_equal(contents, {
+            'one': mock_read_raw.return_value,
+            'two': mock_read_raw.return_value})
+        mock_read_raw.assert_any_call('a.yaml')
+
+    def test_load(self):
+        autospec_method(self.manager.get_config_contents)
+        autospec_method(self.manager.build_container)
         container = self.manager.load()
-        self.manifest.get_file_mapping.assert_called_with()
-        assert_equal(container, mock_config_container.create.return_value)
-
-        expected = dict((name, call.return_value)
-            for ((name, _), call) in zip(content_items, mock_read.mock_calls))
-        mock_config_container.create.assert_called_with(expected)
+        assert_equal(container, self.manager.build_container.return_value)
+        self.manager.build_container.assert_called_with(
+            self.manager.get_config_contents.return_value)
 
     def test_get_hash_default(self):
         self.manifest.__contains__.return_value = False
@@ -171,6 +176,64 @@ class ConfigManagerTestCase(TestCase):
         assert_equal(hash_digest, manager.hash_digest(content))
 
 
+class ConfigManagerBuildContainerTestCase(TestCase):
+
+    master_content = "nodes:\n  - name: node0\n    hostname: node0\n"
+    named_content = (
+        "jobs:\n"
+        "  - name: job0\n"
+        "    node: node0\n"
+        "    schedule: 'interval 20s'\n"
+        "    actions:\n"
+        "      - name: action0\n"
+        "        command: command%s\n")
+
+    @setup_teardown
+    def setup_manager(self):
+        self.manager = manager.ConfigManager('/tmp/unused')
+        self.contents = {
+            schema.MASTER_NAMESPACE: self.master_content,
+            'one': self.named_content % 1,
+            'two': self.named_content % 2,
+        }
+        patcher = mock.patch('tron.config.manager.from_string',
+            wraps=manager.from_string)
+        with patcher as self.mock_from_string:
+            yield
+
+    def test_build_container(self):
+        container = self.manager.build_container(self.contents)
+        assert_equal(set(container.configs), set(self.contents))
+        assert_equal(self.mock_from_string.call_count, 3)
+
+    def test_build_container_only_changed(self):
+        previous = self.manager.build_container(self.contents)
+        self.mock_from_string.reset_mock()
+        self.contents['two'] = self.named_content % 3
+        container = self.manager.build_container(self.contents)
+        self.mock_from_string.assert_called_once_with(self.contents['two'])
+        assert container['one'] is previous['one']
+        assert_equal(container['two'].jobs['two.job0'].actions[
+            'action0'].command, 'command3')
+
+    def test_build_container_master_changed(self):
+        self.manager.build_container(self.contents)
+        self.mock_from_string.reset_mock()
+        self.contents[schema.MASTER_NAMESPACE] += "time_zone: US/Pacific\n"
+        self.manager.build_container(self.contents)
+        assert_equal(self.mock_from_string.call_count, 3)
+
+    def test_build_container_removed(self):
+        self.manager.build_container(self.contents)
+        del self.contents['two']
+        self.manager.build_container(self.contents)
+        assert_equal(set(self.manager.validated), set(self.contents))
+
+    def test_build_container_missing_master(self):
+        del self.contents[schema.MASTER_NAMESPACE]
+        assert_raises(ConfigError, self.manager.build_container, self.contents)
+
+
 class CreateNewConfigTestCase(TestCase):
 
     @mock.patch('tron.config.manager.os.makedirs', autospec=True)
@@ -88,6 +88,31 @@ class ValidCronSchedulerTestCase(TestCase):
     def test_invalid_config(self):
         assert_raises(ConfigError, self.validate, '* * *')
 
+    def test_config_never_matches(self):
+        assert_raises(ConfigError, self.validate, '0 0 30 2 *')
+
+    def test_config_monthdays_and_weekdays(self):
+        assert_raises(ConfigError, self.validate, '0 0 1 * 1')
+
+
+class ParseGrocExpressionTestCase(TestCase):
+
+    def parse(self, expression):
+        config = schedule_parse.ConfigGenericSchedule(
+            'groc daily', expression, None)
+        context = config_utils.NullConfigContext
+        return schedule_parse.parse_groc_expression(config, context)
+
+    def test_parse(self):
+        config = self.parse('1st,3rd monday of march at 04:15')
+        assert_equal(config.ordinals, set([1, 3]))
+        assert_equal(config.weekdays, set([1]))
+        assert_equal(config.months, set([3]))
+        assert_equal(config.timestr, '04:15')
+
+    def test_parse_never_matches(self):
+        assert_raises(ConfigError, self.parse, '30th day of february')
+
 
 class ValidDailySchedulerTestCase(TestCase):
 
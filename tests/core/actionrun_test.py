@@ -13,6 +13,7 @@ from tron import node, actioncommand
 from tron.core import jobrun, actiongraph
 from tron.core.actionrun import ActionCommand, ActionRun
 from tron.core.actionrun import ActionRunCollection, ActionRunFactory
+from tron.core.actionrun import CompletedActionRun
 from tron.serialize import filehandler
 
 
@@ -101,6 +102,14 @@ class ActionRunFactoryTestCase(TestCase):
         assert_equal(action_run.job_run_id, state_data['job_run_id'])
         assert not action_run.is_cleanup
 
+    def test_action_run_from_state_completed(self):
+        state_data = dict(self.action_state_data, state='succeeded')
+        action_run = ActionRunFactory.action_run_from_state(
+                self.job_run, state_data)
+
+        assert isinstance(action_run, CompletedActionRun)
+        assert_equal(action_run.action_name, state_data['action_name'])
+
 
 class ActionRunTestCase(TestCase):
 
@@ -395,6 +404,80 @@ class ActionRunStateRestoreTestCase(testingutils.MockTimeTestCase):
         assert_equal(action_run.rendered_command, self.state_data['command'])
 
 
+class CompletedActionRunTestCase(TestCase):
+
+    @setup
+    def setup_completed_run(self):
+        self.state_data = {
+            'job_run_id':       'job.5',
+            'action_name':      'theaction',
+            'node_name':        'anode',
+            'command':          'do things',
+            'rendered_command': 'do things',
+            'start_time':       'start_time',
+            'end_time':         'end_time',
+            'exit_status':      0,
+            'state':            'succeeded'
+        }
+        self.job_run = mock.create_autospec(jobrun.JobRun,
+            output_path=filehandler.OutputPath('base', 'job.5'),
+            context={}, node=mock.create_autospec(node.Node))
+        self.job_run.action_runs = mock.Mock(run_map={})
+        self.completed = CompletedActionRun.from_state(
+            self.state_data, self.job_run)
+
+    def test_from_state(self):
+        assert_equal(self.completed.id, 'job.5.theaction')
+        assert_equal(self.completed.command, 'do things')
+        assert_equal(self.completed.exit_status, 0)
+        assert_equal(str(self.completed.output_path),
+            'base/job.5/job.5.theaction')
+        assert self.completed.is_succeeded
+        assert self.completed.is_done
+        assert self.completed.is_complete
+        assert not self.completed.is_running
+        assert not self.completed.is_broken
+
+    def test_state_data(self):
+        assert_equal(self.completed.state_data, self.state_data)
+
+    def test_is_completed_state(self):
+        assert CompletedActionRun.is_completed_state(self.state_data)
+        self.state_data['state'] = 'running'
+        assert not CompletedActionRun.is_completed_state(self.state_data)
+
+    def test_from_action_run(self):
+        action_run = ActionRun('job.5', 'theaction', self.job_run.node,
+            bare_command='do things',
+            output_path=self.job_run.output_path.clone(),
+            run_state=ActionRun.STATE_FAILED, exit_status=2)
+        completed = CompletedActionRun.from_action_run(
+            action_run, self.job_run)
+        assert_equal(completed.state_data, action_run.state_data)
+        assert_equal(str(completed.output_path), str(action_run.output_path))
+        assert completed.is_failed
+        assert completed.is_broken
+
+    def test_invalid_transition(self):
+        assert not self.completed.start()
+        assert_equal(self.job_run.action_runs.run_map, {})
+        assert not self.completed._live
+
+    def test_valid_transition_promotes(self):
+        self.state_data['state'] = 'failed'
+        completed = CompletedActionRun.from_state(
+            self.state_data, self.job_run)
+        assert completed.skip()
+        live = self.job_run.action_runs.run_map['theaction']
+        assert isinstance(live, ActionRun)
+        assert live.is_skipped
+        assert completed.is_skipped
+        self.job_run.watch.assert_called_with(live)
+
+    def test_no_dict(self):
+        assert not hasattr(self.completed, '__dict__')
+
+
 class ActionRunCollectionTestCase(TestCase):
 
     def _build_run(self, name):
@@ -428,6 +511,15 @@ class ActionRunCollectionTestCase(TestCase):
         assert_equal(self.collection.run_map, self.run_map)
         assert self.collection.proxy_action_runs_with_cleanup
 
+    def test_freeze_completed(self):
+        self.run_map['action_name'].machine.state = ActionRun.STATE_SUCCEEDED
+        job_run = mock.create_autospec(jobrun.JobRun)
+        self.collection.freeze_completed(job_run)
+        frozen = self.collection.run_map['action_name']
+        assert isinstance(frozen, CompletedActionRun)
+        assert frozen.is_succeeded
+        assert isinstance(self.collection.run_map['second_name'], ActionRun)
+
     def test_action_runs_for_actions(self):
         actions = [Turtle(name='action_name')]
         action_runs = self.collection.action_runs_for_actions(actions)
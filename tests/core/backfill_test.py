@@ -0,0 +1,214 @@
+import datetime
+
+import mock
+from testify import TestCase, run, setup, assert_equal, teardown
+from testify import assert_raises
+
+from tron.core import backfill, job, jobrun
+from tron.core.actionrun import ActionRun
+
+
+def build_job(allow_overlap=True, run_times=()):
+    mock_job = mock.create_autospec(job.Job)
+    mock_job.get_name.return_value = 'MASTER.job'
+    mock_job.allow_overlap = allow_overlap
+    mock_job.runs = mock.create_autospec(jobrun.JobRunCollection)
+    mock_job.scheduler = mock.Mock()
+    mock_job.runs.get_active.return_value = []
+    mock_job.scheduler.get_run_times.return_value = list(run_times)
+    mock_job.build_new_runs.side_effect = lambda run_time, manual: [
+        mock.create_autospec(jobrun.JobRun,
+            id='MASTER.job.%s' % run_time.hour, run_time=run_time)]
+    return mock_job
+
+
+def build_job_scheduler(mock_job):
+    job_scheduler = mock.create_autospec(job.JobScheduler)
+    job_scheduler.get_job.return_value = mock_job
+    return job_scheduler
+
+
+class GetRunTimesTestCase(TestCase):
+
+    @setup
+    def setup_job(self):
+        self.start_time = datetime.datetime(2012, 3, 14)
+        self.end_time = datetime.datetime(2012, 3, 15)
+        self.run_times = [datetime.datetime(2012, 3, 14, hour)
+                          for hour in xrange(5)]
+        self.job = build_job(run_times=self.run_times)
+
+    def test_get_run_times(self):
+        run_times = backfill.get_run_times(
+            self.job, self.start_time, self.end_time)
+        assert_equal(run_times, self.run_times)
+        self.job.scheduler.get_run_times.assert_called_with(
+            self.start_time, self.end_time)
+
+    def test_get_run_times_limit(self):
+        run_times = backfill.get_run_times(
+            self.job, self.start_time, self.end_time, 2)
+        assert_equal(run_times, self.run_times[:2])
+
+    def test_get_run_times_end_before_start(self):
+        assert_raises(backfill.BackfillError, backfill.get_run_times,
+            self.job, self.end_time, self.start_time)
+
+
+class BackfillTestCase(TestCase):
+
+    @setup
+    def setup_backfill(self):
+        self.run_times = [datetime.datetime(2012, 3, 14, hour)
+                          for hour in xrange(5)]
+        self.job = build_job()
+        self.job_scheduler = build_job_scheduler(self.job)
+        self.backfill = backfill.Backfill(
+            1, self.job_scheduler, self.run_times, 2)
+
+    def finish(self, job_run, state=ActionRun.STATE_SUCCEEDED):
+        job_run.state = state
+        self.backfill.handler(job_run, jobrun.JobRun.NOTIFY_DONE)
+
+    def test_start(self):
+        self.backfill.start()
+        assert_equal(len(self.backfill.active), 2)
+        assert_equal(list(self.backfill.pending), self.run_times[2:])
+        self.job.attach.assert_called_with(
+            self.job.NOTIFY_RUN_DONE, self.backfill)
+        for job_run in self.backfill.active:
+            job_run.start.assert_called_with()
+            job_run.attach.assert_called_with(
+                jobrun.JobRun.NOTIFY_DONE, self.backfill)
+        self.job.build_new_runs.assert_called_with(
+            self.run_times[1], manual=True)
+
+    def test_handler_starts_next_run(self):
+        self.backfill.start()
+        first_run = self.backfill.active[0]
+        self.finish(first_run)
+        assert_equal(len(self.backfill.active), 2)
+        assert_equal(len(self.backfill.runs), 3)
+        assert_equal(self.backfill.results,
+            {first_run.id: ActionRun.STATE_SUCCEEDED})
+        first_run.remove_observer.assert_called_with(self.backfill)
+
+    def test_runs_done_on_start(self):
+        # Each run fails when it is started, and is done before start returns
+        job_runs = [mock.Mock(spec=jobrun.JobRun, id=i)
+                    for i in xrange(backfill.MAX_RUNS)]
+        self.job.build_new_runs.side_effect = lambda *_, **__: [job_runs.pop()]
+        def start_and_fail(job_run):
+            job_run.start.side_effect = lambda: self.finish(
+                job_run, ActionRun.STATE_FAILED)
+        for job_run in job_runs:
+            start_and_fail(job_run)
+        run_times = [datetime.datetime(2012, 3, 14)] * backfill.MAX_RUNS
+        self.backfill = backfill.Backfill(
+            1, self.job_scheduler, run_times, 2)
+
+        self.backfill.start()
+        assert_equal(self.backfill.state, backfill.Backfill.STATE_DONE)
+        assert_equal(self.backfill.count_results(ActionRun.STATE_FAILED),
+            backfill.MAX_RUNS)
+        assert not self.backfill.starting
+
+    def test_no_overlap_runs_one_at_a_time(self):
+        self.job.allow_overlap = False
+        self.backfill.start()
+        assert_equal(len(self.backfill.active), 1)
+
+    def test_no_overlap_waits_for_active_runs(self):
+        self.job.allow_overlap = False
+        self.job.runs.get_active.return_value = [mock.Mock()]
+        self.backfill.start()
+        assert_equal(self.backfill.active, [])
+
+        self.job.runs.get_active.return_value = []
+        self.backfill.handler(self.job, self.job.NOTIFY_RUN_DONE)
+        assert_equal(len(self.backfill.active), 1)
+
+    def test_done(self):
+        self.backfill.start()
+        while self.backfill.active:
+            self.finish(self.backfill.active[0])
+        assert_equal(self.backfill.state, backfill.Backfill.STATE_DONE)
+        assert_equal(len(self.backfill.results), 5)
+        self.job.remove_observer.assert_called_with(self.backfill)
+
+    def test_cancel(self):
+        self.backfill.start()
+        self.backfill.cancel()
+        assert_equal(self.backfill.state, backfill.Backfill.STATE_RUNNING)
+        while self.backfill.active:
+            self.finish(self.backfill.active[0])
+        assert_equal(self.backfill.state, backfill.Backfill.STATE_CANCELLED)
+        assert_equal(len(self.backfill.runs), 2)
+
+    def test_get_status(self):
+        self.backfill.start()
+        self.finish(self.backfill.active[0], ActionRun.STATE_FAILED)
+        status = self.backfill.get_status()
+        assert_equal(status['id'], 1)
+        assert_equal(status['job_name'], 'MASTER.job')
+        assert_equal(status['state'], backfill.Backfill.STATE_RUNNING)
+        assert_equal(status['total'], 5)
+        assert_equal(status['pending'], 2)
+        assert_equal(status['running'], 2)
+        assert_equal(status['failed'], 1)
+        assert_equal(status['succeeded'], 0)
+        assert_equal(status['finished'], 1)
+        assert_equal(len(status['runs']), 3)
+
+
+class BackfillManagerTestCase(TestCase):
+
+    @setup
+    def setup_manager(self):
+        self.manager = backfill.BackfillManager.get_instance()
+        self.start_time = datetime.datetime(2012, 3, 14)
+        self.end_time = datetime.datetime(2012, 3, 15)
+        run_times = [datetime.datetime(2012, 3, 14, hour) for hour in xrange(3)]
+        self.job = build_job(run_times=run_times)
+        self.job_scheduler = build_job_scheduler(self.job)
+
+    @teardown
+    def teardown_manager(self):
+        backfill.BackfillManager.reset()
+
+    def test_get_instance(self):
+        assert_equal(backfill.BackfillManager.get_instance(), self.manager)
+
+    def test_create(self):
+        job_backfill = self.manager.create(
+            self.job_scheduler, self.start_time, self.end_time, 3)
+        assert_equal(job_backfill.id, 1)
+        assert_equal(len(job_backfill.active), 3)
+        assert_equal(self.manager.get(1), job_backfill)
+        assert_equal(self.manager.get_all(), [job_backfill])
+
+    def test_create_no_run_times(self):
+        self.job.scheduler.get_run_times.return_value = []
+        assert_raises(backfill.BackfillError, self.manager.create,
+            self.job_scheduler, self.start_time, self.end_time)
+
+    def test_create_too_many_run_times(self):
+        run_times = [self.start_time] * (backfill.MAX_RUNS + 1)
+        self.job.scheduler.get_run_times.return_value = run_times
+        assert_raises(backfill.BackfillError, self.manager.create,
+            self.job_scheduler, self.start_time, self.end_time)
+
+    def test_prune(self):
+        self.manager.MAX_FINISHED = 1
+        backfills = [self.manager.create(
+            self.job_scheduler, self.start_time, self.end_time)
+            for _ in xrange(3)]
+        for job_backfill in backfills[:2]:
+            job_backfill.cancel()
+            job_backfill.active = []
+        self.manager.prune()
+        assert_equal(self.manager.get_all(), backfills[1:])
+
+
+if __name__ == "__main__":
+    run()
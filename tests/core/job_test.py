@@ -30,6 +30,7 @@ class JobTestCase(TestCase):
                     run_collection=run_collection, action_graph=action_graph,
                     node_pool=self.nodes)
             autospec_method(self.job.notify)
+            autospec_method(self.job.notify_later)
             autospec_method(self.job.watch)
             self.job.event = mock.create_autospec(event.EventRecorder)
             yield
@@ -71,6 +72,19 @@ class JobTestCase(TestCase):
         assert_equal(self.job, other_job)
         self.job.event.ok.assert_called_with('reconfigured')
 
+    def test_update_version(self):
+        version = self.job.version
+        self.job.enabled = False
+        assert self.job.version > version
+        version = self.job.version
+        self.job.handle_job_run_state_change(
+            mock.Mock(), jobrun.JobRun.NOTIFY_STATE_CHANGED)
+        assert self.job.version > version
+
+    def test_update_version_new_job(self):
+        other_job = job.Job('otherjob', 'scheduler')
+        assert other_job.version > self.job.version
+
     def test_status_disabled(self):
         self.job.enabled = False
         assert_equal(self.job.status, self.job.STATUS_DISABLED)
@@ -146,12 +160,26 @@ class JobTestCase(TestCase):
         self.job.watch.assert_called_with(runs[0])
 
     def test_handler(self):
-        self.job.handler(None, jobrun.JobRun.NOTIFY_STATE_CHANGED)
-        self.job.notify.assert_called_with(self.job.NOTIFY_STATE_CHANGE)
+        job_run = mock.Mock(run_num=3)
+        self.job.handler(job_run, jobrun.JobRun.NOTIFY_STATE_CHANGED)
+        self.job.notify_later.assert_called_with(self.job.NOTIFY_STATE_CHANGE)
+        assert_equal(self.job.changed_run_nums, set([3]))
 
-        self.job.handler(None, jobrun.JobRun.NOTIFY_DONE)
+        self.job.handler(job_run, jobrun.JobRun.NOTIFY_DONE)
         self.job.notify.assert_called_with(self.job.NOTIFY_RUN_DONE)
 
+    def test_pop_changed_runs(self):
+        job_runs = [mock.Mock(run_num=i) for i in xrange(3)]
+        self.job.runs = job_runs
+        self.job.changed_run_nums = set([0, 2, 5])
+        assert_equal(self.job.pop_changed_runs(), [job_runs[0], job_runs[2]])
+        assert_equal(self.job.changed_run_nums, set())
+
+    def test_clear_changed_runs(self):
+        self.job.changed_run_nums = set([0, 2])
+        self.job.clear_changed_runs()
+        assert_equal(self.job.changed_run_nums, set())
+
     def test__eq__(self):
         other_job = job.Job("jobname", 'scheduler')
         assert not self.job == other_job
@@ -407,6 +435,13 @@ class JobSchedulerScheduleTestCase(TestCase):
         with patcher as self.eventloop:
             yield
 
+    @setup_teardown
+    def mock_run_timer(self):
+        patcher = mock.patch('tron.core.job.runtimer', autospec=True)
+        with patcher as self.runtimer:
+            self.run_timer = self.runtimer.RunTimer.get_instance.return_value
+            yield
+
     @teardown
     def teardown_job(self):
         event.EventManager.reset()
@@ -415,32 +450,33 @@ class JobSchedulerScheduleTestCase(TestCase):
         self.job.enabled = False
         self.job_scheduler.enable()
         assert self.job.enabled
-        assert_length(self.eventloop.call_later.mock_calls, 1)
+        assert_length(self.run_timer.schedule.mock_calls, 1)
 
     def test_enable_noop(self):
         self.job.enalbed = True
         self.job_scheduler.enable()
         assert self.job.enabled
-        assert_length(self.eventloop.call_later.mock_calls, 0)
+        assert_length(self.run_timer.schedule.mock_calls, 0)
 
     def test_schedule(self):
         self.job_scheduler.schedule()
-        assert_length(self.eventloop.call_later.mock_calls, 1)
-
-        # Args passed to callLater
-        call_args = self.eventloop.call_later.mock_calls[0][1]
-        assert_equal(call_args[1], self.job_scheduler.run_job)
-        secs = call_args[0]
-        run = call_args[2]
-
-        run.seconds_until_run_time.assert_called_with()
-        # Assert that we use the seconds we get from the run to schedule
-        assert_equal(run.seconds_until_run_time.return_value, secs)
+        assert_length(self.run_timer.schedule.mock_calls, 1)
+        self.run_timer.schedule.assert_called_with(
+            self.job_scheduler, self.job.runs.build_new_run.return_value)
 
     def test_schedule_disabled_job(self):
         self.job.enabled = False
         self.job_scheduler.schedule()
-        assert_length(self.eventloop.call_later.mock_calls, 0)
+        assert_length(self.run_timer.schedule.mock_calls, 0)
+
+    def test_disable_removes_scheduled_runs(self):
+        self.job_scheduler.disable()
+        self.run_timer.remove.assert_called_with(self.job_scheduler)
+
+    def test_schedule_reconfigured_removes_scheduled_runs(self):
+        autospec_method(self.job_scheduler.create_and_schedule_runs)
+        self.job_scheduler.schedule_reconfigured()
+        self.run_timer.remove.assert_called_with(self.job_scheduler)
 
     def test_handle_job_events_no_schedule_on_complete(self):
         self.job_scheduler.run_job = mock.Mock()
@@ -531,6 +567,18 @@ class JobCollectionTestCase(TestCase):
             job_scheduler.schedule.assert_called_with()
             job_scheduler.get_job.assert_called_with()
 
+    def test_load_from_config_changed(self):
+        autospec_method(self.collection.jobs.filter_by_name)
+        autospec_method(self.collection.add)
+        factory = mock.create_autospec(job.JobSchedulerFactory)
+        job_configs = {'a': mock.Mock(), 'b': mock.Mock()}
+        result = self.collection.load_from_config(
+            job_configs, factory, True, changed=['b'])
+        result = list(result)
+        self.collection.jobs.filter_by_name.assert_called_with(job_configs)
+        assert_mock_calls([mock.call(job_configs['b'])], factory.build.mock_calls)
+        assert_length(result, 1)
+
     def test_update(self):
         mock_scheduler = mock.create_autospec(job.JobScheduler)
         existing_scheduler = mock.create_autospec(job.JobScheduler)
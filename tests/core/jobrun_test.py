@@ -341,6 +341,95 @@ class JobRunFromStateTestCase(TestCase):
         assert_equal(run.node, self.node_pool)
 
 
+class JobRunStubTestCase(TestCase):
+
+    @setup
+    def setup_stub(self):
+        self.action_graph = mock.create_autospec(actiongraph.ActionGraph)
+        self.output_path = mock.create_autospec(filehandler.OutputPath)
+        self.node_pool = mock.create_autospec(node.NodePool)
+        self.run_collection = jobrun.JobRunCollection(5)
+        self.state_data = {
+            'job_name':         'thejobname',
+            'run_num':          22,
+            'run_time':         datetime.datetime(2012, 3, 14, 15, 9 ,26),
+            'node_name':        'thebox',
+            'runs':             [self._build_action_state('succeeded')],
+            'cleanup_run':      None,
+            'manual':           False,
+        }
+        self.stub = jobrun.JobRunStub(self.state_data, self.run_collection,
+            self.action_graph, self.output_path, mock.Mock(), self.node_pool)
+        self.run_collection.runs.append(self.stub)
+
+    def _build_action_state(self, state, name='blingaction'):
+        return {
+            'job_run_id':       'thejobname.22',
+            'action_name':      name,
+            'state':            state,
+            'start_time':       'sometime',
+            'end_time':         'sometime',
+            'command':          'doit',
+            'node_name':        'thenode'
+        }
+
+    def test_is_stub_state(self):
+        assert jobrun.JobRunStub.is_stub_state(self.state_data)
+        self.state_data['cleanup_run'] = self._build_action_state('running')
+        assert not jobrun.JobRunStub.is_stub_state(self.state_data)
+
+    def test_is_stub_state_no_action_runs(self):
+        self.state_data['runs'] = []
+        assert not jobrun.JobRunStub.is_stub_state(self.state_data)
+
+    def test_state(self):
+        assert_equal(self.stub.state, actionrun.ActionRun.STATE_SUCCEEDED)
+        assert not self.stub.is_running
+        assert not self.stub.is_scheduled
+        assert_equal(self.stub.id, 'thejobname.22')
+
+    def test_state_failed(self):
+        self.state_data['runs'].append(
+            self._build_action_state('failed', 'other'))
+        self.state_data['cleanup_run'] = self._build_action_state(
+            'succeeded', 'cleanup')
+        assert_equal(self.stub._get_state(), actionrun.ActionRun.STATE_FAILED)
+
+    def test_state_cancelled(self):
+        self.state_data['cleanup_run'] = self._build_action_state(
+            'cancelled', 'cleanup')
+        assert_equal(self.stub._get_state(),
+            actionrun.ActionRun.STATE_CANCELLED)
+
+    def test_get_action_states(self):
+        self.state_data['cleanup_run'] = self._build_action_state(
+            'succeeded', 'cleanup')
+        assert_equal(self.stub.get_action_states(), [
+            ('thejobname.22.blingaction', 'succeeded'),
+            ('thejobname.22.cleanup', 'succeeded')])
+        assert not self.stub._job_run
+        assert_equal(list(self.run_collection.runs), [self.stub])
+
+    def test_restore(self):
+        observer = mock.Mock()
+        self.stub.attach(True, observer)
+        action_runs = self.stub.action_runs
+        job_run = self.run_collection.runs[0]
+        assert isinstance(job_run, jobrun.JobRun)
+        assert_equal(job_run.action_runs, action_runs)
+        assert_equal(job_run.run_num, 22)
+        assert_equal(job_run._observers, {True: [observer]})
+        assert_equal(self.stub.restore(), job_run)
+
+    def test_cleanup(self):
+        with mock.patch('tron.core.jobrun.event', autospec=True):
+            self.stub.cleanup()
+        output_path = self.output_path.clone.return_value
+        output_path.append.assert_called_with(self.stub.id)
+        output_path.delete.assert_called_with()
+        assert_equal(self.run_collection.runs[0], self.stub)
+
+
 class MockJobRun(Turtle):
 
     manual = False
@@ -417,6 +506,20 @@ class JobRunCollectionTestCase(TestCase):
         assert_equal(run_collection.runs[3].run_num, 0)
         assert_length(restored_runs, 4)
 
+    def test_restore_state_completed_runs(self):
+        run_collection = jobrun.JobRunCollection(20)
+        action_state = dict(state='succeeded')
+        state_data = [
+            dict(run_num=i, job_name="thename", run_time="sometime",
+                cleanup_run=None, runs=[action_state])
+            for i in xrange(2)
+        ]
+        restored_runs = run_collection.restore_state(state_data,
+            mock.Mock(), mock.Mock(), mock.Mock(), mock.Mock())
+        for job_run in restored_runs:
+            assert isinstance(job_run, jobrun.JobRunStub)
+        assert_equal(run_collection.state_data, state_data)
+
     def test_restore_state_with_runs(self):
         assert_raises(ValueError,
                 self.run_collection.restore_state, None, None, None, None, None)
@@ -0,0 +1,113 @@
+import mock
+from testify import TestCase, run, setup, assert_equal, teardown
+from testify import setup_teardown
+
+from tron.core import runtimer, job, jobrun
+
+
+class RunTimerTestCase(TestCase):
+
+    @setup_teardown
+    def mock_eventloop(self):
+        patcher = mock.patch('tron.core.runtimer.eventloop', autospec=True)
+        with patcher as self.eventloop:
+            self.eventloop.seconds.return_value = 100
+            self.delayed_call = self.eventloop.call_later.return_value
+            self.delayed_call.active.return_value = False
+            yield
+
+    @setup
+    def setup_timer(self):
+        self.timer = runtimer.RunTimer.get_instance()
+        self.job_scheduler = mock.create_autospec(job.JobScheduler)
+
+    @teardown
+    def teardown_timer(self):
+        runtimer.RunTimer.reset()
+
+    def build_run(self, seconds, is_scheduled=True):
+        job_run = mock.create_autospec(jobrun.JobRun, is_scheduled=is_scheduled)
+        job_run.seconds_until_run_time.return_value = seconds
+        return job_run
+
+    def schedule(self, *seconds):
+        job_runs = [self.build_run(secs) for secs in seconds]
+        for job_run in job_runs:
+            self.timer.schedule(self.job_scheduler, job_run)
+            self.delayed_call.active.return_value = True
+        return job_runs
+
+    def test_get_instance(self):
+        assert_equal(runtimer.RunTimer.get_instance(), self.timer)
+
+    def test_schedule(self):
+        self.schedule(30, 60)
+        self.eventloop.call_later.assert_called_once_with(30, self.timer.fire)
+        assert_equal(len(self.timer), 2)
+        assert_equal(self.timer.due, 130)
+
+    def test_schedule_earlier(self):
+        self.schedule(60, 10)
+        self.delayed_call.cancel.assert_called_with()
+        self.eventloop.call_later.assert_called_with(10, self.timer.fire)
+
+    def test_fire(self):
+        job_runs = self.schedule(10, 10.05, 20)
+        self.delayed_call.active.return_value = False
+        self.eventloop.seconds.return_value = 110
+        self.timer.fire()
+        assert_equal(self.job_scheduler.run_job.mock_calls,
+            [mock.call(job_runs[0]), mock.call(job_runs[1])])
+        assert_equal(len(self.timer), 1)
+        self.eventloop.call_later.assert_called_with(10, self.timer.fire)
+
+    def test_fire_with_error(self):
+        job_runs = self.schedule(0, 0)
+        self.job_scheduler.run_job.side_effect = [ValueError(), None]
+        self.timer.fire()
+        self.job_scheduler.run_job.assert_called_with(job_runs[1])
+        assert_equal(len(self.timer), 0)
+
+    def test_get_upcoming(self):
+        job_runs = self.schedule(30, 10, 20, 40)
+        job_runs[2].is_scheduled = False
+        assert_equal(self.timer.get_upcoming(2), [job_runs[1], job_runs[0]])
+        assert_equal(len(self.timer.get_upcoming()), 3)
+
+    def test_remove(self):
+        job_runs = self.schedule(10, 20)
+        other_scheduler = mock.create_autospec(job.JobScheduler)
+        other_run = self.build_run(15)
+        self.timer.schedule(other_scheduler, other_run)
+        self.timer.remove(self.job_scheduler)
+        assert_equal(len(self.timer), 1)
+        assert_equal(self.timer.get_upcoming(), [other_run])
+        assert job_runs[0] not in self.timer.get_upcoming()
+
+        self.delayed_call.active.return_value = False
+        self.eventloop.seconds.return_value = 130
+        self.timer.fire()
+        assert not self.job_scheduler.run_job.called
+        other_scheduler.run_job.assert_called_once_with(other_run)
+        assert_equal(self.timer.heap, [])
+        assert_equal(self.timer.entries, {})
+
+    def test_remove_compacts_heap(self):
+        self.timer.COMPACT_MIN = 4
+        self.schedule(10, 20, 30)
+        other_scheduler = mock.create_autospec(job.JobScheduler)
+        self.timer.schedule(other_scheduler, self.build_run(40))
+        self.timer.remove(self.job_scheduler)
+        assert_equal(len(self.timer.heap), 1)
+        assert_equal(self.timer.removed_count, 0)
+        assert_equal(len(self.timer), 1)
+
+    def test_remove_below_compact_min(self):
+        self.schedule(10, 20)
+        self.timer.remove(self.job_scheduler)
+        assert_equal(len(self.timer.heap), 2)
+        assert_equal(len(self.timer), 0)
+
+
+if __name__ == "__main__":
+    run()
@@ -90,10 +90,11 @@ class ServiceTestCase(TestCase):
         self.service.notify.assert_called_with(self.service.NOTIFY_STATE_CHANGE)
 
     def test_handle_instance_state_change_down(self):
-        autospec_method(self.service.notify)
+        autospec_method(self.service.notify_later)
         instance_event = serviceinstance.ServiceInstance.STATE_DOWN
         self.service._handle_instance_state_change(mock.Mock(), instance_event)
-        self.service.notify.assert_called_with(self.service.NOTIFY_STATE_CHANGE)
+        self.service.notify_later.assert_called_with(
+            self.service.NOTIFY_STATE_CHANGE)
         self.service.instances.clear_down.assert_called_with()
 
     def test_handle_instance_state_change_failed(self):
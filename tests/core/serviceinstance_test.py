@@ -30,7 +30,8 @@ class BuildActionTestCase(TestCase):
     def test_build_action(self):
         action = serviceinstance.build_action(self.task)
         self.mock_action_command.assert_called_with(
-            '%s.%s' % (self.id, self.name), self.command, serializer=self.serializer)
+            '%s.%s' % (self.id, self.name), self.command,
+            serializer=self.serializer, priority=self.task.priority)
         assert_equal(action, self.mock_action_command.return_value)
         self.task.watch.assert_called_with(action)
 
@@ -57,6 +58,173 @@ class RunActionTestCase(TestCase):
             "Node run failure for mock_task: %s" % str(error))
 
 
+class BuildMonitorCommandTestCase(TestCase):
+
+    def test_build_monitor_command(self):
+        command = serviceinstance.build_monitor_command(['/tmp/a', '/tmp/b c'])
+        expected = ("for pid_file in /tmp/a '/tmp/b c'; do "
+            "cat \"$pid_file\" | xargs kill -0 >/dev/null 2>&1; echo $?; done")
+        assert_equal(command, expected)
+
+    def test_parse_monitor_output(self):
+        results = serviceinstance.parse_monitor_output("0\n1\n123", 4)
+        assert_equal(results, [True, False, False, None])
+
+
+def build_monitor_task(id, interval=20):
+    task = mock.create_autospec(serviceinstance.ServiceInstanceMonitorTask,
+        id=id, interval=interval, pid_filename='/tmp/%s.pid' % id)
+    task.NOTIFY_START = serviceinstance.ServiceInstanceMonitorTask.NOTIFY_START
+    return task
+
+
+class NodeMonitorTestCase(TestCase):
+
+    @setup_teardown
+    def setup_monitor(self):
+        self.node = mock.create_autospec(node.Node)
+        self.monitor = serviceinstance.NodeMonitor(self.node)
+        self.tasks = [build_monitor_task('a', 20), build_monitor_task('b', 60)]
+        patcher = mock.patch('tron.core.serviceinstance.eventloop', autospec=True)
+        with patcher as self.eventloop:
+            self.eventloop.seconds.return_value = 100
+            self.delayed_call = self.eventloop.call_later.return_value
+            self.delayed_call.active.return_value = False
+            yield
+
+    def schedule(self, *delays):
+        for task, delay in zip(self.tasks, delays):
+            self.monitor.schedule(task, delay)
+            self.delayed_call.active.return_value = True
+
+    def run_batch(self, output="0\n0"):
+        self.monitor.run()
+        self.monitor.buffer_store.open(ActionCommand.STDOUT).write(output)
+        self.monitor.action.exit_status = 0
+        self.monitor.handle_action_event(
+            self.monitor.action, ActionCommand.EXITING)
+
+    def test_schedule(self):
+        self.schedule(20, 10)
+        self.delayed_call.cancel.assert_called_with()
+        self.eventloop.call_later.assert_called_with(10, self.monitor.run)
+        assert_equal(self.monitor.due, 110)
+        assert_equal(len(self.monitor), 2)
+
+    def test_schedule_while_checking(self):
+        self.schedule(0, 0)
+        self.monitor.run()
+        self.monitor.schedule(self.tasks[0], 20)
+        assert_equal(self.monitor.tasks, {})
+
+    def test_remove(self):
+        self.schedule(20)
+        self.monitor.remove(self.tasks[0])
+        assert_equal(len(self.monitor), 0)
+        self.delayed_call.cancel.assert_called_with()
+
+    def test_run_batches_tasks(self):
+        self.schedule(0, 30)
+        self.monitor.run()
+        assert_equal(self.monitor.batch, self.tasks)
+        assert_equal(self.node.submit_command.call_count, 1)
+        for task in self.tasks:
+            task.notify.assert_called_with(task.NOTIFY_START)
+        expected = serviceinstance.build_monitor_command(
+            ['/tmp/a.pid', '/tmp/b.pid'])
+        assert_equal(self.monitor.action.command, expected)
+
+    def test_run_not_due(self):
+        self.schedule(0, 40)
+        self.monitor.run()
+        assert_equal(self.monitor.batch, self.tasks[:1])
+        assert_equal(self.monitor.tasks, {self.tasks[1]: 140})
+
+    def test_run_already_checking(self):
+        self.schedule(0, 0)
+        self.monitor.run()
+        self.monitor.run()
+        assert_equal(self.node.submit_command.call_count, 1)
+
+    def test_run_node_error(self):
+        self.node.submit_command.side_effect = node.Error("Oops")
+        self.schedule(0)
+        self.monitor.run()
+        self.tasks[0].handle_check_failure.assert_called_with(
+            "Node run failure for monitor: Oops", False)
+        assert_equal(self.monitor.checking, set())
+
+    def test_handle_action_exit(self):
+        self.schedule(0, 0)
+        self.run_batch("0\n1")
+        self.tasks[0].handle_check_result.assert_called_with(True)
+        self.tasks[1].handle_check_result.assert_called_with(False)
+        assert_equal(self.monitor.checking, set())
+
+    def test_handle_action_exit_removed_task(self):
+        self.schedule(0, 0)
+        self.monitor.run()
+        self.monitor.remove(self.tasks[0])
+        self.monitor.buffer_store.open(ActionCommand.STDOUT).write("0\n0")
+        self.monitor.action.exit_status = 0
+        self.monitor.handle_action_event(
+            self.monitor.action, ActionCommand.EXITING)
+        assert not self.tasks[0].handle_check_result.mock_calls
+        self.tasks[1].handle_check_result.assert_called_with(True)
+
+    def test_handle_action_exit_no_result(self):
+        self.schedule(0, 0)
+        self.run_batch("0")
+        self.tasks[1].handle_check_failure.assert_called_with(
+            "Monitor command had no result.")
+
+    def test_handle_action_failstart(self):
+        self.schedule(0)
+        self.monitor.run()
+        self.monitor.handle_action_event(
+            self.monitor.action, ActionCommand.FAILSTART)
+        self.tasks[0].handle_check_failure.assert_called_with(
+            "Failed to start monitor command.", True)
+
+    def test_handle_action_mismatching_action(self):
+        self.schedule(0)
+        self.monitor.run()
+        action = mock.create_autospec(actioncommand.ActionCommand)
+        self.monitor.handle_action_event(action, ActionCommand.EXITING)
+        assert not self.tasks[0].handle_check_result.mock_calls
+
+    def test_fail(self):
+        self.schedule(0)
+        self.monitor.run()
+        original_action = self.monitor.action
+        self.monitor.fail()
+        self.node.stop.assert_called_with(original_action)
+        assert_equal(self.monitor.action, actioncommand.CompletedActionCommand)
+        self.tasks[0].handle_check_failure.assert_called_with(
+            "Monitoring failed", False)
+
+
+class NodeMonitorRepositoryTestCase(TestCase):
+
+    @setup_teardown
+    def setup_repository(self):
+        self.repository = serviceinstance.NodeMonitorRepository.get_instance()
+        yield
+        serviceinstance.NodeMonitorRepository.reset()
+
+    def test_get_monitor(self):
+        mock_node = mock.create_autospec(node.Node)
+        monitor = self.repository.get_monitor(mock_node)
+        assert_equal(monitor.node, mock_node)
+        assert_equal(self.repository.get_monitor(mock_node), monitor)
+
+    def test_get_monitor_prunes_empty(self):
+        first, second = [mock.create_autospec(node.Node) for _ in xrange(2)]
+        first_monitor = self.repository.get_monitor(first)
+        self.repository.get_monitor(second)
+        assert_not_equal(self.repository.get_monitor(first), first_monitor)
+
+
 class ServiceInstanceMonitorTaskTestCase(TestCase):
 
     @setup_teardown
@@ -67,90 +235,52 @@ class ServiceInstanceMonitorTaskTestCase(TestCase):
         self.task = serviceinstance.ServiceInstanceMonitorTask(
             "id", mock_node, self.interval, self.filename)
         autospec_method(self.task.notify)
-        autospec_method(self.task.watch)
-        self.task.hang_check_callback = mock.create_autospec(eventloop.UniqueCallback)
-        self.task.callback = mock.create_autospec(eventloop.UniqueCallback)
-        self.mock_eventloop = None
-        with mock.patch('tron.core.serviceinstance.eventloop') as self.mock_eventloop:
-            yield
+        self.task.node_monitor = mock.create_autospec(serviceinstance.NodeMonitor)
+        yield
+        serviceinstance.NodeMonitorRepository.reset()
+
+    def test_init(self):
+        task = serviceinstance.ServiceInstanceMonitorTask(
+            "id", self.task.node, self.interval, self.filename)
+        assert_equal(task.node_monitor.node, self.task.node)
 
     def test_queue(self):
         self.task.queue()
-        self.task.callback.start.assert_called_with()
+        self.task.node_monitor.schedule.assert_called_with(
+            self.task, self.interval)
 
     def test_queue_no_interval(self):
         self.task.interval = 0
         self.task.queue()
-        assert_equal(self.mock_eventloop.call_later.call_count, 0)
+        assert not self.task.node_monitor.schedule.mock_calls
 
     def test_run(self):
         self.task.run()
+        self.task.node_monitor.schedule.assert_called_with(self.task, 0)
 
-        self.task.notify.assert_called_with(self.task.NOTIFY_START)
-        self.task.node.submit_command.assert_called_with(self.task.action)
-        self.task.hang_check_callback.start.assert_called_with()
-        assert_equal(self.task.action.command, self.task.command)
-
-    def test_run_failed(self):
-        with mock.patch('tron.core.serviceinstance.run_action') as mock_run:
-            mock_run.return_value = False
-            self.task.run()
-            assert_equal(self.mock_eventloop.call_later.call_count, 0)
-
-    def test_run_action_exists(self):
-        self.task.action = mock.create_autospec(ActionCommand, is_done=False)
-        with mock.patch('tron.core.serviceinstance.log', autospec=True) as mock_log:
-            self.task.run()
-            assert_equal(mock_log.warn.call_count, 1)
-
-    def test_handle_action_event_failstart(self):
+    def test_handle_check_result_up(self):
         autospec_method(self.task.queue)
-        self.task.handle_action_event(self.task.action, ActionCommand.FAILSTART)
-        self.task.notify.assert_called_with(self.task.NOTIFY_FAILED)
+        self.task.handle_check_result(True)
+        self.task.notify.assert_called_with(self.task.NOTIFY_UP)
         self.task.queue.assert_called_with()
-        self.task.hang_check_callback.cancel.assert_called_with()
-
-    def test_handle_action_event_exit(self):
-        autospec_method(self.task._handle_action_exit)
-        self.task.handle_action_event(self.task.action, ActionCommand.EXITING)
-        self.task._handle_action_exit.assert_called_with()
-        self.task.hang_check_callback.cancel.assert_called_with()
 
-    def test_handle_action_running(self):
+    def test_handle_check_result_down(self):
         autospec_method(self.task.queue)
-        self.task.handle_action_event(self.task.action, ActionCommand.RUNNING)
-        assert not self.task.hang_check_callback.cancel.mock_calls
+        self.task.handle_check_result(False)
+        self.task.notify.assert_called_with(self.task.NOTIFY_FAILED)
         assert not self.task.queue.mock_calls
+        assert_equal(serviceinstance.get_failures_from_task(self.task),
+            "No process found for %s" % self.filename)
 
-    def test_handle_action_mismatching_action(self):
-        autospec_method(self.task._handle_action_exit)
-        action = mock.create_autospec(actioncommand.ActionCommand)
-        self.task.handle_action_event(action, ActionCommand.EXITING)
-        assert not self.task._handle_action_exit.mock_calls
-
-    def test_handle_action_exit_up(self):
-        self.task.action = mock.create_autospec(ActionCommand)
-        self.task.action.is_failed = False
-        autospec_method(self.task.queue)
-        self.task._handle_action_exit()
-        self.task.notify.assert_called_with(self.task.NOTIFY_UP)
-        self.task.queue.assert_called_with()
-
-    def test_handle_action_exit_down(self):
-        self.task.action = mock.create_autospec(ActionCommand)
+    def test_handle_check_failure_retry(self):
         autospec_method(self.task.queue)
-        self.task._handle_action_exit()
+        self.task.handle_check_failure("Oops", retry=True)
         self.task.notify.assert_called_with(self.task.NOTIFY_FAILED)
-        assert_equal(self.task.queue.call_count, 0)
+        self.task.queue.assert_called_with()
 
-    def test_fail(self):
-        self.task.action = mock.create_autospec(actioncommand.ActionCommand)
-        original_action = self.task.action
-        self.task.fail()
-        self.task.notify.assert_called_with(self.task.NOTIFY_FAILED)
-        self.task.node.stop.assert_called_with(original_action)
-        assert_equal(self.task.action, actioncommand.CompletedActionCommand)
-        assert_equal(original_action.write_stderr.call_count, 1)
+    def test_cancel(self):
+        self.task.cancel()
+        self.task.node_monitor.remove.assert_called_with(self.task)
 
 
 class ServiceInstanceStopTaskTestCase(TestCase):
@@ -210,7 +340,8 @@ class ServiceInstanceStartTaskTestCase(TestCase):
             self.task.watch.assert_called_with(mock_ac.return_value)
             self.node.submit_command.assert_called_with(mock_ac.return_value)
             mock_ac.assert_called_with("%s.start" % self.task.id, command,
-                serializer=self.task.buffer_store)
+                serializer=self.task.buffer_store,
+                priority=ActionCommand.PRIORITY_NORMAL)
 
     def test_start_failed(self):
         command = 'the command'
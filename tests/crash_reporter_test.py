@@ -1,9 +1,15 @@
+import collections
+import contextlib
 import logging
-from testify import TestCase, run, setup, assert_equal
+
+import mock
+from testify import TestCase, run, setup, assert_equal, setup_teardown
 from testify.utils import turtle
-from tests.assertions import assert_length, assert_call
+from twisted.internet import defer
+from tests.assertions import assert_length
 
-from tron import crash_reporter
+from tron import crash_reporter, event
+from tron.utils import emailer
 
 class TestError(Exception):
     pass
@@ -50,8 +56,104 @@ class SimpleDeferredTestCase(TestCase):
     def test_emit_crash(self):
         self.event_dict['message'] = ["Ooops"]
         self.event_dict['isError'] = True
-        self.reporter.emit(self.event_dict)
-        assert_call(self.emailer.send, 0, "Ooops")
+        with mock.patch.object(self.reporter, 'add_error') as mock_add:
+            self.reporter.emit(self.event_dict)
+            mock_add.assert_called_with("Ooops")
+
+
+class BuildDigestTestCase(TestCase):
+
+    def test_build_digest_single(self):
+        errors = collections.OrderedDict([("Ooops", 1)])
+        assert_equal(crash_reporter.build_digest(errors),
+            ("Tron Exception", "Ooops"))
+
+    def test_build_digest(self):
+        errors = collections.OrderedDict([("Ooops", 3), ("Other", 1)])
+        subject, content = crash_reporter.build_digest(errors, 2)
+        assert_equal(subject, "Tron Exceptions (6)")
+        expected = ("6 errors, 2 distinct:\n\n3 x Ooops\n\n1 x Other\n\n"
+                    "2 more errors were not included.")
+        assert_equal(content, expected)
+
+
+class CrashReporterDigestTestCase(TestCase):
+
+    @setup_teardown
+    def setup_crash_reporter(self):
+        self.emailer = mock.create_autospec(emailer.Emailer)
+        self.reporter = crash_reporter.CrashReporter(self.emailer, 60)
+        patch_eventloop = mock.patch(
+            'tron.crash_reporter.eventloop', autospec=True)
+        patch_threads = mock.patch(
+            'tron.crash_reporter.threads', autospec=True)
+        with contextlib.nested(patch_eventloop, patch_threads) as (
+                self.eventloop, self.threads):
+            self.eventloop.seconds.return_value = 100
+            self.delayed_call = self.eventloop.call_later.return_value
+            self.delayed_call.active.return_value = False
+            self.threads.deferToThread.side_effect = (
+                lambda func, *args: defer.maybeDeferred(func, *args))
+            yield
+
+    def test_add_error_sends_first_immediately(self):
+        self.reporter.add_error("Ooops")
+        self.eventloop.call_later.assert_called_with(0, self.reporter.send)
+
+    def test_add_error_deduplicates(self):
+        for text in ["Ooops", "Other", "Ooops"]:
+            self.reporter.add_error(text)
+        assert_equal(self.reporter.errors.items(), [("Ooops", 2), ("Other", 1)])
+
+    def test_add_error_max_distinct(self):
+        self.reporter.MAX_DISTINCT_ERRORS = 1
+        for text in ["Ooops", "Other", "Ooops"]:
+            self.reporter.add_error(text)
+        assert_equal(self.reporter.errors.items(), [("Ooops", 2)])
+        assert_equal(self.reporter.num_dropped, 1)
+
+    def test_send(self):
+        self.reporter.add_error("Ooops")
+        self.reporter.add_error("Ooops")
+        self.reporter.send()
+        self.emailer.send.assert_called_once_with(
+            "2 errors, 1 distinct:\n\n2 x Ooops", "Tron Exceptions (2)")
+        assert_equal(self.reporter.errors, {})
+        assert not self.reporter.in_flight
+
+    def test_send_rate_limited(self):
+        self.reporter.add_error("Ooops")
+        self.reporter.send()
+        self.eventloop.seconds.return_value = 130
+        self.reporter.add_error("Other")
+        self.eventloop.call_later.assert_called_with(30, self.reporter.send)
+
+    def test_send_while_in_flight(self):
+        self.threads.deferToThread.side_effect = None
+        self.reporter.add_error("Ooops")
+        self.reporter.send()
+        self.reporter.add_error("Other")
+        self.reporter.send()
+        assert_equal(self.threads.deferToThread.call_count, 1)
+        assert_equal(self.reporter.errors.keys(), ["Other"])
+
+    def test_send_failure(self):
+        self.emailer.send.side_effect = emailer.Error("Oops")
+        self.reporter.event_recorder = mock.create_autospec(
+            event.EventRecorder)
+        self.reporter.add_error("Ooops")
+        self.reporter.send()
+        self.reporter.event_recorder.critical.assert_called_with(
+            "email_failure", msg="Ooops")
+        assert not self.reporter.in_flight
+
+    def test_stop_sends_pending(self):
+        self.reporter.add_error("Ooops")
+        self.delayed_call.active.return_value = True
+        self.reporter.start()
+        self.reporter.stop()
+        self.delayed_call.cancel.assert_called_with()
+        self.emailer.send.assert_called_once_with("Ooops", "Tron Exception")
 
 
 if __name__ == '__main__':
@@ -1,51 +1,158 @@
+import datetime
+
+import mock
+
 from testify import setup, TestCase, assert_equal, teardown, assert_raises
 from tests.assertions import assert_length
 
 from tron import event
 
+class GetLevelTestCase(TestCase):
+
+    def test_get_level(self):
+        assert_equal(event.get_level('critical'), event.LEVEL_CRITICAL)
+        assert_equal(event.get_level('OK'), event.LEVEL_OK)
+        assert_equal(event.get_level('bogus'), None)
+
+    def test_get_prefixes(self):
+        assert_equal(list(event.get_prefixes('one.two')), ['', 'one', 'one.two'])
+        assert_equal(list(event.get_prefixes('')), [''])
+
+
 class EventStoreTestCase(TestCase):
 
     @setup
     def build_store(self):
-        self.limits = {
-            event.LEVEL_INFO:       2,
-            event.LEVEL_CRITICAL:   3
-        }
-        self.store = event.EventStore(self.limits)
+        self.store = event.EventStore(max_events=8)
+        self.start_time = datetime.datetime(2012, 3, 14, 15, 9, 26)
 
-    def _build_event(self, level, name):
-        return event.Event('entity', level, name)
+    def _build_event(self, entity, level, name, seconds):
+        e = event.Event(entity, level, name)
+        e.time = self.start_time + datetime.timedelta(seconds=seconds)
+        return e
 
     @setup
     def add_data(self):
-        for i in xrange(1,5):
-            self.store.append(self._build_event(event.LEVEL_INFO, "test%s" % i))
-
-        for i in xrange(5,10):
-            e = self._build_event(event.LEVEL_CRITICAL, "test%s" % i)
-            self.store.append(e)
-
-        self.store.append(self._build_event(event.LEVEL_OK, "alpha"))
+        entries = [
+            ('job',         event.LEVEL_INFO,       'info1'),
+            ('job.run',     event.LEVEL_CRITICAL,   'crit1'),
+            ('job.run.act', event.LEVEL_OK,         'ok1'),
+            ('jobx',        event.LEVEL_CRITICAL,   'crit2'),
+            ('job',         event.LEVEL_NOTICE,     'notice1'),
+            ('job.run',     event.LEVEL_INFO,       'info2'),
+        ]
+        for seconds, (entity, level, name) in enumerate(entries):
+            self.store.append(self._build_event(entity, level, name, seconds))
+
+    def names(self, *args, **kwargs):
+        return [e.name for e in self.store.get_events(*args, **kwargs)]
 
-    def test_build_deque(self):
-        deq = self.store._build_deque('stars')
-        deq.extend(range(12))
-        assert_equal(len(deq), event.EventStore.DEFAULT_LIMIT)
+    def test_get_events(self):
+        expected = ['info2', 'notice1', 'crit2', 'ok1', 'crit1', 'info1']
+        assert_equal(self.names(), expected)
 
-    def test_append(self):
-        assert_equal(len(self.store.events), 3)
-        for level, limit in self.limits.iteritems():
-            assert_equal(len(self.store.events[level]), limit)
+    def test_get_events_prefix(self):
+        expected = ['info2', 'notice1', 'ok1', 'crit1', 'info1']
+        assert_equal(self.names('job'), expected)
+        assert_equal(self.names('job.run'), ['info2', 'ok1', 'crit1'])
 
-    def test_get_events(self):
-        values = set(e.name for e in self.store.get_events())
-        expected = set(['test3', 'test4', 'test7', 'test8', 'test9', 'alpha'])
-        assert_equal(values, expected)
+    def test_get_events_without_children(self):
+        assert_equal(self.names('job', include_children=False),
+            ['notice1', 'info1'])
 
     def test_get_events_with_min_level(self):
-        values = set(e.name for e in self.store.get_events(event.LEVEL_OK))
-        expected = set(['test7', 'test8', 'test9', 'alpha'])
-        assert_equal(values, expected)
+        assert_equal(self.names(min_level=event.LEVEL_OK),
+            ['notice1', 'crit2', 'ok1', 'crit1'])
+        assert_equal(self.names('job', min_level=event.LEVEL_CRITICAL),
+            ['crit1'])
+
+    def test_get_events_since(self):
+        since = self.start_time + datetime.timedelta(seconds=3)
+        assert_equal(self.names(since=since), ['info2', 'notice1', 'crit2'])
+        assert_equal(self.names('job', since=since), ['info2', 'notice1'])
+
+    def test_get_events_limit(self):
+        assert_equal(self.names(limit=2), ['info2', 'notice1'])
+        assert_equal(self.names('job.run', limit=0), [])
+
+    def test_get_events_missing_entity(self):
+        assert_equal(self.names('bogus'), [])
+
+    def test_append_time_goes_backwards(self):
+        self.store.append(self._build_event('job', event.LEVEL_OK, 'late', -10))
+        assert_equal(self.store.times[-1], self.store.times[-2])
+        assert_equal(self.names(limit=1), ['late'])
+
+    def test_trim(self):
+        for i in xrange(5):
+            self.store.append(self._build_event('job', event.LEVEL_OK, i, 10 + i))
+        assert_equal(len(self.store), 8)
+        assert_equal(self.store.offset, 3)
+        assert_equal(self.store.seq, 11)
+        assert_equal(self.names('job.run'), ['info2'])
+        assert ('job.run.act', event.LEVEL_OK) not in self.store.by_entity
+
+    def test_get_events_before(self):
+        assert_equal(self.names(before=3), ['ok1', 'crit1', 'info1'])
+        assert_equal(self.names('job', before=4, limit=1), ['ok1'])
+
+    def test_set_max_events(self):
+        self.store.set_max_events(2)
+        assert_equal(self.names(), ['info2', 'notice1'])
+
+    def test_set_archive(self):
+        archive = mock.Mock(next_seq=20)
+        archive.get_events.return_value = []
+        self.store.set_archive(archive)
+        assert_equal(self.store.offset, 20)
+        assert_equal(self.store.seq, 26)
+        assert_equal([e.seq for e in self.store], range(20, 26))
+        assert_equal(archive.append.call_count, 6)
+        assert_equal(self.names(before=23), ['ok1', 'crit1', 'info1'])
+
+    def test_set_archive_behind(self):
+        archive = mock.Mock(next_seq=4)
+        self.store.set_archive(archive)
+        assert_equal([e.seq for e in self.store], range(6))
+        assert_equal([c[1][0].name for c in archive.append.mock_calls],
+            ['notice1', 'info2'])
+
+    def test_set_archive_closes_previous(self):
+        previous = mock.Mock(next_seq=6)
+        self.store.set_archive(previous)
+        self.store.set_archive(None)
+        previous.close.assert_called_with()
+        assert_equal(self.store.archive, None)
+        assert_equal(self.store.seq, 6)
+
+    def test_get_events_from_archive(self):
+        archive = mock.Mock(next_seq=0)
+        self.store.set_archive(archive)
+        archive.get_events.return_value = [mock.Mock(name='archived')]
+        self.store.set_max_events(4)
+        events = self.store.get_events('job', limit=5, before=self.store.seq)
+        assert_equal(len(events), 4)
+        archive.get_events.assert_called_with(
+            'job', None, None, 2, True, self.store.offset)
+
+    def test_get_events_from_archive_since(self):
+        archive = mock.Mock(next_seq=0)
+        archive.get_events.return_value = []
+        self.store.set_archive(archive)
+        self.store.set_max_events(4)
+        self.store.get_events(since=self.start_time)
+        archive.get_events.assert_called_with(
+            '', None, self.start_time, None, True, self.store.offset)
+
+    def test_get_events_not_from_archive(self):
+        archive = mock.Mock(next_seq=0)
+        self.store.set_archive(archive)
+        assert_equal(len(self.store.get_events(limit=3)), 3)
+        since = self.start_time + datetime.timedelta(seconds=3)
+        self.store.get_events(since=since)
+        self.store.get_events('job.run', limit=1000)
+        self.store.get_events(before=0)
+        assert not archive.get_events.called
 
 
 class EventRecorderTestCase(TestCase):
@@ -74,9 +181,13 @@ class EventRecorderTestCase(TestCase):
         self.recorder.remove_child('bogus')
         assert 'bogus' not in self.recorder.children
 
+    def test_get_child_shares_store(self):
+        child_rec = self.recorder.get_child('next')
+        assert child_rec.events is self.recorder.events
+
     def test_record(self):
         self.recorder._record(event.LEVEL_CRITICAL, 'this thing')
-        recorded_event = self.recorder.events.events[event.LEVEL_CRITICAL][0]
+        recorded_event = self.recorder.events.events[0]
         assert_equal(recorded_event.level, event.LEVEL_CRITICAL)
         assert_equal(recorded_event.name, 'this thing')
         assert_equal(recorded_event.entity, self.entity_name)
@@ -105,6 +216,14 @@ class EventRecorderTestCase(TestCase):
         expected = ['five', 'two', 'one']
         assert_equal([e.name for e in events], expected)
 
+    def test_list_with_filters(self):
+        self.recorder.ok('one')
+        child_rec = self.recorder.get_child('stars')
+        child_rec.critical('two')
+        child_rec.info('three')
+        events = self.recorder.list(min_level=event.LEVEL_OK, limit=1)
+        assert_equal([e.name for e in events], ['two'])
+
     def test_list_no_events(self):
         assert_length(self.recorder.list(), 0)
         assert_length(self.recorder.list(child_events=False), 0)
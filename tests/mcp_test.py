@@ -6,7 +6,7 @@ from testify import TestCase, setup, teardown
 from testify import  assert_equal, run
 from tests.testingutils import autospec_method
 
-from tron import mcp, event
+from tron import changefeed, mcp, event
 from tron.core import service, job
 from tron.serialize.runstate import statemanager
 from tron.config import config_parse, manager
@@ -56,6 +56,7 @@ class MasterControlProgramTestCase(TestCase):
         master_config = config_container.get_master.return_value
         autospec_method(self.mcp.apply_collection_config)
         autospec_method(self.mcp.apply_notification_options)
+        autospec_method(self.mcp.apply_event_options)
         autospec_method(self.mcp.build_job_scheduler_factory)
         self.mcp.apply_config(config_container)
         self.mcp.state_watcher.update_from_config.assert_called_with(
@@ -68,6 +69,55 @@ class MasterControlProgramTestCase(TestCase):
             master_config.node_pools, master_config.ssh_options)
         self.mcp.build_job_scheduler_factory(master_config)
 
+    @mock.patch('tron.mcp.node.NodePoolRepository', autospec=True)
+    def test_apply_config_incremental(self, _mock_repo):
+        previous = mock.create_autospec(config_parse.ConfigContainer)
+        config_container = mock.create_autospec(config_parse.ConfigContainer)
+        config_container.get_master.return_value = previous.get_master()
+        diff = {
+            'namespaces':   {'added': [], 'removed': [], 'updated': ['a']},
+            'jobs':         {'added': ['a.1'], 'removed': [], 'updated': ['a.2']},
+            'services':     {'added': [], 'removed': ['a.3'], 'updated': []},
+        }
+        config_container.get_diff.return_value = diff
+        self.mcp.config_container = previous
+        autospec_method(self.mcp.apply_collection_config)
+        autospec_method(self.mcp.apply_notification_options)
+        autospec_method(self.mcp.apply_event_options)
+        autospec_method(self.mcp.build_job_scheduler_factory)
+        self.mcp.apply_config(config_container, reconfigure=True)
+
+        config_container.get_diff.assert_called_with(previous)
+        job_call, service_call = self.mcp.apply_collection_config.mock_calls
+        assert_equal(job_call[1][-1], ['a.1', 'a.2'])
+        assert_equal(service_call[1][-1], [])
+        assert_equal(self.mcp.config_container, config_container)
+        assert_equal(self.mcp.get_config_diff(), diff)
+
+    def test_requires_rebuild(self):
+        previous = mock.create_autospec(config_parse.ConfigContainer)
+        master_config = mock.Mock()
+        assert self.mcp.requires_rebuild(None, master_config)
+        assert self.mcp.requires_rebuild(previous, master_config)
+        previous_master = previous.get_master.return_value
+        for key in self.mcp.BUILD_CONFIG_KEYS:
+            setattr(master_config, key, getattr(previous_master, key))
+        assert not self.mcp.requires_rebuild(previous, master_config)
+
+    def test_apply_collection_config(self):
+        collection = mock.create_autospec(job.JobCollection)
+        items = [mock.Mock(), mock.Mock()]
+        collection.load_from_config.return_value = iter(items)
+        self.mcp.change_feed = mock.create_autospec(changefeed.ChangeFeed)
+        self.mcp.apply_collection_config(
+            'config', collection, job.Job.NOTIFY_STATE_CHANGE, 'factory', True)
+        collection.load_from_config.assert_called_with(
+            'config', 'factory', True)
+        self.mcp.state_watcher.watch_all.assert_called_with(
+            items, job.Job.NOTIFY_STATE_CHANGE)
+        self.mcp.change_feed.watch_all.assert_called_with(
+            items, job.Job.NOTIFY_STATE_CHANGE)
+
     def test_update_state_watcher_config_changed(self):
         self.mcp.state_watcher.update_from_config.return_value = True
         self.mcp.jobs = mock.create_autospec(job.JobCollection)
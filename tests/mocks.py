@@ -108,6 +108,12 @@ class MockNodePool(object):
 
     next_round_robin = next
 
+    def get_strategy_name(self):
+        return 'round_robin'
+
+    def get_placements(self):
+        return {}
+
 
 class MockJobRunCollection(Turtle):
 
@@ -1,4 +1,7 @@
 import mock
+from twisted.conch.error import ConchError
+from twisted.internet import defer
+from twisted.python import failure
 from testify import setup, TestCase, assert_equal, run
 from testify import assert_in, assert_raises
 from testify.assertions import assert_not_in, assert_not_equal
@@ -9,6 +12,7 @@ from tron import node, ssh, actioncommand
 from tron.config import schema
 from tron.core import actionrun
 from tron.serialize import filehandler
+from tron.utils import twistedutils
 
 
 def create_mock_node(name=None):
@@ -54,7 +58,7 @@ class NodePoolRepositoryTestCase(TestCase):
         mock_nodes = {'a': create_mock_node('a'), 'b': create_mock_node('b')}
         self.repo.nodes.update(mock_nodes)
         node_config = {'a': mock.Mock(), 'b': mock.Mock()}
-        node_pool_config = {'c': mock.Mock(nodes=['a', 'b'])}
+        node_pool_config = {'c': mock.Mock(nodes=['a', 'b'], strategy=None)}
         ssh_options = mock.Mock(identities=[], known_hosts_file=None)
         node.NodePoolRepository.update_from_config(
             node_config, node_pool_config, ssh_options)
@@ -92,34 +96,6 @@ class KnownHostTestCase(TestCase):
         assert not self.known_hosts.get_public_key('hostname')
 
 
-class DetermineJitterTestCase(TestCase):
-
-    @setup
-    def setup_node_settings(self):
-        self.settings = mock.Mock(
-                jitter_load_factor=1, jitter_min_load=4, jitter_max_delay=20)
-
-    @setup_teardown
-    def patch_random(self):
-        with mock.patch('tron.node.random', autospec=True) as mock_random:
-            mock_random.random.return_value = 1
-            yield
-
-    def test_jitter_under_min_load(self):
-        assert_equal(node.determine_jitter(3, self.settings), 0)
-        assert_equal(node.determine_jitter(4, self.settings), 0)
-
-    def test_jitter_with_load_factor(self):
-        self.settings.jitter_load_factor = 2
-        assert_equal(node.determine_jitter(3, self.settings), 2.0)
-        assert_equal(node.determine_jitter(2, self.settings), 0)
-
-    def test_jitter_with_max_delay(self):
-        self.settings.jitter_max_delay = 15
-        assert_equal(node.determine_jitter(20, self.settings), 15.0)
-        assert_equal(node.determine_jitter(100, self.settings), 15.0)
-
-
 def build_node(
         hostname='localhost', username='theuser', name='thename', pub_key=None):
     config = mock.Mock(hostname=hostname, username=username, name=name)
@@ -143,13 +119,13 @@ class NodeTestCase(TestCase):
         serializer = mock.create_autospec(filehandler.FileHandleManager)
         action_cmd = actionrun.ActionCommand("test", "false", serializer)
 
-        test_node.connection = self.TestConnection()
+        connection = self.TestConnection()
         test_node.run_states = {action_cmd.id: mock.Mock(state=0)}
         test_node.run_states[action_cmd.id].state = node.RUN_STATE_CONNECTING
 
-        test_node._open_channel(action_cmd)
-        assert test_node.connection.chan is not None
-        test_node.connection.chan.dataReceived("test")
+        test_node._open_channel(action_cmd, connection)
+        assert connection.chan is not None
+        connection.chan.dataReceived("test")
         serializer.open.return_value.write.assert_called_with('test')
 
     def test_from_config(self):
@@ -186,6 +162,13 @@ class NodeTestCase(TestCase):
         other_node.conch_options = mock.create_autospec(ssh.SSHAuthOptions)
         assert_not_equal(other_node, self.node)
 
+    @mock.patch('tron.node.timeutils', autospec=True)
+    def test_recent_failures(self, mock_timeutils):
+        for timestamp in [100, 200, 500]:
+            mock_timeutils.current_timestamp.return_value = timestamp
+            self.node.record_failure()
+        assert_equal(self.node.recent_failures, 2)
+
     def test_stop_not_tracked(self):
         action_command = mock.create_autospec(actioncommand.ActionCommand,
             id=mock.Mock())
@@ -200,6 +183,202 @@ class NodeTestCase(TestCase):
         assert_equal(self.node._fail_run.call_count, 1)
 
 
+class NodeConnectionPoolTestCase(TestCase):
+
+    @setup
+    def setup_node(self):
+        self.node = build_node()
+        self.node.node_settings = mock.Mock(
+            min_connections=0,
+            max_connections=2,
+            max_channels_per_connection=2,
+            keepalive_interval=0,
+            idle_connection_timeout=10)
+        autospec_method(self.node._connect)
+        autospec_method(self.node._open_channel)
+        self.runs = [mock.Mock(id='run%s' % i) for i in xrange(5)]
+        for run in self.runs:
+            self.node.run_states[run.id] = node.RunState(run)
+
+    def test_dispatch_waiting_grows_pool(self):
+        self.node.waiting_runs.extend(self.runs[:3])
+        self.node._dispatch_waiting()
+        assert_equal(self.node._connect.call_count, 2)
+        assert_equal(len(self.node.pending_connections), 2)
+
+    def test_dispatch_waiting_one_connection_needed(self):
+        self.node.waiting_runs.extend(self.runs[:2])
+        self.node._dispatch_waiting()
+        assert_equal(self.node._connect.call_count, 1)
+
+    def test_dispatch_waiting_least_loaded(self):
+        busy, free = mock.Mock(), mock.Mock()
+        self.node.connections = {busy: 1, free: 0}
+        self.node.waiting_runs.append(self.runs[0])
+        self.node._dispatch_waiting()
+        self.node._open_channel.assert_called_with(self.runs[0], free)
+        assert not self.node._connect.call_count
+
+    def test_dispatch_waiting_full(self):
+        connections = [mock.Mock(), mock.Mock()]
+        self.node.connections = dict((conn, 2) for conn in connections)
+        self.node.waiting_runs.append(self.runs[0])
+        self.node._dispatch_waiting()
+        assert not self.node._open_channel.call_count
+        assert not self.node._connect.call_count
+        assert_equal(list(self.node.waiting_runs), [self.runs[0]])
+
+    def test_cleanup_dispatches_waiting(self):
+        connection = mock.Mock()
+        self.node.connections = {connection: 2}
+        self.node.run_states[self.runs[0].id].connection = connection
+        self.node.waiting_runs.append(self.runs[1])
+        self.node._cleanup(self.runs[0])
+        self.node._open_channel.assert_called_with(self.runs[1], connection)
+
+    def test_connect_fail_fails_waiting_runs(self):
+        self.node._connect.side_effect = lambda: defer.Deferred()
+        self.node.waiting_runs.extend(self.runs[:2])
+        self.node._dispatch_waiting()
+        self.node.pending_connections[0].errback(failure.Failure(
+            node.ConnectError("failed")))
+        for run in self.runs[:2]:
+            run.exited.assert_called_with(None)
+        assert not self.node.waiting_runs
+
+    @mock.patch('tron.node.eventloop', autospec=True)
+    def test_connection_idle_timeout(self, mock_eventloop):
+        mock_eventloop.seconds.return_value = 100
+        self.node.node_settings.min_connections = 1
+        connections = [mock.Mock(), mock.Mock()]
+        self.node.connections = dict((conn, 0) for conn in connections)
+        self.node.idle_since = dict((conn, 80) for conn in connections)
+        self.node._connection_idle_timeout()
+        closed = [conn for conn in connections
+                  if conn.transport.loseConnection.call_count]
+        assert_equal(len(closed), 1)
+        assert_equal(len(self.node.connections), 1)
+        assert not mock_eventloop.call_later.call_count
+
+    @mock.patch('tron.node.eventloop', autospec=True)
+    def test_connection_idle_timeout_while_busy(self, mock_eventloop):
+        mock_eventloop.seconds.return_value = 100
+        busy, idle, recent = mock.Mock(), mock.Mock(), mock.Mock()
+        self.node.connections = {busy: 2, idle: 0, recent: 0}
+        self.node.idle_since = {idle: 85, recent: 95}
+        self.node._connection_idle_timeout()
+        idle.transport.loseConnection.assert_called_with()
+        assert not recent.transport.loseConnection.call_count
+        assert not busy.transport.loseConnection.call_count
+        mock_eventloop.call_later.assert_called_with(
+            5, self.node._connection_idle_timeout)
+
+    @mock.patch('tron.node.eventloop', autospec=True)
+    def test_cleanup_marks_connection_idle(self, mock_eventloop):
+        mock_eventloop.seconds.return_value = 100
+        mock_eventloop.NullCallback.active.return_value = False
+        self.node.idle_timer = mock_eventloop.NullCallback
+        connection, other = mock.Mock(), mock.Mock()
+        self.node.connections = {connection: 1, other: 1}
+        self.node.run_states[self.runs[0].id].connection = connection
+        self.node._cleanup(self.runs[0])
+        assert_equal(self.node.idle_since, {connection: 100})
+        mock_eventloop.call_later.assert_called_with(
+            10, self.node._connection_idle_timeout)
+
+        self.node._open_channel.side_effect = None
+        node.Node._open_channel(self.node, self.runs[1], connection)
+        assert_equal(self.node.idle_since, {})
+
+    def test_service_stopped(self):
+        connection, other = mock.Mock(), mock.Mock()
+        self.node.connections = {connection: 1, other: 0}
+        run_state = self.node.run_states[self.runs[0].id]
+        run_state.connection = connection
+        run_state.state = node.RUN_STATE_RUNNING
+        self.node.waiting_runs.append(self.runs[1])
+        self.node._service_stopped(connection)
+        self.runs[0].exited.assert_called_with(None)
+        assert_equal(self.node.connections.keys(), [other])
+        self.node._open_channel.assert_called_with(self.runs[1], other)
+
+    def test_keepalive_reply_timeout(self):
+        connection = mock.Mock()
+        result = failure.Failure(twistedutils.Error())
+        self.node._keepalive_reply(result, connection)
+        connection.transport.loseConnection.assert_called_with()
+
+    @mock.patch('tron.node.eventloop', autospec=True)
+    def test_keepalive_reply_failure_is_alive(self, mock_eventloop):
+        self.node.node_settings.keepalive_interval = 5
+        connection = mock.Mock()
+        result = failure.Failure(ConchError('global request failed'))
+        self.node._keepalive_reply(result, connection)
+        assert not connection.transport.loseConnection.call_count
+        mock_eventloop.call_later.assert_called_with(
+            5, self.node._send_keepalive, connection)
+
+
+class NodeRunQueueTestCase(TestCase):
+
+    @setup_teardown
+    def patch_time(self):
+        with mock.patch('tron.node.timeutils', autospec=True) as self.timeutils:
+            self.timeutils.current_timestamp.return_value = 100
+            yield
+
+    @setup
+    def setup_node(self):
+        self.node = build_node()
+        self.node.node_settings = mock.Mock(
+            max_concurrent_runs=2,
+            run_queue_order='fifo',
+            idle_connection_timeout=10)
+        autospec_method(self.node._do_run)
+        self.runs = [
+            mock.Mock(id='run%s' % i, priority=10 - i) for i in xrange(4)]
+
+    def test_run_admits_up_to_max(self):
+        for run in self.runs:
+            self.node.run(run)
+        assert_equal(self.node._do_run.mock_calls,
+            [mock.call(run) for run in self.runs[:2]])
+        assert_equal(len(self.node.run_queue), 2)
+
+    def test_run_unlimited(self):
+        self.node.node_settings.max_concurrent_runs = 0
+        for run in self.runs:
+            self.node.run(run)
+        assert_equal(self.node._do_run.call_count, 4)
+
+    def test_cleanup_admits_next_fifo(self):
+        for run in self.runs:
+            self.node.run(run)
+        self.timeutils.current_timestamp.return_value = 105
+        self.node._cleanup(self.runs[0])
+        self.node._do_run.assert_called_with(self.runs[2])
+        stats = self.node.get_run_queue_stats()
+        assert_equal(stats['queued'], 1)
+        assert_equal(stats['running'], 2)
+        assert_equal(stats['admitted_total'], 3)
+        assert_equal(stats['last_wait'], 5)
+        assert_equal(stats['oldest_queued_wait'], 5)
+
+    def test_cleanup_admits_next_priority(self):
+        self.node.node_settings.run_queue_order = 'priority'
+        for run in self.runs:
+            self.node.run(run)
+        self.node._cleanup(self.runs[0])
+        self.node._do_run.assert_called_with(self.runs[3])
+
+    def test_stop_queued_run(self):
+        for run in self.runs:
+            self.node.run(run)
+        self.node.stop(self.runs[3])
+        assert_equal([run for _, run in self.node.run_queue], [self.runs[2]])
+        assert_equal(self.node.admitted_count, 2)
+
+
 class NodePoolTestCase(TestCase):
 
     @setup
@@ -210,10 +389,11 @@ class NodePoolTestCase(TestCase):
     def test_from_config(self):
         name = 'the pool name'
         nodes = [create_mock_node(), create_mock_node()]
-        config = mock.Mock(name=name)
+        config = mock.Mock(name=name, strategy='least_loaded')
         new_pool = node.NodePool.from_config(config, nodes)
         assert_equal(new_pool.name, config.name)
         assert_equal(new_pool.nodes, nodes)
+        assert_equal(new_pool.get_strategy_name(), 'least_loaded')
 
     def test__init__(self):
         new_node = node.NodePool(self.nodes, 'thename')
@@ -223,6 +403,18 @@ class NodePoolTestCase(TestCase):
         other_pool = node.NodePool(self.nodes, 'othername')
         assert_equal(self.node_pool, other_pool)
 
+    def test__eq__false_strategy_changed(self):
+        other_pool = node.NodePool(self.nodes, 'thename', 'least_loaded')
+        assert_not_equal(self.node_pool, other_pool)
+
+    def test_next_records_placement(self):
+        self.node_pool.strategy = mock.Mock()
+        self.node_pool.strategy.select.return_value = self.nodes[1]
+        assert_equal(self.node_pool.next(), self.nodes[1])
+        self.node_pool.next()
+        assert_equal(self.node_pool.get_placements(),
+            {self.nodes[1].get_name(): 2})
+
     def test_next(self):
         # Call next many times
         for _ in xrange(len(self.nodes) * 2 + 1):
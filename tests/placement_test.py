@@ -0,0 +1,78 @@
+import mock
+from testify import TestCase, run, setup, assert_equal, setup_teardown
+from testify import assert_in
+
+from tron import placement
+
+
+def build_node(load=0, capacity=1, recent_failures=0):
+    return mock.Mock(load=load, capacity=capacity,
+        recent_failures=recent_failures)
+
+
+class NodeLoadTestCase(TestCase):
+
+    def test_node_load(self):
+        node = build_node(load=3, capacity=2, recent_failures=1)
+        assert_equal(placement.node_load(node), 1.5)
+        assert_equal(placement.node_load(node, failure_penalty=3), 3.0)
+
+
+class StrategyTestCase(TestCase):
+
+    @setup
+    def setup_nodes(self):
+        self.nodes = [
+            build_node(load=4, capacity=2),
+            build_node(load=3, capacity=1),
+            build_node(load=1, capacity=1, recent_failures=1),
+        ]
+
+    def test_build_strategy_default(self):
+        strategy = placement.build_strategy(None, self.nodes)
+        assert isinstance(strategy, placement.RandomStrategy)
+        assert_in(strategy.select(), self.nodes)
+
+    def test_round_robin(self):
+        strategy = placement.build_strategy('round_robin', self.nodes)
+        selected = [strategy.select() for _ in xrange(len(self.nodes) * 2)]
+        assert_equal(selected, self.nodes + self.nodes)
+
+    def test_least_loaded(self):
+        strategy = placement.build_strategy('least_loaded', self.nodes)
+        assert_equal(strategy.select(), self.nodes[2])
+
+    def test_health(self):
+        strategy = placement.build_strategy('health', self.nodes)
+        assert_equal(strategy.select(), self.nodes[0])
+
+    def test_power_of_two(self):
+        strategy = placement.build_strategy('power_of_two', self.nodes)
+        with mock.patch('tron.placement.random', autospec=True) as mock_random:
+            mock_random.sample.return_value = self.nodes[:2]
+            assert_equal(strategy.select(), self.nodes[0])
+
+    def test_power_of_two_single_node(self):
+        strategy = placement.build_strategy('power_of_two', self.nodes[:1])
+        assert_equal(strategy.select(), self.nodes[0])
+
+
+class WeightedStrategyTestCase(TestCase):
+
+    @setup_teardown
+    def patch_random(self):
+        with mock.patch('tron.placement.random', autospec=True) as self.random:
+            yield
+
+    def test_select(self):
+        nodes = [build_node(capacity=1), build_node(capacity=3)]
+        strategy = placement.build_strategy('weighted', nodes)
+        assert_equal(strategy.cumulative_weights, [1, 4])
+        self.random.random.return_value = 0.2
+        assert_equal(strategy.select(), nodes[0])
+        self.random.random.return_value = 0.3
+        assert_equal(strategy.select(), nodes[1])
+
+
+if __name__ == "__main__":
+    run()
@@ -58,6 +58,10 @@ class ConstantSchedulerTest(testingutils.MockTimeTestCase):
     def test__str__(self):
         assert_equal(str(self.scheduler), 'constant')
 
+    def test_get_run_times(self):
+        run_times = self.scheduler.get_run_times(self.now, self.now)
+        assert_equal(list(run_times), [])
+
 
 class GeneralSchedulerTestCase(testingutils.MockTimeTestCase):
 
@@ -92,6 +96,20 @@ class GeneralSchedulerTestCase(testingutils.MockTimeTestCase):
     def test__str__(self):
         assert_equal(str(self.scheduler), "daily ")
 
+    def test_get_run_times(self):
+        start_time = datetime.datetime(2012, 3, 14, 14, 30)
+        end_time = datetime.datetime(2012, 3, 16, 14, 30)
+        expected = [datetime.datetime(2012, 3, day, 14, 30)
+                    for day in [14, 15, 16]]
+        run_times = self.scheduler.get_run_times(start_time, end_time)
+        assert_equal(list(run_times), expected)
+
+    def test_get_run_times_empty(self):
+        start_time = datetime.datetime(2012, 3, 14, 14, 31)
+        end_time = datetime.datetime(2012, 3, 15, 14, 29)
+        run_times = self.scheduler.get_run_times(start_time, end_time)
+        assert_equal(list(run_times), [])
+
     def test__str__with_jitter(self):
         self.scheduler.jitter = datetime.timedelta(seconds=300)
         assert_equal(str(self.scheduler), "daily  (+/- 0:05:00)")
@@ -378,6 +396,12 @@ class IntervalSchedulerTestCase(TestCase):
     def test__str__(self):
         assert_equal(str(self.scheduler), "interval %s" % self.interval)
 
+    def test_get_run_times(self):
+        end_time = self.now + datetime.timedelta(seconds=20)
+        expected = [self.now + self.interval * i for i in xrange(3)]
+        run_times = self.scheduler.get_run_times(self.now, end_time)
+        assert_equal(list(run_times), expected)
+
     def test__str__with_jitter(self):
         self.scheduler.jitter = datetime.timedelta(seconds=300)
         assert_equal(str(self.scheduler), "interval 0:00:07 (+/- 0:05:00)")
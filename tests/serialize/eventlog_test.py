@@ -0,0 +1,249 @@
+import datetime
+import os
+import shutil
+import tempfile
+
+import mock
+from testify import TestCase, run, setup, assert_equal, teardown
+
+from tron import event
+from tron.config import schema
+from tron.serialize import eventlog
+
+
+def build_event(seq, entity='job', level=event.LEVEL_OK, name='ok',
+        time=None, **data):
+    recorded_event = event.Event(entity, level, name, **data)
+    recorded_event.seq = seq
+    recorded_event.time = time or (
+        datetime.datetime(2012, 3, 14, 15, 9, 26) +
+        datetime.timedelta(minutes=seq))
+    return recorded_event
+
+
+class EncodeEventTestCase(TestCase):
+
+    def test_encode_decode(self):
+        original = build_event(3, 'job.run', event.LEVEL_CRITICAL, 'failed',
+            msg='Oops')
+        decoded = eventlog.decode_event(eventlog.encode_event(original))
+        for field in event.Event.__slots__:
+            assert_equal(getattr(decoded, field), getattr(original, field))
+
+    def test_decode_events_skips_invalid(self):
+        lines = [eventlog.encode_event(build_event(1)), '{"seq": 2', '']
+        events = eventlog.decode_events(lines, 'filename')
+        assert_equal([e.seq for e in events], [1])
+
+    def test_parse_segment_filename(self):
+        segment = eventlog.parse_segment_filename(
+            'events.000000000010-000000000019.20120314150926-20120314151826.log.gz')
+        assert_equal(segment.first_seq, 10)
+        assert_equal(segment.last_seq, 19)
+        assert_equal(segment.last_time, datetime.datetime(2012, 3, 14, 15, 18, 26))
+        assert not eventlog.parse_segment_filename('events.000000000010.log')
+
+
+class EventLogTestCase(TestCase):
+
+    @setup
+    def setup_log(self):
+        self.path = tempfile.mkdtemp()
+        self.current_time = datetime.datetime(2012, 3, 15)
+        patcher = mock.patch('tron.serialize.eventlog.timeutils.current_time',
+            return_value=self.current_time)
+        self.mock_current_time = patcher.start()
+        self.patcher = patcher
+        self.log = eventlog.EventLog(self.path, segment_size=3)
+
+    @teardown
+    def teardown_log(self):
+        self.patcher.stop()
+        self.log.close()
+        shutil.rmtree(self.path)
+
+    def append(self, *events):
+        for recorded_event in events:
+            self.log.append(recorded_event)
+
+    def seqs(self, *args, **kwargs):
+        return [e.seq for e in self.log.get_events(*args, **kwargs)]
+
+    def test_append_rotates(self):
+        self.append(*[build_event(i) for i in xrange(4)])
+        assert_equal(len(self.log.segments), 1)
+        segment = self.log.segments[0]
+        assert_equal((segment.first_seq, segment.last_seq), (0, 2))
+        assert os.path.exists(os.path.join(self.path, segment.filename))
+        assert_equal(self.log.open_filename, 'events.000000000003.log')
+        assert_equal(self.log.next_seq, 4)
+
+    def test_get_events(self):
+        self.append(*[build_event(i) for i in xrange(5)])
+        assert_equal(self.seqs(), [4, 3, 2, 1, 0])
+        assert_equal(self.seqs(limit=2), [4, 3])
+        assert_equal(self.seqs(before=3, limit=2), [2, 1])
+
+    def test_get_events_filters(self):
+        self.append(
+            build_event(0, 'job'),
+            build_event(1, 'job.run', event.LEVEL_CRITICAL),
+            build_event(2, 'jobx'),
+            build_event(3, 'job.run.action', event.LEVEL_INFO))
+        assert_equal(self.seqs('job'), [3, 1, 0])
+        assert_equal(self.seqs('job', include_children=False), [0])
+        assert_equal(self.seqs(min_level=event.LEVEL_CRITICAL), [1])
+        since = build_event(2).time
+        assert_equal(self.seqs(since=since), [3, 2])
+
+    def test_reopen(self):
+        self.append(*[build_event(i) for i in xrange(5)])
+        self.log.close()
+        self.log = eventlog.EventLog(self.path, segment_size=3)
+        assert_equal(len(self.log.segments), 2)
+        assert_equal(self.log.next_seq, 5)
+        assert_equal(self.seqs(), [4, 3, 2, 1, 0])
+
+    def test_prune(self):
+        old_time = self.current_time - datetime.timedelta(days=10)
+        self.append(*[build_event(i, time=old_time) for i in xrange(3)])
+        self.append(*[build_event(i) for i in xrange(3, 6)])
+        assert_equal(len(self.log.segments), 1)
+        assert_equal(self.seqs(), [5, 4, 3])
+        filename = self.log.segments[0].filename
+        assert_equal(sorted(os.listdir(self.path)),
+            [filename, eventlog.KEYS_FORMAT % filename])
+
+    def test_get_events_skips_segments(self):
+        self.append(*[build_event(i, 'other') for i in xrange(6)])
+        self.append(build_event(6, 'job'))
+        with mock.patch.object(self.log, '_read_segment') as mock_read:
+            assert_equal(self.seqs('job'), [6])
+            assert not mock_read.called
+
+    def test_get_events_open_segment_not_read(self):
+        self.append(*[build_event(i) for i in xrange(2)])
+        with mock.patch('tron.serialize.eventlog.open', create=True) as mock_open:
+            assert_equal(self.seqs(), [1, 0])
+            assert not mock_open.called
+
+    def test_get_events_max_segment_reads(self):
+        self.log.MAX_SEGMENT_READS = 2
+        self.append(*[build_event(i) for i in xrange(12)])
+        assert_equal(self.seqs(), range(11, 5, -1))
+        assert_equal(self.seqs(before=6), range(5, -1, -1))
+
+    def test_keys_reopen(self):
+        self.append(*[build_event(i, 'other') for i in xrange(3)])
+        self.log.close()
+        self.log = eventlog.EventLog(self.path, segment_size=3)
+        filename = self.log.segments[0].filename
+        assert_equal(self.log.keys[filename], set([('other', event.LEVEL_OK)]))
+
+    def test_keys_missing(self):
+        self.append(*[build_event(i) for i in xrange(3)])
+        filename = self.log.segments[0].filename
+        os.remove(os.path.join(self.path, eventlog.KEYS_FORMAT % filename))
+        self.log.close()
+        self.log = eventlog.EventLog(self.path, segment_size=3)
+        assert_equal(self.log.keys[filename], None)
+        assert_equal(self.seqs(), [2, 1, 0])
+        assert_equal(self.log.keys[filename], set([('job', event.LEVEL_OK)]))
+
+    def test_read_segment_cache(self):
+        self.log.CACHE_SIZE = 1
+        self.append(*[build_event(i) for i in xrange(6)])
+        assert_equal(self.seqs(), range(5, -1, -1))
+        assert_equal(self.log.cache.keys(), [self.log.segments[0].filename])
+
+
+class UpdateArchiveTestCase(TestCase):
+
+    @setup
+    def setup_store(self):
+        self.path = tempfile.mkdtemp()
+        self.store = event.EventStore()
+        self.config = schema.ConfigEvents(
+            max_events=10, store_dir=self.path, segment_size=5,
+            retention_days=7)
+
+    @teardown
+    def teardown_store(self):
+        self.store.close()
+        shutil.rmtree(self.path)
+
+    def test_update_archive(self):
+        self.store.append(event.Event('job', event.LEVEL_OK, 'ok'))
+        assert eventlog.update_archive(self.store, self.config)
+        assert_equal(self.store.archive.path, self.path)
+        assert_equal(self.store.archive.next_seq, 1)
+        assert not eventlog.update_archive(self.store, self.config)
+
+    def test_update_archive_options(self):
+        for i in xrange(3):
+            self.store.append(event.Event('job', event.LEVEL_OK, str(i)))
+        eventlog.update_archive(self.store, self.config)
+        archive = self.store.archive
+        config = self.config._replace(segment_size=2, retention_days=3)
+        assert eventlog.update_archive(self.store, config)
+        assert self.store.archive is archive
+        assert_equal((archive.segment_size, archive.retention_days), (2, 3))
+        assert_equal(len(archive.segments), 1)
+        assert_equal([e.seq for e in self.store], [0, 1, 2])
+        assert_equal([e.seq for e in archive.get_events()], [2, 1, 0])
+
+    def test_update_archive_new_path(self):
+        for i in xrange(3):
+            self.store.append(event.Event('job', event.LEVEL_OK, str(i)))
+        eventlog.update_archive(self.store, self.config)
+        other_path = tempfile.mkdtemp()
+        try:
+            config = self.config._replace(store_dir=other_path)
+            assert eventlog.update_archive(self.store, config)
+            assert_equal([e.seq for e in self.store], [0, 1, 2])
+            assert_equal(self.store.archive.next_seq, 3)
+            self.store.close()
+
+            assert eventlog.update_archive(self.store, self.config)
+            assert_equal([e.seq for e in self.store], [0, 1, 2])
+            events = self.store.archive.get_events()
+            assert_equal([e.seq for e in events], [2, 1, 0])
+        finally:
+            shutil.rmtree(other_path)
+
+    def test_set_archive_after_restart(self):
+        eventlog.update_archive(self.store, self.config)
+        for i in xrange(3):
+            self.store.append(event.Event('job', event.LEVEL_OK, str(i)))
+        self.store.close()
+
+        self.store = event.EventStore()
+        self.store.append(event.Event('job', event.LEVEL_OK, 'new'))
+        eventlog.update_archive(self.store, self.config)
+        assert_equal([e.seq for e in self.store], [3])
+        assert_equal([e.name for e in self.store.get_events()], ['new'])
+        events = self.store.get_events(before=self.store.seq)
+        assert_equal([e.name for e in events], ['new', '2', '1', '0'])
+
+    def test_update_archive_removed(self):
+        eventlog.update_archive(self.store, self.config)
+        config = self.config._replace(store_dir=None)
+        assert eventlog.update_archive(self.store, config)
+        assert_equal(self.store.archive, None)
+
+    def test_store_reads_from_archive(self):
+        self.store.set_max_events(4)
+        eventlog.update_archive(self.store, self.config)
+        for i in xrange(8):
+            self.store.append(event.Event('job', event.LEVEL_OK, str(i)))
+        assert_equal(self.store.offset, 4)
+        events = self.store.get_events(limit=6)
+        assert_equal([e.seq for e in events], [7, 6, 5, 4])
+        events = self.store.get_events(limit=6, before=8)
+        assert_equal([e.seq for e in events], [7, 6, 5, 4, 3, 2])
+        events = self.store.get_events(before=3)
+        assert_equal([e.name for e in events], ['2', '1', '0'])
+
+
+if __name__ == "__main__":
+    run()
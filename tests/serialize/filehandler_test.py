@@ -7,6 +7,8 @@ from testify import TestCase, run, assert_equal, assert_not_in, assert_in
 from testify import assert_not_equal, turtle
 from testify import setup, teardown, suite
 
+import mock
+from tron.serialize import filehandler
 from tron.serialize.filehandler import FileHandleManager, OutputStreamSerializer
 from tron.serialize.filehandler import OutputPath, NullFileHandle
 
@@ -72,6 +74,40 @@ class FileHandleWrapperTestCase(TestCase):
         with open(self.file.name) as fh:
             assert_equal(fh.read(), "123")
 
+    def test_write_notifies_listeners(self):
+        callback = mock.Mock()
+        self.manager.subscribe(self.file.name, callback)
+        self.fh_wrapper.write("some things")
+        callback.assert_called_with(self.file.name, "some things")
+        self.manager.unsubscribe(self.file.name, callback)
+        self.fh_wrapper.write("more things")
+        assert_equal(callback.call_count, 1)
+        assert_not_in(self.file.name, self.manager.listeners)
+
+    def test_write_listener_error(self):
+        failing, callback = mock.Mock(side_effect=ValueError), mock.Mock()
+        self.manager.subscribe(self.file.name, failing)
+        self.manager.subscribe(self.file.name, callback)
+        self.fh_wrapper.write("some things")
+        callback.assert_called_with(self.file.name, "some things")
+        self.fh_wrapper.flush()
+        assert_equal(open(self.file.name).read(), "some things")
+        self.manager.listeners.clear()
+
+    def test_recent(self):
+        self.fh_wrapper.write("one\ntw")
+        self.fh_wrapper.write("o\nthree\nfo")
+        assert_equal(self.fh_wrapper.recent(2), ['three', 'fo'])
+        assert_equal(self.fh_wrapper.recent(3), ['two', 'three', 'fo'])
+        assert_equal(self.fh_wrapper.recent(4), None)
+
+    def test_recent_bounded(self):
+        with mock.patch.object(filehandler, 'RECENT_LINES', 3):
+            self.fh_wrapper.recent_lines = filehandler.deque(maxlen=3)
+            self.fh_wrapper.write("\n".join(str(i) for i in xrange(10)))
+        assert_equal(list(self.fh_wrapper.recent_lines), ['6', '7', '8'])
+        assert_equal(self.fh_wrapper.recent(3), ['7', '8', '9'])
+
 
 class FileHandleManagerTestCase(TestCase):
 
@@ -236,6 +272,52 @@ class OutputStreamSerializerTestCase(TestCase):
         file_dne = 'bogusfile123'
         assert_equal(self.serial.tail(file_dne), [])
 
+    def test_tail_many_blocks(self):
+        self.content = ''.join('line %s\n' % i for i in xrange(100))
+        self._write_contents()
+        with mock.patch.object(filehandler, 'TAIL_BLOCK_SIZE', 16):
+            lines = self.serial.tail(self.filename, 3)
+        assert_equal(lines, ['line 97', 'line 98', 'line 99'])
+
+    def test_tail_from_open_file(self):
+        with mock.patch.object(filehandler, 'tail_file') as mock_tail_file:
+            fh = self.serial.open(self.filename)
+            fh.write(self.content)
+            assert_equal(self.serial.tail(self.filename, 2), self.expected[-2:])
+            assert not mock_tail_file.call_count
+        fh.close()
+
+    def test_size(self):
+        assert_equal(self.serial.size(self.filename), 0)
+        self._write_contents()
+        assert_equal(self.serial.size(self.filename), len(self.content))
+
+    def test_read_since(self):
+        self._write_contents()
+        lines, offset = self.serial.read_since(self.filename, 0)
+        assert_equal(lines, self.expected[:2])
+        assert_equal(offset, 8)
+        assert_equal(self.serial.read_since(self.filename, offset), ([], 8))
+
+    def test_read_since_replaced_file(self):
+        self._write_contents()
+        assert_equal(self.serial.read_since(self.filename, 100),
+            (self.expected[:2], 8))
+
+    def test_read_since_open_file(self):
+        with self.serial.open(self.filename) as fh:
+            fh.write("one\n")
+            assert_equal(self.serial.read_since(self.filename, 0), (['one'], 4))
+
+    def test_read_from(self):
+        self._write_contents()
+        assert_equal(self.serial.read_from(self.filename, 5), (5, "56\n789"))
+        assert_equal(self.serial.read_from(self.filename, 50),
+            (0, self.content))
+
+    def test_read_since_does_not_exist(self):
+        assert_equal(self.serial.read_since('bogusfile123', 4), ([], 4))
+
 
 class OutputPathTestCase(TestCase):
 
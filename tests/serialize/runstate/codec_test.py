@@ -0,0 +1,51 @@
+import datetime
+import pytz
+import yaml
+from testify import TestCase, run, assert_equal
+from tests.assertions import assert_raises
+from tron.serialize.runstate import codec
+
+
+class CodecTestCase(TestCase):
+
+    state_data = {
+        'job_run_id':   'MASTER.job.3',
+        'run_time':     datetime.datetime(2013, 4, 5, 6, 7, 8),
+        'end_time':     pytz.timezone('US/Pacific').localize(
+                            datetime.datetime(2013, 4, 5, 6, 7, 8)),
+        'exit_status':  None,
+        'runs':         [{'state': 'succeeded', 'manual': False}],
+    }
+
+    def test_get_codec(self):
+        assert_equal(codec.get_codec('pickle'), codec.PickleCodec)
+        assert_raises(codec.CodecError, codec.get_codec, 'unknown')
+
+    def test_pickle_round_trip(self):
+        data = codec.PickleCodec.encode(self.state_data)
+        assert data.startswith(codec.MAGIC)
+        decoded = codec.decode(data)
+        assert_equal(decoded, self.state_data)
+        assert_equal(decoded['end_time'].tzinfo, self.state_data['end_time'].tzinfo)
+
+    def test_decode_legacy_yaml(self):
+        data = yaml.dump(self.state_data)
+        assert_equal(codec.decode(data), self.state_data)
+
+    def test_decode_unknown_codec(self):
+        data = codec.HEADER.pack(codec.MAGIC, 99, 1) + 'data'
+        assert_raises(codec.CodecError, codec.decode, data)
+
+    def test_decode_newer_version(self):
+        data = codec.HEADER.pack(codec.MAGIC, codec.PickleCodec.codec_id, 9)
+        assert_raises(codec.CodecError, codec.decode, data)
+
+    def test_text_round_trip(self):
+        for state_codec in codec.CODECS.itervalues():
+            data = codec.encode_text(state_codec, self.state_data)
+            data.decode('ascii')
+            assert_equal(codec.decode_text(unicode(data)), self.state_data)
+
+
+if __name__ == "__main__":
+    run()
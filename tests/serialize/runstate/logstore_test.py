@@ -0,0 +1,103 @@
+import os
+import tempfile
+import mock
+from testify import TestCase, run, setup, assert_equal, teardown
+from testify import assert_raises
+from tron.serialize.runstate.logstore import LogStateStore, LogStateKey
+
+
+class LogStateStoreTestCase(TestCase):
+
+    @setup
+    def setup_store(self):
+        self.filename = os.path.join(tempfile.gettempdir(), 'log_state')
+        self.store = LogStateStore(self.filename, 'compact_min=4')
+
+    @teardown
+    def teardown_store(self):
+        self.store.cleanup()
+        os.unlink(self.filename)
+
+    def test__init__(self):
+        assert_equal(self.store.filename, self.filename)
+        assert not self.store.fsync
+        assert_equal(self.store.compact_min, 4)
+
+    def test_save_and_restore(self):
+        keys = [LogStateKey('one', 'two'), LogStateKey('three', 'four')]
+        self.store.save(zip(keys, [{'this': 'data'}, {'this': 'data2'}]))
+        self.store.save([(keys[0], {'this': 'data3'})])
+
+        state_data = self.store.restore(keys + [LogStateKey('five', 'six')])
+        expected = {keys[0]: {'this': 'data3'}, keys[1]: {'this': 'data2'}}
+        assert_equal(state_data, expected)
+
+    def test_restore_from_file(self):
+        key = LogStateKey('one', 'two')
+        self.store.save([(key, {'this': 'data'})])
+        self.store.save([(key, {'this': 'data2'})])
+        self.store.cleanup()
+
+        self.store = LogStateStore(self.filename)
+        assert_equal(self.store.record_count, 2)
+        assert_equal(self.store.restore([key]), {key: {'this': 'data2'}})
+
+    def test_restore_truncated_record(self):
+        keys = [LogStateKey('one', 'two'), LogStateKey('three', 'four')]
+        self.store.save([(keys[0], {'this': 'data'})])
+        valid_length = os.path.getsize(self.filename)
+        self.store.save([(keys[1], {'this': 'data2'})])
+        self.store.cleanup()
+        with open(self.filename, 'r+b') as fh:
+            fh.truncate(os.path.getsize(self.filename) - 2)
+
+        self.store = LogStateStore(self.filename)
+        assert_equal(self.store.restore(keys), {keys[0]: {'this': 'data'}})
+        assert_equal(os.path.getsize(self.filename), valid_length)
+
+    def test_save_failed_is_truncated(self):
+        keys = [LogStateKey('one', 'two'), LogStateKey('three', 'four')]
+        self.store.save([(keys[0], {'this': 'data'})])
+        valid_length = os.path.getsize(self.filename)
+        with mock.patch.object(self.store, '_sync',
+                side_effect=[IOError("disk full"), None]):
+            self.store.fh.write('partial record')
+            assert_raises(IOError, self.store.save,
+                [(keys[1], {'this': 'data2'})])
+            assert_equal(os.path.getsize(self.filename), valid_length)
+            self.store.save([(keys[1], {'this': 'data3'})])
+        self.store.cleanup()
+
+        self.store = LogStateStore(self.filename)
+        expected = {keys[0]: {'this': 'data'}, keys[1]: {'this': 'data3'}}
+        assert_equal(self.store.restore(keys), expected)
+
+    def test_save_truncates_failed_save(self):
+        key = LogStateKey('one', 'two')
+        self.store.save([(key, {'this': 'data'})])
+        self.store.fh.write('partial record')
+        self.store.save([(key, {'this': 'data2'})])
+        self.store.cleanup()
+
+        self.store = LogStateStore(self.filename)
+        assert_equal(self.store.record_count, 2)
+        assert_equal(self.store.restore([key]), {key: {'this': 'data2'}})
+
+    def test_compact(self):
+        keys = [LogStateKey('one', 'two'), LogStateKey('three', 'four')]
+        self.store.save([(keys[1], {'this': 'data'})])
+        for i in xrange(4):
+            self.store.save([(keys[0], {'count': i})])
+
+        assert_equal(self.store.record_count, 2)
+        expected = {keys[0]: {'count': 3}, keys[1]: {'this': 'data'}}
+        assert_equal(self.store.restore(keys), expected)
+        self.store.cleanup()
+
+        self.store = LogStateStore(self.filename)
+        assert_equal(self.store.record_count, 2)
+        assert_equal(self.store.restore(keys), expected)
+
+
+if __name__ == "__main__":
+    run()
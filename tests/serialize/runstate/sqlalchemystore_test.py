@@ -1,5 +1,8 @@
+import datetime
+import functools
+import mock
 from testify import TestCase, run, setup, assert_equal, teardown
-from tests.assertions import assert_length
+from tests.assertions import assert_length, assert_raises
 from tron.serialize import runstate
 sqlalchemystore = None # pyflakes
 
@@ -42,6 +45,58 @@ class SQLAlchmeyStateStoreTestCase(TestCase):
         rows = self.store.engine.execute(self.store.job_table.select())
         assert_equal(rows.fetchone(), ('stars', "{docs: blocks}\n"))
 
+    def test_save_binary_codec(self):
+        from tron.serialize.runstate import codec
+        self.store.encoder = functools.partial(
+            codec.encode_text, codec.PickleCodec)
+        key = sqlalchemystore.SQLStateKey(self.store.job_table, 'stars')
+        doc = {'docs': 'blocks', 'time': datetime.datetime(2013, 4, 5)}
+        self.store.save([(key, doc)])
+
+        rows = self.store.engine.execute(self.store.job_table.select())
+        assert rows.fetchone()[1].startswith(codec.TEXT_PREFIX)
+        assert_equal(self.store.restore([key]), {key: doc})
+
+    def test_save_update(self):
+        keys = [
+            sqlalchemystore.SQLStateKey(self.store.job_table, 'stars'),
+            sqlalchemystore.SQLStateKey(self.store.job_table, 'moon'),
+        ]
+        self.store.save([(keys[0], {'docs': 'blocks'})])
+        self.store.save(zip(keys, [{'docs': 'builder'}, {'docs': 'helper'}]))
+
+        rows = self.store.engine.execute(self.store.job_table.select())
+        assert_length(rows.fetchall(), 2)
+        docs = self.store.restore(keys)
+        assert_equal(docs[keys[0]], {'docs': 'builder'})
+        assert_equal(docs[keys[1]], {'docs': 'helper'})
+
+    def test_save_many_chunked(self):
+        self.store.SELECT_CHUNK_SIZE = 3
+        keys = [sqlalchemystore.SQLStateKey(self.store.service_table, str(i))
+                for i in xrange(7)]
+        self.store.save([(key, {'num': i}) for i, key in enumerate(keys)])
+        self.store.save([(key, {'num': i * 2}) for i, key in enumerate(keys)])
+
+        docs = self.store.restore(keys)
+        assert_equal(docs, dict((key, {'num': i * 2})
+                                for i, key in enumerate(keys)))
+
+    def test_with_reconnect(self):
+        import sqlalchemy.exc
+        error = sqlalchemy.exc.DBAPIError('stmt', None, Exception(),
+            connection_invalidated=True)
+        func = mock.Mock(side_effect=[error, 'result'])
+        assert_equal(self.store._with_reconnect(func, 'arg'), 'result')
+        assert_equal(func.call_count, 2)
+
+    def test_with_reconnect_other_error(self):
+        import sqlalchemy.exc
+        error = sqlalchemy.exc.DBAPIError('stmt', None, Exception())
+        func = mock.Mock(side_effect=error)
+        assert_raises(sqlalchemy.exc.DBAPIError,
+            self.store._with_reconnect, func)
+
     def test_restore_missing(self):
         key = sqlalchemystore.SQLStateKey(self.store.job_table, 'stars')
         docs = self.store.restore([key])
@@ -4,11 +4,14 @@ from testify import TestCase, assert_equal, setup, run
 
 from tests.assertions import assert_raises
 from tests.testingutils import autospec_method
+from tron import eventloop
 from tron.config import schema
 from tron.serialize import runstate
 from tron.serialize.runstate.shelvestore import ShelveStateStore
 from tron.serialize.runstate.statemanager import PersistentStateManager, StateChangeWatcher
 from tron.serialize.runstate.statemanager import StateSaveBuffer
+from tron.serialize.runstate.statemanager import JobStateJournal
+from tron.serialize.runstate.statemanager import NullStateManager
 from tron.serialize.runstate.statemanager import StateMetadata
 from tron.serialize.runstate.statemanager import PersistenceStoreError
 from tron.serialize.runstate.statemanager import VersionMismatchError
@@ -21,11 +24,13 @@ class PersistenceManagerFactoryTestCase(TestCase):
         thefilename = 'thefilename'
         config = schema.ConfigState(
             store_type='shelve', name=thefilename, buffer_size=0,
-            connection_details=None)
+            connection_details=None, journal_size=0, buffer_max_latency=None,
+            buffer_max_bytes=None, threaded_writes=False, codec='yaml')
         manager = PersistenceManagerFactory.from_config(config)
         store = manager._impl
         assert_equal(store.filename, config.name)
         assert isinstance(store, ShelveStateStore)
+        assert not manager._journal
         os.unlink(thefilename)
 
 
@@ -53,22 +58,106 @@ class StateSaveBufferTestCase(TestCase):
         self.buffer = StateSaveBuffer(self.buffer_size)
 
     def test_save(self):
-        assert self.buffer.save(1, 2)
+        for i in xrange(4):
+            assert not self.buffer.save(i, 2)
         assert not self.buffer.save(1, 3)
-        assert not self.buffer.save(1, 4)
-        assert not self.buffer.save(1, 5)
-        assert not self.buffer.save(1, 6)
-        assert self.buffer.save(1, 7)
-        assert_equal(self.buffer.buffer[1], 7)
+        assert self.buffer.save(5, 7)
+        assert_equal(self.buffer.buffer[1], 3)
+        assert_equal(len(self.buffer), 5)
+
+    def test_save_max_bytes(self):
+        self.buffer.max_bytes = 100
+        self.buffer.SIZE_SAMPLE_INTERVAL = 1
+        assert not self.buffer.save(1, 'a')
+        assert not self.buffer.save(1, 'b' * 60)
+        assert_equal(self.buffer.key_sizes.keys(), [1])
+        assert self.buffer.save(2, 'c' * 60)
+        assert self.buffer.buffered_bytes > 120
+
+    @mock.patch('tron.serialize.runstate.statemanager.pickle', autospec=True)
+    def test_save_max_bytes_sampled(self, mock_pickle):
+        mock_pickle.dumps.return_value = 'x' * 10
+        self.buffer.max_bytes = 100
+        for _ in xrange(self.buffer.SIZE_SAMPLE_INTERVAL):
+            self.buffer.save(1, 'a')
+            list(self.buffer)
+        assert_equal(mock_pickle.dumps.call_count, 1)
+        self.buffer.save(1, 'a')
+        assert_equal(mock_pickle.dumps.call_count, 2)
+        assert_equal(self.buffer.buffered_bytes, 10)
 
     def test__iter__(self):
+        self.buffer.max_bytes = 100
         self.buffer.save(1, 2)
         self.buffer.save(2, 3)
         items = list(self.buffer)
         assert not self.buffer.buffer
+        assert_equal(self.buffer.buffered_bytes, 0)
         assert_equal(items, [(1,2), (2,3)])
 
 
+class JobStateJournalTestCase(TestCase):
+
+    @setup
+    def setup_journal(self):
+        self.journal = JobStateJournal(2)
+        self.job_runs = [
+            mock.Mock(run_num=i, state_data={'run_num': i, 'state': 'new'})
+            for i in xrange(3)]
+        self.job = mock.Mock(enabled=True, runs=self.job_runs,
+            state_data={'enabled': True, 'runs': []})
+        self.job.name = 'job_name'
+        self.job.pop_changed_runs.return_value = self.job_runs[:1]
+
+    def test_record_first_change_snapshot(self):
+        records = self.journal.record(self.job)
+        (job_type, snapshot), (journal_type, journal) = records
+        assert_equal(job_type, runstate.JOB_STATE)
+        assert_equal(journal_type, runstate.JOB_JOURNAL_STATE)
+        assert_equal(snapshot['snapshot_id'], journal['snapshot_id'])
+        assert_equal(journal['runs'], [])
+        assert_equal(journal['run_nums'], [0, 1, 2])
+
+    def test_record_changed_runs(self):
+        self.journal.snapshot(self.job)
+        records = self.journal.record(self.job)
+        assert_equal(len(records), 1)
+        journal_type, journal = records[0]
+        assert_equal(journal_type, runstate.JOB_JOURNAL_STATE)
+        assert_equal(journal['runs'], [self.job_runs[0].state_data])
+
+    def test_record_compacts(self):
+        self.journal.snapshot(self.job)
+        self.journal.record(self.job)
+        self.journal.record(self.job)
+        records = self.journal.record(self.job)
+        assert_equal(records[0][0], runstate.JOB_STATE)
+
+    def test_record_removed_runs(self):
+        self.journal.snapshot(self.job)
+        self.journal.record(self.job)
+        self.job.runs = self.job_runs[1:]
+        self.job.pop_changed_runs.return_value = []
+        _, journal = self.journal.record(self.job)[0]
+        assert_equal(journal['runs'], [])
+        assert_equal(journal['run_nums'], [1, 2])
+
+    def test_apply(self):
+        state_data = {'snapshot_id': 5, 'enabled': True, 'runs': [
+            {'run_num': 1, 'state': 'old'}, {'run_num': 0, 'state': 'old'}]}
+        journal_state = {'snapshot_id': 5, 'enabled': False,
+            'run_nums': [2, 1], 'runs': [{'run_num': 1, 'state': 'new'}]}
+        expected = {'enabled': False, 'runs': [{'run_num': 1, 'state': 'new'}]}
+        assert_equal(JobStateJournal.apply(state_data, journal_state), expected)
+
+    def test_apply_snapshot_mismatch(self):
+        state_data = {'enabled': True, 'runs': []}
+        journal_state = {'snapshot_id': 5, 'enabled': False,
+            'run_nums': [], 'runs': []}
+        assert_equal(JobStateJournal.apply(state_data, journal_state),
+            state_data)
+
+
 class PersistentStateManagerTestCase(TestCase):
 
     @setup
@@ -106,6 +195,71 @@ class PersistentStateManagerTestCase(TestCase):
         key = '%s%s' % (runstate.JOB_STATE, name)
         self.store.save.assert_called_with([(key, state_data)])
 
+    def test_save_job(self):
+        mock_job = mock.Mock()
+        self.manager.save_job(mock_job)
+        key = '%s%s' % (runstate.JOB_STATE, mock_job.name)
+        self.store.save.assert_called_with([(key, mock_job.state_data)])
+        mock_job.clear_changed_runs.assert_called_with()
+
+    def test_save_job_with_journal(self):
+        self.manager._journal = mock.create_autospec(JobStateJournal)
+        self.manager._journal.record.return_value = [
+            (runstate.JOB_JOURNAL_STATE, {'runs': []})]
+        mock_job = mock.Mock()
+        self.manager.save_job(mock_job)
+        key = '%s%s' % (runstate.JOB_JOURNAL_STATE, mock_job.name)
+        self.store.save.assert_called_with([(key, {'runs': []})])
+        assert not mock_job.clear_changed_runs.called
+
+    def test_restore_jobs(self):
+        names = ['namea']
+        snapshot = {'snapshot_id': 1, 'enabled': True, 'runs': []}
+        journal = {'snapshot_id': 1, 'enabled': False, 'run_nums': [],
+            'runs': []}
+        self.store.restore.side_effect = [
+            {'%snamea' % runstate.JOB_STATE: snapshot},
+            {'%snamea' % runstate.JOB_JOURNAL_STATE: journal}]
+        state_data = self.manager._restore_jobs(names)
+        assert_equal(state_data, {'namea': {'enabled': False, 'runs': []}})
+
+    def test_save_buffered_with_max_latency(self):
+        self.manager._buffer = StateSaveBuffer(2)
+        self.manager._flush_callback = mock.create_autospec(
+            eventloop.UniqueCallback)
+        self.manager.save(runstate.JOB_STATE, 'name', mock.Mock())
+        assert not self.store.save.mock_calls
+        self.manager._flush_callback.start.assert_called_with()
+
+        self.manager._flush_expired()
+        assert_equal(self.store.save.call_count, 1)
+        self.manager._flush_callback.cancel.assert_called_with()
+
+    def test_flush_expired_disabled(self):
+        self.manager.enabled = False
+        self.manager._buffer.save('key', 'data')
+        self.manager._flush_expired()
+        assert not self.store.save.mock_calls
+
+    def test_save_records_flush_stats(self):
+        self.manager.save(runstate.JOB_STATE, 'name', mock.Mock())
+        assert_equal(self.manager.flush_stats['flush_count'], 1)
+        assert_equal(self.manager.flush_stats['keys_flushed'], 1)
+        assert self.manager.flush_stats['last_duration'] is not None
+        assert 'bytes_flushed' not in self.manager.flush_stats
+
+    def test_save_records_flushed_bytes(self):
+        buffer = StateSaveBuffer(10, max_bytes=10)
+        self.manager = PersistentStateManager(self.store, buffer)
+        self.manager.save(runstate.JOB_STATE, 'name', {'state': 'x' * 20})
+        assert self.manager.flush_stats['bytes_flushed'] > 20
+
+    def test_get_flush_stats(self):
+        self.manager.save(runstate.JOB_STATE, 'name', mock.Mock())
+        stats = self.manager.get_flush_stats()
+        assert_equal(stats, self.manager.flush_stats)
+        assert stats is not self.manager.flush_stats
+
     def test_save_failed(self):
         self.store.save.side_effect = PersistenceStoreError("blah")
         assert_raises(PersistenceStoreError, self.manager.save, None, None, None)
@@ -146,6 +300,12 @@ class StateChangeWatcherTestCase(TestCase):
         self.state_manager = mock.create_autospec(PersistentStateManager)
         self.watcher.state_manager = self.state_manager
 
+    def test_get_flush_stats(self):
+        stats = self.watcher.get_flush_stats()
+        assert_equal(stats, self.state_manager.get_flush_stats.return_value)
+        self.watcher.state_manager = NullStateManager
+        assert_equal(self.watcher.get_flush_stats(), None)
+
     def test_update_from_config_no_change(self):
         self.watcher.config = state_config = mock.Mock()
         assert not self.watcher.update_from_config(state_config)
@@ -168,8 +328,8 @@ class StateChangeWatcherTestCase(TestCase):
     def test_save_job(self):
         mock_job = mock.Mock()
         self.watcher.save_job(mock_job)
-        self.watcher.state_manager.save.assert_called_with(
-            runstate.JOB_STATE, mock_job.name, mock_job.state_data)
+        self.watcher.state_manager.save_job.assert_called_with(
+            mock_job, snapshot=True)
 
     def test_save_service(self):
         mock_service = mock.Mock()
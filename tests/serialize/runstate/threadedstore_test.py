@@ -0,0 +1,96 @@
+import mock
+from testify import TestCase, run, setup, assert_equal, teardown
+from twisted.internet import defer
+
+from tron.serialize.runstate.threadedstore import ThreadedStateStore
+
+
+class ThreadedStateStoreTestCase(TestCase):
+
+    @setup
+    def setup_store(self):
+        self.store = mock.Mock()
+        self.threaded_store = ThreadedStateStore(self.store)
+        self.patcher = mock.patch(
+            'tron.serialize.runstate.threadedstore.threads', autospec=True)
+        self.mock_threads = self.patcher.start()
+        self.eventloop_patcher = mock.patch(
+            'tron.serialize.runstate.threadedstore.eventloop', autospec=True)
+        self.mock_eventloop = self.eventloop_patcher.start()
+
+    @teardown
+    def teardown_store(self):
+        self.patcher.stop()
+        self.eventloop_patcher.stop()
+        self.threaded_store.pool.stop()
+
+    def test_build_key(self):
+        key = self.threaded_store.build_key('type', 'iden')
+        assert_equal(key, self.store.build_key.return_value)
+
+    def test_save(self):
+        items = [('a', 1), ('b', 2)]
+        self.threaded_store.save(items)
+        defer_to_thread = self.mock_threads.deferToThreadPool
+        assert_equal(defer_to_thread.call_count, 1)
+        _, pool, func, key_value_pairs = defer_to_thread.call_args[0]
+        assert_equal(pool, self.threaded_store.pool)
+        assert_equal(sorted(key_value_pairs), items)
+        assert not self.threaded_store.pending
+
+    def test_save_in_flight(self):
+        self.threaded_store.save([('a', 1)])
+        self.threaded_store.save([('a', 2), ('b', 3)])
+        self.threaded_store.save([('a', 4)])
+        assert_equal(self.mock_threads.deferToThreadPool.call_count, 1)
+        assert_equal(self.threaded_store.pending, {'a': 4, 'b': 3})
+
+        self.threaded_store._handle_done(None)
+        assert_equal(self.mock_threads.deferToThreadPool.call_count, 2)
+        key_value_pairs = self.mock_threads.deferToThreadPool.call_args[0][3]
+        assert_equal(sorted(key_value_pairs), [('a', 4), ('b', 3)])
+
+    def test_save_error_retries(self):
+        deferreds = [defer.Deferred() for _ in xrange(3)]
+        self.mock_threads.deferToThreadPool.side_effect = deferreds
+        retry_call = self.mock_eventloop.call_later.return_value
+        self.threaded_store.save([('a', 1), ('b', 1)])
+        self.threaded_store.save([('a', 2)])
+
+        deferreds[0].errback(IOError("disk full"))
+        assert_equal(self.threaded_store.pending, {'a': 2, 'b': 1})
+        self.mock_eventloop.call_later.assert_called_with(
+            1, self.threaded_store._write_pending)
+        retry_call.active.return_value = True
+        self.threaded_store.save([('c', 3)])
+        assert_equal(self.mock_threads.deferToThreadPool.call_count, 1)
+
+        retry_call.active.return_value = False
+        self.threaded_store._write_pending()
+        deferreds[1].errback(IOError("disk full"))
+        self.mock_eventloop.call_later.assert_called_with(
+            2, self.threaded_store._write_pending)
+        assert_equal(self.threaded_store.pending, {'a': 2, 'b': 1, 'c': 3})
+
+        self.threaded_store._write_pending()
+        deferreds[2].callback(None)
+        assert_equal(self.threaded_store.retry_delay, 0)
+        assert not self.threaded_store.pending
+        assert not self.threaded_store.in_flight
+
+    def test_restore_with_pending(self):
+        self.threaded_store.save([('a', 1)])
+        self.threaded_store.save([('b', 2)])
+        self.store.restore.return_value = {'a': 1}
+        assert_equal(self.threaded_store.restore(['a', 'b']), {'a': 1, 'b': 2})
+
+    def test_cleanup(self):
+        self.threaded_store.save([('a', 1)])
+        self.threaded_store.save([('b', 2)])
+        self.threaded_store.cleanup()
+        self.store.save.assert_called_with([('b', 2)])
+        self.store.cleanup.assert_called_with()
+
+
+if __name__ == "__main__":
+    run()
@@ -3,7 +3,7 @@ import tempfile
 
 from testify import TestCase, run, setup, assert_equal, teardown
 import yaml
-from tron.serialize.runstate import yamlstore
+from tron.serialize.runstate import codec, yamlstore
 
 class YamlStateStoreTestCase(TestCase):
 
@@ -69,6 +69,16 @@ class YamlStateStoreTestCase(TestCase):
             actual = yaml.load(fh)
         assert_equal(actual, expected)
 
+    def test_save_and_restore_binary_codec(self):
+        self.store = yamlstore.YamlStateStore(self.filename, codec.PickleCodec)
+        key = yamlstore.YamlKey('one', 'five')
+        self.store.save([(key, {'a': 'b'})])
+
+        with open(self.filename, 'rb') as fh:
+            assert fh.read().startswith(codec.MAGIC)
+        store = yamlstore.YamlStateStore(self.filename)
+        assert_equal(store.restore([key]), {key: {'a': 'b'}})
+
 
 
 
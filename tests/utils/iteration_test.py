@@ -1,6 +1,6 @@
 from testify import TestCase, assert_equal, setup, run
 from tests.assertions import assert_raises
-from tron.utils.iteration import min_filter, max_filter, list_all
+from tron.utils.iteration import min_filter, max_filter, list_all, chunked
 
 class FilterFuncTestCase(TestCase):
 
@@ -61,5 +61,15 @@ class ListAllTestCase(TestCase):
         assert not list_all(seq)
         assert_raises(StopIteration, seq.next)
 
+
+class ChunkedTestCase(TestCase):
+
+    def test_chunked(self):
+        chunks = list(chunked(xrange(7), 3))
+        assert_equal(chunks, [[0, 1, 2], [3, 4, 5], [6]])
+
+    def test_chunked_empty(self):
+        assert_equal(list(chunked([], 3)), [])
+
 if __name__ == "__main__":
     run()
\ No newline at end of file
@@ -1,6 +1,7 @@
-from testify import run, setup, assert_equal, TestCase, turtle
+import mock
+from testify import run, setup, assert_equal, TestCase, turtle, teardown
 from tests.assertions import assert_length
-from tron.utils.observer import Observable, Observer
+from tron.utils.observer import Observable, Observer, NotificationBus
 
 
 class ObservableTestCase(TestCase):
@@ -30,6 +31,28 @@ class ObservableTestCase(TestCase):
         self.obs.notify('b')
         assert_equal(len(handler.handler.calls), 2)
 
+    def test_notify_caches_handlers(self):
+        first, second = mock.Mock(), mock.Mock()
+        self.obs.attach('a', first)
+        self.obs.notify('a')
+        assert_equal(self.obs._handlers, {'a': (first,)})
+        self.obs.attach(True, second)
+        self.obs.notify('a')
+        assert_equal(self.obs._handlers, {'a': (second, first)})
+        self.obs.remove_observer(first)
+        self.obs.notify('a')
+        assert_equal(first.handler.call_count, 2)
+        assert_equal(second.handler.call_count, 2)
+
+    def test_share_observers(self):
+        handler = mock.Mock()
+        other = Observable()
+        other.notify('a')
+        other.share_observers(self.obs)
+        self.obs.attach('a', handler)
+        other.notify('a')
+        handler.handler.assert_called_with(other, 'a')
+
 
 class ObserverClearTestCase(TestCase):
 
@@ -102,7 +125,72 @@ class ObserverTestCase(TestCase):
         assert_equal(handler.has_watched, 2)
 
 
+class NotificationBusTestCase(TestCase):
 
+    @setup
+    def setup_bus(self):
+        patcher = mock.patch('tron.utils.observer.eventloop', autospec=True)
+        self.mock_eventloop = patcher.start()
+        self.patcher = patcher
+        self.delayed_call = self.mock_eventloop.call_later.return_value
+        self.delayed_call.active.return_value = False
+        self.mock_eventloop.NullCallback.active.return_value = False
+        self.bus = NotificationBus.get_instance()
+        self.obs = Observable()
+        self.handler = mock.Mock()
+        self.obs.attach(True, self.handler)
+
+    @teardown
+    def teardown_bus(self):
+        self.patcher.stop()
+        NotificationBus.reset()
+
+    def test_get_instance(self):
+        assert_equal(NotificationBus.get_instance(), self.bus)
+
+    def test_notify_later(self):
+        self.obs.notify_later('a')
+        self.mock_eventloop.call_later.assert_called_with(0, self.bus.dispatch)
+        assert not self.handler.handler.called
+        self.bus.dispatch()
+        self.handler.handler.assert_called_with(self.obs, 'a')
+
+    def test_dispatch_coalesces(self):
+        other = Observable()
+        other.attach(True, self.handler)
+        for event in ['a', 'b', 'a', 'a']:
+            self.obs.notify_later(event)
+        other.notify_later('a')
+        self.bus.dispatch()
+        assert_equal(self.handler.handler.mock_calls, [
+            mock.call(self.obs, 'a'),
+            mock.call(self.obs, 'b'),
+            mock.call(other, 'a')])
+
+    def test_dispatch_error(self):
+        failing = Observable()
+        failing.attach(True, mock.Mock(**{'handler.side_effect': ValueError}))
+        failing.notify_later('a')
+        self.obs.notify_later('a')
+        self.bus.dispatch()
+        self.handler.handler.assert_called_with(self.obs, 'a')
+
+    def test_add_scheduled_once(self):
+        self.obs.notify_later('a')
+        self.delayed_call.active.return_value = True
+        self.obs.notify_later('b')
+        assert_equal(self.mock_eventloop.call_later.call_count, 1)
+
+    def test_flush(self):
+        self.handler.handler.side_effect = lambda obs, event: (
+            event == 'a' and obs.notify_later('b'))
+        self.obs.notify_later('a')
+        self.delayed_call.active.return_value = True
+        self.bus.flush()
+        self.delayed_call.cancel.assert_called_with()
+        assert_equal(self.handler.handler.mock_calls, [
+            mock.call(self.obs, 'a'), mock.call(self.obs, 'b')])
+        assert_equal(len(self.bus.pending), 0)
 
 
 if __name__ == "__main__":
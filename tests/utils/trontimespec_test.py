@@ -119,6 +119,48 @@ class TimeSpecificationTestCase(TestCase):
         time = time_spec.next_time(start_date, False)
         assert_equal(time, datetime.time(1, 20, 4))
 
+    def test_next_time_bisects_fields(self):
+        time_spec = trontimespec.TimeSpecification(
+                    minutes=[0, 59], hours=[3, 23], seconds=[10, 50])
+        start_date = datetime.datetime(2012, 3, 14, 3, 59, 50)
+        assert_equal(time_spec.next_time(start_date, True),
+            datetime.time(23, 0, 10))
+
+        start_date = datetime.datetime(2012, 3, 14, 3, 0, 10, 5)
+        assert_equal(time_spec.next_time(start_date, True),
+            datetime.time(3, 0, 50))
+
+    def test_get_match_never_matches(self):
+        time_spec = trontimespec.TimeSpecification(monthdays=[30], months=[2])
+        assert time_spec.get_match(datetime.datetime(2012, 3, 14)) is None
+
+    def test_get_match_leap_day(self):
+        self.time_spec = trontimespec.TimeSpecification(monthdays=[29], months=[2])
+        self._cmp((2013, 1, 1), (2016, 2, 29))
+
+    def test_get_days_cached(self):
+        time_spec = trontimespec.TimeSpecification(weekdays=[1,5])
+        days = time_spec.get_days(2012, 3)
+        assert_equal(days, [2, 5, 9, 12, 16, 19, 23, 26, 30])
+        assert time_spec.get_days(2012, 3) is days
+
+    def test_occurrences(self):
+        time_spec = trontimespec.TimeSpecification(
+                    hours=[1, 13], minutes=[0], seconds=[0])
+        start = datetime.datetime(2012, 3, 14, 2)
+        end = datetime.datetime(2012, 3, 15, 13)
+        expected = [
+            datetime.datetime(2012, 3, 14, 13),
+            datetime.datetime(2012, 3, 15, 1),
+            datetime.datetime(2012, 3, 15, 13),
+        ]
+        assert_equal(list(time_spec.occurrences(start, end)), expected)
+
+    def test_occurrences_never_matches(self):
+        time_spec = trontimespec.TimeSpecification(monthdays=[31], months=[4])
+        start = datetime.datetime(2012, 3, 14)
+        assert_equal(list(time_spec.occurrences(start)), [])
+
 
 if __name__ == "__main__":
     run()
\ No newline at end of file
@@ -43,9 +43,14 @@ class ActionCommand(object):
     STDOUT      = '.stdout'
     STDERR      = '.stderr'
 
-    def __init__(self, id, command, serializer=None):
+    # Nodes which order their run queue by priority admit lower values first
+    PRIORITY_HIGH   = 0
+    PRIORITY_NORMAL = 10
+
+    def __init__(self, id, command, serializer=None, priority=PRIORITY_NORMAL):
         self.id             = id
         self.command        = command
+        self.priority       = priority
         self.machine        = state.StateMachine(self.PENDING, delegate=self)
         self.exit_status    = None
         self.start_time     = None
@@ -190,7 +195,8 @@ class SubprocessActionRunnerFactory(object):
     def build_stop_action_command(self, id, command):
         command = self.build_command(id, command, self.status_exec_name)
         run_id = '%s.%s' % (id, command)
-        return ActionCommand(run_id, command, StringBufferStore())
+        return ActionCommand(run_id, command, StringBufferStore(),
+            priority=ActionCommand.PRIORITY_HIGH)
 
     def __eq__(self, other):
         return (self.__class__ == other.__class__ and
@@ -31,6 +31,18 @@ class ReprAdapter(object):
             (field_name, getattr(self, 'get_%s' % field_name))
             for field_name in self.translated_field_names)
 
+    def select_fields(self, field_names):
+        """Restrict the representation to field_names, so that the other
+        fields are not built. All fields are included if field_names is empty.
+        """
+        if not field_names:
+            return self
+        self.fields = [name for name in self.fields if name in field_names]
+        self.translators = dict((name, func)
+            for name, func in self.translators.iteritems()
+            if name in field_names)
+        return self
+
     def get_repr(self):
         repr_data = dict(
                 (field, getattr(self._obj, field)) for field in self.fields)
@@ -41,7 +53,9 @@ class ReprAdapter(object):
 
 
 def adapt_many(adapter_class, seq, *args, **kwargs):
-    return [adapter_class(item, *args, **kwargs).get_repr() for item in seq]
+    fields = kwargs.pop('fields', None)
+    return [adapter_class(item, *args, **kwargs).select_fields(fields).get_repr()
+            for item in seq]
 
 
 def toggle_flag(flag_name):
@@ -94,18 +108,26 @@ class ActionRunAdapter(RunAdapter):
             'requirements',
             'stdout',
             'stderr',
+            'stdout_offset',
+            'stderr_offset',
             'duration',
             'job_name',
             'run_num',
     ]
 
     def __init__(self, action_run, job_run=None,
-                 max_lines=10, include_stdout=False, include_stderr=False):
+                 max_lines=10, include_stdout=False, include_stderr=False,
+                 stdout_offset=None, stderr_offset=None):
         super(ActionRunAdapter, self).__init__(action_run)
         self.job_run            = job_run
         self.max_lines          = max_lines or None
         self.include_stdout     = include_stdout
         self.include_stderr     = include_stderr
+        self.offsets            = {
+            actioncommand.ActionCommand.STDOUT: stdout_offset,
+            actioncommand.ActionCommand.STDERR: stderr_offset,
+        }
+        self.output             = {}
 
     def get_raw_command(self):
         return self._obj.bare_command
@@ -122,15 +144,39 @@ class ActionRunAdapter(RunAdapter):
     def _get_serializer(self):
         return filehandler.OutputStreamSerializer(self._obj.output_path)
 
+    def _read_output(self, filename):
+        """Return a tuple of (lines, offset). The lines are those written to
+        the file since the requested offset, or the last max_lines lines if
+        there was no offset. The offset is the end of the returned lines.
+        """
+        if filename in self.output:
+            return self.output[filename]
+
+        serializer = self._get_serializer()
+        offset = self.offsets[filename]
+        if offset is not None:
+            output = serializer.read_since(filename, offset)
+        else:
+            end_offset = serializer.size(filename)
+            output = serializer.tail(filename, self.max_lines), end_offset
+        self.output[filename] = output
+        return output
+
     @toggle_flag('include_stdout')
     def get_stdout(self):
-        filename = actioncommand.ActionCommand.STDOUT
-        return self._get_serializer().tail(filename, self.max_lines)
+        return self._read_output(actioncommand.ActionCommand.STDOUT)[0]
 
     @toggle_flag('include_stderr')
     def get_stderr(self):
-        filename = actioncommand.ActionCommand.STDERR
-        return self._get_serializer().tail(filename, self.max_lines)
+        return self._read_output(actioncommand.ActionCommand.STDERR)[0]
+
+    @toggle_flag('include_stdout')
+    def get_stdout_offset(self):
+        return self._read_output(actioncommand.ActionCommand.STDOUT)[1]
+
+    @toggle_flag('include_stderr')
+    def get_stderr_offset(self):
+        return self._read_output(actioncommand.ActionCommand.STDERR)[1]
 
     def get_job_name(self):
         return self._obj.job_run_id.rsplit('.', 1)[-2]
@@ -361,8 +407,8 @@ class ServiceAdapter(ReprAdapter):
 
     @toggle_flag('include_events')
     def get_events(self):
-        events = adapt_many(EventAdapter, self._obj.event_recorder.list())
-        return events[:self.include_events]
+        events = self._obj.event_recorder.list(limit=self.include_events)
+        return adapt_many(EventAdapter, events)
 
 
 class ServiceInstanceAdapter(ReprAdapter):
@@ -379,7 +425,7 @@ class ServiceInstanceAdapter(ReprAdapter):
 
 class EventAdapter(ReprAdapter):
 
-    field_names = ['name', 'entity', 'time']
+    field_names = ['name', 'entity', 'time', 'seq']
     translated_field_names = ['level']
 
     def get_level(self):
@@ -388,13 +434,28 @@ class EventAdapter(ReprAdapter):
 
 class NodeAdapter(ReprAdapter):
     field_names = ['name', 'hostname', 'username', 'port']
+    translated_field_names = ['run_queue']
+
+    def __init__(self, node, include_run_queue=False):
+        super(NodeAdapter, self).__init__(node)
+        self.include_run_queue = include_run_queue
+
+    @toggle_flag('include_run_queue')
+    def get_run_queue(self):
+        return self._obj.get_run_queue_stats()
 
 
 class NodePoolAdapter(ReprAdapter):
-    translated_field_names = ['name', 'nodes']
+    translated_field_names = ['name', 'nodes', 'strategy', 'placements']
 
     def get_name(self):
         return self._obj.get_name()
 
+    def get_strategy(self):
+        return self._obj.get_strategy_name()
+
+    def get_placements(self):
+        return self._obj.get_placements()
+
     def get_nodes(self):
         return adapt_many(NodeAdapter, self._obj.get_nodes())
@@ -0,0 +1,76 @@
+"""
+ Cache the representations of Jobs built by the api, so that a request only
+ adapts the jobs which changed since the previous request.
+
+ A Job increases its version whenever it or one of its runs changes. A cached
+ representation is used until the version of its job changes. The version
+ of a collection of jobs is used as the ETag of the collection.
+"""
+import time
+
+from tron.api import adapter
+
+
+def has_active_runs(job):
+    return any(job.runs.get_active())
+
+
+def get_job_version(job, include_job_runs):
+    """Return the version of the representation of a job, or None if it can
+    not be cached. The representation of an active run includes a duration
+    which changes with time, so it is not cached.
+    """
+    if include_job_runs and has_active_runs(job):
+        return None
+    return job.version
+
+
+def build_etag(jobs, include_job_runs=False, include_action_runs=False):
+    """Return an ETag for the representation of jobs. The ETag changes when a
+    job changes (its version increases), or when a job is added or removed.
+    When the representation of any job can not be cached, the ETag also
+    changes every second.
+    """
+    versions = [job.version for job in jobs]
+    parts = [max(versions or [0]), len(versions),
+             int(include_job_runs), int(include_action_runs)]
+    if include_job_runs and any(has_active_runs(job) for job in jobs):
+        parts.append(int(time.time()))
+    return '"%s"' % '-'.join(str(part) for part in parts)
+
+
+class JobReprCache(object):
+    """Cache JobAdapter representations by job name, and the arguments they
+    were built with.
+    """
+
+    def __init__(self):
+        self.entries = {}
+
+    def get_repr(self, job, include_job_runs=False, include_action_runs=False,
+            num_runs=None, fields=None):
+        version = get_job_version(job, include_job_runs)
+        fields = tuple(fields or ())
+        key = include_job_runs, include_action_runs, num_runs, fields
+        entries = self.entries.setdefault(job.get_name(), {})
+        cached = entries.get(key)
+        if version is not None and cached and cached[0] == version:
+            return cached[1]
+
+        job_adapter = adapter.JobAdapter(job, include_job_runs,
+            include_action_runs, num_runs=num_runs)
+        job_repr = job_adapter.select_fields(fields).get_repr()
+        entries[key] = version, job_repr
+        return job_repr
+
+    def get_reprs(self, jobs, *args, **kwargs):
+        reprs = [self.get_repr(job, *args, **kwargs) for job in jobs]
+        if len(self.entries) > len(jobs):
+            self.prune(job.get_name() for job in jobs)
+        return reprs
+
+    def prune(self, names):
+        """Remove the entries for jobs which are not in names."""
+        names = set(names)
+        for name in set(self.entries) - names:
+            del self.entries[name]
@@ -113,6 +113,19 @@ class JobController(object):
         raise UnknownCommandError("Unknown command %s" % command)
 
 
+class BackfillController(object):
+
+    def __init__(self, backfill):
+        self.backfill = backfill
+
+    def handle_command(self, command):
+        if command == 'cancel':
+            self.backfill.cancel()
+            return "%s cancelled" % self.backfill
+
+        raise UnknownCommandError("Unknown command %s" % command)
+
+
 class ServiceInstanceController(object):
 
     def __init__(self, service_instance):
@@ -221,5 +234,8 @@ class ConfigController(object):
             log.error("Configuration update failed: %s" % e)
             return str(e)
 
+    def get_config_diff(self):
+        return self.mcp.get_config_diff()
+
     def get_namespaces(self):
         return self.config_manager.get_namespaces()
@@ -26,6 +26,16 @@ def get_string(request, key):
     return request.args[key][0]
 
 
+def get_list(request, key):
+    """Returns the comma separated values of the first value in the request
+    args for a given key, or None.
+    """
+    value = get_string(request, key)
+    if not value:
+        return None
+    return [item for item in value.split(',') if item]
+
+
 def get_bool(request, key):
     """Returns True if the key exists and is truthy in the request args."""
     return bool(get_integer(request, key))
@@ -14,9 +14,12 @@ except ImportError:
 
 from twisted.web import http, resource, static, server
 
-from tron import event
-from tron.api import adapter, controller
-from tron.api import requestargs
+from tron import actioncommand, changefeed, event, eventloop, node
+from tron.api import adapter, cache, controller
+from tron.api import requestargs, stream
+from tron.core import backfill, runtimer
+from tron.serialize import filehandler
+from tron.utils import timeutils
 
 
 log = logging.getLogger(__name__)
@@ -66,9 +69,93 @@ def resource_from_collection(collection, name, child_resource):
     return child_resource(item)
 
 
-class ActionRunResource(resource.Resource):
+def paginate(items, key, cursor=None, limit=None, reverse=False):
+    """Sort items by key, and return a tuple of up to limit items which sort
+    after cursor, and the cursor of the next page (None on the last page).
+    """
+    items = sorted(items, key=key, reverse=reverse)
+    if cursor is not None:
+        if reverse:
+            items = [item for item in items if key(item) < cursor]
+        else:
+            items = [item for item in items if key(item) > cursor]
+    if not limit or len(items) <= limit:
+        return items, None
+    items = items[:limit]
+    return items, key(items[-1])
+
+
+def get_time_range(request):
+    return (requestargs.get_datetime(request, 'since') or None,
+            requestargs.get_datetime(request, 'until') or None)
+
+
+def in_time_range(value, time_range):
+    since, until = time_range
+    if not since and not until:
+        return True
+    if value is None:
+        return False
+    return (not since or value >= since) and (not until or value <= until)
+
+
+def is_on_node(node_pool, node_name):
+    if node_pool.get_name() == node_name:
+        return True
+    return any(n.get_name() == node_name for n in node_pool.get_nodes())
+
+
+def build_job_filter(request):
+    """Return a function which matches jobs by the namespace, name_prefix,
+    state (a list of job statuses), node (a node or node pool name), and
+    since/until (the run time of any of their runs) request args.
+    """
+    namespace   = requestargs.get_string(request, 'namespace')
+    prefix      = requestargs.get_string(request, 'name_prefix')
+    states      = requestargs.get_list(request, 'state')
+    node_name   = requestargs.get_string(request, 'node')
+    time_range  = get_time_range(request)
+
+    def matches(job):
+        name = job.get_name()
+        if namespace and changefeed.get_namespace(name) != namespace:
+            return False
+        if prefix and not name.startswith(prefix):
+            return False
+        if node_name and not is_on_node(job.node_pool, node_name):
+            return False
+        if any(time_range) and not any(
+                in_time_range(run.run_time, time_range) for run in job.runs):
+            return False
+        if states and job.status not in states:
+            return False
+        return True
+    return matches
+
+
+def build_action_run_filter(request):
+    """Return a function which matches action runs by the state (a list of
+    state names), node, and since/until (their start time) request args.
+    """
+    states      = requestargs.get_list(request, 'state')
+    node_name   = requestargs.get_string(request, 'node')
+    time_range  = get_time_range(request)
 
-    isLeaf = True
+    def matches(action_run):
+        if states and action_run.state.name not in states:
+            return False
+        if node_name and (not action_run.node or
+                          action_run.node.get_name() != node_name):
+            return False
+        return in_time_range(action_run.start_time, time_range)
+    return matches
+
+
+def get_run_num(action_run):
+    return int(action_run.job_run_id.rsplit('.', 1)[1])
+
+
+class ActionRunResource(resource.Resource):
 
     def __init__(self, action_run, job_run):
         resource.Resource.__init__(self)
@@ -76,19 +163,57 @@ class ActionRunResource(resource.Resource):
         self.job_run    = job_run
         self.controller = controller.ActionRunController(action_run, job_run)
 
+    def getChild(self, name, _):
+        if not name:
+            return self
+        if name == 'stream':
+            return ActionRunStreamResource(self.action_run)
+        return resource.NoResource("Cannot find child %s" % name)
+
     def render_GET(self, request):
         run_adapter = adapter.ActionRunAdapter(
             self.action_run,
             self.job_run,
             requestargs.get_integer(request, 'num_lines'),
             include_stdout=requestargs.get_bool(request, 'include_stdout'),
-            include_stderr=requestargs.get_bool(request, 'include_stderr'))
+            include_stderr=requestargs.get_bool(request, 'include_stderr'),
+            stdout_offset=requestargs.get_integer(request, 'stdout_offset'),
+            stderr_offset=requestargs.get_integer(request, 'stderr_offset'))
         return respond(request, run_adapter.get_repr())
 
     def render_POST(self, request):
         return handle_command(request, self.controller, self.action_run)
 
 
+class ActionRunStreamResource(resource.Resource):
+    """Stream the stdout and stderr of an action run as server-sent events
+    until the action run is done. Streams start from the stdout_offset and
+    stderr_offset request args, or from the current end of the output.
+    """
+
+    isLeaf = True
+
+    def __init__(self, action_run):
+        resource.Resource.__init__(self)
+        self.action_run = action_run
+
+    def render_GET(self, request):
+        serializer = filehandler.OutputStreamSerializer(
+            self.action_run.output_path)
+        offsets = {}
+        for filename in (actioncommand.ActionCommand.STDOUT,
+                         actioncommand.ActionCommand.STDERR):
+            arg_name = '%s_offset' % filename.lstrip('.')
+            offset = requestargs.get_integer(request, arg_name)
+            if offset is None:
+                offset = serializer.size(filename)
+            offsets[filename] = offset
+
+        stream.OutputStream(
+            request, self.action_run, serializer, offsets).start()
+        return server.NOT_DONE_YET
+
+
 class JobRunResource(resource.Resource):
 
     def __init__(self, job_run, job_scheduler):
@@ -147,6 +272,10 @@ class JobResource(resource.Resource):
             return self
         if run_id == '_events':
             return EventResource(self.job_scheduler.get_name())
+        if run_id == '_schedule':
+            return JobScheduleResource(self.job_scheduler)
+        if run_id == '_backfill':
+            return JobBackfillResource(self.job_scheduler)
 
         run = self.get_run_from_identifier(run_id)
         if run:
@@ -180,7 +309,86 @@ class JobResource(resource.Resource):
             run_time=run_time)
 
 
+class JobScheduleResource(resource.Resource):
+    """Preview the times a job is scheduled to run from start_time (defaults
+    to now) up to and including end_time (defaults to a day after
+    start_time). At most `limit` run times are returned.
+    """
+
+    isLeaf = True
+
+    DEFAULT_LIMIT = 100
+    DEFAULT_WINDOW = datetime.timedelta(days=1)
+
+    def __init__(self, job_scheduler):
+        resource.Resource.__init__(self)
+        self.job_scheduler = job_scheduler
+
+    def render_GET(self, request):
+        start_time = requestargs.get_datetime(request, 'start_time')
+        end_time = requestargs.get_datetime(request, 'end_time')
+        if start_time is None or end_time is None:
+            msg = ("start_time and end_time must be formatted as %s" %
+                   requestargs.DATE_FORMAT)
+            return respond(request, {'error': msg}, code=http.BAD_REQUEST)
+
+        start_time = start_time or timeutils.current_time()
+        end_time = end_time or start_time + self.DEFAULT_WINDOW
+        limit = requestargs.get_integer(request, 'limit') or self.DEFAULT_LIMIT
+        limit = min(limit, backfill.MAX_RUNS)
+
+        job = self.job_scheduler.get_job()
+        try:
+            run_times = backfill.get_run_times(
+                job, start_time, end_time, limit + 1)
+        except backfill.BackfillError, e:
+            return respond(request, {'error': str(e)}, code=http.BAD_REQUEST)
+
+        response = {
+            'job_name':     job.get_name(),
+            'run_times':    run_times[:limit],
+            'truncated':    len(run_times) > limit,
+        }
+        return respond(request, response)
+
+
+class JobBackfillResource(resource.Resource):
+    """Create a backfill of the runs a job is scheduled to run from
+    start_time up to and including end_time. At most max_concurrency runs
+    of the backfill are active at once.
+    """
+
+    isLeaf = True
+
+    def __init__(self, job_scheduler):
+        resource.Resource.__init__(self)
+        self.job_scheduler = job_scheduler
+
+    def render_POST(self, request):
+        start_time = requestargs.get_datetime(request, 'start_time')
+        end_time = requestargs.get_datetime(request, 'end_time')
+        if not start_time or not end_time:
+            msg = "start_time and end_time are required (%s)"
+            response = {'error': msg % requestargs.DATE_FORMAT}
+            return respond(request, response, code=http.BAD_REQUEST)
+
+        max_concurrency = (requestargs.get_integer(request, 'max_concurrency')
+                           or backfill.DEFAULT_MAX_CONCURRENCY)
+        manager = backfill.BackfillManager.get_instance()
+        try:
+            job_backfill = manager.create(
+                self.job_scheduler, start_time, end_time, max_concurrency)
+        except backfill.BackfillError, e:
+            return respond(request, {'error': str(e)}, code=http.BAD_REQUEST)
+        return respond(request, job_backfill.get_status())
+
+
 class ActionRunHistoryResource(resource.Resource):
+    """The runs of an action, newest first. Supports the filters of
+    build_action_run_filter(), and pagination by limit and cursor (a run
+    number). The cursor of the next page is sent as the X-Next-Cursor
+    header.
+    """
 
     isLeaf = True
 
@@ -189,15 +397,37 @@ class ActionRunHistoryResource(resource.Resource):
         self.action_runs = action_runs
 
     def render_GET(self, request):
-        return respond(request,
-            adapter.adapt_many(adapter.ActionRunAdapter, self.action_runs))
+        action_runs = filter(build_action_run_filter(request), self.action_runs)
+        cursor = requestargs.get_integer(request, 'cursor')
+        limit = requestargs.get_integer(request, 'limit')
+        headers = {}
+        if cursor is not None or limit:
+            action_runs, next_cursor = paginate(
+                action_runs, get_run_num, cursor, limit, reverse=True)
+            if next_cursor is not None:
+                headers['X-Next-Cursor'] = str(next_cursor)
+
+        fields = requestargs.get_list(request, 'fields')
+        response = adapter.adapt_many(
+            adapter.ActionRunAdapter, action_runs, fields=fields)
+        return respond(request, response, headers=headers)
 
 
 class JobCollectionResource(resource.Resource):
+    """The jobs, sorted by name. Supports the filters of build_job_filter(),
+    pagination by limit and cursor (the name of the last job on the previous
+    page), num_runs, and fields to select the fields of each job.
+    """
+
+    DEFAULT_NUM_RUNS    = 5
+    MAX_RENDERED        = 32
 
     def __init__(self, job_collection):
         self.job_collection = job_collection
         self.controller     = controller.JobCollectionController(job_collection)
+        self.repr_cache     = cache.JobReprCache()
+        self.rendered       = {}
+        self.job_index      = None, None
         resource.Resource.__init__(self)
 
     def getChild(self, name, request):
@@ -205,23 +435,55 @@ class JobCollectionResource(resource.Resource):
             return self
         return resource_from_collection(self.job_collection, name, JobResource)
 
-    def get_data(self, include_job_run=False, include_action_runs=False):
-        return adapter.adapt_many(adapter.JobAdapter,
-            self.job_collection.get_jobs(),
-            include_job_run,
-            include_action_runs,
-            num_runs=5)
+    def get_data(self, include_job_run=False, include_action_runs=False,
+            jobs=None, num_runs=DEFAULT_NUM_RUNS, fields=None):
+        if jobs is None:
+            jobs = self.job_collection.get_jobs()
+        return self.repr_cache.get_reprs(jobs, include_job_run,
+            include_action_runs, num_runs=num_runs, fields=fields)
 
     def get_job_index(self):
-        jobs = adapter.adapt_many(
-            adapter.JobIndexAdapter, self.job_collection.get_jobs())
-        return dict((job['name'], job['actions']) for job in jobs)
+        jobs = self.job_collection.get_jobs()
+        etag = cache.build_etag(jobs)
+        if self.job_index[0] != etag:
+            index = adapter.adapt_many(adapter.JobIndexAdapter, jobs)
+            index = dict((job['name'], job['actions']) for job in index)
+            self.job_index = etag, index
+        return self.job_index[1]
 
     def render_GET(self, request):
+        """Respond with the jobs, or 304 Not Modified when the client has the
+        current representation. Only jobs which changed since the previous
+        request are adapted, and the response is re-used until a job changes.
+        """
         include_job_runs = requestargs.get_bool(request, 'include_job_runs')
         include_action_runs = requestargs.get_bool(request, 'include_action_runs')
-        output = dict(jobs=self.get_data(include_job_runs, include_action_runs))
-        return respond(request, output)
+        jobs = filter(build_job_filter(request), self.job_collection.get_jobs())
+        etag = cache.build_etag(jobs, include_job_runs, include_action_runs)
+        if request.setETag(etag) == http.CACHED:
+            return ""
+
+        key = tuple(sorted((name, tuple(values))
+            for name, values in (request.args or {}).iteritems()))
+        rendered_etag, body = self.rendered.get(key, (None, None))
+        if rendered_etag == etag:
+            request.setHeader('content-type', 'text/json')
+            return body
+
+        num_runs = requestargs.get_integer(request, 'num_runs')
+        if num_runs is None:
+            num_runs = self.DEFAULT_NUM_RUNS
+        jobs, next_cursor = paginate(jobs, lambda job: job.get_name(),
+            requestargs.get_string(request, 'cursor'),
+            requestargs.get_integer(request, 'limit'))
+        jobs = self.get_data(include_job_runs, include_action_runs, jobs,
+            num_runs, requestargs.get_list(request, 'fields'))
+        body = respond(request, dict(jobs=jobs, next_cursor=next_cursor))
+
+        if len(self.rendered) >= self.MAX_RENDERED:
+            self.rendered.clear()
+        self.rendered[key] = etag, body
+        return body
 
     def render_POST(self, request):
         return handle_command(request, self.controller, self.job_collection)
@@ -325,6 +587,8 @@ class ConfigResource(resource.Resource):
         error = self.controller.update_config(name, config_content, config_hash)
         if error:
             response['error'] = error
+        else:
+            response['diff'] = self.controller.get_config_diff()
         return respond(request, response)
 
 
@@ -337,23 +601,248 @@ class StatusResource(resource.Resource):
         resource.Resource.__init__(self)
 
     def render_GET(self, request):
-        return respond(request, {'status': "I'm alive."})
+        state_watcher = self._master_control.get_state_watcher()
+        response = {
+            'status':           "I'm alive.",
+            'state_flushes':    state_watcher.get_flush_stats(),
+        }
+        return respond(request, response)
 
 
 class EventResource(resource.Resource):
+    """List the events of an entity and its children, most recent first.
+    Events are filtered by the request args entity (the name of a child,
+    relative to this entity), min_level, since and limit. The request arg
+    before is the sequence number to page back from.
+    """
 
     isLeaf = True
 
+    DEFAULT_LIMIT = 1000
+
     def __init__(self, entity_name):
         resource.Resource.__init__(self)
         self.entity_name = entity_name
 
     def render_GET(self, request):
-        recorder      = event.get_recorder(self.entity_name)
-        response_data = adapter.adapt_many(adapter.EventAdapter, recorder.list())
+        entity = requestargs.get_string(request, 'entity')
+        entity_name = event.NAME_CHARACTER.join(
+            name for name in (self.entity_name, entity) if name)
+
+        min_level = requestargs.get_string(request, 'min_level')
+        if min_level:
+            min_level = event.get_level(min_level)
+            if not min_level:
+                labels = ', '.join(level.label for level in event.LEVELS)
+                response = {'error': "min_level must be one of %s" % labels}
+                return respond(request, response, code=http.BAD_REQUEST)
+
+        since = requestargs.get_datetime(request, 'since')
+        if since is None:
+            msg = "since must be formatted as %s" % requestargs.DATE_FORMAT
+            return respond(request, {'error': msg}, code=http.BAD_REQUEST)
+
+        limit = requestargs.get_integer(request, 'limit')
+        recorder      = event.get_recorder(entity_name)
+        events        = recorder.list(min_level=min_level or None,
+                            since=since or None,
+                            limit=self.DEFAULT_LIMIT if limit is None else limit,
+                            before=requestargs.get_integer(request, 'before'))
+        response_data = adapter.adapt_many(adapter.EventAdapter, events)
         return respond(request, dict(data=response_data))
 
 
+class NodeCollectionResource(resource.Resource):
+
+    isLeaf = True
+
+    def __init__(self, node_pool_repo):
+        self.node_pool_repo = node_pool_repo
+        resource.Resource.__init__(self)
+
+    def render_GET(self, request):
+        nodes = sorted(self.node_pool_repo.nodes.itervalues(),
+            key=lambda n: n.get_name())
+        response_data = adapter.adapt_many(
+            adapter.NodeAdapter, nodes, include_run_queue=True)
+        return respond(request, dict(nodes=response_data))
+
+
+class BackfillResource(resource.Resource):
+
+    isLeaf = True
+
+    def __init__(self, job_backfill):
+        resource.Resource.__init__(self)
+        self.backfill = job_backfill
+        self.controller = controller.BackfillController(job_backfill)
+
+    def render_GET(self, request):
+        return respond(request, self.backfill.get_status())
+
+    def render_POST(self, request):
+        return handle_command(request, self.controller, self.backfill)
+
+
+class BackfillCollectionResource(resource.Resource):
+    """The progress of recent backfills."""
+
+    def __init__(self, backfill_manager):
+        resource.Resource.__init__(self)
+        self.backfill_manager = backfill_manager
+
+    def getChild(self, backfill_id, _):
+        if not backfill_id:
+            return self
+        if backfill_id.isdigit():
+            job_backfill = self.backfill_manager.get(int(backfill_id))
+            if job_backfill:
+                return BackfillResource(job_backfill)
+        return resource.NoResource("Cannot find backfill %s" % backfill_id)
+
+    def render_GET(self, request):
+        backfills = self.backfill_manager.get_all()
+        response_data = [job_backfill.get_status() for job_backfill in backfills]
+        return respond(request, dict(backfills=response_data))
+
+
+class UpcomingRunsResource(resource.Resource):
+    """The next `num_runs` scheduled runs across all jobs, ordered by their
+    run time.
+    """
+
+    isLeaf = True
+
+    DEFAULT_NUM_RUNS = 20
+
+    def __init__(self, run_timer):
+        self.run_timer = run_timer
+        resource.Resource.__init__(self)
+
+    def render_GET(self, request):
+        num_runs = requestargs.get_integer(request, 'num_runs')
+        job_runs = self.run_timer.get_upcoming(num_runs or self.DEFAULT_NUM_RUNS)
+        response_data = adapter.adapt_many(adapter.JobRunAdapter, job_runs)
+        return respond(request, dict(runs=response_data))
+
+
+def get_changes(change_feed, since, matches):
+    seq = change_feed.seq
+    changes, is_complete = change_feed.get_changes(since, matches)
+    return dict(seq=seq, changes=changes, reset=not is_complete)
+
+
+def build_change_filter(request):
+    return changefeed.build_filter(
+        requestargs.get_string(request, 'name'),
+        requestargs.get_string(request, 'namespace'))
+
+
+class ChangeWaiter(object):
+    """Hold a request until there is a change which matches, or until the
+    timeout, and respond with the changes after since.
+    """
+
+    def __init__(self, request, change_feed, since, matches, timeout):
+        self.request        = request
+        self.change_feed    = change_feed
+        self.since          = since
+        self.matches        = matches
+        self.timeout        = timeout
+        self.delayed_call   = None
+        self.stopped        = False
+
+    def start(self):
+        self.change_feed.subscribe(self.handle_change)
+        self.delayed_call = eventloop.call_later(self.timeout, self.finish)
+        self.request.notifyFinish().addBoth(self._stop)
+
+    def handle_change(self, change):
+        if self.matches(change):
+            self.finish()
+
+    def finish(self):
+        if self.stopped:
+            return
+        self._stop()
+        response = get_changes(self.change_feed, self.since, self.matches)
+        self.request.write(respond(self.request, response))
+        self.request.finish()
+
+    def _stop(self, _result=None):
+        if self.stopped:
+            return
+        self.stopped = True
+        self.change_feed.unsubscribe(self.handle_change)
+        if self.delayed_call.active():
+            self.delayed_call.cancel()
+
+
+class ChangeFeedResource(resource.Resource):
+    """Respond with the state changes after the `since` sequence number,
+    which match the optional `name` (of a job or service) and `namespace`.
+    When there are no changes the request waits up to `timeout` seconds for
+    one. `reset` is true when the changes after since are no longer
+    available, and the client should re-fetch its state.
+    """
+
+    DEFAULT_TIMEOUT     = 30
+    MAX_TIMEOUT         = 300
+
+    def __init__(self, change_feed):
+        resource.Resource.__init__(self)
+        self.change_feed = change_feed
+
+    def getChild(self, name, _):
+        if not name:
+            return self
+        if name == 'stream':
+            return ChangeStreamResource(self.change_feed)
+        return resource.NoResource("Cannot find child %s" % name)
+
+    def render_GET(self, request):
+        since = requestargs.get_integer(request, 'since')
+        if since is None:
+            since = self.change_feed.seq
+        timeout = requestargs.get_integer(request, 'timeout')
+        if timeout is None:
+            timeout = self.DEFAULT_TIMEOUT
+        matches = build_change_filter(request)
+
+        response = get_changes(self.change_feed, since, matches)
+        if response['changes'] or response['reset'] or not timeout:
+            return respond(request, response)
+
+        timeout = min(timeout, self.MAX_TIMEOUT)
+        ChangeWaiter(request, self.change_feed, since, matches, timeout).start()
+        return server.NOT_DONE_YET
+
+
+class ChangeStreamResource(resource.Resource):
+    """Stream state changes as server-sent events. The stream starts after
+    the `since` sequence number, or the Last-Event-ID of a reconnecting
+    client, or from the current change.
+    """
+
+    isLeaf = True
+
+    def __init__(self, change_feed):
+        resource.Resource.__init__(self)
+        self.change_feed = change_feed
+
+    def render_GET(self, request):
+        since = requestargs.get_integer(request, 'since')
+        last_event_id = request.getHeader('last-event-id')
+        if since is None and last_event_id and last_event_id.isdigit():
+            since = int(last_event_id)
+        if since is None:
+            since = self.change_feed.seq
+
+        stream.ChangeStream(request, self.change_feed, since,
+            build_change_filter(request)).start()
+        return server.NOT_DONE_YET
+
+
 class ApiRootResource(resource.Resource):
 
     def __init__(self, mcp):
@@ -368,6 +857,13 @@ class ApiRootResource(resource.Resource):
         self.putChild('config',   ConfigResource(mcp))
         self.putChild('status',   StatusResource(mcp))
         self.putChild('events',   EventResource(''))
+        self.putChild('changes',  ChangeFeedResource(mcp.get_change_feed()))
+        self.putChild('upcoming',
+            UpcomingRunsResource(runtimer.RunTimer.get_instance()))
+        self.putChild('backfills',
+            BackfillCollectionResource(backfill.BackfillManager.get_instance()))
+        self.putChild('nodes',
+            NodeCollectionResource(node.NodePoolRepository.get_instance()))
         self.putChild('', self)
 
     def render_GET(self, request):
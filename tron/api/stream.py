@@ -0,0 +1,264 @@
+"""
+ Stream action run output and state changes to api clients as server-sent
+ events.
+
+ An OutputStream is notified by the FileHandleManager when output is
+ written to the stdout or stderr file of an action run, and writes it to the
+ request. When the client can not keep up, Twisted pauses the stream. A
+ paused stream stops writing output, and reads the output it missed from the
+ files when it is resumed.
+
+ A ChangeStream writes the changes from a ChangeFeed. A paused ChangeStream
+ catches up from the history of the ChangeFeed when it is resumed.
+"""
+import logging
+
+try:
+    import simplejson as json
+    _silence_pyflakes = [json]
+except ImportError:
+    import json
+
+from twisted.internet import interfaces
+from zope.interface import implements
+
+from tron.serialize import filehandler
+from tron.utils import observer
+
+
+log = logging.getLogger(__name__)
+
+
+def split_partial_char(content):
+    """Split UTF-8 encoded content into the bytes of its complete
+    characters, and the bytes of a character which is cut off at the end.
+    """
+    for i in xrange(1, min(4, len(content)) + 1):
+        byte = ord(content[-i])
+        if byte & 0xC0 == 0x80:
+            # Continuation byte, keep looking for the lead byte
+            continue
+        if byte >= 0xF8:
+            length = 1
+        elif byte >= 0xF0:
+            length = 4
+        elif byte >= 0xE0:
+            length = 3
+        elif byte >= 0xC0:
+            length = 2
+        else:
+            length = 1
+        if length > i:
+            return content[:-i], content[-i:]
+        break
+    return content, ''
+
+
+def decode_output(content):
+    """Decode output bytes so they can be JSON encoded. Bytes which are not
+    valid UTF-8 are replaced.
+    """
+    return content.decode('utf-8', 'replace')
+
+
+def format_event(event_name, data, event_id=None):
+    """Format a server-sent event with JSON encoded data."""
+    id_line = "id: %s\n" % event_id if event_id is not None else ""
+    return "%sevent: %s\ndata: %s\n\n" % (
+        id_line, event_name, json.dumps(data))
+
+
+class OutputStream(observer.Observer):
+    """Write the output of an action run to a request until the action run
+    is done. offsets is a dict of output filename to the byte offset to
+    start streaming from.
+
+    Output is sent as text. A character which is split between two writes
+    is held back until the rest of it is written.
+    """
+    implements(interfaces.IPushProducer)
+
+    def __init__(self, request, action_run, serializer, offsets):
+        self.request        = request
+        self.action_run     = action_run
+        self.serializer     = serializer
+        self.offsets        = offsets
+        self.paths          = dict(
+            (serializer.full_path(filename), filename) for filename in offsets)
+        self.behind         = set(offsets)
+        self.partial        = {}
+        self.paused         = False
+        self.finishing      = False
+        self.stopped        = False
+
+    def start(self):
+        self.request.setHeader('content-type', 'text/event-stream')
+        self.request.setHeader('cache-control', 'no-cache')
+        self.request.registerProducer(self, True)
+        self.request.notifyFinish().addBoth(self._client_closed)
+
+        manager = filehandler.FileHandleManager.get_instance()
+        for path in self.paths:
+            manager.subscribe(path, self.handle_write)
+
+        if self.action_run.is_done:
+            self.finish()
+            return
+
+        self.watch(self.action_run)
+        self._catch_up()
+
+    def handle_write(self, path, content):
+        """Called by the FileHandleManager when content is written."""
+        filename = self.paths[path]
+        if self.paused or filename in self.behind:
+            self.behind.add(filename)
+            return
+        self._send(filename, self.offsets[filename], content)
+
+    def _send(self, filename, offset, content):
+        self.offsets[filename] = offset + len(content)
+        partial = self.partial.pop(filename, '')
+        content, remaining = split_partial_char(partial + content)
+        if remaining:
+            self.partial[filename] = remaining
+        if content:
+            self._write_output(filename, offset - len(partial), content)
+
+    def _write_output(self, filename, offset, content):
+        data = {'offset': offset, 'data': decode_output(content)}
+        self.request.write(format_event(filename.lstrip('.'), data))
+
+    def _send_partial(self):
+        """Send the bytes of characters which were never completed."""
+        for filename, content in sorted(self.partial.iteritems()):
+            offset = self.offsets[filename] - len(content)
+            self._write_output(filename, offset, content)
+        self.partial.clear()
+
+    def _catch_up(self):
+        """Read the output which was not sent while the stream was paused."""
+        for filename in sorted(self.behind):
+            while not self.paused:
+                offset, content = self.serializer.read_from(
+                    filename, self.offsets[filename])
+                if not content:
+                    self.behind.discard(filename)
+                    break
+                self._send(filename, offset, content)
+
+    def handler(self, _observable, _event):
+        if self.action_run.is_done:
+            self.finish()
+
+    def finish(self):
+        """Send the remaining output, and end the stream once it is sent."""
+        if self.stopped:
+            return
+
+        self.finishing = True
+        self._catch_up()
+        if self.paused or self.stopped:
+            return
+
+        self._send_partial()
+        data = {'state': str(self.action_run.state)}
+        self.request.write(format_event('done', data))
+        self._stop()
+        self.request.unregisterProducer()
+        self.request.finish()
+
+    def pauseProducing(self):
+        self.paused = True
+
+    def resumeProducing(self):
+        self.paused = False
+        if self.finishing:
+            self.finish()
+        else:
+            self._catch_up()
+
+    def stopProducing(self):
+        self._stop()
+
+    def _client_closed(self, _result):
+        self._stop()
+
+    def _stop(self):
+        if self.stopped:
+            return
+        self.stopped = True
+        manager = filehandler.FileHandleManager.get_instance()
+        for path in self.paths:
+            manager.unsubscribe(path, self.handle_write)
+        self.action_run.remove_observer(self)
+
+
+class ChangeStream(object):
+    """Write the changes from a ChangeFeed which match to a request, starting
+    after the sequence number since. A reset event is written when the feed
+    no longer has the changes after since, to tell the client to re-fetch
+    its state.
+    """
+    implements(interfaces.IPushProducer)
+
+    def __init__(self, request, change_feed, since, matches):
+        self.request        = request
+        self.change_feed    = change_feed
+        self.since          = since
+        self.matches        = matches
+        self.behind         = True
+        self.paused         = False
+        self.stopped        = False
+
+    def start(self):
+        self.request.setHeader('content-type', 'text/event-stream')
+        self.request.setHeader('cache-control', 'no-cache')
+        self.request.registerProducer(self, True)
+        self.request.notifyFinish().addBoth(self._client_closed)
+        self.change_feed.subscribe(self.handle_change)
+        self._catch_up()
+
+    def handle_change(self, change):
+        """Called by the ChangeFeed when a change is added."""
+        if self.paused or self.behind:
+            self.behind = True
+            return
+        self.since = change['seq']
+        if self.matches(change):
+            self._send(change)
+
+    def _send(self, change):
+        self.request.write(
+            format_event('change', change, event_id=change['seq']))
+
+    def _catch_up(self):
+        """Write the changes which were not sent while the stream was paused."""
+        seq = self.change_feed.seq
+        changes, is_complete = self.change_feed.get_changes(
+            self.since, self.matches)
+        self.since, self.behind = seq, False
+        if not is_complete:
+            self.request.write(format_event('reset', {'seq': seq}, seq))
+        for change in changes:
+            self._send(change)
+
+    def pauseProducing(self):
+        self.paused = True
+
+    def resumeProducing(self):
+        self.paused = False
+        if self.behind and not self.stopped:
+            self._catch_up()
+
+    def stopProducing(self):
+        self._stop()
+
+    def _client_closed(self, _result):
+        self._stop()
+
+    def _stop(self):
+        if self.stopped:
+            return
+        self.stopped = True
+        self.change_feed.unsubscribe(self.handle_change)
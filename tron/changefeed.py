@@ -0,0 +1,161 @@
+"""
+ tron.changefeed
+
+ A feed of state changes to Jobs, JobRuns, ActionRuns and Services. Api
+ clients read the changes after the last sequence number they have seen,
+ instead of polling the full job and service collections.
+
+ The feed watches Jobs and Services. When one of them notifies, the states
+ of it and its runs are compared to the states from the previous
+ notification, and a change is appended for each state which is different.
+ The states of every Job and Service are first recorded after state is
+ restored, so that restored runs are not reported as changes.
+ Completed runs restored from state (JobRunStubs) are only read once, from
+ their state data, so they are never restored.
+"""
+from collections import deque, OrderedDict
+import itertools
+import logging
+
+from tron import event
+from tron.core import job, jobrun, service
+from tron.utils import observer
+
+log = logging.getLogger(__name__)
+
+
+def get_namespace(name):
+    return name.split(event.NAME_CHARACTER, 1)[0]
+
+
+def build_filter(name=None, namespace=None):
+    """Return a function which matches changes to the job or service called
+    name, and changes in namespace.
+    """
+    def matches(change):
+        if name and change['parent'] != name:
+            return False
+        if namespace and change['namespace'] != namespace:
+            return False
+        return True
+    return matches
+
+
+def get_run_states(job_run):
+    """Return the (type, name, state) of a JobRun and its ActionRuns."""
+    states = [('job_run', job_run.id, job_run.state)]
+    states.extend(('action_run', action_run_id, state)
+                  for action_run_id, state in job_run.get_action_states())
+    return states
+
+
+def get_job_states(job, previous=None):
+    """Return a dict of run id (None for the Job itself) to the
+    (type, name, state) of a Job, or of a JobRun and its ActionRuns. The
+    states of a JobRunStub never change, so they are copied from previous
+    when it has them.
+    """
+    previous = previous or {}
+    states = OrderedDict([(None, [('job', job.get_name(), job.status)])])
+    for job_run in job.runs:
+        if isinstance(job_run, jobrun.JobRunStub) and job_run.id in previous:
+            states[job_run.id] = previous[job_run.id]
+        else:
+            states[job_run.id] = get_run_states(job_run)
+    return states
+
+
+def get_service_states(service, _previous=None):
+    return {None: [('service', service.get_name(), service.get_state())]}
+
+
+class ChangeFeed(observer.Observer):
+    """Record state changes with a monotonic sequence number. The most recent
+    `history` changes are kept for clients to catch up from.
+    """
+    DEFAULT_HISTORY = 1000
+
+    def __init__(self, history=DEFAULT_HISTORY):
+        self.changes        = deque(maxlen=history)
+        self.seq            = 0
+        self.watched        = {}
+        self.snapshots      = {}
+        self.subscribers    = []
+
+    def watch(self, observable, event=True):
+        super(ChangeFeed, self).watch(observable, event)
+        self.watched[str(observable)] = observable
+
+    def snapshot(self, observable):
+        """Record the current states of observable without adding changes."""
+        self.snapshots[str(observable)] = self._get_states(observable)
+
+    def snapshot_all(self):
+        """Record the current states of all watched observables. Used after
+        state is restored, so that restored runs are not reported as changes.
+        """
+        for observable in self.watched.itervalues():
+            self.snapshot(observable)
+
+    def _get_states(self, observable, previous=None):
+        if isinstance(observable, job.Job):
+            return get_job_states(observable, previous)
+        if isinstance(observable, service.Service):
+            return get_service_states(observable, previous)
+        return {}
+
+    def handler(self, observable, _event):
+        key = str(observable)
+        previous = self.snapshots.get(key, {})
+        current = self._get_states(observable, previous)
+        for group, states in current.iteritems():
+            if states is previous.get(group):
+                continue
+            previous_states = dict(((entity_type, name), str(state))
+                for entity_type, name, state in previous.get(group, ()))
+            for entity_type, name, state in states:
+                state = str(state)
+                if previous_states.get((entity_type, name)) != state:
+                    self.append(entity_type, name, observable.get_name(), state)
+        self.snapshots[key] = current
+
+    def append(self, entity_type, name, parent, state):
+        self.seq += 1
+        change = {
+            'seq':          self.seq,
+            'type':         entity_type,
+            'name':         name,
+            'parent':       parent,
+            'namespace':    get_namespace(parent),
+            'state':        state,
+        }
+        self.changes.append(change)
+        for callback in list(self.subscribers):
+            callback(change)
+
+    def get_changes(self, since, matches=None):
+        """Return a tuple of the changes after the sequence number since
+        which match, and True if the feed still has all of those changes.
+        When the feed no longer has them (or since is from a previous run of
+        the daemon) the client should re-fetch its state.
+        """
+        if since == self.seq:
+            return [], True
+        if since > self.seq or not self.changes:
+            return [], False
+        if self.changes[0]['seq'] > since + 1:
+            return [], False
+
+        newer = itertools.takewhile(
+            lambda change: change['seq'] > since, reversed(self.changes))
+        changes = [change for change in newer if not matches or matches(change)]
+        changes.reverse()
+        return changes, True
+
+    def subscribe(self, callback):
+        """Call callback with each change as it is added."""
+        self.subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        if callback in self.subscribers:
+            self.subscribers.remove(callback)
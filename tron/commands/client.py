@@ -75,6 +75,11 @@ def build_get_url(url, data=None):
      return '%s?%s' % (url, urllib.urlencode(data)) if data else url
 
 
+def build_event_params(since=None, before=None):
+    params = [('since', since), ('before', before)]
+    return dict((key, value) for key, value in params if value is not None)
+
+
 class Client(object):
     """An HTTP client used to issue commands to the Tron API.
     """
@@ -88,8 +93,9 @@ class Client(object):
     def status(self):
         return self.http_get('/api/status')
 
-    def events(self):
-        return self.http_get('/api/events')['data']
+    def events(self, since=None, before=None):
+        params = build_event_params(since, before)
+        return self.http_get('/api/events', params)['data']
 
     def config(self,
               config_name, config_data=None, config_hash=None, no_header=False):
@@ -138,8 +144,23 @@ class Client(object):
             'include_stderr':   1}
         return self.http_get(action_run_url, params)
 
-    def object_events(self, item_url):
-        return self.http_get('%s/_events' % item_url)['data']
+    def schedule(self, job_url, start_time, end_time, limit=None):
+        params = {'start_time': start_time, 'end_time': end_time}
+        if limit:
+            params['limit'] = limit
+        return self.http_get('%s/_schedule' % job_url, params)
+
+    def backfill(self, job_url, start_time, end_time, max_concurrency):
+        request_data = dict(start_time=start_time, end_time=end_time,
+                            max_concurrency=max_concurrency)
+        return self.request('%s/_backfill' % job_url, request_data)
+
+    def backfill_status(self, backfill_id):
+        return self.http_get('/api/backfills/%s' % backfill_id)
+
+    def object_events(self, item_url, since=None, before=None):
+        params = build_event_params(since, before)
+        return self.http_get('%s/_events' % item_url, params)['data']
 
     def http_get(self, url, data=None):
         return self.request(build_get_url(url, data))
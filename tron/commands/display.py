@@ -413,9 +413,9 @@ class DisplayActionRuns(TableDisplay):
 
 class DisplayEvents(TableDisplay):
 
-    columns = ['Time', 'Level', 'Entity', 'Name']
-    fields  = ['time', 'level', 'entity', 'name']
-    widths  = [22,     12,       35,      20    ]
+    columns = ['Seq',  'Time', 'Level', 'Entity', 'Name']
+    fields  = ['seq',  'time', 'level', 'entity', 'name']
+    widths  = [10,     22,     12,       35,      20    ]
     title = 'events'
     resize_fields = ['entity']
 
@@ -138,6 +138,12 @@ class ValidateSSHOptions(Validator):
         'jitter_min_load':          4,
         'jitter_max_delay':         20,
         'jitter_load_factor':       1,
+        'min_connections':          0,
+        'max_connections':          1,
+        'max_channels_per_connection': 0,
+        'keepalive_interval':       0,
+        'max_concurrent_runs':      0,
+        'run_queue_order':          schema.RunQueueOrderTypes.fifo,
     }
 
     validators = {
@@ -150,9 +156,32 @@ class ValidateSSHOptions(Validator):
         'jitter_min_load':          config_utils.valid_int,
         'jitter_max_delay':         config_utils.valid_int,
         'jitter_load_factor':       config_utils.valid_int,
+        'min_connections':          config_utils.valid_int,
+        'max_connections':          config_utils.valid_int,
+        'max_channels_per_connection': config_utils.valid_int,
+        'keepalive_interval':       config_utils.valid_int,
+        'max_concurrent_runs':      config_utils.valid_int,
+        'run_queue_order':          config_utils.build_enum_validator(
+                                        schema.RunQueueOrderTypes),
     }
 
     def post_validation(self, valid_input, config_context):
+        path = config_context.path
+        max_connections = valid_input.get(
+            'max_connections', self.defaults['max_connections'])
+        if max_connections < 1:
+            raise ConfigError("%s max_connections must be >= 1." % path)
+
+        min_connections = valid_input.get('min_connections', 0)
+        if not 0 <= min_connections <= max_connections:
+            msg = "%s min_connections must be >= 0 and <= max_connections."
+            raise ConfigError(msg % path)
+
+        for name in ('max_channels_per_connection', 'keepalive_interval',
+                'max_concurrent_runs'):
+            if valid_input.get(name, 0) < 0:
+                raise ConfigError("%s %s must be >= 0." % (path, name))
+
         if config_context.partial:
             return
 
@@ -167,6 +196,12 @@ class ValidateNotificationOptions(Validator):
     """Validate notification options."""
     config_class =              NotificationOptions
     optional =                  True
+    defaults = {
+        'digest_interval':      60,
+    }
+    validators = {
+        'digest_interval':      config_utils.valid_int,
+    }
 
 valid_notification_options = ValidateNotificationOptions()
 
@@ -178,11 +213,13 @@ class ValidateNode(Validator):
         'username':             config_utils.valid_string,
         'hostname':             config_utils.valid_string,
         'port':                 config_utils.valid_int,
+        'capacity':             config_utils.valid_int,
     }
 
     defaults = {
         'port':                 22,
         'username':             os.environ['USER'],
+        'capacity':             1,
     }
 
     def do_shortcut(self, node):
@@ -194,6 +231,11 @@ class ValidateNode(Validator):
         super(ValidateNode, self).set_defaults(output_dict, config_context)
         output_dict.setdefault('name', output_dict['hostname'])
 
+    def post_validation(self, valid_input, config_context):
+        if valid_input.get('capacity', 1) < 1:
+            path = config_context.path
+            raise ConfigError("%s capacity must be >= 1." % path)
+
 valid_node = ValidateNode()
 
 
@@ -202,6 +244,8 @@ class ValidateNodePool(Validator):
     validators = {
         'name':                 valid_identifier,
         'nodes':                build_list_of_type_validator(valid_identifier),
+        'strategy':             config_utils.build_enum_validator(
+                                    schema.NodeSelectionTypes),
     }
 
     def cast(self, node_pool, _context):
@@ -211,6 +255,7 @@ class ValidateNodePool(Validator):
 
     def set_defaults(self, node_pool, _):
         node_pool.setdefault('name', '_'.join(node_pool['nodes']))
+        node_pool.setdefault('strategy', schema.NodeSelectionTypes.random)
 
 
 valid_node_pool = ValidateNodePool()
@@ -389,11 +434,21 @@ class ValidateActionRunner(Validator):
     }
 
 
+# State stores which encode state with the configured codec
+CODEC_STORE_TYPES = set([
+    schema.StatePersistenceTypes.sql, schema.StatePersistenceTypes.yaml])
+
+
 class ValidateStatePersistence(Validator):
     config_class                = schema.ConfigState
     defaults = {
         'buffer_size':          1,
         'connection_details':   None,
+        'journal_size':         0,
+        'buffer_max_latency':   None,
+        'buffer_max_bytes':     None,
+        'threaded_writes':      False,
+        'codec':                'yaml',
     }
 
     validators = {
@@ -402,6 +457,12 @@ class ValidateStatePersistence(Validator):
                                     schema.StatePersistenceTypes),
         'connection_details':   valid_string,
         'buffer_size':          valid_int,
+        'journal_size':         valid_int,
+        'buffer_max_latency':   valid_float,
+        'buffer_max_bytes':     valid_int,
+        'threaded_writes':      valid_bool,
+        'codec':                config_utils.build_enum_validator(
+                                    schema.StateCodecTypes),
     }
 
     def post_validation(self, config, config_context):
@@ -411,9 +472,52 @@ class ValidateStatePersistence(Validator):
             path = config_context.path
             raise ConfigError("%s buffer_size must be >= 1." % path)
 
+        journal_size = config.get('journal_size')
+        if journal_size and journal_size < 0:
+            path = config_context.path
+            raise ConfigError("%s journal_size must be >= 0." % path)
+
+        for name in ('buffer_max_latency', 'buffer_max_bytes'):
+            value = config.get(name)
+            if value is not None and value <= 0:
+                path = config_context.path
+                raise ConfigError("%s %s must be > 0." % (path, name))
+
+        codec = config.get('codec')
+        store_type = config.get('store_type')
+        if codec and codec != 'yaml' and store_type not in CODEC_STORE_TYPES:
+            path = config_context.path
+            raise ConfigError("%s codec %s is not supported by %s stores." % (
+                path, codec, store_type))
+
 valid_state_persistence = ValidateStatePersistence()
 
 
+class ValidateEvents(Validator):
+    config_class                = schema.ConfigEvents
+    defaults = {
+        'max_events':           10000,
+        'store_dir':            None,
+        'segment_size':         10000,
+        'retention_days':       7,
+    }
+
+    validators = {
+        'max_events':           valid_int,
+        'store_dir':            valid_string,
+        'segment_size':         valid_int,
+        'retention_days':       valid_int,
+    }
+
+    def post_validation(self, config, config_context):
+        for name in ('max_events', 'segment_size', 'retention_days'):
+            if name in config and config[name] < 1:
+                path = config_context.path
+                raise ConfigError("%s %s must be >= 1." % (path, name))
+
+valid_events = ValidateEvents()
+
+
 def validate_jobs_and_services(config, config_context):
     """Validate jobs and services."""
     valid_jobs      = build_dict_name_validator(valid_job, allow_empty=True)
@@ -428,7 +532,9 @@ def validate_jobs_and_services(config, config_context):
     config_utils.unique_names(fmt_string, config['jobs'], config['services'])
 
 
-DEFAULT_STATE_PERSISTENCE = ConfigState('tron_state', 'shelve', None, 1)
+DEFAULT_STATE_PERSISTENCE = ConfigState(
+    'tron_state', 'shelve', None, 1, 0, None, None, False, 'yaml')
+DEFAULT_EVENTS = schema.ConfigEvents(10000, None, 10000, 7)
 DEFAULT_NODE = ValidateNode().do_shortcut('localhost')
 
 
@@ -447,6 +553,7 @@ class ValidateConfig(Validator):
         'notification_options': None,
         'time_zone':            None,
         'state_persistence':    DEFAULT_STATE_PERSISTENCE,
+        'events':               DEFAULT_EVENTS,
         'nodes':                {'localhost': DEFAULT_NODE},
         'node_pools':           {},
         'jobs':                 (),
@@ -462,6 +569,7 @@ class ValidateConfig(Validator):
         'notification_options': valid_notification_options,
         'time_zone':            valid_time_zone,
         'state_persistence':    valid_state_persistence,
+        'events':               valid_events,
         'nodes':                nodes,
         'node_pools':           node_pools,
     }
@@ -526,18 +634,37 @@ def get_nodes_from_master_namespace(master):
     return set(itertools.chain(master.nodes, master.node_pools))
 
 
+def validate_namespace(name, content, master):
+    """Validate the content of the named namespace, using the nodes and
+    command context of the validated master config.
+    """
+    nodes = get_nodes_from_master_namespace(master)
+    context = ConfigContext(name, nodes, master.command_context, name)
+    return valid_named_config(content, config_context=context)
+
+
 def validate_config_mapping(config_mapping):
     if MASTER_NAMESPACE not in config_mapping:
         msg = "A config mapping requires a %s namespace"
         raise ConfigError(msg % MASTER_NAMESPACE)
 
     master = valid_config(config_mapping.pop(MASTER_NAMESPACE))
-    nodes = get_nodes_from_master_namespace(master)
     yield MASTER_NAMESPACE, master
 
     for name, content in config_mapping.iteritems():
-        context = ConfigContext(name, nodes, master.command_context, name)
-        yield name, valid_named_config(content, config_context=context)
+        yield name, validate_namespace(name, content, master)
+
+
+def diff_mapping(previous, current):
+    """Return the sorted names which were added, removed and updated from
+    the previous mapping to the current mapping.
+    """
+    return {
+        'added':    sorted(set(current) - set(previous)),
+        'removed':  sorted(set(previous) - set(current)),
+        'updated':  sorted(name for name in set(previous) & set(current)
+                           if previous[name] != current[name]),
+    }
 
 
 class ConfigContainer(object):
@@ -572,6 +699,18 @@ class ConfigContainer(object):
     def get_master(self):
         return self.configs[MASTER_NAMESPACE]
 
+    def get_diff(self, previous=None):
+        """Return the namespaces, jobs and services which were added,
+        removed or updated since the previous container.
+        """
+        previous = previous or ConfigContainer({})
+        return {
+            'namespaces':   diff_mapping(previous.configs, self.configs),
+            'jobs':         diff_mapping(previous.get_jobs(), self.get_jobs()),
+            'services':     diff_mapping(
+                                previous.get_services(), self.get_services()),
+        }
+
     def get_node_names(self):
         return get_nodes_from_master_namespace(self.get_master())
 
@@ -71,13 +71,19 @@ class ManifestFile(object):
 
 
 class ConfigManager(object):
-    """Read, load and write configuration."""
+    """Read, load and write configuration.
+
+    Validated namespaces are cached with the hash of their content and the
+    hash of the MASTER namespace they were validated with, so a namespace is
+    only parsed and validated again when one of those changes.
+    """
 
     DEFAULT_HASH = hash_digest("")
 
     def __init__(self, config_path):
         self.config_path = config_path
         self.manifest = ManifestFile(config_path)
+        self.validated = {}
 
     def build_file_path(self, name):
         name = name.replace('.', '_').replace(os.path.sep, '_')
@@ -89,7 +95,7 @@ class ConfigManager(object):
         return read_raw(filename)
 
     def write_config(self, name, content):
-        self.validate_with_fragment(name, from_string(content))
+        self.validate_with_fragment(name, content)
         filename = self.get_filename_from_manifest(name)
         write_raw(filename, content)
 
@@ -101,19 +107,53 @@ class ConfigManager(object):
         return self.manifest.get_file_name(name) or create_filename()
 
     def validate_with_fragment(self, name, content):
-        name_mapping = self.get_config_name_mapping()
-        name_mapping[name] = content
-        config_parse.ConfigContainer.create(name_mapping)
+        contents = self.get_config_contents()
+        contents[name] = content
+        self.build_container(contents)
 
-    def get_config_name_mapping(self):
+    def get_config_contents(self):
         seq = self.manifest.get_file_mapping().iteritems()
-        return dict((name, read(filename)) for name, filename in seq)
+        return dict((name, read_raw(filename)) for name, filename in seq)
+
+    def validate(self, name, content, master_hash, master=None):
+        """Return the validated config for the raw content of a namespace."""
+        key = hash_digest(content), master_hash
+        cached = self.validated.get(name)
+        if cached and cached[0] == key:
+            return cached[1]
+
+        log.info("Validating config %s", name)
+        if name == schema.MASTER_NAMESPACE:
+            config = config_parse.valid_config(from_string(content))
+        else:
+            config = config_parse.validate_namespace(
+                name, from_string(content), master)
+        self.validated[name] = key, config
+        return config
+
+    def build_container(self, contents):
+        """Return a ConfigContainer from a mapping of namespace to raw
+        content, validating only the namespaces which changed.
+        """
+        if schema.MASTER_NAMESPACE not in contents:
+            msg = "A config mapping requires a %s namespace"
+            raise ConfigError(msg % schema.MASTER_NAMESPACE)
+
+        master_content = contents[schema.MASTER_NAMESPACE]
+        master_hash = hash_digest(master_content)
+        master = self.validate(
+            schema.MASTER_NAMESPACE, master_content, master_hash)
+        configs = dict((name, self.validate(name, content, master_hash, master))
+                       for name, content in contents.iteritems())
+
+        for name in set(self.validated) - set(contents):
+            del self.validated[name]
+        return config_parse.ConfigContainer(configs)
 
     def load(self):
         """Return the fully constructed configuration."""
         log.info("Loading full config from %s" % self.config_path)
-        name_mapping = self.get_config_name_mapping()
-        return config_parse.ConfigContainer.create(name_mapping)
+        return self.build_container(self.get_config_contents())
 
     def get_hash(self, name):
         """Return a hash of the configuration contents for name."""
@@ -7,7 +7,7 @@ import datetime
 import re
 
 from tron.config import ConfigError, config_utils, schema
-from tron.utils import crontab
+from tron.utils import crontab, trontimespec
 
 
 ConfigGenericSchedule = schema.config_object_factory(
@@ -225,6 +225,26 @@ def build_groc_schedule_parser_re():
 DAILY_SCHEDULE_RE = build_groc_schedule_parser_re()
 
 
+# The first match of a time specification is searched for from this date. The
+# calendar repeats, so a specification which never matches after this date
+# never matches.
+TIME_SPEC_REFERENCE = datetime.datetime(2000, 1, 1)
+
+def valid_time_spec(config_context, **kwargs):
+    """Raise a ConfigError if the TimeSpecification built from kwargs is
+    not valid, or never matches (ex: the 30th of February).
+    """
+    try:
+        time_spec = trontimespec.TimeSpecification(**kwargs)
+    except ValueError, e:
+        msg = "Invalid schedule at %s: %s"
+        raise ConfigError(msg % (config_context.path, e))
+
+    if time_spec.get_match(TIME_SPEC_REFERENCE) is None:
+        msg = "Schedule at %s never runs"
+        raise ConfigError(msg % config_context.path)
+
+
 def _parse_number(day):
     return int(''.join(c for c in day if c.isdigit()))
 
@@ -264,6 +284,8 @@ def parse_groc_expression(config, config_context):
     else:
         months = set(CONVERT_MONTHS[mo] for mo in m.group('months').split(','))
 
+    valid_time_spec(config_context, ordinals=ordinals, weekdays=weekdays,
+        monthdays=monthdays, months=months, timestr=timestr)
     return ConfigGrocScheduler(
         original=expression,
         ordinals=ordinals,
@@ -278,12 +300,14 @@ def valid_cron_scheduler(config, config_context):
     """Parse a cron schedule."""
     try:
         crontab_kwargs = crontab.parse_crontab(config.value)
-        return ConfigCronScheduler(
-            original=config.value, jitter=config.jitter, **crontab_kwargs)
     except ValueError, e:
         msg = "Invalid cron scheduler %s: %s"
         raise ConfigError(msg % (config_context.path, e))
 
+    valid_time_spec(config_context, **crontab_kwargs)
+    return ConfigCronScheduler(
+        original=config.value, jitter=config.jitter, **crontab_kwargs)
+
 
 schedulers = {
     'constant':     valid_constant_scheduler,
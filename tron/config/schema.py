@@ -33,6 +33,7 @@ TronConfig = config_object_factory(
         'output_stream_dir',   # str
         'action_runner',       # ConfigActionRunner
         'state_persistence',   # ConfigState
+        'events',              # ConfigEvents
         'command_context',     # FrozenDict of str
         'ssh_options',         # ConfigSSHOptions
         'notification_options',# NotificationOptions or None
@@ -57,6 +58,9 @@ NotificationOptions = config_object_factory(
     [
         'smtp_host',            # str
         'notification_addr',    # str
+    ],
+    [
+        'digest_interval',      # int
     ])
 
 
@@ -75,14 +79,21 @@ ConfigSSHOptions = config_object_factory(
         'jitter_min_load',
         'jitter_max_delay',
         'jitter_load_factor',
+        'min_connections',
+        'max_connections',
+        'max_channels_per_connection',
+        'keepalive_interval',
+        'max_concurrent_runs',
+        'run_queue_order',
     ])
 
 
 ConfigNode = config_object_factory('ConfigNode',
-    ['hostname'], ['name', 'username', 'port'])
+    ['hostname'], ['name', 'username', 'port', 'capacity'])
 
 
-ConfigNodePool = config_object_factory('ConfigNodePool', ['nodes'], ['name'])
+ConfigNodePool = config_object_factory('ConfigNodePool',
+    ['nodes'], ['name', 'strategy'])
 
 
 ConfigState = config_object_factory(
@@ -92,7 +103,22 @@ ConfigState = config_object_factory(
         'store_type',
         ],[
         'connection_details',
-        'buffer_size'
+        'buffer_size',
+        'journal_size',
+        'buffer_max_latency',
+        'buffer_max_bytes',
+        'threaded_writes',
+        'codec',
+    ])
+
+
+ConfigEvents = config_object_factory(
+    'ConfigEvents',
+    optional=[
+        'max_events',           # int
+        'store_dir',            # str or None
+        'segment_size',         # int
+        'retention_days',       # int
     ])
 
 
@@ -151,7 +177,17 @@ ConfigService = config_object_factory(
     ])
 
 
-StatePersistenceTypes = Enum.create('shelve', 'sql', 'mongo', 'yaml')
+StatePersistenceTypes = Enum.create('shelve', 'sql', 'mongo', 'yaml', 'log')
+
+
+StateCodecTypes = Enum.create('yaml', 'pickle')
+
+
+RunQueueOrderTypes = Enum.create('fifo', 'priority')
+
+
+NodeSelectionTypes = Enum.create('random', 'round_robin', 'least_loaded',
+    'power_of_two', 'weighted', 'health')
 
 
 ActionRunnerTypes = Enum.create('none', 'subprocess')
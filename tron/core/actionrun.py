@@ -60,7 +60,13 @@ class ActionRunFactory(object):
 
     @classmethod
     def action_run_from_state(cls, job_run, state_data, cleanup=False):
-        """Restore an ActionRun for this JobRun from the state data."""
+        """Restore an ActionRun for this JobRun from the state data. Runs
+        which are in an end state are restored as a CompletedActionRun.
+        """
+        if CompletedActionRun.is_completed_state(state_data):
+            return CompletedActionRun.from_state(
+                state_data, job_run, cleanup=cleanup)
+
         return ActionRun.from_state(
             state_data,
             job_run.context,
@@ -119,6 +125,9 @@ class ActionRun(Observer):
          STATE_UNKNOWN)
     )
 
+    # The names of all transitions between states
+    TRANSITIONS = set(state.get_transitions(STATE_SCHEDULED))
+
     # Failed render command is false to ensure that it will fail when run
     FAILED_RENDER = 'false'
 
@@ -153,6 +162,10 @@ class ActionRun(Observer):
     def attach(self):
         return self.machine.attach
 
+    @property
+    def remove_observer(self):
+        return self.machine.remove_observer
+
     @property
     def id(self):
         return "%s.%s" % (self.job_run_id, self.action_name)
@@ -365,6 +378,235 @@ class ActionRun(Observer):
         return "ActionRun: %s" % self.id
 
 
+def completed_attr(name):
+    """Return a property which reads the attribute from the slot of a
+    CompletedActionRun, or from its live ActionRun once it was promoted.
+    """
+    slot_name = '_%s' % name
+
+    def getter(self):
+        if self._live:
+            return getattr(self._live, name)
+        return getattr(self, slot_name)
+    return property(getter)
+
+
+class CompletedActionRun(object):
+    """An immutable and compact record of an ActionRun in an end state. It
+    supports the attributes used by ActionRunCollection, the API adapters
+    and state serialization, without the StateMachine, command context and
+    observers of an ActionRun.
+
+    Calling a transition which is valid from the current state (ex: success,
+    fail, skip) promotes the record back to a live ActionRun, which replaces
+    it in the JobRuns ActionRunCollection.
+    """
+    __slots__ = [
+        '_job_run_id',
+        '_action_name',
+        '_node_name',
+        '_state',
+        '_start_time',
+        '_end_time',
+        '_exit_status',
+        '_bare_command',
+        '_rendered_command',
+        '_is_cleanup',
+        '_output_path',
+        '_action_runner',
+        '_job_run',
+        '_live',
+    ]
+
+    job_run_id          = completed_attr('job_run_id')
+    action_name         = completed_attr('action_name')
+    state               = completed_attr('state')
+    start_time          = completed_attr('start_time')
+    end_time            = completed_attr('end_time')
+    exit_status         = completed_attr('exit_status')
+    bare_command        = completed_attr('bare_command')
+    rendered_command    = completed_attr('rendered_command')
+    is_cleanup          = completed_attr('is_cleanup')
+    output_path         = completed_attr('output_path')
+
+    def __init__(self, job_run, job_run_id, action_name, node_name, run_state,
+            start_time, end_time, exit_status, bare_command, rendered_command,
+            cleanup, output_path, action_runner=None):
+        self._job_run           = job_run
+        self._job_run_id        = job_run_id
+        self._action_name       = action_name
+        self._node_name         = node_name
+        self._state             = run_state
+        self._start_time        = start_time
+        self._end_time          = end_time
+        self._exit_status       = exit_status
+        self._bare_command      = bare_command
+        self._rendered_command  = rendered_command
+        self._is_cleanup        = cleanup
+        self._output_path       = output_path
+        self._action_runner     = action_runner
+        self._live              = None
+
+    @staticmethod
+    def is_completed_state(state_data):
+        return state_data['state'] in set(
+            str(end_state) for end_state in ActionRun.END_STATES)
+
+    @classmethod
+    def from_action_run(cls, action_run, job_run):
+        """Freeze an ActionRun which is in an end state."""
+        return cls(
+            job_run,
+            action_run.job_run_id,
+            action_run.action_name,
+            action_run.node.get_name() if action_run.node else None,
+            action_run.state,
+            action_run.start_time,
+            action_run.end_time,
+            action_run.exit_status,
+            action_run.bare_command,
+            action_run.rendered_command,
+            action_run.is_cleanup,
+            filehandler.OutputPath(str(action_run.output_path)),
+            action_run.action_runner)
+
+    @classmethod
+    def from_state(cls, state_data, job_run, cleanup=False):
+        """Restore a CompletedActionRun from a serialized state."""
+        if 'id' in state_data:
+            job_run_id, action_name = state_data['id'].rsplit('.', 1)
+        else:
+            job_run_id = state_data['job_run_id']
+            action_name = state_data['action_name']
+
+        output_path = job_run.output_path.clone()
+        output_path.append("%s.%s" % (job_run_id, action_name))
+        return cls(
+            job_run,
+            job_run_id,
+            action_name,
+            state_data.get('node_name'),
+            state.named_event_by_name(
+                ActionRun.STATE_SCHEDULED, state_data['state']),
+            state_data['start_time'],
+            state_data['end_time'],
+            state_data.get('exit_status'),
+            state_data['command'],
+            state_data.get('rendered_command'),
+            cleanup,
+            filehandler.OutputPath(str(output_path)))
+
+    @property
+    def id(self):
+        return "%s.%s" % (self.job_run_id, self.action_name)
+
+    @property
+    def node(self):
+        if self._live:
+            return self._live.node
+        pool_repo = node.NodePoolRepository.get_instance()
+        return pool_repo.get_node(self._node_name, self._job_run.node)
+
+    @property
+    def command(self):
+        return self.rendered_command or self.bare_command
+
+    @property
+    def state_data(self):
+        if self._live:
+            return self._live.state_data
+        return {
+            'job_run_id':       self._job_run_id,
+            'action_name':      self._action_name,
+            'state':            str(self._state),
+            'start_time':       self._start_time,
+            'end_time':         self._end_time,
+            'command':          self.command,
+            'rendered_command': self._rendered_command,
+            'node_name':        self._node_name,
+            'exit_status':      self._exit_status,
+        }
+
+    def check_state(self, state):
+        if self._live:
+            return self._live.check_state(state)
+        return self._state.get(state)
+
+    def attach(self, watch_spec, observer):
+        """A CompletedActionRun never changes state, so observers are only
+        attached once it is promoted.
+        """
+        if self._live:
+            self._live.attach(watch_spec, observer)
+
+    def remove_observer(self, observer):
+        if self._live:
+            self._live.remove_observer(observer)
+
+    def cleanup(self):
+        if self._live:
+            self._live.cleanup()
+
+    def promote(self):
+        """Return a live ActionRun for this record, and replace this record
+        with it in the JobRuns ActionRunCollection.
+        """
+        if self._live:
+            return self._live
+
+        log.info("Promoting completed action run %s", self.id)
+        job_run = self._job_run
+        live = ActionRun.from_state(
+            self.state_data,
+            job_run.context,
+            job_run.output_path.clone(),
+            job_run.node,
+            cleanup=self._is_cleanup)
+        if self._action_runner:
+            live.action_runner = self._action_runner
+        job_run.action_runs.run_map[self._action_name] = live
+        job_run.watch(live)
+        self._live = live
+        return live
+
+    @property
+    def is_done(self):
+        return self.state in ActionRun.END_STATES
+
+    @property
+    def is_complete(self):
+        return self.is_succeeded or self.is_skipped
+
+    @property
+    def is_broken(self):
+        return self.is_failed or self.is_cancelled or self.is_unknown
+
+    @property
+    def is_active(self):
+        return self.is_starting or self.is_running
+
+    def __getattr__(self, name):
+        """Support the same state properties as an ActionRun. Transitions
+        which are valid from the current state promote this record.
+        """
+        if name.startswith('_'):
+            raise AttributeError(name)
+
+        if name.startswith('is_'):
+            state_name = name.replace('is_', 'state_').upper()
+            try:
+                return self.state == getattr(ActionRun, state_name)
+            except AttributeError:
+                raise AttributeError(name)
+
+        if name in ActionRun.TRANSITIONS and not self.check_state(name):
+            return lambda: False
+        return getattr(self.promote(), name)
+
+    def __str__(self):
+        return "ActionRun: %s" % self.id
+
+
 class ActionRunCollection(object):
     """A collection of ActionRuns used by a JobRun."""
 
@@ -410,6 +652,16 @@ class ActionRunCollection(object):
     def cleanup_action_run(self):
         return self.run_map.get(action.CLEANUP_ACTION_NAME)
 
+    def freeze_completed(self, job_run):
+        """Replace ActionRuns which are in an end state with a compact
+        CompletedActionRun.
+        """
+        for name, action_run in self.run_map.items():
+            if isinstance(action_run, ActionRun) and action_run.is_done:
+                action_run.machine.clear_observers()
+                self.run_map[name] = CompletedActionRun.from_action_run(
+                    action_run, job_run)
+
     @property
     def state_data(self):
         return [run.state_data for run in self.action_runs]
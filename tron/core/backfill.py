@@ -0,0 +1,217 @@
+"""
+ tron.core.backfill
+
+ Create the runs a job would have been scheduled to run over a window of
+ time. The run times come from the scheduler of the job. Runs are created
+ and started in batches, so that at most `max_concurrency` runs of a
+ backfill are active at once. A job which does not allow overlap runs one
+ backfill run at a time, and waits for its other active runs to finish.
+"""
+from collections import deque
+import itertools
+import logging
+
+from tron.core import jobrun
+from tron.core.actionrun import ActionRun
+from tron.utils import observer
+
+log = logging.getLogger(__name__)
+
+
+# Most runs which can be created by a single backfill
+MAX_RUNS = 1000
+
+DEFAULT_MAX_CONCURRENCY = 1
+
+
+class BackfillError(ValueError):
+    """Raised when a backfill can not be created."""
+
+
+def get_run_times(job, start_time, end_time, limit=MAX_RUNS):
+    """Return up to limit times the scheduler of job would run it from
+    start_time up to and including end_time.
+    """
+    if end_time < start_time:
+        raise BackfillError("End time %s is before start time %s" % (
+            end_time, start_time))
+    run_times = job.scheduler.get_run_times(start_time, end_time)
+    return list(itertools.islice(run_times, limit))
+
+
+class Backfill(observer.Observer):
+    """Create and start a JobRun for each run time, with at most
+    max_concurrency of them active at once.
+    """
+
+    STATE_RUNNING       = 'running'
+    STATE_CANCELLED     = 'cancelled'
+    STATE_DONE          = 'done'
+
+    def __init__(self, backfill_id, job_scheduler, run_times, max_concurrency):
+        self.id                 = backfill_id
+        self.job                = job_scheduler.get_job()
+        self.run_times          = list(run_times)
+        self.pending            = deque(self.run_times)
+        self.max_concurrency    = max(1, max_concurrency)
+        self.active             = []
+        self.runs               = []
+        self.results            = {}
+        self.cancelled          = False
+        # True while start_runs is starting runs
+        self.starting           = False
+
+    @property
+    def concurrency(self):
+        return self.max_concurrency if self.job.allow_overlap else 1
+
+    @property
+    def state(self):
+        if self.active or (self.pending and not self.cancelled):
+            return self.STATE_RUNNING
+        return self.STATE_CANCELLED if self.cancelled else self.STATE_DONE
+
+    @property
+    def is_done(self):
+        return self.state != self.STATE_RUNNING
+
+    def has_capacity(self):
+        if len(self.active) >= self.concurrency:
+            return False
+        if not self.job.allow_overlap:
+            return not any(self.job.runs.get_active())
+        return True
+
+    def start(self):
+        """Start the first batch of runs, and watch the job to start more
+        when its runs are done.
+        """
+        self.watch(self.job, self.job.NOTIFY_RUN_DONE)
+        self.start_runs()
+
+    def start_runs(self):
+        """Start runs for the pending run times while there is capacity. A run
+        can be done as soon as it is started (if it fails to start), so this
+        is called again from handler while runs are being started. That call
+        returns, and the capacity it leaves is used by the loop below.
+        """
+        if self.starting:
+            return
+
+        self.starting = True
+        try:
+            while not self.cancelled and self.pending and self.has_capacity():
+                run_time = self.pending.popleft()
+                for job_run in self.job.build_new_runs(run_time, manual=True):
+                    self.runs.append(job_run)
+                    self.active.append(job_run)
+                    self.watch(job_run, jobrun.JobRun.NOTIFY_DONE)
+                    job_run.start()
+        finally:
+            self.starting = False
+
+        if self.is_done:
+            self.stop_watching(self.job)
+
+    def handler(self, observable, _event):
+        """Called when a JobRun of this backfill is done, or when any run of
+        the job is done, which may leave capacity for this backfill.
+        """
+        if observable is not self.job:
+            self.handle_run_done(observable)
+        self.start_runs()
+
+    def handle_run_done(self, job_run):
+        self.active.remove(job_run)
+        self.stop_watching(job_run)
+        self.results[job_run.id] = job_run.state
+        log.info("%s: %s is %s", self, job_run, job_run.state)
+
+    def cancel(self):
+        """Stop creating new runs. Runs which were started are not stopped."""
+        self.cancelled = True
+        self.pending.clear()
+        if self.is_done:
+            self.stop_watching(self.job)
+
+    def count_results(self, state):
+        return sum(1 for result in self.results.itervalues() if result == state)
+
+    def get_status(self):
+        return {
+            'id':               self.id,
+            'job_name':         self.job.get_name(),
+            'state':            self.state,
+            'total':            len(self.run_times),
+            'pending':          len(self.pending),
+            'running':          len(self.active),
+            'succeeded':        self.count_results(ActionRun.STATE_SUCCEEDED),
+            'failed':           self.count_results(ActionRun.STATE_FAILED),
+            'finished':         len(self.results),
+            'max_concurrency':  self.max_concurrency,
+            'runs':             [job_run.id for job_run in self.runs],
+        }
+
+    def __str__(self):
+        return "Backfill:%s(%s)" % (self.id, self.job.get_name())
+
+
+class BackfillManager(object):
+    """A Singleton which creates Backfills and keeps them for progress
+    reporting. At most MAX_FINISHED finished backfills are kept.
+    """
+
+    MAX_FINISHED = 100
+
+    _instance = None
+
+    def __init__(self):
+        if self._instance is not None:
+            raise ValueError("BackfillManager is already instantiated.")
+        self.backfills      = {}
+        self.ids            = itertools.count(1)
+
+    @classmethod
+    def get_instance(cls):
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    @classmethod
+    def reset(cls):
+        cls._instance = None
+
+    def create(self, job_scheduler, start_time, end_time,
+            max_concurrency=DEFAULT_MAX_CONCURRENCY):
+        """Create and start a Backfill of the job of job_scheduler from
+        start_time up to and including end_time.
+        """
+        job = job_scheduler.get_job()
+        run_times = get_run_times(job, start_time, end_time, MAX_RUNS + 1)
+        if not run_times:
+            raise BackfillError("%s has no run times from %s to %s" % (
+                job, start_time, end_time))
+        if len(run_times) > MAX_RUNS:
+            raise BackfillError("%s has more than %s run times from %s to %s" %
+                (job, MAX_RUNS, start_time, end_time))
+
+        backfill = Backfill(
+            self.ids.next(), job_scheduler, run_times, max_concurrency)
+        self.backfills[backfill.id] = backfill
+        self.prune()
+        log.info("Starting %s of %d runs", backfill, len(run_times))
+        backfill.start()
+        return backfill
+
+    def get(self, backfill_id):
+        return self.backfills.get(backfill_id)
+
+    def get_all(self):
+        return [self.backfills[key] for key in sorted(self.backfills)]
+
+    def prune(self):
+        """Remove the oldest finished backfills."""
+        finished = [backfill.id for backfill in self.get_all()
+                    if backfill.is_done]
+        for backfill_id in finished[:-self.MAX_FINISHED]:
+            del self.backfills[backfill_id]
@@ -4,6 +4,7 @@ import itertools
 from tron import command_context, event, node, eventloop
 from tron.core import jobrun
 from tron.core import actiongraph
+from tron.core import runtimer
 from tron.core.actionrun import ActionRun
 from tron.scheduler import scheduler_from_config
 from tron.serialize import filehandler
@@ -25,6 +26,11 @@ class InvalidStartStateError(Error):
 log = logging.getLogger(__name__)
 
 
+# Job versions are unique across jobs, so that a newer job always has a
+# greater version than the job it replaced
+job_versions = itertools.count(1)
+
+
 class Job(Observable, Observer):
     """A configurable data object.
 
@@ -68,6 +74,7 @@ class Job(Observable, Observer):
         self.runs               = run_collection
         self.queueing           = queueing
         self.all_nodes          = all_nodes
+        self.version            = None
         self.enabled            = enabled
         self.node_pool          = node_pool
         self.allow_overlap      = allow_overlap
@@ -77,6 +84,7 @@ class Job(Observable, Observer):
         self.output_path.append(name)
         self.event              = event.get_recorder(self.name)
         self.context = command_context.build_context(self, parent_context)
+        self.changed_run_nums   = set()
         self.event.ok('created')
 
     @classmethod
@@ -110,8 +118,25 @@ class Job(Observable, Observer):
         """
         for attr in self.equality_attributes:
             setattr(self, attr, getattr(job, attr))
+        self.update_version()
         self.event.ok('reconfigured')
 
+    def update_version(self):
+        """Increase the version of this Job. Called whenever the Job or its
+        runs change, so that the api can cache the representation of a Job
+        until its version changes.
+        """
+        self.version = job_versions.next()
+
+    def _get_enabled(self):
+        return self._enabled
+
+    def _set_enabled(self, enabled):
+        self._enabled = enabled
+        self.update_version()
+
+    enabled = property(_get_enabled, _set_enabled)
+
     @property
     def status(self):
         """Current status."""
@@ -140,6 +165,17 @@ class Job(Observable, Observer):
             'enabled':          self.enabled
         }
 
+    def pop_changed_runs(self):
+        """Return the JobRuns which have changed since the last call. Used
+        to persist only the runs which changed, instead of the full state_data.
+        """
+        changed, self.changed_run_nums = self.changed_run_nums, set()
+        return [run for run in self.runs if run.run_num in changed]
+
+    def clear_changed_runs(self):
+        """Forget the changed runs, when the full state_data is saved."""
+        self.changed_run_nums.clear()
+
     def restore_state(self, state_data):
         """Apply a previous state to this Job."""
         self.enabled = state_data['enabled']
@@ -152,6 +188,7 @@ class Job(Observable, Observer):
         for run in job_runs:
             self.watch(run)
 
+        self.update_version()
         self.event.ok('restored')
 
     def build_new_runs(self, run_time, manual=False):
@@ -163,16 +200,22 @@ class Job(Observable, Observer):
         nodes = pool.nodes if self.all_nodes else [pool.next()]
         for node in nodes:
             run = self.runs.build_new_run(self, run_time, node, manual=manual)
+            self.changed_run_nums.add(run.run_num)
             self.watch(run)
+            self.update_version()
             yield run
 
-    def handle_job_run_state_change(self, _job_run, event):
+    def handle_job_run_state_change(self, job_run, event):
         """Handle state changes from JobRuns and propagate changes to any
         observers.
         """
-        # Propagate state change for serialization
+        self.update_version()
+
+        # Propagate state change for serialization. The changes of all runs
+        # in one reactor tick are saved once.
         if event == jobrun.JobRun.NOTIFY_STATE_CHANGED:
-            self.notify(self.NOTIFY_STATE_CHANGE)
+            self.changed_run_nums.add(job_run.run_num)
+            self.notify_later(self.NOTIFY_STATE_CHANGE)
             return
 
         # Propagate DONE JobRun notifications to JobScheduler
@@ -228,6 +271,7 @@ class JobScheduler(Observer):
         """Disable the job and cancel and pending scheduled jobs."""
         self.job.enabled = False
         self.job.runs.cancel_pending()
+        runtimer.RunTimer.get_instance().remove(self)
 
     @property
     def is_shutdown(self):
@@ -246,6 +290,8 @@ class JobScheduler(Observer):
         """Remove the pending run and create new runs with the new JobScheduler.
         """
         self.job.runs.remove_pending()
+        runtimer.RunTimer.get_instance().remove(self)
+        self.job.update_version()
         self.create_and_schedule_runs(ignore_last_run_time=True)
 
     def schedule(self):
@@ -257,10 +303,9 @@ class JobScheduler(Observer):
         self.create_and_schedule_runs()
 
     def _set_callback(self, job_run):
-        """Set a callback for JobRun to fire at the appropriate time."""
+        """Schedule the JobRun to be run by the RunTimer at its run time."""
         log.info("Scheduling next Jobrun for %s", self.job.name)
-        seconds = job_run.seconds_until_run_time()
-        eventloop.call_later(seconds, self.run_job, job_run)
+        runtimer.RunTimer.get_instance().schedule(self, job_run)
 
     # TODO: new class for this method
     def run_job(self, job_run, run_queued=False):
@@ -399,9 +444,10 @@ class JobCollection(object):
             proxy.attr_proxy('is_shutdown',         all)
         ])
 
-    def load_from_config(self, job_configs, factory, reconfigure):
+    def load_from_config(self, job_configs, factory, reconfigure, changed=None):
         """Apply a configuration to this collection and return a generator of
-        jobs which were added.
+        jobs which were added. If changed is a collection of job names, only
+        those jobs are rebuilt.
         """
         self.jobs.filter_by_name(job_configs)
 
@@ -411,6 +457,8 @@ class JobCollection(object):
                     job_scheduler.schedule()
                 yield job_scheduler.get_job()
 
+        if changed is not None:
+            job_configs = dict((name, job_configs[name]) for name in changed)
         seq = (factory.build(config) for config in job_configs.itervalues())
         return map_to_job_and_schedule(itertools.ifilter(self.add, seq))
 
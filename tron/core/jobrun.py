@@ -223,6 +223,8 @@ class JobRun(Observable, Observer):
         else:
             self.event.ok('succeeded')
 
+        self.action_runs.freeze_completed(self)
+
         # Notify Job that this JobRun is complete
         self.notify(self.NOTIFY_DONE)
 
@@ -240,6 +242,11 @@ class JobRun(Observable, Observer):
     def get_action_run(self, action_name):
         return self.action_runs.get(action_name)
 
+    def get_action_states(self):
+        """Return a list of (id, state) of each ActionRun."""
+        return [(action_run.id, action_run.state)
+                for action_run in self.action_runs.action_runs_with_cleanup]
+
     @property
     def state(self):
         """The overall state of this job run. Based on the state of its actions.
@@ -275,6 +282,116 @@ class JobRun(Observable, Observer):
         return "JobRun:%s" % self.id
 
 
+class JobRunStub(Observable):
+    """A lightweight placeholder for a completed JobRun restored from state.
+
+    A JobRunStub supports the attributes used to schedule new runs, and to
+    serialize the state of the Job, without building the ActionRuns, context,
+    and output paths of a full JobRun. Accessing any other attribute restores
+    the full JobRun, which replaces the stub in its JobRunCollection and
+    inherits its observers.
+    """
+
+    STATE_SUCCEEDED_NAMES = set(
+        [str(ActionRun.STATE_SUCCEEDED), str(ActionRun.STATE_SKIPPED)])
+
+    def __init__(self, state_data, run_collection, action_graph, output_path,
+                context, node_pool):
+        super(JobRunStub, self).__init__()
+        self.state_data         = state_data
+        self.run_collection     = run_collection
+        self.action_graph       = action_graph
+        self.output_path        = output_path
+        self.context            = context
+        self.node_pool          = node_pool
+        self.job_name           = state_data['job_name']
+        self.run_num            = state_data['run_num']
+        self.run_time           = state_data['run_time']
+        self.manual             = state_data.get('manual', False)
+        self.state              = self._get_state()
+        self._node              = None
+        self._job_run           = None
+
+    @classmethod
+    def is_stub_state(cls, state_data):
+        """Return True if every ActionRun in the state is in an end state."""
+        action_states = list(state_data['runs'])
+        if not action_states:
+            return False
+        if state_data.get('cleanup_run'):
+            action_states.append(state_data['cleanup_run'])
+
+        end_states = set(str(end_state) for end_state in ActionRun.END_STATES)
+        return all(run['state'] in end_states for run in action_states)
+
+    def _get_state(self):
+        """Return the same state as JobRun.state for a completed JobRun."""
+        action_states = [run['state'] for run in self.state_data['runs']]
+        cleanup_run = self.state_data.get('cleanup_run')
+        cleanup_states = [cleanup_run['state']] if cleanup_run else []
+
+        if set(action_states + cleanup_states) <= self.STATE_SUCCEEDED_NAMES:
+            return ActionRun.STATE_SUCCEEDED
+        if str(ActionRun.STATE_CANCELLED) in action_states + cleanup_states:
+            return ActionRun.STATE_CANCELLED
+        if str(ActionRun.STATE_FAILED) in action_states:
+            return ActionRun.STATE_FAILED
+        return ActionRun.STATE_UNKNOWN
+
+    @property
+    def id(self):
+        return '%s.%s' % (self.job_name, self.run_num)
+
+    def get_action_states(self):
+        """Return a list of (id, state) of each ActionRun, from the state
+        data, without restoring the JobRun.
+        """
+        action_states = list(self.state_data['runs'])
+        if self.state_data.get('cleanup_run'):
+            action_states.append(self.state_data['cleanup_run'])
+        return [('%s.%s' % (self.id, run['action_name']), run['state'])
+                for run in action_states]
+
+    @property
+    def node(self):
+        if not self._node:
+            pool_repo = node.NodePoolRepository.get_instance()
+            self._node = pool_repo.get_node(
+                self.state_data.get('node_name'), self.node_pool.next())
+        return self._node
+
+    # A completed run is never pending or active
+    is_scheduled = is_queued = is_running = is_starting = False
+
+    def restore(self):
+        """Restore the full JobRun and replace this stub with it."""
+        if self._job_run:
+            return self._job_run
+
+        log.info("Restoring %s from state", self)
+        self._job_run = JobRun.from_state(self.state_data, self.action_graph,
+            self.output_path.clone(), self.context, self.node)
+        self._job_run.share_observers(self)
+        self.run_collection.replace_run(self, self._job_run)
+        return self._job_run
+
+    def cleanup(self):
+        """Cleanup without restoring the full JobRun."""
+        event.EventManager.get_instance().remove(str(self))
+        self.clear_observers()
+        output_path = self.output_path.clone()
+        output_path.append(self.id)
+        output_path.delete()
+
+    def __getattr__(self, name):
+        if name.startswith('__') or 'state_data' not in self.__dict__:
+            raise AttributeError(name)
+        return getattr(self.restore(), name)
+
+    def __str__(self):
+        return "JobRun:%s" % self.id
+
+
 class JobRunCollection(object):
     """A JobRunCollection is a deque of JobRun objects. Responsible for
     ordering and logic related to a group of JobRuns which should all be runs
@@ -303,14 +420,24 @@ class JobRunCollection(object):
             msg = "State can not be restored to a collection with runs."
             raise ValueError(msg)
 
-        restored_runs = [
-            JobRun.from_state(run_state, action_graph, output_path.clone(),
-                context, node_pool.next())
-            for run_state in state_data
-        ]
+        def restore_run(run_state):
+            if JobRunStub.is_stub_state(run_state):
+                return JobRunStub(run_state, self, action_graph, output_path,
+                    context, node_pool)
+            return JobRun.from_state(run_state, action_graph,
+                output_path.clone(), context, node_pool.next())
+
+        restored_runs = [restore_run(run_state) for run_state in state_data]
         self.runs.extend(restored_runs)
         return restored_runs
 
+    def replace_run(self, old_run, new_run):
+        """Replace old_run with new_run, keeping the same position."""
+        for i, job_run in enumerate(self.runs):
+            if job_run is old_run:
+                self.runs[i] = new_run
+                return
+
     def build_new_run(self, job, run_time, node, manual=False):
         """Create a new run for the job, add it to the runs list,
         and return it.
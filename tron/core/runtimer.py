@@ -0,0 +1,141 @@
+"""
+ tron.core.runtimer
+
+ Start scheduled JobRuns from a single event loop timer. Scheduled runs are
+ kept in a heap ordered by the time they are due, and the timer is set for
+ the earliest run. When the timer fires, every run which is due (within
+ FIRE_WINDOW seconds) is started in one batch.
+
+ The entries of a JobScheduler are removed from the heap lazily when the job
+ is reconfigured or disabled. The heap is compacted once more than half of
+ its entries were removed.
+"""
+import heapq
+import itertools
+import logging
+
+from tron import eventloop
+
+log = logging.getLogger(__name__)
+
+
+class RunTimer(object):
+    """A Singleton which calls JobScheduler.run_job() for scheduled JobRuns
+    when they are due.
+    """
+
+    # Runs due within this many seconds of each other are started together
+    FIRE_WINDOW = 0.1
+
+    # The heap is not compacted until it has at least this many entries
+    COMPACT_MIN = 100
+
+    _instance = None
+
+    def __init__(self):
+        if self._instance is not None:
+            raise ValueError("RunTimer is already instantiated.")
+        self.heap           = []
+        self.counter        = itertools.count()
+        # Map of id(job_scheduler) to its entries in the heap
+        self.entries        = {}
+        self.removed_count  = 0
+        self.delayed_call   = eventloop.NullCallback
+        self.due            = None
+
+    @classmethod
+    def get_instance(cls):
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    @classmethod
+    def reset(cls):
+        if cls._instance and cls._instance.delayed_call.active():
+            cls._instance.delayed_call.cancel()
+        cls._instance = None
+
+    def schedule(self, job_scheduler, job_run):
+        """Call job_scheduler.run_job(job_run) at the run time of job_run."""
+        due = eventloop.seconds() + job_run.seconds_until_run_time()
+        entry = [due, self.counter.next(), job_scheduler, job_run]
+        self.entries.setdefault(id(job_scheduler), []).append(entry)
+        heapq.heappush(self.heap, entry)
+        self._set_timer()
+
+    def remove(self, job_scheduler):
+        """Remove the scheduled runs of job_scheduler. Called when its job is
+        reconfigured or disabled.
+        """
+        for entry in self.entries.pop(id(job_scheduler), ()):
+            entry[2] = entry[3] = None
+            self.removed_count += 1
+
+        if (len(self.heap) >= self.COMPACT_MIN and
+                self.removed_count * 2 > len(self.heap)):
+            self.compact()
+
+    def compact(self):
+        """Rebuild the heap without the removed entries."""
+        self.heap = [entry for entry in self.heap if entry[2] is not None]
+        heapq.heapify(self.heap)
+        self.removed_count = 0
+
+    def _pop(self):
+        """Pop the next entry from the heap. Returns None for a removed
+        entry.
+        """
+        entry = heapq.heappop(self.heap)
+        job_scheduler = entry[2]
+        if job_scheduler is None:
+            self.removed_count -= 1
+            return None
+
+        entries = self.entries[id(job_scheduler)]
+        entries.remove(entry)
+        if not entries:
+            del self.entries[id(job_scheduler)]
+        return entry
+
+    def _set_timer(self):
+        while self.heap and self.heap[0][2] is None:
+            self._pop()
+        if not self.heap:
+            return
+
+        due = self.heap[0][0]
+        if self.delayed_call.active():
+            if self.due <= due:
+                return
+            self.delayed_call.cancel()
+
+        self.due = due
+        delay = max(0, due - eventloop.seconds())
+        self.delayed_call = eventloop.call_later(delay, self.fire)
+
+    def fire(self):
+        """Start the runs which are due, and set the timer for the next run."""
+        fire_until = eventloop.seconds() + self.FIRE_WINDOW
+        batch = []
+        while self.heap and self.heap[0][0] <= fire_until:
+            entry = self._pop()
+            if entry:
+                batch.append(entry)
+
+        log.debug("Starting %d scheduled runs.", len(batch))
+        for _, _, job_scheduler, job_run in batch:
+            try:
+                job_scheduler.run_job(job_run)
+            except Exception:
+                log.exception("Failed to start %s", job_run)
+        self._set_timer()
+
+    def get_upcoming(self, num_runs=None):
+        """Return the scheduled JobRuns, ordered by when they are due."""
+        entries = (entry for entry in sorted(self.heap)
+                   if entry[3] is not None and entry[3].is_scheduled)
+        return [job_run for _, _, _, job_run in
+                itertools.islice(entries, num_runs)]
+
+    def __len__(self):
+        return len(self.heap) - self.removed_count
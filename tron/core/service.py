@@ -104,7 +104,7 @@ class Service(observer.Observer, observer.Observable):
         """Handle any changes to the state of this service's instances."""
         if event == serviceinstance.ServiceInstance.STATE_DOWN:
             self.instances.clear_down()
-            self.notify(self.NOTIFY_STATE_CHANGE)
+            self.notify_later(self.NOTIFY_STATE_CHANGE)
 
         if event in (serviceinstance.ServiceInstance.STATE_FAILED,
                      serviceinstance.ServiceInstance.STATE_UP):
@@ -159,9 +159,10 @@ class ServiceCollection(object):
     def __init__(self):
         self.services = collections.MappingCollection('services')
 
-    def load_from_config(self, service_configs, context):
+    def load_from_config(self, service_configs, context, changed=None):
         """Apply a configuration to this collection and return a generator of
-        services which were added.
+        services which were added. If changed is a collection of service
+        names, only those services are rebuilt.
         """
         self.services.filter_by_name(service_configs.keys())
 
@@ -169,6 +170,9 @@ class ServiceCollection(object):
             log.debug("Building new service %s", config.name)
             return Service.from_config(config, context)
 
+        if changed is not None:
+            service_configs = dict(
+                (name, service_configs[name]) for name in changed)
         seq = (build(config) for config in service_configs.itervalues())
         return itertools.ifilter(self.add, seq)
 
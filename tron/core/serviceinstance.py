@@ -1,6 +1,7 @@
 import logging
 
 import operator
+import pipes
 import signal
 
 from tron import command_context, actioncommand
@@ -25,11 +26,12 @@ def create_hang_check(delay, func):
 
 def build_action(task, command=None):
     """Create an action for a task which is an Observer, and which has
-    properties 'task_name', 'command', and 'buffer_store'.
+    properties 'task_name', 'command', 'priority' and 'buffer_store'.
     """
     name = '%s.%s' % (task.id, task.task_name)
     command = command or task.command
-    action = ActionCommand(name, command, serializer=task.buffer_store)
+    action = ActionCommand(name, command,
+        serializer=task.buffer_store, priority=task.priority)
     task.watch(action)
     return action
 
@@ -54,52 +56,118 @@ def get_failures_from_task(task):
     return task.buffer_store.get_stream(actioncommand.ActionCommand.STDERR)
 
 
-class ServiceInstanceMonitorTask(observer.Observable, observer.Observer):
-    """ServiceInstance task which monitors the service process and
-    notifies observers if the process is up or down. Also monitors itself
-    to ensure this check does not hang.
+def build_monitor_command(pid_filenames):
+    """Return a command which checks the process in each pid file, and
+    prints the exit status of each check on a separate line.
+    """
+    pid_files = ' '.join(pipes.quote(filename) for filename in pid_filenames)
+    return ('for pid_file in %s; do cat "$pid_file" | xargs kill -0 '
+            '>/dev/null 2>&1; echo $?; done' % pid_files)
 
-    This task will be a no-op if interval is Falsy.
+
+def parse_monitor_output(output, count):
+    """Return a list of count results from the output of a monitor command,
+    True if the process is up, False if it is down and None if the command
+    did not print a result.
+    """
+    statuses = output.split()
+    return [statuses[i] == '0' if i < len(statuses) else None
+            for i in xrange(count)]
+
+
+class NodeMonitor(observer.Observer):
+    """Check the pid files of the ServiceInstanceMonitorTasks on a node with
+    a single command. Tasks are scheduled with the number of seconds until
+    they are due. When the timer fires every task which is due, or is due
+    within EARLY_CHECK_RATIO of its interval, is checked in one batch, so that
+    the checks on a node converge into the same batch. The result for each
+    pid file is passed back to its task.
     """
-    NOTIFY_START            = 'monitor_task_notify_start'
-    NOTIFY_FAILED           = 'monitor_task_notify_failed'
-    NOTIFY_UP               = 'monitor_task_notify_up'
-    NOTIFY_DOWN             = 'monitor_task_notify_down'
 
-    command_template        = "cat %s | xargs kill -0"
-    task_name               = 'monitor'
+    EARLY_CHECK_RATIO   = 0.5
 
-    def __init__(self, id, node, interval, pid_filename):
-        super(ServiceInstanceMonitorTask, self).__init__()
-        self.interval            = interval or 0
+    task_name           = 'monitor'
+    priority            = ActionCommand.PRIORITY_HIGH
+
+    def __init__(self, node):
         self.node                = node
-        self.id                  = id
-        self.pid_filename        = pid_filename
+        self.id                  = node.get_name()
+        self.tasks               = {}
+        self.batch               = []
+        self.checking            = set()
         self.action              = actioncommand.CompletedActionCommand
-        self.callback            = eventloop.UniqueCallback(
-                                    self.interval, self.run)
-        self.hang_check_callback = create_hang_check(self.interval, self.fail)
         self.buffer_store        = actioncommand.StringBufferStore()
+        self.command             = None
+        self.delayed_call        = eventloop.NullCallback
+        self.due                 = None
+        self.hang_check_callback = eventloop.NullCallback
+
+    def schedule(self, task, delay):
+        """Check the pid file of task in delay seconds."""
+        if task in self.checking:
+            log.warn("%s: %s is already being checked.", self, task)
+            return
+        self.tasks[task] = eventloop.seconds() + delay
+        self._set_timer()
+
+    def remove(self, task):
+        """Stop checking task, and ignore its result if it is being checked."""
+        self.tasks.pop(task, None)
+        self.checking.discard(task)
+        if not self.tasks and self.delayed_call.active():
+            self.delayed_call.cancel()
+
+    def _set_timer(self):
+        if not self.tasks or self.checking:
+            return
 
-    def queue(self):
-        """Queue this task to run after monitor_interval."""
-        log.info("Queueing %s" % self)
-        self.callback.start()
+        due = min(self.tasks.itervalues())
+        if self.delayed_call.active():
+            if self.due <= due:
+                return
+            self.delayed_call.cancel()
+
+        self.due = due
+        delay = max(0, due - eventloop.seconds())
+        self.delayed_call = eventloop.call_later(delay, self.run)
+
+    def get_due_tasks(self):
+        now = eventloop.seconds()
+        def is_due(task):
+            return self.tasks[task] - task.interval * self.EARLY_CHECK_RATIO <= now
+        return sorted(filter(is_due, self.tasks), key=lambda task: task.id)
 
     def run(self):
-        """Run the monitoring command."""
-        if not self.action.is_done:
+        """Check the pid files of the tasks which are due."""
+        if self.checking:
             log.warn("%s: Monitor action already exists.", self)
             return
 
-        self.notify(self.NOTIFY_START)
-        self.action = build_action(self)
-        if run_action(self, self.action):
-            self.hang_check_callback.start()
+        self.batch = self.get_due_tasks()
+        if not self.batch:
+            return self._set_timer()
 
-    @property
-    def command(self):
-        return self.command_template % self.pid_filename
+        for task in self.batch:
+            del self.tasks[task]
+        self.checking = set(self.batch)
+        for task in self.batch:
+            task.notify(task.NOTIFY_START)
+
+        self.buffer_store.clear()
+        self.command = build_monitor_command(
+            task.pid_filename for task in self.batch)
+        self.action = build_action(self)
+        log.debug("Checking %d pid files on %s", len(self.batch), self.node)
+        try:
+            self.node.submit_command(self.action)
+        except node.Error, e:
+            log.error("Failed to run %s on %s: %s", self.action, self.node, e)
+            return self._fail_batch("Node run failure for monitor: %s" % e)
+
+        interval = min(task.interval for task in self.batch)
+        self.hang_check_callback.cancel()
+        self.hang_check_callback = create_hang_check(interval, self.fail)
+        self.hang_check_callback.start()
 
     def handle_action_event(self, action, event):
         if action != self.action:
@@ -112,14 +180,130 @@ class ServiceInstanceMonitorTask(observer.Observable, observer.Observer):
             self._handle_action_exit()
         if event == ActionCommand.FAILSTART:
             self.hang_check_callback.cancel()
-            self.notify(self.NOTIFY_FAILED)
-            self.queue()
+            self._fail_batch("Failed to start monitor command.", retry=True)
 
     handler = handle_action_event
 
     def _handle_action_exit(self):
-        log.debug("%s exit, failure: %r", self, self.action.is_failed)
         if self.action.is_failed:
+            stderr = self.buffer_store.get_stream(ActionCommand.STDERR)
+            return self._fail_batch(
+                "Monitor command failed: %s" % (stderr or self.action.exit_status))
+
+        output = self.buffer_store.get_stream(ActionCommand.STDOUT)
+        results = parse_monitor_output(output, len(self.batch))
+        batch, checking = self._clear_batch()
+        for task, is_up in zip(batch, results):
+            if task not in checking:
+                continue
+            if is_up is None:
+                task.handle_check_failure("Monitor command had no result.")
+            else:
+                task.handle_check_result(is_up)
+        self._set_timer()
+
+    def fail(self):
+        """Called when the monitor command has not exited in time."""
+        log.warning("%s is still running %s.", self, self.action)
+        self.node.stop(self.action)
+        self.action = actioncommand.CompletedActionCommand
+        self._fail_batch("Monitoring failed")
+
+    def _fail_batch(self, message, retry=False):
+        batch, checking = self._clear_batch()
+        for task in batch:
+            if task in checking:
+                task.handle_check_failure(message, retry)
+        self._set_timer()
+
+    def _clear_batch(self):
+        batch, checking = self.batch, self.checking
+        self.batch, self.checking = [], set()
+        return batch, checking
+
+    def __len__(self):
+        return len(self.tasks) + len(self.checking)
+
+    def __str__(self):
+        return "%s(%s)" % (self.__class__.__name__, self.id)
+
+
+class NodeMonitorRepository(object):
+    """A Singleton which keeps a NodeMonitor for each Node."""
+
+    _instance = None
+
+    def __init__(self):
+        if self._instance is not None:
+            raise ValueError("NodeMonitorRepository is already instantiated.")
+        self.monitors = {}
+
+    @classmethod
+    def get_instance(cls):
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    @classmethod
+    def reset(cls):
+        cls._instance = None
+
+    def get_monitor(self, node):
+        """Return the NodeMonitor for node. NodeMonitors of nodes which were
+        removed by a reconfiguration are discarded once they are empty.
+        """
+        key = id(node)
+        if key not in self.monitors:
+            self.prune()
+            self.monitors[key] = NodeMonitor(node)
+        return self.monitors[key]
+
+    def prune(self):
+        for key, monitor in self.monitors.items():
+            if not monitor:
+                del self.monitors[key]
+
+
+class ServiceInstanceMonitorTask(observer.Observable):
+    """ServiceInstance task which monitors the service process and
+    notifies observers if the process is up or down. The pid file is checked
+    by the NodeMonitor of the node, in a batch with the other pid files on
+    that node.
+
+    This task will be a no-op if interval is Falsy.
+    """
+    NOTIFY_START            = 'monitor_task_notify_start'
+    NOTIFY_FAILED           = 'monitor_task_notify_failed'
+    NOTIFY_UP               = 'monitor_task_notify_up'
+    NOTIFY_DOWN             = 'monitor_task_notify_down'
+
+    task_name               = 'monitor'
+
+    def __init__(self, id, node, interval, pid_filename):
+        super(ServiceInstanceMonitorTask, self).__init__()
+        self.interval            = interval or 0
+        self.node                = node
+        self.id                  = id
+        self.pid_filename        = pid_filename
+        self.node_monitor        = NodeMonitorRepository.get_instance(
+                                    ).get_monitor(node)
+        self.buffer_store        = actioncommand.StringBufferStore()
+
+    def queue(self):
+        """Queue this task to run after monitor_interval."""
+        if not self.interval:
+            return
+        log.info("Queueing %s" % self)
+        self.node_monitor.schedule(self, self.interval)
+
+    def run(self):
+        """Check the pid file with the next batch on the node."""
+        self.node_monitor.schedule(self, 0)
+
+    def handle_check_result(self, is_up):
+        log.debug("%s is up: %r", self, is_up)
+        if not is_up:
+            self.write_stderr("No process found for %s" % self.pid_filename)
             self.notify(self.NOTIFY_FAILED)
             return
 
@@ -127,17 +311,18 @@ class ServiceInstanceMonitorTask(observer.Observable, observer.Observer):
         self.queue()
         self.buffer_store.clear()
 
-    def cancel(self):
-        """Cancel the monitor callback and hang check."""
-        self.callback.cancel()
-        self.hang_check_callback.cancel()
-
-    def fail(self):
-        log.warning("%s is still running %s.", self, self.action)
-        self.node.stop(self.action)
-        self.action.write_stderr("Monitoring failed")
+    def handle_check_failure(self, message, retry=False):
+        self.write_stderr(message)
         self.notify(self.NOTIFY_FAILED)
-        self.action = actioncommand.CompletedActionCommand
+        if retry:
+            self.queue()
+
+    def write_stderr(self, message):
+        self.buffer_store.open(actioncommand.ActionCommand.STDERR).write(message)
+
+    def cancel(self):
+        """Stop checking the pid file."""
+        self.node_monitor.remove(self)
 
     def __str__(self):
         return "%s(%s)" % (self.__class__.__name__, self.id)
@@ -151,6 +336,7 @@ class ServiceInstanceStopTask(observer.Observable, observer.Observer):
 
     command_template            = "cat %s | xargs kill -%s"
     task_name                   = 'stop'
+    priority                    = ActionCommand.PRIORITY_HIGH
 
     def __init__(self, id, node, pid_filename):
         super(ServiceInstanceStopTask, self).__init__()
@@ -198,6 +384,7 @@ class ServiceInstanceStartTask(observer.Observable, observer.Observer):
     NOTIFY_STARTED          = 'start_task_notify_started'
 
     task_name               = 'start'
+    priority                = ActionCommand.PRIORITY_NORMAL
 
     def __init__(self, id, node):
         super(ServiceInstanceStartTask, self).__init__()
@@ -1,20 +1,55 @@
+import collections
 import logging
+from twisted.internet import threads
 from twisted.python import log
 from tron import event
+from tron import eventloop
 
 
 logger = logging.getLogger(__name__)
 
 
+def build_digest(errors, num_dropped=0):
+    """Return the subject and content of an email for errors, a mapping of
+    error text to the number of times it happened.
+    """
+    total = sum(errors.itervalues()) + num_dropped
+    if total == 1:
+        return "Tron Exception", errors.keys()[0]
+
+    lines = ["%d errors, %d distinct:" % (total, len(errors)), ""]
+    for text, count in errors.iteritems():
+        lines.extend(["%d x %s" % (count, text), ""])
+    if num_dropped:
+        lines.append("%d more errors were not included." % num_dropped)
+    return "Tron Exceptions (%d)" % total, "\n".join(lines).rstrip()
+
+
 class CrashReporter(object):
     """Observer for twisted events that can send emails on crashes
 
+    Errors are sent as a digest, so at most one email is sent every
+    digest_interval seconds. Repeats of the same error are counted, and the
+    email is sent from a thread so that a slow SMTP host does not block the
+    reactor.
+
     Based on twisted.log.PythonLoggingObserver
     """
 
-    def __init__(self, emailer):
-        self.emailer        = emailer
-        self.event_recorder = event.get_recorder(str(self))
+    DEFAULT_DIGEST_INTERVAL     = 60
+
+    # Most distinct errors which are included in one digest
+    MAX_DISTINCT_ERRORS         = 20
+
+    def __init__(self, emailer, digest_interval=DEFAULT_DIGEST_INTERVAL):
+        self.emailer            = emailer
+        self.digest_interval    = digest_interval
+        self.event_recorder     = event.get_recorder(str(self))
+        self.errors             = collections.OrderedDict()
+        self.num_dropped        = 0
+        self.last_sent          = None
+        self.in_flight          = None
+        self.delayed_call       = eventloop.NullCallback
 
     def _get_level(self, event_dict):
         """Returns the logging level for an event."""
@@ -37,19 +72,60 @@ class CrashReporter(object):
         if self._get_level(event_dict) < logging.ERROR:
             return
 
-        try:
-            self.event_recorder.critical("crash", msg=text)
-            self.emailer.send(text)
+        self.event_recorder.critical("crash", msg=text)
+        self.add_error(text)
+
+    def add_error(self, text):
+        """Add an error to the next digest, and schedule the digest to be
+        sent.
+        """
+        if text in self.errors or len(self.errors) < self.MAX_DISTINCT_ERRORS:
+            self.errors[text] = self.errors.get(text, 0) + 1
+        else:
+            self.num_dropped += 1
+        self._schedule()
+
+    def _schedule(self):
+        if self.in_flight or self.delayed_call.active():
+            return
+
+        delay = 0
+        if self.last_sent is not None:
+            next_send = self.last_sent + self.digest_interval
+            delay = max(0, next_send - eventloop.seconds())
+        self.delayed_call = eventloop.call_later(delay, self.send)
+
+    def send(self):
+        """Send the errors since the last digest from a thread."""
+        if self.in_flight or not self.errors:
+            return
+
+        subject, content = build_digest(self.errors, self.num_dropped)
+        self.errors, self.num_dropped = collections.OrderedDict(), 0
+        self.last_sent = eventloop.seconds()
+        self.in_flight = threads.deferToThread(
+            self.emailer.send, content, subject)
+        self.in_flight.addErrback(self._handle_error, content)
+        self.in_flight.addBoth(self._handle_done)
+
+    def _handle_error(self, failure, content):
+        logger.error("Error sending notification: %s", failure.value)
+        self.event_recorder.critical("email_failure", msg=content)
 
-        except Exception:
-            logger.exception("Error sending notification")
-            self.event_recorder.critical("email_failure", msg=text)
+    def _handle_done(self, _):
+        self.in_flight = None
+        if self.errors:
+            self._schedule()
 
     def start(self):
         log.addObserver(self.emit)
 
     def stop(self):
+        """Stop observing errors, and send the errors which are pending."""
         log.removeObserver(self.emit)
+        if self.delayed_call.active():
+            self.delayed_call.cancel()
+        self.send()
 
     def __str__(self):
         return 'CrashReporter'
@@ -1,7 +1,7 @@
-from collections import deque
-import logging
-import operator
+import bisect
+import heapq
 import itertools
+import logging
 
 from tron.utils import timeutils
 
@@ -36,40 +36,190 @@ LEVEL_NOTICE    = EventLevel(2, "NOTICE")       # Troubling behaviour
 LEVEL_CRITICAL  = EventLevel(3, "CRITICAL")     # Major Failure
 
 
-class EventStore(object):
-    """An index of event level to a circular buffer of events. Supports
-    retrieving events which with a minimal level.
+LEVELS          = [LEVEL_INFO, LEVEL_OK, LEVEL_NOTICE, LEVEL_CRITICAL]
+
+
+def get_level(label):
+    """Return the EventLevel with label (case insensitive), or None."""
+    for level in LEVELS:
+        if level.label == label.upper():
+            return level
+
+
+def get_prefixes(entity_name):
+    """Yield entity_name and the name of each of its ancestors, including
+    the root name ''.
     """
-    DEFAULT_LIMIT   = 10
-    NO_LEVEL        = EventLevel(None, None)
+    yield ''
+    parts = entity_name.split(NAME_CHARACTER) if entity_name else []
+    for i in xrange(1, len(parts) + 1):
+        yield NAME_CHARACTER.join(parts[:i])
 
-    def __init__(self, limits=None):
-        self.limits = limits or dict()
-        self.events = {}
 
-    def _build_deque(self, category):
-        limit = self.limits.get(category, self.DEFAULT_LIMIT)
-        return deque(maxlen=limit)
+class EventStore(object):
+    """An append-only log of events, ordered by the time they were recorded.
+    Each event has a sequence number, which is its position in the log.
+
+    The sequence numbers of events are indexed by (entity, level), and by
+    (prefix, level) for the entity and each of its ancestors, so that the
+    events of an entity, or of an entity and its children, are found without
+    scanning the log. The log keeps the most recent max_events events. Older
+    events are removed in batches of a quarter of max_events.
+
+    If the store has an archive (an EventLog) every event is also appended
+    to the archive. Queries which page back past the events in memory, with
+    before or with a since older than them, also read the archive.
+    """
+    DEFAULT_MAX_EVENTS  = 10000
+
+    def __init__(self, max_events=DEFAULT_MAX_EVENTS):
+        self.max_events     = max_events
+        self.archive        = None
+        self.clear()
+
+    def clear(self, offset=0):
+        self.events         = []
+        self.times          = []
+        self.offset         = offset
+        self.levels         = set()
+        self.by_entity      = {}
+        self.by_prefix      = {}
+
+    def set_archive(self, archive):
+        """Set the EventLog which events are appended to. The events in
+        memory which are not in the archive yet are appended to it. If the
+        archive already has later sequence numbers (as it does after a
+        restart) the events in memory are numbered to follow them.
+        """
+        if self.archive:
+            self.archive.close()
+        self.archive = archive
+        if not archive:
+            return
+
+        if archive.next_seq > self.seq:
+            events = self.events
+            self.clear(archive.next_seq)
+            for recorded_event in events:
+                self.append(recorded_event)
+            return
+
+        start = max(0, archive.next_seq - self.offset)
+        for recorded_event in self.events[start:]:
+            archive.append(recorded_event)
+
+    @property
+    def seq(self):
+        """The sequence number of the next event."""
+        return self.offset + len(self.events)
 
     def append(self, event):
-        level = event.level
-        if level not in self.events:
-            self.events[level] = self._build_deque(level)
-        self.events[level].append(event)
+        seq, level = self.seq, event.level
+        # Keep the time index sorted, even if the clock goes backwards
+        time = max(event.time, self.times[-1]) if self.times else event.time
+        event.seq = seq
+        self.events.append(event)
+        self.times.append(time)
+        self.levels.add(level)
+        self.by_entity.setdefault((event.entity, level), []).append(seq)
+        for prefix in get_prefixes(event.entity):
+            self.by_prefix.setdefault((prefix, level), []).append(seq)
+
+        if self.archive:
+            self.archive.append(event)
+        if len(self.events) > self.max_events + self.max_events / 4:
+            self.trim()
+
+    def set_max_events(self, max_events):
+        self.max_events = max_events
+        if len(self.events) > max_events:
+            self.trim()
+
+    def trim(self):
+        """Remove the oldest events, and their sequence numbers from the
+        indexes, so that at most max_events events are kept.
+        """
+        count = len(self.events) - self.max_events
+        if count <= 0:
+            return
+        del self.events[:count]
+        del self.times[:count]
+        self.offset += count
+        for index in (self.by_entity, self.by_prefix):
+            for key, seqs in index.items():
+                del seqs[:bisect.bisect_left(seqs, self.offset)]
+                if not seqs:
+                    del index[key]
+
+    def get_seq(self, since):
+        """Return the sequence number of the first event at or after the
+        time since.
+        """
+        return self.offset + bisect.bisect_left(self.times, since)
+
+    def get_events(self, entity_name='', min_level=None, since=None,
+            limit=None, include_children=True, before=None):
+        """Return the events of entity_name, most recent first. Events of
+        the children of entity_name are included if include_children is
+        True. Only events with a level of at least min_level, which were
+        recorded at or after the time since, and which have a sequence
+        number less than before are returned.
+        """
+        index = self.by_prefix if include_children else self.by_entity
+        start = self.get_seq(since) if since is not None else self.offset
+        end = self.seq if before is None else before
+        levels = (level for level in self.levels
+                  if min_level is None or level >= min_level)
+        seqs = (index.get((entity_name, level)) for level in levels)
+
+        def newest_first(seqs):
+            first = bisect.bisect_left(seqs, start)
+            last = bisect.bisect_left(seqs, end) - 1
+            for i in xrange(last, first - 1, -1):
+                yield -seqs[i]
+
+        merged = heapq.merge(*[newest_first(s) for s in seqs if s])
+        events = [self.events[-neg_seq - self.offset]
+                  for neg_seq in itertools.islice(merged, limit)]
+
+        if self._use_archive(since, before, limit, len(events)):
+            remaining = None if limit is None else limit - len(events)
+            end = self.offset if before is None else min(before, self.offset)
+            events.extend(self.archive.get_events(entity_name, min_level,
+                since, remaining, include_children, end))
+        return events
+
+    def _use_archive(self, since, before, limit, count):
+        """Return True if the query pages back past the events in memory, and
+        the archive may have more of the events which were not found.
+        """
+        if not self.archive or (limit is not None and count >= limit):
+            return False
+        if before is not None:
+            return before > 0
+        return since is not None and (not self.times or self.times[0] > since)
+
+    def flush(self):
+        if self.archive:
+            self.archive.flush()
 
-    def get_events(self, min_level=None):
-        min_level       = min_level or self.NO_LEVEL
-        event_iterable  = self.events.iteritems()
-        groups          = (e for key, e in event_iterable if key >= min_level)
-        return itertools.chain.from_iterable(groups)
-    __iter__ = get_events
+    def close(self):
+        if self.archive:
+            self.archive.close()
+
+    def __iter__(self):
+        return iter(self.events)
+
+    def __len__(self):
+        return len(self.events)
 
 
 class Event(object):
     """Data object for storing details of an event."""
-    __slots__ = ('entity', 'time', 'level', 'name', 'data')
+    __slots__ = ('entity', 'time', 'level', 'name', 'data', 'seq')
 
     def __init__(self, entity, level, name, **data):
+        self.seq        = None
         self.entity     = entity
         self.time       = timeutils.current_time()
         self.level      = level
@@ -79,14 +229,15 @@ class Event(object):
 
 class EventRecorder(object):
     """A node in a tree which stores EventRecorders, links to children,
-    and adds missing children on get_child().
+    and adds missing children on get_child(). All recorders in a tree record
+    events to the same EventStore.
     """
     __slots__ = ('name', 'children', 'events')
 
-    def __init__(self, name):
+    def __init__(self, name, events=None):
         self.name           = name
         self.children       = {}
-        self.events         = EventStore()
+        self.events         = EventStore() if events is None else events
 
     def get_child(self, child_key):
         if child_key in self.children:
@@ -95,7 +246,7 @@ class EventRecorder(object):
         split_char      = NAME_CHARACTER
         name_parts      = [self.name, child_key] if self.name else [child_key]
         child_name      = split_char.join(name_parts)
-        child           = EventRecorder(child_name)
+        child           = EventRecorder(child_name, self.events)
         return self.children.setdefault(child_key, child)
 
     def remove_child(self, child_key):
@@ -105,22 +256,11 @@ class EventRecorder(object):
     def _record(self, level, name, **data):
         self.events.append(Event(self.name, level, name, **data))
 
-    def list(self, min_level=None, child_events=True):
-        if child_events:
-            events = self._events_with_child_events(min_level)
-        else:
-            events = self.events.get_events(min_level)
-        return sorted(events, key=operator.attrgetter('time'), reverse=True)
-
-    def _events_with_child_events(self, min_level):
-        """Yield all events and all child events which were recorded with a
-        level greater than or equal to min_level.
-        """
-        for event in self.events.get_events(min_level):
-            yield event
-        for child in self.children.itervalues():
-            for event in child._events_with_child_events(min_level):
-                yield event
+    def list(self, min_level=None, child_events=True, since=None, limit=None,
+            before=None):
+        """Return the events of this recorder, most recent first."""
+        return self.events.get_events(
+            self.name, min_level, since, limit, child_events, before)
 
     def info(self, name, **data):
         return self._record(LEVEL_INFO,     name, **data)
@@ -164,6 +304,9 @@ class EventManager(object):
     def _get_name_parts(self, entity_name):
         return entity_name.split(NAME_CHARACTER) if entity_name else []
 
+    def get_store(self):
+        return self.root_recorder.events
+
     def get(self, entity_name):
         """Search for and return the event recorder in the tree."""
         recorder = self.root_recorder
@@ -174,7 +317,7 @@ class EventManager(object):
 
     @classmethod
     def reset(cls):
-        cls.get_instance().recorders = EventRecorder('')
+        cls.get_instance().root_recorder = EventRecorder('')
 
     def remove(self, entity_name):
         """Remove an event recorder."""
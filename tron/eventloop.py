@@ -25,6 +25,11 @@ def call_later(interval, *args, **kwargs):
     return reactor.callLater(interval, *args, **kwargs)
 
 
+def seconds():
+    """Return the current time of the event loop, in seconds."""
+    return reactor.seconds()
+
+
 class UniqueCallback(object):
     """Wrap a DelayedCall so there can be only one instance of this call
     queued at a time. A Falsy delay causes this object to do nothing.
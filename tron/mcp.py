@@ -2,13 +2,16 @@ from __future__ import with_statement
 import logging
 
 from tron import command_context, actioncommand
+from tron import changefeed
 from tron import event
 from tron import crash_reporter
 from tron import node
 from tron.config import manager
 from tron.core import service, job
+from tron.serialize import eventlog
 from tron.serialize.runstate import statemanager
 from tron.utils import emailer
+from tron.utils import observer
 
 
 log = logging.getLogger(__name__)
@@ -23,9 +26,24 @@ def apply_master_configuration(mapping, master_config):
         func(*args)
 
 
+def get_changed_names(diff):
+    return diff['added'] + diff['updated']
+
+
 class MasterControlProgram(object):
     """Central state object for the Tron daemon."""
 
+    # Jobs and services are built using these master config values. When any
+    # of them changes, every job and service is rebuilt.
+    BUILD_CONFIG_KEYS = [
+        'time_zone',
+        'output_stream_dir',
+        'action_runner',
+        'nodes',
+        'node_pools',
+        'ssh_options',
+    ]
+
     def __init__(self, working_dir, config_path):
         super(MasterControlProgram, self).__init__()
         self.jobs               = job.JobCollection()
@@ -37,19 +55,28 @@ class MasterControlProgram(object):
         self.event_recorder     = event.get_recorder()
         self.event_recorder.ok('started')
         self.state_watcher      = statemanager.StateChangeWatcher()
+        self.change_feed        = changefeed.ChangeFeed()
+        self.config_container   = None
+        self.config_diff        = None
 
     def shutdown(self):
+        # Save the state changes which have not been dispatched yet
+        observer.NotificationBus.get_instance().flush()
         self.state_watcher.shutdown()
+        event.EventManager.get_instance().get_store().close()
 
     def graceful_shutdown(self):
         """Inform JobCollection that a shutdown has been requested."""
         self.jobs.request_shutdown()
 
     def reconfigure(self):
-        """Reconfigure MCP while Tron is already running."""
+        """Reconfigure MCP while Tron is already running. Returns the diff
+        from the previous configuration.
+        """
         self.event_recorder.ok("reconfigured")
         try:
             self._load_config(reconfigure=True)
+            return self.config_diff
         except Exception:
             self.event_recorder.critical("reconfigure_failure")
             log.exception("reconfigure failure")
@@ -79,21 +106,45 @@ class MasterControlProgram(object):
                                                          'node_pools',
                                                          'ssh_options'),
             (self.apply_notification_options,            'notification_options'),
+            (self.apply_event_options,                   'events'),
         ]
         master_config = config_container.get_master()
         apply_master_configuration(master_config_directives, master_config)
 
+        previous = self.config_container
+        diff = config_container.get_diff(previous)
+        if self.requires_rebuild(previous, master_config):
+            changed_jobs = changed_services = None
+        else:
+            changed_jobs = get_changed_names(diff['jobs'])
+            changed_services = get_changed_names(diff['services'])
+
         # TODO: unify NOTIFY_STATE_CHANGE and simplify this
         factory = self.build_job_scheduler_factory(master_config)
         self.apply_collection_config(config_container.get_jobs(),
-            self.jobs, job.Job.NOTIFY_STATE_CHANGE, factory, reconfigure)
+            self.jobs, job.Job.NOTIFY_STATE_CHANGE, factory, reconfigure,
+            changed_jobs)
 
         self.apply_collection_config(config_container.get_services(),
-            self.services, service.Service.NOTIFY_STATE_CHANGE, self.context)
+            self.services, service.Service.NOTIFY_STATE_CHANGE, self.context,
+            changed_services)
+        self.config_container, self.config_diff = config_container, diff
+
+    def requires_rebuild(self, previous, master_config):
+        """Return True if every job and service should be rebuilt, because
+        there is no previous config, or a master config value they are built
+        with has changed.
+        """
+        if not previous:
+            return True
+        previous_master = previous.get_master()
+        return any(getattr(previous_master, key) != getattr(master_config, key)
+                   for key in self.BUILD_CONFIG_KEYS)
 
     def apply_collection_config(self, config, collection, notify_type, *args):
-        items = collection.load_from_config(config, *args)
+        items = list(collection.load_from_config(config, *args))
         self.state_watcher.watch_all(items, notify_type)
+        self.change_feed.watch_all(items, notify_type)
 
     def build_job_scheduler_factory(self, master_config):
         output_stream_dir = master_config.output_stream_dir or self.working_dir
@@ -123,9 +174,15 @@ class MasterControlProgram(object):
             self.crash_reporter.stop()
 
         email_sender = emailer.Emailer(conf.smtp_host, conf.notification_addr)
-        self.crash_reporter = crash_reporter.CrashReporter(email_sender)
+        self.crash_reporter = crash_reporter.CrashReporter(
+            email_sender, conf.digest_interval)
         self.crash_reporter.start()
 
+    def apply_event_options(self, events_config):
+        store = event.EventManager.get_instance().get_store()
+        store.set_max_events(events_config.max_events)
+        eventlog.update_archive(store, events_config)
+
     def set_context_base(self, command_context):
         self.context.base = command_context
 
@@ -135,9 +192,21 @@ class MasterControlProgram(object):
     def get_service_collection(self):
         return self.services
 
+    def get_change_feed(self):
+        return self.change_feed
+
+    def get_state_watcher(self):
+        return self.state_watcher
+
     def get_config_manager(self):
         return self.config
 
+    def get_config_diff(self):
+        """Return the diff of the last applied config from the config before
+        it.
+        """
+        return self.config_diff
+
     def restore_state(self):
         """Use the state manager to retrieve to persisted state and apply it
         to the configured Jobs and Services.
@@ -149,6 +218,7 @@ class MasterControlProgram(object):
         self.jobs.restore_state(job_states)
         self.services.restore_state(service_states)
         self.state_watcher.save_metadata()
+        self.change_feed.snapshot_all()
 
     def __str__(self):
         return "MCP"
@@ -1,14 +1,16 @@
+import heapq
 import logging
 import itertools
-import random
+from collections import deque
 from twisted.conch.client.knownhosts import KnownHostsFile
 
 from twisted.internet import protocol, defer, reactor
 from twisted.python import failure
 from twisted.python.filepath import FilePath
 
-from tron import ssh, eventloop
-from tron.utils import twistedutils, collections
+from tron import ssh, eventloop, placement
+from tron.config import schema
+from tron.utils import twistedutils, collections, timeutils
 
 
 log = logging.getLogger(__name__)
@@ -32,6 +34,13 @@ RUN_STATE_RUNNING = 10
 # Process has exited
 RUN_STATE_COMPLETE = 100
 
+# Failures on a node within this many seconds are recent failures
+RECENT_FAILURE_WINDOW = 300
+
+# Global request sent to probe a connection. Servers reply with a failure to
+# requests they do not support, which is still proof the connection is alive.
+KEEPALIVE_REQUEST = 'keepalive@openssh.com'
+
 
 class Error(Exception):
     pass
@@ -117,22 +126,26 @@ class NodePoolRepository(object):
 
 class NodePool(object):
     """A pool of Node objects."""
-    def __init__(self, nodes, name):
+    def __init__(self, nodes, name, strategy=None):
         self.nodes      = nodes
         self.disabled   = False
         self.name       = name or '_'.join(n.get_name() for n in nodes)
         self.iter       = itertools.cycle(self.nodes)
+        self.strategy   = placement.build_strategy(strategy, nodes)
+        self.placements = {}
 
     @classmethod
     def from_config(cls, node_pool_config, nodes):
-        return cls(nodes, node_pool_config.name)
+        return cls(nodes, node_pool_config.name, node_pool_config.strategy)
 
     @classmethod
     def from_node(cls, node):
         return cls([node], node.get_name())
 
     def __eq__(self, other):
-        return isinstance(other, NodePool) and self.nodes == other.nodes
+        return (isinstance(other, NodePool) and
+                self.nodes == other.nodes and
+                self.strategy.name == other.strategy.name)
 
     def __ne__(self, other):
         return not self == other
@@ -143,9 +156,22 @@ class NodePool(object):
     def get_nodes(self):
         return self.nodes
 
+    def get_strategy_name(self):
+        return self.strategy.name
+
+    def get_placements(self):
+        """Return a dict of node name to the number of times it was selected."""
+        return dict(self.placements)
+
     def next(self):
-        """Return a random node from the pool."""
-        return random.choice(self.nodes)
+        """Return the node selected by the pools strategy, and record the
+        selection.
+        """
+        node = self.strategy.select()
+        name = node.get_name()
+        self.placements[name] = self.placements.get(name, 0) + 1
+        log.debug("%s selected %s using %s", self, name, self.strategy.name)
+        return node
 
     def next_round_robin(self):
         """Return the next node cycling in a consistent order."""
@@ -186,15 +212,9 @@ class RunState(object):
         self.state = RUN_STATE_CONNECTING
         self.deferred = defer.Deferred()
         self.channel = None
-
-
-def determine_jitter(count, node_settings):
-    """Return a pseudo-random number of seconds to delay a run."""
-    count *= node_settings.jitter_load_factor
-    min_count = node_settings.jitter_min_load
-    max_jitter = max(0.0, count - min_count)
-    max_jitter = min(node_settings.jitter_max_delay, max_jitter)
-    return random.random() * float(max_jitter)
+        self.connection = None
+        self.queued_time = timeutils.current_timestamp()
+        self.admitted = False
 
 
 class Node(object):
@@ -208,16 +228,39 @@ class Node(object):
         # SSH Options
         self.conch_options = ssh_options
 
-        # The SSH connection we use to open channels on. If present, means we
-        # are connected.
-        self.connection = None
+        # Map of open SSH connections to the number of channels open on them
+        self.connections = {}
 
-        # If present, means we are trying to connect
-        self.connection_defer = None
+        # Deferreds for connections which are being established
+        self.pending_connections = []
+
+        # Runs waiting for a channel, in the order they were submitted
+        self.waiting_runs = deque()
 
         # Map of run id to instance of RunState
         self.run_states = {}
 
+        # Heap of (sort key, run) for runs waiting to be admitted
+        self.run_queue = []
+        self.run_queue_counter = itertools.count()
+
+        # Number of runs which have been admitted and are not complete
+        self.admitted_count = 0
+        self.queue_stats = {
+            'admitted_total':   0,
+            'total_wait':       0.0,
+            'max_wait':         0.0,
+            'last_wait':        0.0,
+        }
+
+        # Timestamps of recent connection and run start failures
+        self.failure_times = deque()
+
+        # Map of connection to the DelayedCall for its next keepalive probe
+        self.keepalive_timers = {}
+
+        # Map of connection with no open channels to the time it became idle
+        self.idle_since = {}
         self.idle_timer = eventloop.NullCallback
         self.disabled = False
         self.pub_key = pub_key
@@ -234,6 +277,30 @@ class Node(object):
     def port(self):
         return self.config.port
 
+    @property
+    def capacity(self):
+        return self.config.capacity
+
+    @property
+    def load(self):
+        """The number of runs which are queued or running on this node."""
+        return len(self.run_states)
+
+    @property
+    def recent_failures(self):
+        """The number of failures within RECENT_FAILURE_WINDOW seconds."""
+        window_start = timeutils.current_timestamp() - RECENT_FAILURE_WINDOW
+        while self.failure_times and self.failure_times[0] < window_start:
+            self.failure_times.popleft()
+        return len(self.failure_times)
+
+    def record_failure(self):
+        self.failure_times.append(timeutils.current_timestamp())
+
+    @property
+    def max_connections(self):
+        return max(1, self.node_settings.max_connections)
+
     @classmethod
     def from_config(cls, node_config, ssh_options, pub_key, node_settings):
         return cls(node_config, ssh_options, pub_key, node_settings)
@@ -286,22 +353,67 @@ class Node(object):
         if run.id in self.run_states:
             raise Error("Run %s already running !?!", run.id)
 
-        if self.idle_timer.active():
-            self.idle_timer.cancel()
-
-        self.run_states[run.id] = RunState(run)
-
-        # TODO: have this return a runner instead of number
-        fudge_factor = determine_jitter(len(self.run_states), self.node_settings)
-        if fudge_factor == 0.0:
-            self._do_run(run)
-        else:
-            log.info("Delaying execution of %s for %.2f secs", run.id, fudge_factor)
-            eventloop.call_later(fudge_factor, self._do_run, run)
+        run_state = RunState(run)
+        self.run_states[run.id] = run_state
+        self._enqueue_run(run)
+        self._admit_runs()
 
         # We return the deferred here, but really we're trying to keep the rest
         # of the world from getting too involved with twisted.
-        return self.run_states[run.id].deferred
+        return run_state.deferred
+
+    def _enqueue_run(self, run):
+        if self.node_settings.run_queue_order == schema.RunQueueOrderTypes.priority:
+            priority = run.priority
+        else:
+            priority = 0
+        sort_key = priority, self.run_queue_counter.next()
+        heapq.heappush(self.run_queue, (sort_key, run))
+
+    def _admit_runs(self):
+        """Start queued runs until there are max_concurrent_runs runs."""
+        max_runs = self.node_settings.max_concurrent_runs
+        while self.run_queue and (not max_runs or self.admitted_count < max_runs):
+            _, run = heapq.heappop(self.run_queue)
+            self._admit_run(run)
+
+    def _admit_run(self, run):
+        run_state = self.run_states[run.id]
+        run_state.admitted = True
+        self.admitted_count += 1
+
+        wait = timeutils.current_timestamp() - run_state.queued_time
+        self.queue_stats['admitted_total'] += 1
+        self.queue_stats['total_wait'] += wait
+        self.queue_stats['max_wait'] = max(self.queue_stats['max_wait'], wait)
+        self.queue_stats['last_wait'] = wait
+        if wait:
+            log.info("Run %s was queued on %s for %.2f secs",
+                run.id, self.hostname, wait)
+        self._do_run(run)
+
+    def _remove_queued_run(self, run):
+        self.run_queue = [item for item in self.run_queue if item[1] is not run]
+        heapq.heapify(self.run_queue)
+
+    def get_run_queue_stats(self):
+        """Return the depth of the run queue and the time runs waited in it."""
+        now = timeutils.current_timestamp()
+        queued_times = [
+            self.run_states[run.id].queued_time for _, run in self.run_queue]
+        admitted_total = self.queue_stats['admitted_total']
+        return {
+            'queued':               len(self.run_queue),
+            'running':              self.admitted_count,
+            'max_concurrent_runs':  self.node_settings.max_concurrent_runs,
+            'admitted_total':       admitted_total,
+            'mean_wait':            (self.queue_stats['total_wait'] /
+                                     admitted_total if admitted_total else 0.0),
+            'max_wait':             self.queue_stats['max_wait'],
+            'last_wait':            self.queue_stats['last_wait'],
+            'oldest_queued_wait':   (now - min(queued_times)
+                                     if queued_times else 0.0),
+        }
 
     def stop(self, command):
         """Stop this command by marking it as failed."""
@@ -309,33 +421,174 @@ class Node(object):
         self._fail_run(command, exc)
 
     def _do_run(self, run):
-        """Finish starting to execute a run
+        """Finish starting to execute a run once it has been admitted."""
+        self.waiting_runs.append(run)
+        self._dispatch_waiting()
 
-        This step may have been delayed.
+    def _dispatch_waiting(self):
+        """Open a channel for each waiting run on the least loaded connection,
+        and open more connections if there are no free channels.
         """
-
-        # Now let's see if we need to start this off by establishing a
-        # connection or if we are already connected
-        if self.connection is None:
-            self._connect_then_run(run)
+        while self.waiting_runs:
+            connection = self._get_free_connection()
+            if connection is None:
+                break
+            self._open_channel(self.waiting_runs.popleft(), connection)
+
+        if self.waiting_runs:
+            self._grow_pool()
+
+    def _get_free_connection(self):
+        """Return the connection with the fewest open channels, or None if
+        every connection has max_channels_per_connection channels.
+        """
+        max_channels = self.node_settings.max_channels_per_connection
+        candidates = [
+            (count, connection)
+            for connection, count in self.connections.iteritems()
+            if not max_channels or count < max_channels
+        ]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda item: item[0])[1]
+
+    def _grow_pool(self):
+        """Start connecting until the pending connections have enough channels
+        for the waiting runs, or there are max_connections connections.
+        """
+        max_channels = self.node_settings.max_channels_per_connection
+        if max_channels:
+            needed = -(-len(self.waiting_runs) // max_channels)
         else:
-            self._open_channel(run)
+            needed = 1
+
+        while (len(self.pending_connections) < needed and
+                len(self.connections) + len(self.pending_connections) <
+                self.max_connections):
+            self._add_connection()
+
+    def _add_connection(self):
+        connect_defer = self._connect()
+        self.pending_connections.append(connect_defer)
+
+        def on_connect(connection):
+            self.pending_connections.remove(connect_defer)
+            self.connections[connection] = 0
+            self._schedule_keepalive(connection)
+            self._mark_idle(connection)
+            self._dispatch_waiting()
+
+        def connect_fail(result):
+            self.pending_connections.remove(connect_defer)
+            self.record_failure()
+            log.warning("Failed to connect to %s: %s",
+                        self.hostname, result.getErrorMessage())
+            if not self.connections and not self.pending_connections:
+                self._fail_waiting_runs()
+
+        connect_defer.addCallbacks(on_connect, connect_fail)
+
+    def _fail_waiting_runs(self):
+        waiting_runs, self.waiting_runs = self.waiting_runs, deque()
+        for run in waiting_runs:
+            log.warning("Cannot run %s, Failed to connect to %s",
+                        run, self.hostname)
+            self._fail_run(run, failure.Failure(
+                exc_value=ConnectError("Connection to %s failed" %
+                                       self.hostname)))
 
     def _cleanup(self, run):
-        # TODO: why set to None before deleting it?
-        self.run_states[run.id].channel = None
-        del self.run_states[run.id]
+        run_state = self.run_states.pop(run.id)
+        run_state.channel = None
+        if run_state.connection in self.connections:
+            self.connections[run_state.connection] -= 1
+            if not self.connections[run_state.connection]:
+                self._mark_idle(run_state.connection)
+        if run in self.waiting_runs:
+            self.waiting_runs.remove(run)
+
+        if run_state.admitted:
+            self.admitted_count -= 1
+        else:
+            self._remove_queued_run(run)
+
+        if self.waiting_runs:
+            self._dispatch_waiting()
+        if self.run_queue:
+            self._admit_runs()
 
-        if not self.run_states:
-            self.idle_timer = eventloop.call_later(
-                self.node_settings.idle_connection_timeout,
-                self._connection_idle_timeout)
+    def _mark_idle(self, connection):
+        self.idle_since[connection] = eventloop.seconds()
+        self._schedule_idle_check()
+
+    def _schedule_idle_check(self):
+        """Schedule a check for when the connection which has been idle the
+        longest reaches idle_connection_timeout, if the pool has more than
+        min_connections.
+        """
+        if self.idle_timer.active() or not self.idle_since:
+            return
+        if len(self.connections) <= self.node_settings.min_connections:
+            return
+        timeout = self.node_settings.idle_connection_timeout
+        delay = min(self.idle_since.itervalues()) + timeout - eventloop.seconds()
+        self.idle_timer = eventloop.call_later(
+            max(0, delay), self._connection_idle_timeout)
 
     def _connection_idle_timeout(self):
-        if self.connection:
+        """Close the connections which have been idle for
+        idle_connection_timeout seconds, oldest first, keeping
+        min_connections open. Other connections may be busy.
+        """
+        timeout = self.node_settings.idle_connection_timeout
+        excess = len(self.connections) - self.node_settings.min_connections
+        now = eventloop.seconds()
+        expired = sorted(
+            (since, connection) for connection, since in
+            self.idle_since.iteritems() if now - since >= timeout)
+        for _, connection in expired[:max(0, excess)]:
             log.info("Connection to %s idle for %d secs. Closing.",
-                     self.hostname, self.node_settings.idle_connection_timeout)
-            self.connection.transport.loseConnection()
+                     self.hostname, timeout)
+            del self.idle_since[connection]
+            self.connections.pop(connection, None)
+            self._cancel_keepalive(connection)
+            connection.transport.loseConnection()
+        self._schedule_idle_check()
+
+    def _schedule_keepalive(self, connection):
+        interval = self.node_settings.keepalive_interval
+        if interval:
+            self.keepalive_timers[connection] = eventloop.call_later(
+                interval, self._send_keepalive, connection)
+
+    def _cancel_keepalive(self, connection):
+        timer = self.keepalive_timers.pop(connection, None)
+        if timer and timer.active():
+            timer.cancel()
+
+    def _send_keepalive(self, connection):
+        """Probe the connection, and close it if there is no reply within
+        keepalive_interval.
+        """
+        self.keepalive_timers.pop(connection, None)
+        if connection not in self.connections:
+            return
+
+        deferred = connection.sendGlobalRequest(
+            KEEPALIVE_REQUEST, '', wantReply=1)
+        twistedutils.defer_timeout(
+            deferred, self.node_settings.keepalive_interval)
+        deferred.addBoth(self._keepalive_reply, connection)
+
+    def _keepalive_reply(self, result, connection):
+        if (isinstance(result, failure.Failure) and
+                result.check(twistedutils.Error, defer.CancelledError)):
+            log.warning("Keepalive to %s timed out. Closing connection.",
+                        self.hostname)
+            connection.transport.loseConnection()
+            return
+
+        self._schedule_keepalive(connection)
 
     def _fail_run(self, run, result):
         """Indicate the run has failed, and cleanup state"""
@@ -357,61 +610,49 @@ class Node(object):
         run.exited(None)
         cb(result)
 
-    def _connect_then_run(self, run):
-        # Have we started the connection process ?
-        if self.connection_defer is None:
-            self.connection_defer = self._connect()
-
-        def call_open_channel(arg):
-            self._open_channel(run)
-            return arg
-
-        def connect_fail(result):
-            log.warning("Cannot run %s, Failed to connect to %s",
-                        run, self.hostname)
-            self.connection_defer = None
-            self._fail_run(run, failure.Failure(
-                exc_value=ConnectError("Connection to %s failed" %
-                                       self.hostname)))
-
-        self.connection_defer.addCallback(call_open_channel)
-        self.connection_defer.addErrback(connect_fail)
-
     def _service_stopped(self, connection):
         """Called when the SSH service has disconnected fully.
 
-        We should be in a state where we know there are no runs in progress
-        because all the SSH channels should have disconnected them.
+        The runs with channels on this connection are failed. Runs which are
+        waiting for a channel are started on another connection.
         """
-        assert self.connection is connection
-        self.connection = None
+        self.connections.pop(connection, None)
+        self.idle_since.pop(connection, None)
+        self._cancel_keepalive(connection)
 
         log.info("Service to %s stopped", self.hostname)
 
-        for run_id, run in self.run_states.iteritems():
-            if run.state == RUN_STATE_CONNECTING:
-                # Now we can trigger a reconnect and re-start any waiting runs.
-                self._connect_then_run(run)
-            elif run.state == RUN_STATE_RUNNING:
-                self._fail_run(run, None)
-            elif run.state == RUN_STATE_STARTING:
-                if run.channel and run.channel.start_defer is not None:
+        for run_id, run_state in self.run_states.items():
+            if run_state.connection is not connection:
+                continue
+
+            if run_state.state == RUN_STATE_RUNNING:
+                self._fail_run(run_state.run, failure.Failure(
+                    exc_value=ResultError("Connection to %s lost" %
+                                          self.hostname)))
+            elif run_state.state == RUN_STATE_STARTING:
+                if run_state.channel and run_state.channel.start_defer is not None:
 
                     # This means our run IS still waiting to start. There
                     # should be an outstanding timeout sitting on this guy as
                     # well. We'll just short circut it.
-                    twistedutils.defer_timeout(run.channel.start_defer, 0)
+                    twistedutils.defer_timeout(run_state.channel.start_defer, 0)
                 else:
                     # Doesn't seem like this should ever happen.
                     log.warning("Run %r caught in starting state, but"
                                 " start_defer is over.", run_id)
-                    self._fail_run(run, None)
+                    self._fail_run(run_state.run, failure.Failure(
+                        exc_value=ResultError("Connection to %s lost" %
+                                              self.hostname)))
             else:
                 # Service ended. The open channels should know how to handle
                 # this (and cleanup) themselves, so if there should not be any
                 # runs except those waiting to connect
                 raise Error("Run %s in state %s when service stopped",
-                            run_id, run.state)
+                            run_id, run_state.state)
+
+        if self.waiting_runs:
+            self._dispatch_waiting()
 
     def _connect(self):
         # This is complicated because we have to deal with a few different
@@ -426,16 +667,18 @@ class Node(object):
 
         # We're going to create a deferred, returned to the caller, that will
         # be called back when we have an established, secure connection ready
-        # for opening channels. The value will be this instance of node.
+        # for opening channels. The value will be the connection.
         connect_defer = defer.Deferred()
         twistedutils.defer_timeout(connect_defer, self.node_settings.connect_timeout)
 
         def on_service_started(connection):
-            # Booyah, time to start doing stuff
-            self.connection = connection
-            self.connection_defer = None
+            if connect_defer.called:
+                log.warning("Connection to %s started after timeout", self.hostname)
+                connection.transport.loseConnection()
+                return connection
 
-            connect_defer.callback(self)
+            # Booyah, time to start doing stuff
+            connect_defer.callback(connection)
             return connection
 
         def on_connection_secure(connection):
@@ -454,20 +697,23 @@ class Node(object):
 
         def on_transport_fail(fail):
             log.warning("Cannot connect to %s", self.hostname)
-            connect_defer.errback(fail)
+            if not connect_defer.called:
+                connect_defer.errback(fail)
 
         create_defer.addCallback(on_transport_create)
         create_defer.addErrback(on_transport_fail)
 
         return connect_defer
 
-    def _open_channel(self, run):
-        assert self.connection
+    def _open_channel(self, run, connection):
         assert self.run_states[run.id].state < RUN_STATE_RUNNING
 
         self.run_states[run.id].state = RUN_STATE_STARTING
+        self.run_states[run.id].connection = connection
+        self.connections[connection] = self.connections.get(connection, 0) + 1
+        self.idle_since.pop(connection, None)
 
-        chan = ssh.ExecChannel(conn=self.connection)
+        chan = ssh.ExecChannel(conn=connection)
 
         chan.addOutputCallback(run.write_stdout)
         chan.addErrorCallback(run.write_stderr)
@@ -485,11 +731,7 @@ class Node(object):
         twistedutils.defer_timeout(chan.start_defer, RUN_START_TIMEOUT)
 
         self.run_states[run.id].channel = chan
-        # TODO: I believe this needs to be checking the health of the connection
-        # before trying to open a new channel.  If the connection is gone it
-        # needs to re-establish, or if the connection is not responding
-        # we shouldn't create this new channel
-        self.connection.openChannel(chan)
+        connection.openChannel(chan)
 
     def _channel_complete(self, channel, run):
         """Callback once our channel has completed it's operation
@@ -537,6 +779,7 @@ class Node(object):
         """
         log.error("Error running %s, disconnecting from %s: %s",
                   run.id, self.hostname, str(result))
+        self.record_failure()
 
         # We clear out the deferred that likely called us because there are
         # actually more than one error paths because of user timeouts.
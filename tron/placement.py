@@ -0,0 +1,108 @@
+"""
+ tron.placement
+
+ Strategies used by a NodePool to select the node for a new run. A strategy
+ is built for the nodes of a pool, and is selected by the `strategy` of the
+ node pool config.
+"""
+import bisect
+import itertools
+import random
+
+from tron.config import schema
+
+
+# Each recent failure on a node counts as this many outstanding runs
+FAILURE_PENALTY = 2
+
+
+def node_load(node, failure_penalty=0):
+    """Return the outstanding runs on a node per unit of its capacity."""
+    load = node.load + failure_penalty * node.recent_failures
+    return float(load) / max(1, node.capacity)
+
+
+class RandomStrategy(object):
+    """Select a random node."""
+    name = schema.NodeSelectionTypes.random
+
+    def __init__(self, nodes):
+        self.nodes = nodes
+
+    def select(self):
+        return random.choice(self.nodes)
+
+
+class RoundRobinStrategy(RandomStrategy):
+    """Select each node in turn."""
+    name = schema.NodeSelectionTypes.round_robin
+
+    def __init__(self, nodes):
+        super(RoundRobinStrategy, self).__init__(nodes)
+        self.iter = itertools.cycle(nodes)
+
+    def select(self):
+        return self.iter.next()
+
+
+class LeastLoadedStrategy(RandomStrategy):
+    """Select the node with the fewest outstanding runs per unit of capacity.
+    Ties are broken randomly.
+    """
+    name = schema.NodeSelectionTypes.least_loaded
+    failure_penalty = 0
+
+    def select(self):
+        return min(self.nodes, key=lambda node: (
+            node_load(node, self.failure_penalty), random.random()))
+
+
+class HealthPenalizedStrategy(LeastLoadedStrategy):
+    """Select the least loaded node, counting recent connection and start
+    failures on a node as additional load.
+    """
+    name = schema.NodeSelectionTypes.health
+    failure_penalty = FAILURE_PENALTY
+
+
+class PowerOfTwoStrategy(RandomStrategy):
+    """Select the less loaded of two random nodes. This avoids sending every
+    new run to the same least loaded node before its load is updated.
+    """
+    name = schema.NodeSelectionTypes.power_of_two
+
+    def select(self):
+        if len(self.nodes) < 2:
+            return self.nodes[0]
+        return min(random.sample(self.nodes, 2), key=node_load)
+
+
+class WeightedStrategy(RandomStrategy):
+    """Select a random node, weighted by the capacity of each node."""
+    name = schema.NodeSelectionTypes.weighted
+
+    def __init__(self, nodes):
+        super(WeightedStrategy, self).__init__(nodes)
+        self.cumulative_weights, total = [], 0
+        for node in nodes:
+            total += max(1, node.capacity)
+            self.cumulative_weights.append(total)
+
+    def select(self):
+        point = random.random() * self.cumulative_weights[-1]
+        return self.nodes[bisect.bisect_right(self.cumulative_weights, point)]
+
+
+STRATEGIES = dict((strategy.name, strategy) for strategy in [
+    RandomStrategy,
+    RoundRobinStrategy,
+    LeastLoadedStrategy,
+    HealthPenalizedStrategy,
+    PowerOfTwoStrategy,
+    WeightedStrategy,
+])
+
+
+def build_strategy(name, nodes):
+    """Build the strategy called name for nodes. Defaults to random."""
+    return STRATEGIES[name or schema.NodeSelectionTypes.random](nodes)
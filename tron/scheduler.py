@@ -10,10 +10,16 @@ Tron schedulers
     def next_run_time(self, last_run_time):
         <returns datetime>
 
+    def get_run_times(self, start_time, end_time):
+        <returns iterable of datetime>
+
 
  next_run_time() should return a datetime which is the time the next job run
  will be run.
 
+ get_run_times() should return the times, without jitter, a job would be
+ scheduled to run from start_time up to and including end_time.
+
  schedule_on_complete is a bool that identifies if this scheduler should have
  jobs scheduled with the start_time of the previous run (False), or the
  end time of the previous run (False).
@@ -83,6 +89,10 @@ class ConstantScheduler(object):
     def next_run_time(self, _):
         return timeutils.current_time()
 
+    def get_run_times(self, _start_time, _end_time):
+        """A constant job has no run times, it is run when it completes."""
+        return []
+
     def __str__(self):
         return self.get_name()
 
@@ -161,24 +171,34 @@ class GeneralScheduler(object):
             seconds=seconds,
             timezone=time_zone.zone if time_zone else None)
 
+    def localize(self, start_time):
+        if not self.time_zone:
+            return start_time
+        try:
+            return self.time_zone.localize(start_time, is_dst=None)
+        except AmbiguousTimeError:
+            # We are in the infamous 1 AM block which happens twice on
+            # fall-back. Pretend like it's the first time, every time.
+            return self.time_zone.localize(start_time, is_dst=True)
+        except NonExistentTimeError:
+            # We are in the infamous 2:xx AM block which does not
+            # exist. Pretend like it's the later time, every time.
+            return self.time_zone.localize(start_time, is_dst=True)
+
     def next_run_time(self, start_time):
         """Find the next time to run."""
         if not start_time:
             start_time = timeutils.current_time()
-        elif self.time_zone:
-            try:
-                start_time = self.time_zone.localize(start_time, is_dst=None)
-            except AmbiguousTimeError:
-                # We are in the infamous 1 AM block which happens twice on
-                # fall-back. Pretend like it's the first time, every time.
-                start_time = self.time_zone.localize(start_time, is_dst=True)
-            except NonExistentTimeError:
-                # We are in the infamous 2:xx AM block which does not
-                # exist. Pretend like it's the later time, every time.
-                start_time = self.time_zone.localize(start_time, is_dst=True)
+        else:
+            start_time = self.localize(start_time)
 
         return self.time_spec.get_match(start_time) + get_jitter(self.jitter)
 
+    def get_run_times(self, start_time, end_time):
+        # Matches are after start_time, so search from just before it
+        start_time = self.localize(start_time) - datetime.timedelta.resolution
+        return self.time_spec.occurrences(start_time, self.localize(end_time))
+
     def __str__(self):
         return '%s %s%s' % (
             self.name, self.original, get_jitter_str(self.jitter))
@@ -213,6 +233,12 @@ class IntervalScheduler(object):
         last_run_time = last_run_time or timeutils.current_time()
         return last_run_time + self.interval + get_jitter(self.jitter)
 
+    def get_run_times(self, start_time, end_time):
+        run_time = start_time
+        while run_time <= end_time:
+            yield run_time
+            run_time += self.interval
+
     def __str__(self):
         return "%s %s%s" % (
             self.get_name(), self.interval, get_jitter_str(self.jitter))
@@ -0,0 +1,385 @@
+"""Persist events to rotating, compressed, append-only segment files.
+
+Events are appended as JSON lines to the open segment, a file named
+`events.<first seq>.log`. Once it contains segment_size events it is
+compressed to a closed segment, named with the range of sequence numbers and
+times of its events, and a new open segment is started on the next event.
+
+The in-memory index is the list of closed segments, which is built from
+their filenames, and the set of (entity, level) of the events in each
+segment, which is saved to a keys file next to the segment. A query reads
+the segments which may contain matching events, newest first, until it has
+found enough events or has read MAX_SEGMENT_READS segments. The events of
+the open segment and of the most recently read segments are kept in memory.
+Closed segments with no events newer than retention_days are removed.
+"""
+from collections import namedtuple
+import datetime
+import gzip
+import logging
+import os
+import re
+import shutil
+
+try:
+    import simplejson as json
+    _silence_pyflakes = [json]
+except ImportError:
+    import json
+
+from tron import event
+from tron.utils import timeutils
+from tron.utils.dicts import OrderedDict
+
+log = logging.getLogger(__name__)
+
+
+DEFAULT_SEGMENT_SIZE    = 10000
+DEFAULT_RETENTION_DAYS  = 7
+
+TIME_FORMAT             = "%Y-%m-%d %H:%M:%S.%f"
+FILENAME_TIME_FORMAT    = "%Y%m%d%H%M%S"
+
+OPEN_SEGMENT_FORMAT     = "events.%012d.log"
+SEGMENT_FORMAT          = "events.%012d-%012d.%s-%s.log.gz"
+KEYS_FORMAT             = "%s.keys"
+OPEN_SEGMENT_RE         = re.compile(r"^events\.(\d+)\.log$")
+SEGMENT_RE              = re.compile(
+                            r"^events\.(\d+)-(\d+)\.(\d{14})-(\d{14})\.log\.gz$")
+
+
+Segment = namedtuple(
+    'Segment', ['first_seq', 'last_seq', 'first_time', 'last_time', 'filename'])
+
+
+def encode_event(recorded_event):
+    return json.dumps({
+        'seq':      recorded_event.seq,
+        'entity':   recorded_event.entity,
+        'level':    recorded_event.level.label,
+        'name':     recorded_event.name,
+        'time':     recorded_event.time.strftime(TIME_FORMAT),
+        'data':     recorded_event.data,
+    }, default=str)
+
+
+def decode_event(line):
+    record = json.loads(line)
+    level = event.get_level(record['level'])
+    data = dict((str(key), value) for key, value in record['data'].iteritems())
+    decoded = event.Event(record['entity'], level, record['name'], **data)
+    decoded.time = datetime.datetime.strptime(record['time'], TIME_FORMAT)
+    decoded.seq = record['seq']
+    return decoded
+
+
+def decode_events(lines, filename):
+    events = []
+    for line in lines:
+        try:
+            events.append(decode_event(line))
+        except (ValueError, KeyError, TypeError, AttributeError):
+            log.warn("Skipping invalid event in %s: %r", filename, line)
+    return events
+
+
+def parse_segment_filename(filename):
+    match = SEGMENT_RE.match(filename)
+    if not match:
+        return None
+    first_seq, last_seq, first_time, last_time = match.groups()
+    parse_time = lambda value: datetime.datetime.strptime(
+        value, FILENAME_TIME_FORMAT)
+    return Segment(int(first_seq), int(last_seq),
+        parse_time(first_time), parse_time(last_time), filename)
+
+
+def get_keys(events):
+    return set((e.entity, e.level) for e in events)
+
+
+def build_matcher(entity_name, min_level, include_children):
+    """Return a function which returns True if an event with an entity and
+    level matches the query.
+    """
+    prefix = entity_name + event.NAME_CHARACTER
+    def matches(entity, level):
+        if min_level is not None and level < min_level:
+            return False
+        if entity == entity_name:
+            return True
+        return include_children and (
+            not entity_name or entity.startswith(prefix))
+    return matches
+
+
+class EventLog(object):
+    """Append events to segment files in path, and read them back."""
+
+    # Number of decoded closed segments kept in memory
+    CACHE_SIZE = 2
+
+    # Maximum number of closed segments read by one query
+    MAX_SEGMENT_READS = 4
+
+    def __init__(self, path, segment_size=DEFAULT_SEGMENT_SIZE,
+            retention_days=DEFAULT_RETENTION_DAYS):
+        self.path               = path
+        self.segment_size       = segment_size
+        self.retention_days     = retention_days
+        self.segments           = []
+        # Map of segment filename to the (entity, level) of its events, or
+        # None if they are not known until the segment is read
+        self.keys               = {}
+        self.cache              = OrderedDict()
+        self.fh                 = None
+        self.open_filename      = None
+        self.open_first         = None
+        self.open_last          = None
+        self.open_events        = []
+        self.open_keys          = set()
+        self.next_seq           = 0
+        self._load()
+
+    @classmethod
+    def from_config(cls, events_config):
+        return cls(events_config.store_dir,
+            events_config.segment_size, events_config.retention_days)
+
+    def matches_config(self, events_config):
+        return (self.path == events_config.store_dir and
+                self.segment_size == events_config.segment_size and
+                self.retention_days == events_config.retention_days)
+
+    def configure(self, segment_size, retention_days):
+        """Change the segment size and retention of this log."""
+        self.segment_size       = segment_size
+        self.retention_days     = retention_days
+        if len(self.open_events) >= self.segment_size:
+            self.rotate()
+        self.prune()
+
+    def _full_path(self, filename):
+        return os.path.join(self.path, filename)
+
+    def _load(self):
+        """Build the index of closed segments, and close the open segments
+        left by a previous run.
+        """
+        if not os.path.isdir(self.path):
+            os.makedirs(self.path)
+
+        for filename in sorted(os.listdir(self.path)):
+            segment = parse_segment_filename(filename)
+            if segment:
+                self.segments.append(segment)
+                self.keys[filename] = self._read_keys(filename)
+            elif OPEN_SEGMENT_RE.match(filename):
+                self._recover(filename)
+
+        self.segments.sort()
+        if self.segments:
+            self.next_seq = self.segments[-1].last_seq + 1
+        self.prune()
+
+    def _recover(self, filename):
+        events = self._read_file(open, filename)
+        if not events:
+            os.remove(self._full_path(filename))
+            return
+        first, last = events[0], events[-1]
+        self._close_segment(filename,
+            (first.seq, first.time), (last.seq, last.time), get_keys(events))
+
+    def _read_keys(self, filename):
+        """Read the keys file of a segment. Returns None if it is missing or
+        invalid.
+        """
+        try:
+            with open(self._full_path(KEYS_FORMAT % filename), 'rb') as fh:
+                keys = set((entity, event.get_level(label))
+                           for entity, label in json.load(fh))
+        except (IOError, ValueError, TypeError, AttributeError):
+            return None
+        if any(level is None for _, level in keys):
+            return None
+        return keys
+
+    def _write_keys(self, filename, keys):
+        self.keys[filename] = keys
+        data = sorted((entity, level.label) for entity, level in keys)
+        try:
+            with open(self._full_path(KEYS_FORMAT % filename), 'wb') as fh:
+                json.dump(data, fh)
+        except IOError, e:
+            log.warn("Failed to write keys of %s: %s", filename, e)
+
+    def append(self, recorded_event):
+        if self.fh is None:
+            self._open_segment(recorded_event)
+        self.fh.write(encode_event(recorded_event) + '\n')
+        self.open_last = recorded_event.seq, recorded_event.time
+        self.open_events.append(recorded_event)
+        self.open_keys.add((recorded_event.entity, recorded_event.level))
+        self.next_seq = recorded_event.seq + 1
+        if len(self.open_events) >= self.segment_size:
+            self.rotate()
+
+    def _open_segment(self, first_event):
+        self.open_filename = OPEN_SEGMENT_FORMAT % first_event.seq
+        self.fh = open(self._full_path(self.open_filename), 'a')
+        self.open_first = first_event.seq, first_event.time
+        self.open_events = []
+        self.open_keys = set()
+
+    def rotate(self):
+        """Close the open segment. The next event starts a new segment."""
+        if self.fh is None:
+            return
+        self.fh.close()
+        self.fh = None
+        self._close_segment(self.open_filename,
+            self.open_first, self.open_last, self.open_keys)
+        self.open_filename = None
+        self.open_events = []
+        self.open_keys = set()
+        self.prune()
+
+    def _close_segment(self, open_filename, first, last, keys):
+        """Compress an open segment to a closed segment."""
+        (first_seq, first_time), (last_seq, last_time) = first, last
+        filename = SEGMENT_FORMAT % (first_seq, last_seq,
+            first_time.strftime(FILENAME_TIME_FORMAT),
+            last_time.strftime(FILENAME_TIME_FORMAT))
+        tmp_path = self._full_path(filename + '.tmp')
+        with open(self._full_path(open_filename), 'rb') as src:
+            dst = gzip.open(tmp_path, 'wb')
+            try:
+                shutil.copyfileobj(src, dst)
+            finally:
+                dst.close()
+        self._write_keys(filename, keys)
+        os.rename(tmp_path, self._full_path(filename))
+        os.remove(self._full_path(open_filename))
+        self.segments.append(parse_segment_filename(filename))
+        log.info("Closed event segment %s", filename)
+
+    def prune(self):
+        """Remove the closed segments which are older than retention_days."""
+        cutoff = timeutils.current_time() - datetime.timedelta(
+            days=self.retention_days)
+        while self.segments and self.segments[0].last_time < cutoff:
+            segment = self.segments.pop(0)
+            self.cache.pop(segment.filename, None)
+            self.keys.pop(segment.filename, None)
+            os.remove(self._full_path(segment.filename))
+            keys_path = self._full_path(KEYS_FORMAT % segment.filename)
+            if os.path.exists(keys_path):
+                os.remove(keys_path)
+            log.info("Removed event segment %s", segment.filename)
+
+    def _read_file(self, open_func, filename):
+        fh = open_func(self._full_path(filename), 'rb')
+        try:
+            return decode_events(fh.read().splitlines(), filename)
+        finally:
+            fh.close()
+
+    def _read_segment(self, segment):
+        if segment.filename in self.cache:
+            events = self.cache.pop(segment.filename)
+        else:
+            events = self._read_file(gzip.open, segment.filename)
+            if self.keys.get(segment.filename) is None:
+                self._write_keys(segment.filename, get_keys(events))
+        self.cache[segment.filename] = events
+        while len(self.cache) > self.CACHE_SIZE:
+            self.cache.popitem(last=False)
+        return events
+
+    def _may_match(self, keys, matches):
+        return keys is None or any(matches(*key) for key in keys)
+
+    def _iter_segments(self, since, before, matches):
+        """Yield the events of each segment which may contain events
+        matching the query, after since and before the sequence number
+        before, newest first. At most MAX_SEGMENT_READS closed segments are
+        read.
+        """
+        if (self.open_events and
+                (before is None or self.open_first[0] < before) and
+                self._may_match(self.open_keys, matches)):
+            yield self.open_events
+
+        reads = 0
+        for segment in reversed(self.segments):
+            if before is not None and segment.first_seq >= before:
+                continue
+            # Filenames only have the time to the second
+            last_time = segment.last_time + datetime.timedelta(seconds=1)
+            if since is not None and last_time < since:
+                break
+            if not self._may_match(self.keys.get(segment.filename), matches):
+                continue
+            if reads >= self.MAX_SEGMENT_READS:
+                log.info("Stopped reading %s after %s segments",
+                    self.path, reads)
+                break
+            reads += 1
+            yield self._read_segment(segment)
+
+    def get_events(self, entity_name='', min_level=None, since=None,
+            limit=None, include_children=True, before=None):
+        """Return the events of entity_name (and its children if
+        include_children is True), most recent first, with a sequence number
+        less than before.
+        """
+        matches = build_matcher(entity_name, min_level, include_children)
+        results = []
+        for events in self._iter_segments(since, before, matches):
+            for recorded_event in reversed(events):
+                if before is not None and recorded_event.seq >= before:
+                    continue
+                if since is not None and recorded_event.time < since:
+                    continue
+                if not matches(recorded_event.entity, recorded_event.level):
+                    continue
+                results.append(recorded_event)
+                if limit is not None and len(results) >= limit:
+                    return results
+        return results
+
+    def flush(self):
+        if self.fh:
+            self.fh.flush()
+
+    def close(self):
+        """Close the open segment file. It is compressed when the log is
+        next opened.
+        """
+        if self.fh:
+            self.fh.close()
+            self.fh = None
+
+    def __str__(self):
+        return "EventLog(%s)" % self.path
+
+
+def update_archive(event_store, events_config):
+    """Set the EventLog of event_store from events_config. Returns True if
+    the EventLog was changed.
+    """
+    archive = event_store.archive
+    if archive and archive.path == events_config.store_dir:
+        if archive.matches_config(events_config):
+            return False
+        archive.configure(
+            events_config.segment_size, events_config.retention_days)
+        return True
+
+    if archive:
+        # Close the open segment before a log in the same path can recover it
+        event_store.set_archive(None)
+    if events_config.store_dir:
+        event_store.set_archive(EventLog.from_config(events_config))
+    return archive is not None or bool(events_config.store_dir)
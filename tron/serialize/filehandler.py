@@ -1,12 +1,11 @@
 """
 Tools for managing and properly closing file handles.
 """
+from collections import deque
 import logging
 import os
 import os.path
 import shutil
-import sys
-from subprocess import PIPE, Popen
 import time
 
 
@@ -15,6 +14,16 @@ from tron.utils.dicts import OrderedDict
 log = logging.getLogger(__name__)
 
 
+# Number of recent lines kept in memory for each open file
+RECENT_LINES = 100
+
+# Size of the blocks read from the end of a file when tailing it
+TAIL_BLOCK_SIZE = 4096
+
+# Maximum number of bytes returned by a single read_since()
+MAX_READ_BYTES = 1024 * 1024
+
+
 class NullFileHandle(object):
     """A No-Op object that supports a File interface."""
     closed = True
@@ -31,13 +40,16 @@ class FileHandleWrapper(object):
     access time and metadata.  These objects should only be created
     by FileHandleManager. Do not instantiate them on their own.
     """
-    __slots__ = ['manager', 'name', 'last_accessed', '_fh']
+    __slots__ = [
+        'manager', 'name', 'last_accessed', '_fh', 'recent_lines', 'partial_line']
 
     def __init__(self, manager, name):
         self.manager = manager
         self.name = name
         self.last_accessed = time.time()
         self._fh = NullFileHandle
+        self.recent_lines = deque(maxlen=RECENT_LINES)
+        self.partial_line = ''
 
     def close(self):
         self.close_wrapped()
@@ -59,7 +71,30 @@ class FileHandleWrapper(object):
 
         self.last_accessed = time.time()
         self._fh.write(content)
+        self._record_lines(content)
         self.manager.update(self)
+        self.manager.notify_write(self, content)
+
+    def _record_lines(self, content):
+        lines = (self.partial_line + content).split('\n')
+        self.partial_line = lines.pop()
+        self.recent_lines.extend(lines[-RECENT_LINES:])
+
+    def flush(self):
+        if self._fh != NullFileHandle:
+            self._fh.flush()
+
+    def recent(self, num_lines):
+        """Return the last num_lines lines written using this wrapper, or
+        None if fewer lines were written. The oldest line is never returned,
+        because it may continue a line written before this wrapper existed.
+        """
+        lines = list(self.recent_lines)
+        if self.partial_line:
+            lines.append(self.partial_line)
+        if len(lines) <= num_lines:
+            return None
+        return [line.rstrip() for line in lines[-num_lines:]]
 
     def __enter__(self):
         return self
@@ -90,6 +125,7 @@ class FileHandleManager(object):
             raise ValueError(msg)
         self.max_idle_time = max_idle_time
         self.cache = OrderedDict()
+        self.listeners = {}
         self.__class__._instance = self
 
     @classmethod
@@ -121,6 +157,33 @@ class FileHandleManager(object):
         self.cache[filename] = fhw
         return fhw
 
+    def get(self, filename):
+        """Return the FileHandleWrapper for filename if it is open."""
+        return self.cache.get(filename)
+
+    def subscribe(self, filename, callback):
+        """Call callback(filename, content) after content is written to
+        filename.
+        """
+        self.listeners.setdefault(filename, []).append(callback)
+
+    def unsubscribe(self, filename, callback):
+        callbacks = self.listeners.get(filename, [])
+        if callback in callbacks:
+            callbacks.remove(callback)
+        if not callbacks:
+            self.listeners.pop(filename, None)
+
+    def notify_write(self, fh_wrapper, content):
+        """Call the listeners of fh_wrapper. An error in a listener is
+        logged, so that it does not stop the write.
+        """
+        for callback in list(self.listeners.get(fh_wrapper.name, ())):
+            try:
+                callback(fh_wrapper.name, content)
+            except Exception:
+                log.exception("Error in write listener for %s", fh_wrapper.name)
+
     def cleanup(self, time_func=time.time):
         """Close any file handles that have been idle for longer than
         max_idle_time. time_func is primary used for testing.
@@ -161,29 +224,105 @@ class OutputStreamSerializer(object):
     def full_path(self, filename):
         return os.path.join(self.base_path, filename)
 
-    # TODO: do not use subprocess
+    def _get_open_file(self, path):
+        """Return the open FileHandleWrapper for path after flushing it, so
+        that the file contains everything written to it.
+        """
+        fh_wrapper = FileHandleManager.get_instance().get(path)
+        if fh_wrapper:
+            fh_wrapper.flush()
+        return fh_wrapper
+
     def tail(self, filename, num_lines=None):
-        """Tail a file using `tail`."""
+        """Return the last num_lines lines of a file, or all lines if
+        num_lines is None. Recent lines are read from memory if the file is
+        open, otherwise the file is read backwards from the end.
+        """
         path = self.full_path(filename)
-        if not path or not os.path.exists(path):
-            return []
-        if not num_lines:
-            num_lines = sys.maxint
+        fh_wrapper = self._get_open_file(path)
+        if fh_wrapper and num_lines:
+            lines = fh_wrapper.recent(num_lines)
+            if lines is not None:
+                return lines
 
         try:
-            cmd = ('tail', '-n', str(num_lines), path)
-            tail_sub = Popen(cmd, stdout=PIPE)
-            return list(line.rstrip() for line in tail_sub.stdout)
-        except OSError, e:
-            log.error("Could not tail %s: %s" % (path, e))
+            return tail_file(path, num_lines)
+        except IOError, e:
+            if os.path.exists(path):
+                log.error("Could not tail %s: %s" % (path, e))
             return []
 
+    def size(self, filename):
+        """Return the size of the file in bytes, which is the offset of the
+        end of the file.
+        """
+        path = self.full_path(filename)
+        self._get_open_file(path)
+        try:
+            return os.path.getsize(path)
+        except OSError:
+            return 0
+
+    def read_from(self, filename, offset, max_bytes=MAX_READ_BYTES):
+        """Return a tuple of (offset, content) with up to max_bytes written
+        to the file after the byte offset. If the file is shorter than offset
+        it was replaced, and is read from the start, so offset is 0.
+        """
+        path = self.full_path(filename)
+        self._get_open_file(path)
+        try:
+            with open(path, 'rb') as fh:
+                fh.seek(0, os.SEEK_END)
+                if offset > fh.tell():
+                    offset = 0
+                fh.seek(offset)
+                return offset, fh.read(max_bytes)
+        except IOError:
+            return offset, ''
+
+    def read_since(self, filename, offset, max_bytes=MAX_READ_BYTES):
+        """Return a tuple of (lines, offset) with the complete lines written
+        to the file after the byte offset, and the offset after those lines.
+        If the file is shorter than offset it was replaced, and is read from
+        the start.
+        """
+        offset, content = self.read_from(filename, offset, max_bytes)
+        end = content.rfind('\n') + 1
+        if not end and len(content) == max_bytes:
+            end = len(content)
+        content = content[:end]
+        return [line.rstrip() for line in content.splitlines()], offset + end
+
     def open(self, filename):
         """Return a FileHandleManager for the output path."""
         path = self.full_path(filename)
         return FileHandleManager.get_instance().open(path)
 
 
+def tail_file(path, num_lines=None):
+    """Return the last num_lines lines of the file at path. The file is read
+    backwards in blocks until it has enough lines.
+    """
+    with open(path, 'rb') as fh:
+        if not num_lines:
+            return [line.rstrip() for line in fh]
+
+        fh.seek(0, os.SEEK_END)
+        position = fh.tell()
+        blocks, newlines = [], 0
+        # The last line may end with a newline, so one extra is needed
+        while position > 0 and newlines <= num_lines:
+            block_size = min(TAIL_BLOCK_SIZE, position)
+            position -= block_size
+            fh.seek(position)
+            block = fh.read(block_size)
+            newlines += block.count('\n')
+            blocks.append(block)
+
+    content = ''.join(reversed(blocks))
+    return [line.rstrip() for line in content.splitlines()[-num_lines:]]
+
+
 class OutputPath(object):
     """A list like object used to construct a file path for output. The
     file path is constructed by joining the base path with any additional
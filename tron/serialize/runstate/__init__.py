@@ -3,4 +3,5 @@
 # State types
 JOB_STATE               = 'job_state'
 SERVICE_STATE           = 'service_state'
-MCP_STATE               = 'mcp_state'
\ No newline at end of file
+MCP_STATE               = 'mcp_state'
+JOB_JOURNAL_STATE       = 'job_journal_state'
@@ -0,0 +1,105 @@
+"""Encode and decode state_data for stores which persist serialized state.
+
+Encoded state starts with a versioned header which identifies the codec that
+encoded it. State without a header is YAML, which is how state was encoded
+by previous versions of Tron. This allows a store to change codecs, and
+existing state is re-encoded with the new codec the next time it is saved.
+
+    header: MAGIC, codec id (unsigned char), codec version (unsigned char)
+
+Stores which can only persist text use encode_text() and decode_text(),
+which base64 encode binary formats.
+"""
+import base64
+import cPickle as pickle
+import struct
+
+import yaml
+
+
+MAGIC               = '\x00TRN'
+HEADER              = struct.Struct('!4sBB')
+TEXT_PREFIX         = '#tron-b64:'
+
+
+class CodecError(ValueError):
+    """Raised when encoded state can not be decoded."""
+
+
+class YamlCodec(object):
+    """Encode state as YAML. Encoded state has no header so that it can still
+    be read by previous versions of Tron.
+    """
+    name                = 'yaml'
+    codec_id            = 1
+    version             = 1
+    is_binary           = False
+
+    @classmethod
+    def encode(cls, state_data):
+        return yaml.dump(state_data)
+
+    @classmethod
+    def loads(cls, data, _version):
+        return yaml.load(data)
+
+
+class PickleCodec(object):
+    """Encode state using pickle protocol 2, a compact binary format."""
+    name                = 'pickle'
+    codec_id            = 2
+    version             = 1
+    is_binary           = True
+    protocol            = 2
+
+    @classmethod
+    def encode(cls, state_data):
+        header = HEADER.pack(MAGIC, cls.codec_id, cls.version)
+        return header + pickle.dumps(state_data, cls.protocol)
+
+    @classmethod
+    def loads(cls, data, _version):
+        return pickle.loads(data)
+
+
+CODECS = dict((codec.name, codec) for codec in (YamlCodec, PickleCodec))
+CODECS_BY_ID = dict((codec.codec_id, codec) for codec in CODECS.itervalues())
+
+
+def get_codec(name):
+    if name not in CODECS:
+        raise CodecError("Unknown codec: %s" % name)
+    return CODECS[name]
+
+
+def decode(data):
+    """Decode state encoded by any codec, or legacy YAML."""
+    if not data.startswith(MAGIC):
+        return YamlCodec.loads(data, None)
+
+    if len(data) < HEADER.size:
+        raise CodecError("Incomplete header.")
+
+    _, codec_id, version = HEADER.unpack(data[:HEADER.size])
+    codec = CODECS_BY_ID.get(codec_id)
+    if not codec:
+        raise CodecError("Unknown codec id: %s" % codec_id)
+    if version > codec.version:
+        msg = "State encoded with %s version %s, expected <= %s"
+        raise CodecError(msg % (codec.name, version, codec.version))
+    return codec.loads(data[HEADER.size:], version)
+
+
+def encode_text(codec, state_data):
+    """Encode state_data using codec as a string safe for a text field."""
+    data = codec.encode(state_data)
+    if not codec.is_binary:
+        return data
+    return TEXT_PREFIX + base64.b64encode(data)
+
+
+def decode_text(data):
+    """Decode state encoded by encode_text()."""
+    if data.startswith(TEXT_PREFIX):
+        data = base64.b64decode(str(data[len(TEXT_PREFIX):]))
+    return decode(data)
@@ -0,0 +1,211 @@
+"""Store state in an append-only log file.
+
+Each save appends a length prefixed and checksummed record for every key to
+the end of the log. An in-memory index maps each key to the offset of its
+most recent record, so a restore only reads the latest record for each key.
+Once the log contains more stale records than live ones it is compacted by
+rewriting only the latest records to a new file.
+"""
+from collections import namedtuple
+import cPickle as pickle
+import logging
+import os
+import struct
+import urlparse
+import zlib
+
+log = logging.getLogger(__name__)
+
+
+LogStateKey = namedtuple('LogStateKey', ['type', 'iden'])
+
+
+class LogStateStoreError(ValueError):
+    """Raised when a record in the log can not be read."""
+
+
+class LogStateStore(object):
+    """Persist state to an append-only log file.
+
+    connection_details is an optional HTTP query string. Valid keys are:
+        fsync           - fsync the log after each save (default 0)
+        compact_min     - minimum number of records in the log before it
+                          will be compacted (default 1000)
+    """
+
+    # Record length and crc32 of the record payload
+    HEADER              = struct.Struct('!Ii')
+    PICKLE_PROTOCOL     = 2
+    DEFAULT_COMPACT_MIN = 1000
+
+    def __init__(self, filename, connection_details=None):
+        self.filename           = filename
+        params                  = self._parse_connection_details(
+                                    connection_details)
+        self.fsync              = bool(int(params.get('fsync', 0)))
+        self.compact_min        = int(
+                                    params.get('compact_min',
+                                    self.DEFAULT_COMPACT_MIN))
+        self.index              = {}
+        self.record_count       = 0
+        # Length of the log which holds complete records
+        self.length             = 0
+        self._open()
+
+    def _parse_connection_details(self, connection_details):
+        if not connection_details:
+            return {}
+        return dict(urlparse.parse_qsl(connection_details))
+
+    def _open(self):
+        """Open the log, rebuild the index, and truncate a partially written
+        record left by a crash.
+        """
+        mode = 'r+b' if os.path.exists(self.filename) else 'w+b'
+        self.fh = open(self.filename, mode)
+        valid_length = self._build_index()
+        self.fh.seek(0, os.SEEK_END)
+        if self.fh.tell() > valid_length:
+            log.warn("Truncating %s bytes of incomplete records from %s",
+                self.fh.tell() - valid_length, self.filename)
+            self.fh.truncate(valid_length)
+            self.fh.seek(valid_length)
+        self.length = valid_length
+
+    def _build_index(self):
+        """Scan the log and index the offset of the latest record for each
+        key. Returns the length of the log that contains valid records.
+        """
+        self.fh.seek(0)
+        offset = 0
+        while True:
+            try:
+                key, _, length = self._read_record(offset)
+            except LogStateStoreError, e:
+                log.warn("Stopped reading %s: %s", self.filename, e)
+                return offset
+            if key is None:
+                return offset
+            self.index[key] = offset
+            self.record_count += 1
+            offset += length
+
+    def _read_record(self, offset):
+        """Read the record at offset and return a tuple of
+        (key, state_data, record length). Returns a key of None at the end
+        of the log.
+        """
+        self.fh.seek(offset)
+        header = self.fh.read(self.HEADER.size)
+        if not header:
+            return None, None, 0
+        if len(header) < self.HEADER.size:
+            raise LogStateStoreError("Incomplete header at %s" % offset)
+
+        length, checksum = self.HEADER.unpack(header)
+        payload = self.fh.read(length)
+        if len(payload) < length or zlib.crc32(payload) != checksum:
+            raise LogStateStoreError("Invalid record at %s" % offset)
+
+        key, state_data = pickle.loads(payload)
+        return LogStateKey(*key), state_data, self.HEADER.size + length
+
+    def _build_record(self, key, state_data):
+        payload = pickle.dumps((tuple(key), state_data), self.PICKLE_PROTOCOL)
+        return self.HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+    def build_key(self, type, iden):
+        return LogStateKey(type, iden)
+
+    def save(self, key_value_pairs):
+        self.fh.seek(0, os.SEEK_END)
+        if self.fh.tell() > self.length:
+            self._truncate()
+        offset = self.length
+        records, offsets = [], {}
+        for key, state_data in key_value_pairs:
+            record = self._build_record(key, state_data)
+            offsets[key] = offset
+            offset += len(record)
+            records.append(record)
+
+        try:
+            self.fh.write(''.join(records))
+            self._sync(self.fh)
+        except (IOError, OSError):
+            try:
+                self._truncate()
+            except (IOError, OSError):
+                pass
+            raise
+        self.length = offset
+        self.index.update(offsets)
+        self.record_count += len(records)
+
+        if self.should_compact():
+            self.compact()
+
+    def _truncate(self):
+        """Remove the part of a save which failed, so that it does not hide
+        the records saved after it when the log is opened. If this fails
+        it is tried again before the next save.
+        """
+        log.warn("Truncating %s to %s bytes after a failed save",
+            self.filename, self.length)
+        try:
+            self.fh.truncate(self.length)
+            self.fh.seek(self.length)
+        except (IOError, OSError), e:
+            log.error("Failed to truncate %s: %s", self.filename, e)
+            raise
+
+    def _sync(self, fh):
+        fh.flush()
+        if self.fsync:
+            os.fsync(fh.fileno())
+
+    def restore(self, keys):
+        items = {}
+        for key in keys:
+            if key not in self.index:
+                continue
+            _, state_data, _ = self._read_record(self.index[key])
+            if state_data:
+                items[key] = state_data
+        return items
+
+    def should_compact(self):
+        """Return True if more than half the records in the log are stale."""
+        return (self.record_count >= self.compact_min and
+                self.record_count > 2 * len(self.index))
+
+    def compact(self):
+        """Rewrite the log with only the latest record for each key."""
+        log.info("Compacting %s from %s to %s records", self.filename,
+            self.record_count, len(self.index))
+        tmp_filename = '%s.compact' % self.filename
+        index, offset = {}, 0
+        with open(tmp_filename, 'wb') as tmp_fh:
+            for key, key_offset in sorted(
+                    self.index.iteritems(), key=lambda item: item[1]):
+                _, state_data, _ = self._read_record(key_offset)
+                record = self._build_record(key, state_data)
+                tmp_fh.write(record)
+                index[key] = offset
+                offset += len(record)
+            self._sync(tmp_fh)
+
+        self.fh.close()
+        os.rename(tmp_filename, self.filename)
+        self.fh = open(self.filename, 'r+b')
+        self.index = index
+        self.record_count = len(index)
+        self.length = offset
+
+    def cleanup(self):
+        if not self.fh.closed:
+            self._sync(self.fh)
+            self.fh.close()
+
+    def __repr__(self):
+        return "LogStateStore('%s')" % self.filename
@@ -19,11 +19,13 @@ class MongoStateStore(object):
     JOB_COLLECTION              = 'job_state_collection'
     SERVICE_COLLECTION          = 'service_state_collection'
     METADATA_COLLECTION         = 'metadata_collection'
+    JOB_JOURNAL_COLLECTION      = 'job_journal_collection'
 
     TYPE_TO_COLLECTION_MAP = {
         runstate.JOB_STATE:     JOB_COLLECTION,
         runstate.SERVICE_STATE: SERVICE_COLLECTION,
-        runstate.MCP_STATE:     METADATA_COLLECTION
+        runstate.MCP_STATE:     METADATA_COLLECTION,
+        runstate.JOB_JOURNAL_STATE: JOB_JOURNAL_COLLECTION,
     }
 
     def __init__(self, db_name, connection_details):
@@ -1,13 +1,17 @@
 from collections import namedtuple
 from contextlib import contextmanager
-import itertools
-import operator
+import functools
+import logging
 
-import yaml
 sqlalchemy = None # pyflakes
 
 from tron.serialize import runstate
+from tron.serialize.runstate import codec
 from tron.config.config_utils import MAX_IDENTIFIER_LENGTH
+from tron.utils import iteration
+
+
+log = logging.getLogger(__name__)
 
 
 SQLStateKey = namedtuple('SQLStateKey', ['table', 'id'])
@@ -15,15 +19,20 @@ SQLStateKey = namedtuple('SQLStateKey', ['table', 'id'])
 
 class SQLAlchemyStateStore(object):
 
-    def __init__(self, name, connection_details):
+    # Maximum number of ids in a single IN clause
+    SELECT_CHUNK_SIZE           = 500
+
+    def __init__(self, name, connection_details, state_codec=None):
         import sqlalchemy
+        import sqlalchemy.exc
         global sqlalchemy
         assert sqlalchemy # pyflakes
 
         self.name               = name
-        self._connection        = None
-        self.encoder            = yaml.dump
-        self.decoder            = yaml.load
+        self.codec              = state_codec or codec.YamlCodec
+        self.encoder            = functools.partial(
+                                    codec.encode_text, self.codec)
+        self.decoder            = codec.decode_text
         self._create_engine(connection_details)
         self._build_tables()
         self.create_tables()
@@ -51,17 +60,35 @@ class SQLAlchemyStateStore(object):
             Column('state_data', Text)
         )
 
+        self.job_journal_table = Table('job_journal_data', self._metadata,
+            Column('id', String(MAX_IDENTIFIER_LENGTH), primary_key=True),
+            Column('state_data', Text)
+        )
+
     def create_tables(self):
         """Execute the create table statements."""
         self._metadata.create_all(self.engine)
 
     @contextmanager
     def connect(self):
-        """Yield a connection."""
-        # TODO: handle 'mysql has gone away' and similar exceptions
-        if not self._connection or self._connection.closed:
-            self._connection = self.engine.connect()
-        yield self._connection
+        """Yield a connection from the engines connection pool."""
+        conn = self.engine.connect()
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def _with_reconnect(self, func, *args):
+        """Call func, and retry it once on a fresh connection if the database
+        connection was lost (ex: 'mysql has gone away').
+        """
+        try:
+            return func(*args)
+        except sqlalchemy.exc.DBAPIError, e:
+            if not e.connection_invalidated:
+                raise
+            log.warn("Lost connection to %s, reconnecting: %s", self, e)
+            return func(*args)
 
     def build_key(self, type, iden):
         table = None
@@ -71,43 +98,86 @@ class SQLAlchemyStateStore(object):
             table = self.service_table
         if type == runstate.MCP_STATE:
             table = self.metadata_table
+        if type == runstate.JOB_JOURNAL_STATE:
+            table = self.job_journal_table
         return SQLStateKey(table, iden)
 
+    def _group_by_table(self, keys):
+        """Return a dict of table to the list of ids for that table."""
+        ids_by_table = {}
+        for key in keys:
+            ids_by_table.setdefault(key.table, []).append(key.id)
+        return ids_by_table
+
     def save(self, key_value_pairs):
+        state_by_key = dict(
+            (key, self.encoder(state_data))
+            for key, state_data in key_value_pairs)
+        self._with_reconnect(self._save, state_by_key)
+
+    def _save(self, state_by_key):
+        """Save all items in a single transaction, using one statement per
+        table for updates and one for inserts.
+        """
+        ids_by_table = self._group_by_table(state_by_key)
         with self.connect() as conn:
-            for key, state_data in key_value_pairs:
-                state_data = self.encoder(state_data)
-
-                # The first state update requires an insert
-                if not self._update(conn, key, state_data):
-                    self._insert(conn, key, state_data)
-
-    def _update(self, conn, key, data):
-        """Attempt to update the state_data."""
-        update  = key.table.update()
-        where   = key.table.c.id==key.id
-        results = conn.execute(update.where(where).values(state_data=data))
-        return results.rowcount
-
-    def _insert(self, conn, key, state_data):
-        """Attempt to insert the state_data."""
-        insert = key.table.insert()
-        conn.execute(insert.values(id=key.id, state_data=state_data))
+            trans = conn.begin()
+            try:
+                for table, ids in ids_by_table.iteritems():
+                    rows = [(iden, state_by_key[SQLStateKey(table, iden)])
+                            for iden in ids]
+                    self._upsert(conn, table, rows)
+                trans.commit()
+            except:
+                trans.rollback()
+                raise
+
+    def _upsert(self, conn, table, rows):
+        """Update the rows which already exist and insert the rest."""
+        ids = [iden for iden, _ in rows]
+        existing = set(self._select_existing_ids(conn, table, ids))
+        updates = [dict(key_id=iden, state_data=state_data)
+                   for iden, state_data in rows if iden in existing]
+        inserts = [dict(id=iden, state_data=state_data)
+                   for iden, state_data in rows if iden not in existing]
+
+        if updates:
+            update = table.update().where(
+                table.c.id == sqlalchemy.bindparam('key_id'))
+            conn.execute(update.values(
+                state_data=sqlalchemy.bindparam('state_data')), updates)
+        if inserts:
+            conn.execute(table.insert(), inserts)
+
+    def _select_existing_ids(self, conn, table, ids):
+        for chunk in iteration.chunked(ids, self.SELECT_CHUNK_SIZE):
+            select = sqlalchemy.sql.select([table.c.id], table.c.id.in_(chunk))
+            for row in conn.execute(select):
+                yield row[0]
 
     def restore(self, keys):
-        with self.connect() as conn:
-            items = [(key, self._select(conn, key)) for key in keys]
-            return dict(itertools.ifilter(operator.itemgetter(1), items))
+        return self._with_reconnect(self._restore, keys)
 
-    def _select(self, conn, key):
-        cols = [key.table.c.state_data]
-        select = sqlalchemy.sql.select(cols, key.table.c.id==key.id)
-        result = conn.execute(select).fetchone()
-        return self.decoder(result[0]) if result else None
+    def _restore(self, keys):
+        """Restore all keys using one select for each table."""
+        items = {}
+        with self.connect() as conn:
+            for table, ids in self._group_by_table(keys).iteritems():
+                for iden, state_data in self._select(conn, table, ids):
+                    state_data = self.decoder(state_data)
+                    if state_data:
+                        items[SQLStateKey(table, iden)] = state_data
+        return items
+
+    def _select(self, conn, table, ids):
+        cols = [table.c.id, table.c.state_data]
+        for chunk in iteration.chunked(ids, self.SELECT_CHUNK_SIZE):
+            select = sqlalchemy.sql.select(cols, table.c.id.in_(chunk))
+            for row in conn.execute(select):
+                yield row[0], row[1]
 
     def cleanup(self):
-        if self._connection:
-            self._connection.close()
+        self.engine.dispose()
 
     def __str__(self):
         return "SQLAlchemyStateStore(%s)" % self.name
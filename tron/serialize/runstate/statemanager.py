@@ -1,14 +1,19 @@
 from contextlib import contextmanager
+import cPickle as pickle
 import logging
 import time
 import itertools
 import tron
+from tron import eventloop
 from tron.config import schema
 from tron.core import job, service
 from tron.serialize import runstate
+from tron.serialize.runstate import codec
+from tron.serialize.runstate.logstore import LogStateStore
 from tron.serialize.runstate.mongostore import MongoStateStore
 from tron.serialize.runstate.shelvestore import ShelveStateStore
 from tron.serialize.runstate.sqlalchemystore import SQLAlchemyStateStore
+from tron.serialize.runstate.threadedstore import ThreadedStateStore
 from tron.serialize.runstate.yamlstore import YamlStateStore
 from tron.utils import observer
 
@@ -31,6 +36,10 @@ class PersistenceManagerFactory(object):
         name                    = persistence_config.name
         connection_details      = persistence_config.connection_details
         buffer_size             = persistence_config.buffer_size
+        buffer_max_latency      = persistence_config.buffer_max_latency
+        buffer_max_bytes        = persistence_config.buffer_max_bytes
+        journal_size            = persistence_config.journal_size
+        state_codec             = codec.get_codec(persistence_config.codec)
         store                   = None
 
         if store_type not in schema.StatePersistenceTypes:
@@ -40,16 +49,25 @@ class PersistenceManagerFactory(object):
             store = ShelveStateStore(name)
 
         if store_type == schema.StatePersistenceTypes.sql:
-            store = SQLAlchemyStateStore(name, connection_details)
+            store = SQLAlchemyStateStore(
+                name, connection_details, state_codec)
 
         if store_type == schema.StatePersistenceTypes.mongo:
             store = MongoStateStore(name, connection_details)
 
         if store_type == schema.StatePersistenceTypes.yaml:
-            store = YamlStateStore(name)
+            store = YamlStateStore(name, state_codec)
 
-        buffer = StateSaveBuffer(buffer_size)
-        return PersistentStateManager(store, buffer)
+        if store_type == schema.StatePersistenceTypes.log:
+            store = LogStateStore(name, connection_details)
+
+        if persistence_config.threaded_writes:
+            store = ThreadedStateStore(store)
+
+        buffer = StateSaveBuffer(
+            buffer_size, buffer_max_latency, buffer_max_bytes)
+        journal = JobStateJournal(journal_size) if journal_size else None
+        return PersistentStateManager(store, buffer, journal)
 
 
 class StateMetadata(object):
@@ -83,27 +101,146 @@ class StateMetadata(object):
 
 
 class StateSaveBuffer(object):
-    """Buffer calls to save, and perform the saves when buffer reaches
-    buffer size. This buffer will only store one state_data for each key.
+    """Buffer calls to save, and perform the saves when the buffer holds
+    buffer_size dirty keys, or when the estimated size of the buffered state
+    reaches max_bytes. If max_latency is set, buffered state is also saved at
+    most max_latency seconds after it was buffered. This buffer will only
+    store one state_data for each key.
+
+    The size of a state_data is estimated by pickling it, which is as costly
+    as a save to most stores. To avoid paying that cost on every save, the
+    size of a key is only measured on its first save and every
+    SIZE_SAMPLE_INTERVAL saves after that, and the last measured size is
+    used in between.
     """
 
-    def __init__(self, buffer_size):
+    SIZE_SAMPLE_INTERVAL = 10
+
+    def __init__(self, buffer_size, max_latency=None, max_bytes=None):
         self.buffer_size        = buffer_size
+        self.max_latency        = max_latency
+        self.max_bytes          = max_bytes
         self.buffer             = {}
-        self.counter            = itertools.cycle(xrange(buffer_size))
+        # Estimated size of each buffered key
+        self.key_sizes          = {}
+        self.buffered_bytes     = 0
+        # Map of key to [last measured size, saves since it was measured]
+        self.sampled_sizes      = {}
 
     def save(self, key, state_data):
         """Save the state_data indexed by key and return True if the buffer
         is full.
         """
         self.buffer[key] = state_data
-        return not self.counter.next()
+        if self.max_bytes:
+            self._update_size(key, state_data)
+        return self.is_full
+
+    def _update_size(self, key, state_data):
+        size = self._estimate_size(key, state_data)
+        self.buffered_bytes += size - self.key_sizes.get(key, 0)
+        self.key_sizes[key] = size
+
+    def _estimate_size(self, key, state_data):
+        sample = self.sampled_sizes.get(key)
+        if not sample or sample[1] >= self.SIZE_SAMPLE_INTERVAL:
+            size = len(pickle.dumps(state_data, pickle.HIGHEST_PROTOCOL))
+            sample = self.sampled_sizes[key] = [size, 0]
+        sample[1] += 1
+        return sample[0]
+
+    @property
+    def is_full(self):
+        if len(self.buffer) >= self.buffer_size:
+            return True
+        return bool(self.max_bytes and self.buffered_bytes >= self.max_bytes)
+
+    def __len__(self):
+        return len(self.buffer)
 
     def __iter__(self):
         """Return all buffered data and clear the buffer."""
         for key, item in self.buffer.iteritems():
             yield key, item
         self.buffer.clear()
+        self.key_sizes.clear()
+        self.buffered_bytes = 0
+
+
+class JobStateJournal(object):
+    """Journal the JobRuns which changed since the last snapshot of a Job, so
+    that a state change only writes the changed runs instead of every retained
+    run. After journal_size changes the journal is compacted into a new full
+    snapshot of the Job.
+
+    Snapshots and journals share a snapshot_id, so a journal is only applied
+    to the snapshot it was recorded against.
+    """
+
+    def __init__(self, journal_size):
+        self.journal_size       = journal_size
+        self.journals           = {}
+
+    def snapshot(self, job):
+        """Return the state records for a full snapshot of the job, and reset
+        its journal.
+        """
+        job.pop_changed_runs()
+        snapshot_id = time.time()
+        journal = self.journals[job.name] = {
+            'snapshot_id':      snapshot_id,
+            'count':            0,
+            'runs':             {},
+        }
+        snapshot = dict(job.state_data, snapshot_id=snapshot_id)
+        return [
+            (runstate.JOB_STATE,            snapshot),
+            (runstate.JOB_JOURNAL_STATE,    self._build_state(job, journal)),
+        ]
+
+    def record(self, job):
+        """Return the state records to save for a change to the job. Only the
+        runs which changed since the last snapshot are included.
+        """
+        journal = self.journals.get(job.name)
+        if not journal or journal['count'] >= self.journal_size:
+            return self.snapshot(job)
+
+        journal['count'] += 1
+        for job_run in job.pop_changed_runs():
+            journal['runs'][job_run.run_num] = job_run.state_data
+        return [(runstate.JOB_JOURNAL_STATE, self._build_state(job, journal))]
+
+    def _build_state(self, job, journal):
+        run_nums = [job_run.run_num for job_run in job.runs]
+        # Drop runs which were removed from the job since the snapshot
+        for run_num in set(journal['runs']) - set(run_nums):
+            del journal['runs'][run_num]
+
+        return {
+            'snapshot_id':      journal['snapshot_id'],
+            'enabled':          job.enabled,
+            'run_nums':         run_nums,
+            'runs':             journal['runs'].values(),
+        }
+
+    @staticmethod
+    def apply(state_data, journal_state):
+        """Return the state_data of a job with the journal applied."""
+        if not state_data or not journal_state:
+            return state_data
+
+        if state_data.get('snapshot_id') != journal_state['snapshot_id']:
+            return state_data
+
+        runs = dict((run['run_num'], run) for run in state_data['runs'])
+        runs.update((run['run_num'], run) for run in journal_state['runs'])
+        return {
+            'enabled':          journal_state['enabled'],
+            'runs':             [runs[run_num]
+                                 for run_num in journal_state['run_nums']
+                                 if run_num in runs],
+        }
 
 
 class PersistentStateManager(object):
@@ -126,12 +263,26 @@ class PersistentStateManager(object):
         def cleanup(self):
             pass
 
+    If a JobStateJournal is used, changes to a Job are persisted as a journal
+    of the changed JobRuns, which is applied to the last snapshot of the Job
+    when the state is restored.
     """
 
-    def __init__(self, persistence_impl, buffer):
+    def __init__(self, persistence_impl, buffer, journal=None):
         self.enabled            = True
         self._buffer            = buffer
         self._impl              = persistence_impl
+        self._journal           = journal
+        self._flush_callback    = eventloop.UniqueCallback(
+                                    buffer.max_latency, self._flush_expired)
+        self.flush_stats        = {
+            'flush_count':          0,
+            'keys_flushed':         0,
+            'last_duration':        None,
+        }
+        # The size of buffered state is only measured when it is limited
+        if buffer.max_bytes:
+            self.flush_stats['bytes_flushed'] = 0
         self.metadata_key       = self._impl.build_key(
                                     runstate.MCP_STATE, StateMetadata.name)
 
@@ -141,9 +292,19 @@ class PersistentStateManager(object):
         if not skip_validation:
             self._restore_metadata()
 
-        return (self._restore_dicts(runstate.JOB_STATE, job_names),
+        return (self._restore_jobs(job_names),
                 self._restore_dicts(runstate.SERVICE_STATE, service_names))
 
+    def _restore_jobs(self, job_names):
+        """Return a dict mapping of job name to state data, with any journaled
+        changes applied.
+        """
+        job_states = self._restore_dicts(runstate.JOB_STATE, job_names)
+        journals   = self._restore_dicts(runstate.JOB_JOURNAL_STATE, job_names)
+        return dict(
+            (name, JobStateJournal.apply(state_data, journals.get(name)))
+            for name, state_data in job_states.iteritems())
+
     def _restore_metadata(self):
         metadata = self._impl.restore([self.metadata_key])
         StateMetadata.validate_metadata(metadata.get(self.metadata_key))
@@ -160,14 +321,39 @@ class PersistentStateManager(object):
         return dict((key_to_item_map[key], state_data)
                     for key, state_data in key_to_state_map.iteritems())
 
+    def save_job(self, job, snapshot=False):
+        """Persist the state of a Job. If journaling is enabled, only the
+        changed runs are saved unless snapshot is True.
+        """
+        if not self._journal:
+            job.clear_changed_runs()
+            return self.save(runstate.JOB_STATE, job.name, job.state_data)
+
+        if snapshot:
+            state_records = self._journal.snapshot(job)
+        else:
+            state_records = self._journal.record(job)
+
+        for type_enum, state_data in state_records:
+            self.save(type_enum, job.name, state_data)
+
     def save(self, type_enum, name, state_data):
         """Persist an items state."""
         key = self._impl.build_key(type_enum, name)
         log.info("Buffering state save for: %s", key)
         if self._buffer.save(key, state_data) and self.enabled:
+            return self._save_from_buffer()
+        self._flush_callback.start()
+
+    def _flush_expired(self):
+        """Save buffered state which has reached the buffers max_latency."""
+        if self.enabled:
             self._save_from_buffer()
 
     def _save_from_buffer(self):
+        self._flush_callback.cancel()
+        buffered_bytes = (self._buffer.buffered_bytes
+                          if self._buffer.max_bytes else None)
         key_state_pairs = list(self._buffer)
         if not key_state_pairs:
             return
@@ -175,26 +361,39 @@ class PersistentStateManager(object):
         keys = ','.join(str(key) for key, _ in key_state_pairs)
         log.info("Saving state for %s" % keys)
 
-        with self._timeit():
-            try:
-                self._impl.save(key_state_pairs)
-            except Exception, e:
-                msg = "Failed to save state for %s: %s" % (keys, e)
-                log.warn(msg)
-                raise PersistenceStoreError(msg)
+        start_time = time.time()
+        try:
+            self._impl.save(key_state_pairs)
+        except Exception, e:
+            msg = "Failed to save state for %s: %s" % (keys, e)
+            log.warn(msg)
+            raise PersistenceStoreError(msg)
+        duration = time.time() - start_time
+        self._record_flush(len(key_state_pairs), buffered_bytes, duration)
+
+    def _record_flush(self, key_count, byte_count, duration):
+        """Record and log metrics for a flush of the buffer. byte_count is only
+        known when the buffer has a max_bytes, and is None otherwise.
+        """
+        self.flush_stats['flush_count']     += 1
+        self.flush_stats['keys_flushed']    += key_count
+        self.flush_stats['last_duration']   = duration
+        if byte_count is None:
+            log.info("State saved using %s: %d keys in %0.3fs." % (
+                self._impl, key_count, duration))
+            return
+
+        self.flush_stats['bytes_flushed']   += byte_count
+        log.info("State saved using %s: %d keys, %d bytes in %0.3fs." % (
+            self._impl, key_count, byte_count, duration))
+
+    def get_flush_stats(self):
+        return dict(self.flush_stats)
 
     def cleanup(self):
         self._save_from_buffer()
         self._impl.cleanup()
 
-    @contextmanager
-    def _timeit(self):
-        """Log the time spent saving the state."""
-        start_time = time.time()
-        yield
-        duration = time.time() - start_time
-        log.info("State saved using %s in %0.3fs." % (self._impl, duration))
-
     @contextmanager
     def disabled(self):
         """Temporarily disable the state manager."""
@@ -212,6 +411,10 @@ class NullStateManager(object):
     def cleanup():
         pass
 
+    @staticmethod
+    def get_flush_stats():
+        return None
+
     @classmethod
     def disabled(cls):
         return cls()
@@ -242,12 +445,12 @@ class StateChangeWatcher(observer.Observer):
     def handler(self, observable, _event):
         """Handle a state change in an observable by saving its state."""
         if isinstance(observable, job.Job):
-            self.save_job(observable)
+            self.state_manager.save_job(observable)
         if isinstance(observable, service.Service):
             self.save_service(observable)
 
     def save_job(self, job):
-        self._save_object(runstate.JOB_STATE, job)
+        self.state_manager.save_job(job, snapshot=True)
 
     def save_service(self, service):
         self._save_object(runstate.SERVICE_STATE, service)
@@ -265,5 +468,11 @@ class StateChangeWatcher(observer.Observer):
     def disabled(self):
         return self.state_manager.disabled()
 
+    def get_flush_stats(self):
+        """Return the flush metrics of the state manager, or None if state is
+        not persisted.
+        """
+        return self.state_manager.get_flush_stats()
+
     def restore(self, jobs, services):
         return self.state_manager.restore(jobs, services)
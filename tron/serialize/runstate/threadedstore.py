@@ -0,0 +1,114 @@
+"""Perform state store writes in a worker thread.
+
+Saves are handed to a single worker thread so slow stores do not block the
+reactor. Only one save is in flight at a time. Saves which arrive while a
+save is in flight are merged (by key) into a single pending save, which is
+written once the in flight save completes. This keeps the writes for each key
+in order, and bounds the pending state to one state_data per key.
+
+When a save fails its state is merged back into the pending save (unless a
+newer state_data was saved for the key) and written again after a delay,
+which doubles on each failure up to MAX_RETRY_DELAY.
+"""
+import logging
+import threading
+import time
+
+from twisted.internet import reactor, threads
+from twisted.python import threadpool
+
+from tron import eventloop
+
+log = logging.getLogger(__name__)
+
+
+class ThreadedStateStore(object):
+    """Wrap an IStateStore so that saves are written from a worker thread.
+
+    The state_data passed to save() must not be modified after it is saved,
+    which holds for the state_data built by Jobs and Services.
+    """
+
+    # Seconds to wait before writing again after the first failed save
+    RETRY_DELAY         = 1
+    MAX_RETRY_DELAY     = 60
+
+    def __init__(self, store):
+        self.store              = store
+        self.pending            = {}
+        self.in_flight          = None
+        self.retry_delay        = 0
+        self.retry_call         = eventloop.NullCallback
+        self.lock               = threading.Lock()
+        self.pool               = threadpool.ThreadPool(
+                                    1, 1, name='ThreadedStateStore')
+        self.pool.start()
+
+    def build_key(self, type, iden):
+        return self.store.build_key(type, iden)
+
+    def save(self, key_value_pairs):
+        self.pending.update(key_value_pairs)
+        if not self.in_flight and not self.retry_call.active():
+            self._write_pending()
+
+    def _write_pending(self):
+        key_value_pairs, self.pending = self.pending.items(), {}
+        self.in_flight = threads.deferToThreadPool(
+            reactor, self.pool, self._save, key_value_pairs)
+        self.in_flight.addCallbacks(self._handle_saved, self._handle_error,
+            errbackArgs=(key_value_pairs,))
+        self.in_flight.addBoth(self._handle_done)
+
+    def _save(self, key_value_pairs):
+        """Called from the worker thread."""
+        with self.lock:
+            start_time = time.time()
+            self.store.save(key_value_pairs)
+            duration = time.time() - start_time
+        log.info("State written using %s in %0.3fs." % (self.store, duration))
+
+    def _handle_saved(self, _):
+        self.retry_delay = 0
+
+    def _handle_error(self, failure, key_value_pairs):
+        """Merge the state which failed to save back into the pending save,
+        without replacing state which was saved since.
+        """
+        for key, state_data in key_value_pairs:
+            self.pending.setdefault(key, state_data)
+        self.retry_delay = min(
+            max(self.RETRY_DELAY, self.retry_delay * 2), self.MAX_RETRY_DELAY)
+        keys = ','.join(str(key) for key, _ in key_value_pairs)
+        log.error("Failed to save state for %s, retrying in %ss: %s",
+            keys, self.retry_delay, failure.value)
+
+    def _handle_done(self, _):
+        self.in_flight = None
+        if not self.pending:
+            return
+        if self.retry_delay:
+            self.retry_call = eventloop.call_later(
+                self.retry_delay, self._write_pending)
+        else:
+            self._write_pending()
+
+    def restore(self, keys):
+        with self.lock:
+            items = self.store.restore(keys)
+        items.update(
+            (key, self.pending[key]) for key in keys if key in self.pending)
+        return items
+
+    def cleanup(self):
+        """Wait for the in flight save, and write any pending state."""
+        self.pool.stop()
+        if self.retry_call.active():
+            self.retry_call.cancel()
+        if self.pending:
+            key_value_pairs, self.pending = self.pending.items(), {}
+            self._save(key_value_pairs)
+        self.store.cleanup()
+
+    def __str__(self):
+        return "ThreadedStateStore(%s)" % self.store
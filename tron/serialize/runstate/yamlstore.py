@@ -3,31 +3,31 @@
 WARNING: Using this store is NOT recommended.  It will be far too slow for
 anything but the most trivial setups.  It should only be used with a high
 buffer size (10+), and a low run_limit (< 10).
+
+The file can be encoded with a binary codec instead of YAML, which is faster,
+but the whole file is still written on every save.
 """
 from collections import namedtuple
 import itertools
 import operator
 import os
 from tron.serialize import runstate
-
-yaml = None # For pyflakes
+from tron.serialize.runstate import codec
 
 YamlKey = namedtuple('YamlKey', ['type', 'iden'])
 
 TYPE_MAPPING = {
     runstate.JOB_STATE:     'jobs',
     runstate.SERVICE_STATE: 'services',
-    runstate.MCP_STATE:     runstate.MCP_STATE
+    runstate.MCP_STATE:     runstate.MCP_STATE,
+    runstate.JOB_JOURNAL_STATE: 'job_journals',
 }
 
 class YamlStateStore(object):
 
-    def __init__(self, filename):
-        # Differ import of yaml until class is instantiated
-        import yaml
-        global yaml
-        assert yaml
+    def __init__(self, filename, state_codec=None):
         self.filename           = filename
+        self.codec              = state_codec or codec.YamlCodec
         self.buffer             = {}
 
     def build_key(self, type, iden):
@@ -37,8 +37,8 @@ class YamlStateStore(object):
         if not os.path.exists(self.filename):
             return {}
 
-        with open(self.filename, 'r') as fh:
-            self.buffer = yaml.load(fh)
+        with open(self.filename, 'rb') as fh:
+            self.buffer = codec.decode(fh.read())
 
         items = (self.buffer.get(key.type, {}).get(key.iden) for key in keys)
         key_item_pairs = itertools.izip(keys, items)
@@ -50,8 +50,8 @@ class YamlStateStore(object):
         self._write_buffer()
 
     def _write_buffer(self):
-        with open(self.filename, 'w') as fh:
-            yaml.dump(self.buffer, fh)
+        with open(self.filename, 'wb') as fh:
+            fh.write(self.codec.encode(self.buffer))
 
     def cleanup(self):
         pass
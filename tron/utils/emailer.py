@@ -25,9 +25,9 @@ class Emailer(object):
         hostname = socket.gethostname()
         return "@".join((username, hostname))
 
-    def send(self, content):
+    def send(self, content, subject="Tron Exception"):
         msg = MIMEText(content)
-        msg['Subject'] = "Tron Exception"
+        msg['Subject'] = subject
         msg['To'] = self.to_addr
 
         port = 25
@@ -21,4 +21,10 @@ def list_all(seq):
     all(). This differs from the built-in all() which will short circuit
     on the first False.
     """
-    return all(list(seq))
\ No newline at end of file
+    return all(list(seq))
+
+def chunked(seq, size):
+    """Return successive lists of at most size items from seq."""
+    seq = list(seq)
+    for i in xrange(0, len(seq), size):
+        yield seq[i:i + size]
@@ -1,8 +1,66 @@
 """Implements the Observer/Observable pattern,"""
 import logging
 
+from tron import eventloop
+from tron.utils.dicts import OrderedDict
+
 log = logging.getLogger(__name__)
 
+
+class NotificationBus(object):
+    """A Singleton which coalesces notifications sent with
+    Observable.notify_later. Repeats of an event from the same Observable
+    are dispatched once, on the next reactor tick, in the order the events
+    were first sent.
+    """
+
+    _instance = None
+
+    def __init__(self):
+        if self._instance is not None:
+            raise ValueError("NotificationBus is already instantiated.")
+        self.pending        = OrderedDict()
+        self.delayed_call   = eventloop.NullCallback
+
+    @classmethod
+    def get_instance(cls):
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    @classmethod
+    def reset(cls):
+        cls._instance = None
+
+    def add(self, observable, event):
+        key = id(observable), event
+        if key in self.pending:
+            return
+        self.pending[key] = observable, event
+        if not self.delayed_call.active():
+            self.delayed_call = eventloop.call_later(0, self.dispatch)
+
+    def dispatch(self):
+        """Notify the observers of each pending event. Events sent while
+        dispatching are dispatched on the next tick.
+        """
+        pending, self.pending = self.pending, OrderedDict()
+        for observable, event in pending.itervalues():
+            try:
+                observable.notify(event)
+            except Exception:
+                log.exception("Error notifying observers of %s: %r",
+                    observable, event)
+
+    def flush(self):
+        """Dispatch the pending events now."""
+        if self.delayed_call.active():
+            self.delayed_call.cancel()
+        self.delayed_call = eventloop.NullCallback
+        while self.pending:
+            self.dispatch()
+
+
 class Observable(object):
     """An Observable in the Observer/Observable pattern. It stores
     specifications and Observers which can be notified of changes by calling
@@ -11,6 +69,8 @@ class Observable(object):
 
     def __init__(self):
         self._observers = dict()
+        # Cache of the handlers of each event, cleared when observers change
+        self._handlers  = dict()
 
     def attach(self, watch_spec, observer):
         """Attach another observer to the listen_spec.
@@ -20,6 +80,7 @@ class Observable(object):
             <string>                Matches only that event
             <sequence of strings>   Matches any of the events in the sequence
         """
+        self._handlers.clear()
         if isinstance(watch_spec, (basestring, bool)):
             self._observers.setdefault(watch_spec, []).append(observer)
             return
@@ -31,6 +92,7 @@ class Observable(object):
         """Remove all observers for a given watch_spec. Removes all
         observers if listen_spec is None
         """
+        self._handlers.clear()
         if watch_spec is None or watch_spec is True:
             self._observers.clear()
             return
@@ -39,20 +101,37 @@ class Observable(object):
 
     def remove_observer(self, observer):
         """Remove an observer from all watch_specs."""
+        self._handlers.clear()
         for observers in self._observers.values():
             if observer in observers:
                 observers.remove(observer)
 
+    def share_observers(self, other):
+        """Use the observers of other, so that observers attached to either
+        Observable are notified by both.
+        """
+        self._observers = other._observers
+        self._handlers  = other._handlers
+
     def _get_handlers_for_event(self, event):
         """Returns the complete list of handlers for the event."""
-        return self._observers.get(True, []) + self._observers.get(event, [])
+        handlers = self._handlers.get(event)
+        if handlers is None:
+            handlers = self._handlers[event] = tuple(
+                self._observers.get(True, []) + self._observers.get(event, []))
+        return handlers
 
     def notify(self, event):
         """Notify all observers of the event."""
-        log.debug("Notifying listeners for new event %r", event)
         for handler in self._get_handlers_for_event(event):
             handler.handler(self, event)
 
+    def notify_later(self, event):
+        """Notify all observers of the event on the next reactor tick. Repeats
+        of the event before then are only sent once.
+        """
+        NotificationBus.get_instance().add(self, event)
+
 
 class Observer(object):
     """An observer in the Observer/Observable pattern.  Given an observable
@@ -12,6 +12,7 @@
 """A complete time specification based on the Google App Engine GROC spec."""
 
 
+import bisect
 import calendar
 import datetime
 import itertools
@@ -107,6 +108,24 @@ hour_range     = range(0, 24)
 minute_range   = second_range = range(0, 60)
 
 
+def next_combination(fields, start):
+    """Return the smallest tuple in the product of fields (a sequence of
+    sorted lists) which is greater than the tuple start, or None.
+    """
+    values, rest = fields[0], fields[1:]
+    index = bisect.bisect_left(values, start[0])
+    if index < len(values) and values[index] == start[0]:
+        if rest:
+            tail = next_combination(rest, start[1:])
+            if tail is not None:
+                return (start[0],) + tail
+        index += 1
+
+    if index == len(values):
+        return None
+    return (values[index],) + tuple(field[0] for field in rest)
+
+
 def validate_spec(source, value_range, type, default=None, allow_last=False):
     default = default if default is not None else value_range
     if not source:
@@ -123,8 +142,19 @@ def validate_spec(source, value_range, type, default=None, allow_last=False):
 class TimeSpecification(object):
     """TimeSpecification determines the next time which matches the
     configured pattern.
+
+    The allowed values of each field are kept as sorted lists, so the next
+    allowed time of day is found by bisecting them. The matching days of
+    each month are computed once and cached.
     """
 
+    # The calendar repeats every 400 years, so a specification which has no
+    # match within this many years never matches
+    SEARCH_YEARS = 400
+
+    # Maximum number of months with cached matching days
+    MAX_CACHED_MONTHS = 1200
+
     def __init__(self,
             ordinals=None,
             weekdays=None,
@@ -161,71 +191,71 @@ class TimeSpecification(object):
         self.monthdays  = validate_spec(
             monthdays, monthday_range, 'monthdays', [], True)
         self.timezone   = get_timezone(timezone)
+        self.time_fields = self.hours, self.minutes, self.seconds
+        self.month_days = {}
 
-    def next_day(self, first_day, year, month):
-        """Returns matching days for the given year and month.
-        """
-        first_day_of_month, last_day_of_month = calendar.monthrange(year, month)
+    def get_days(self, year, month):
+        """Returns all the matching days for the given year and month."""
+        if (year, month) in self.month_days:
+            return self.month_days[year, month]
 
+        first_day_of_month, last_day_of_month = calendar.monthrange(year, month)
         map_last   = lambda day: last_day_of_month if day == TOKEN_LAST else day
-        day_filter = lambda day: first_day <= day <= last_day_of_month
-        sort_days  = lambda days: sorted(itertools.ifilter(day_filter, days))
+        day_filter = lambda day: 1 <= day <= last_day_of_month
 
         if self.monthdays:
-            return sort_days(map_last(day) for day in self.monthdays)
+            days = (map_last(day) for day in self.monthdays)
+        else:
+            start_day = (first_day_of_month + 1) % 7
+            days = (((weekday - start_day) % 7) + (ordinal - 1) * 7 + 1
+                    for ordinal in self.ordinals for weekday in self.weekdays)
+
+        if len(self.month_days) >= self.MAX_CACHED_MONTHS:
+            self.month_days.clear()
+        days = self.month_days[year, month] = sorted(
+            set(itertools.ifilter(day_filter, days)))
+        return days
 
-        start_day = (first_day_of_month + 1) % 7
-        def days_from_weekdays():
-            for ordinal in self.ordinals:
-                week = (ordinal - 1) * 7
-                for weekday in self.weekdays:
-                    yield ((weekday - start_day) % 7) + week + 1
-
-        return sort_days(days_from_weekdays())
+    def next_day(self, first_day, year, month):
+        """Returns matching days for the given year and month.
+        """
+        days = self.get_days(year, month)
+        return days[bisect.bisect_left(days, first_day):]
 
     def next_month(self, start_date):
-        """Create a generator which yields valid months after the start month.
+        """Create a generator which yields valid months after the start month,
+        for up to SEARCH_YEARS years.
         """
-        current     = start_date.month
-        potential   = [m for m in self.months if m >= current]
-        year_wraps   = 0
-
-        while True:
-            if not potential:
-                year_wraps += 1
-                potential = list(self.months)
-
-            yield potential.pop(0), start_date.year + year_wraps
+        index = bisect.bisect_left(self.months, start_date.month)
+        for year in xrange(start_date.year,
+                           start_date.year + self.SEARCH_YEARS + 1):
+            for month in self.months[index:]:
+                yield month, year
+            index = 0
 
     def next_time(self, start_date, is_start_day):
         """Return the next valid time."""
-        start_hour   = start_date.time().hour
-        hour_filter  = lambda hour: not is_start_day or hour >= start_hour
+        if not is_start_day:
+            return datetime.time(*(field[0] for field in self.time_fields))
 
-        for hour in itertools.ifilter(hour_filter, self.hours):
-            for minute in self.minutes:
-                for second in self.seconds:
-                    candidate = datetime.time(hour, minute, second)
-
-                    if is_start_day and start_date.time() >= candidate:
-                        continue
-
-                    return candidate
+        start_time = start_date.time()
+        start = start_time.hour, start_time.minute, start_time.second
+        candidate = next_combination(self.time_fields, start)
+        return datetime.time(*candidate) if candidate else None
 
     def get_match(self, start):
-        """Returns the next datetime match after start."""
+        """Returns the next datetime match after start, or None if there is no
+        match within SEARCH_YEARS.
+        """
         start_date  = to_timezone(start, self.timezone).replace(tzinfo=None)
-
-        def get_first_day(month, year):
-            if (month, year) != (start_date.month, start_date.year):
-                return 1
-            return start_date.day
+        start_month = start_date.year, start_date.month
 
         for month, year in self.next_month(start_date):
-            first_day = get_first_day(month, year)
+            is_start_month = (year, month) == start_month
+            first_day = start_date.day if is_start_month else 1
 
             for day in self.next_day(first_day, year, month):
-                is_start_day = start_date.timetuple()[:3] == (year, month, day)
+                is_start_day = is_start_month and day == start_date.day
 
                 time = self.next_time(start_date, is_start_day)
                 if time is None:
@@ -238,6 +268,16 @@ class TimeSpecification(object):
                     continue
                 return candidate
 
+    def occurrences(self, start, end=None):
+        """Create a generator which yields each match after start, up to and
+        including end. end must be comparable with the matches, which have the
+        same tzinfo as start.
+        """
+        match = self.get_match(start)
+        while match is not None and (end is None or match <= end):
+            yield match
+            match = self.get_match(match)
+
     # TODO: test
     def handle_timezone(self, out, tzinfo):
         if self.timezone and pytz is not None: